@@ -0,0 +1,49 @@
+"""create agdi_tasks table
+
+Revision ID: 4c2b7e9d1a30
+Revises: 67a5401e0198
+Create Date: 2026-10-19 09:12:41.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c2b7e9d1a30'
+down_revision = '67a5401e0198'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # queue for upload post-processing tasks of AGDI
+    sql = sa.sql.text("""
+        CREATE TABLE public.agdi_tasks (
+            id bigserial PRIMARY KEY,
+            task_type character varying NOT NULL,
+            gdi_oid_resource bigint,
+            params text NOT NULL,
+            status character varying NOT NULL DEFAULT 'pending',
+            error text,
+            created_at timestamp without time zone NOT NULL DEFAULT now(),
+            finished_at timestamp without time zone
+        );
+
+        -- lookup of pending tasks by workers
+        CREATE INDEX agdi_tasks_pending_idx
+          ON public.agdi_tasks (id) WHERE status = 'pending';
+        -- lookup of latest task status for a GDI resource
+        CREATE INDEX agdi_tasks_gdi_oid_resource_idx
+          ON public.agdi_tasks (gdi_oid_resource, id);
+    """)
+
+    conn = op.get_bind()
+    conn.execute(sql)
+
+
+def downgrade():
+    sql = sa.sql.text("DROP TABLE public.agdi_tasks;")
+
+    conn = op.get_bind()
+    conn.execute(sql)
@@ -0,0 +1,75 @@
+"""create agdi_data_version table
+
+Revision ID: a9d3c51e7f24
+Revises: 4c2b7e9d1a30
+Create Date: 2026-10-19 14:03:27.541902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d3c51e7f24'
+down_revision = '4c2b7e9d1a30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # change counters per ConfigDB table, for invalidating cached data of AGDI
+    sql = sa.sql.text("""
+        CREATE TABLE public.agdi_data_version (
+            table_name character varying PRIMARY KEY,
+            version bigint NOT NULL DEFAULT 0,
+            updated_at timestamp without time zone NOT NULL DEFAULT now()
+        );
+
+        CREATE FUNCTION public.agdi_bump_data_version() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO public.agdi_data_version AS v
+                (table_name, version, updated_at)
+            VALUES (TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME, 1, now())
+            ON CONFLICT (table_name) DO UPDATE
+                SET version = v.version + 1, updated_at = now();
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        -- statement level triggers, so that bulk writes bump once
+        -- NOTE: tables created later need their own trigger
+        DO $$
+        DECLARE
+            t record;
+        BEGIN
+            FOR t IN
+                SELECT table_schema, table_name
+                FROM information_schema.tables
+                WHERE table_schema IN ('gdi_knoten', 'iam', 'contacts')
+                    AND table_type = 'BASE TABLE'
+            LOOP
+                EXECUTE format(
+                    'CREATE TRIGGER agdi_data_version '
+                    'AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I.%I '
+                    'FOR EACH STATEMENT '
+                    'EXECUTE PROCEDURE public.agdi_bump_data_version()',
+                    t.table_schema, t.table_name
+                );
+            END LOOP;
+        END;
+        $$;
+    """)
+
+    conn = op.get_bind()
+    conn.execute(sql)
+
+
+def downgrade():
+    # NOTE: drops triggers with function
+    sql = sa.sql.text("""
+        DROP FUNCTION public.agdi_bump_data_version() CASCADE;
+        DROP TABLE public.agdi_data_version;
+    """)
+
+    conn = op.get_bind()
+    conn.execute(sql)
@@ -0,0 +1,91 @@
+"""bump agdi data version on commit
+
+Revision ID: b8e4f0c2d915
+Revises: f7c2d85e1b43
+Create Date: 2026-10-19 21:12:05.318467
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e4f0c2d915'
+down_revision = 'f7c2d85e1b43'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # NOTE: the statement level triggers of migration a9d3c51e7f24 only
+    #       record the changed tables of the current transaction, without
+    #       locking any shared rows. The change counters are incremented by
+    #       a deferred constraint trigger at commit time, in order of table
+    #       names, so that concurrent writers do not deadlock on them.
+    sql = sa.sql.text("""
+        CREATE TABLE public.agdi_data_version_pending (
+            txid bigint NOT NULL,
+            table_name character varying NOT NULL,
+            PRIMARY KEY (txid, table_name)
+        );
+
+        CREATE OR REPLACE FUNCTION public.agdi_bump_data_version()
+        RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO public.agdi_data_version_pending (txid, table_name)
+            VALUES (txid_current(), TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME)
+            ON CONFLICT DO NOTHING;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE FUNCTION public.agdi_apply_data_version() RETURNS trigger AS $$
+        BEGIN
+            -- NOTE: first call at commit applies all pending tables of the
+            --       transaction, later calls find none
+            WITH pending AS (
+                DELETE FROM public.agdi_data_version_pending
+                WHERE txid = txid_current()
+                RETURNING table_name
+            )
+            INSERT INTO public.agdi_data_version AS v
+                (table_name, version, updated_at)
+            SELECT table_name, 1, now() FROM pending
+            ORDER BY table_name
+            ON CONFLICT (table_name) DO UPDATE
+                SET version = v.version + 1, updated_at = now();
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE CONSTRAINT TRIGGER agdi_data_version
+        AFTER INSERT ON public.agdi_data_version_pending
+        DEFERRABLE INITIALLY DEFERRED
+        FOR EACH ROW
+        EXECUTE PROCEDURE public.agdi_apply_data_version();
+    """)
+
+    conn = op.get_bind()
+    conn.execute(sql)
+
+
+def downgrade():
+    sql = sa.sql.text("""
+        CREATE OR REPLACE FUNCTION public.agdi_bump_data_version()
+        RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO public.agdi_data_version AS v
+                (table_name, version, updated_at)
+            VALUES (TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME, 1, now())
+            ON CONFLICT (table_name) DO UPDATE
+                SET version = v.version + 1, updated_at = now();
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TABLE public.agdi_data_version_pending;
+        DROP FUNCTION public.agdi_apply_data_version();
+    """)
+
+    conn = op.get_bind()
+    conn.execute(sql)
@@ -0,0 +1,52 @@
+"""add attempts to agdi_tasks
+
+Revision ID: c3a9d7e51f02
+Revises: b8e4f0c2d915
+Create Date: 2026-10-19 22:41:17.604193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a9d7e51f02'
+down_revision = 'b8e4f0c2d915'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # NOTE: tasks are marked as 'running' when claimed by a worker, and
+    #       failed after too many attempts, e.g. if they crash the worker
+    sql = sa.sql.text("""
+        ALTER TABLE public.agdi_tasks
+            ADD COLUMN attempts integer NOT NULL DEFAULT 0,
+            ADD COLUMN started_at timestamp without time zone;
+
+        -- lookup of pending and claimed tasks by workers
+        DROP INDEX public.agdi_tasks_pending_idx;
+        CREATE INDEX agdi_tasks_pending_idx
+          ON public.agdi_tasks (id) WHERE status IN ('pending', 'running');
+    """)
+
+    conn = op.get_bind()
+    conn.execute(sql)
+
+
+def downgrade():
+    sql = sa.sql.text("""
+        UPDATE public.agdi_tasks SET status = 'pending'
+            WHERE status = 'running';
+
+        DROP INDEX public.agdi_tasks_pending_idx;
+        CREATE INDEX agdi_tasks_pending_idx
+          ON public.agdi_tasks (id) WHERE status = 'pending';
+
+        ALTER TABLE public.agdi_tasks
+            DROP COLUMN attempts,
+            DROP COLUMN started_at;
+    """)
+
+    conn = op.get_bind()
+    conn.execute(sql)
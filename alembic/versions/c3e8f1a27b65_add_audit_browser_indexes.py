@@ -0,0 +1,50 @@
+"""add audit browser indexes
+
+Revision ID: c3e8f1a27b65
+Revises: a9d3c51e7f24
+Create Date: 2026-10-19 16:21:05.118342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e8f1a27b65'
+down_revision = 'a9d3c51e7f24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # indexes for keyset pagination of audit log by (action_tstamp_tx,
+    # event_id), with and without filters
+    sql = sa.sql.text("""
+        CREATE INDEX IF NOT EXISTS logged_actions_tstamp_event_idx
+          ON audit.logged_actions (action_tstamp_tx, event_id);
+        CREATE INDEX IF NOT EXISTS logged_actions_table_tstamp_event_idx
+          ON audit.logged_actions (table_name, action_tstamp_tx, event_id);
+        CREATE INDEX IF NOT EXISTS logged_actions_user_tstamp_event_idx
+          ON audit.logged_actions
+            (session_user_name, action_tstamp_tx, event_id);
+        -- history of GDI resources
+        CREATE INDEX IF NOT EXISTS logged_actions_gdi_oid_tstamp_event_idx
+          ON audit.logged_actions
+            ((row_data -> 'gdi_oid'), action_tstamp_tx, event_id)
+          WHERE (row_data -> 'gdi_oid') IS NOT NULL;
+    """)
+
+    conn = op.get_bind()
+    conn.execute(sql)
+
+
+def downgrade():
+    sql = sa.sql.text("""
+        DROP INDEX audit.logged_actions_tstamp_event_idx;
+        DROP INDEX audit.logged_actions_table_tstamp_event_idx;
+        DROP INDEX audit.logged_actions_user_tstamp_event_idx;
+        DROP INDEX audit.logged_actions_gdi_oid_tstamp_event_idx;
+    """)
+
+    conn = op.get_bind()
+    conn.execute(sql)
@@ -0,0 +1,212 @@
+"""partition audit logged_actions
+
+Revision ID: e5b7a2d94c18
+Revises: c3e8f1a27b65
+Create Date: 2026-10-19 17:42:31.604217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b7a2d94c18'
+down_revision = 'c3e8f1a27b65'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # convert audit.logged_actions to a table partitioned by month of
+    # action_tstamp_tx (requires PostgreSQL 11+)
+    #
+    # NOTE: existing rows are kept in place as partition
+    #       'logged_actions_legacy' up to the start of next month, so that no
+    #       rows have to be copied
+    sql = sa.sql.text("""
+        DO $$
+        DECLARE
+            next_month timestamptz := date_trunc('month', now())
+                + interval '1 month';
+            seq text;
+            idx record;
+            legacy_idx text;
+            grant_row record;
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM pg_class c
+                    JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = 'audit' AND c.relname = 'logged_actions'
+                    AND c.relkind = 'p'
+            ) THEN
+                RETURN;
+            END IF;
+
+            ALTER TABLE audit.logged_actions RENAME TO logged_actions_legacy;
+            -- NOTE: replaced by primary key of partitioned table
+            ALTER TABLE audit.logged_actions_legacy
+                DROP CONSTRAINT IF EXISTS logged_actions_pkey;
+
+            CREATE TABLE audit.logged_actions (
+                LIKE audit.logged_actions_legacy
+                INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING COMMENTS
+            ) PARTITION BY RANGE (action_tstamp_tx);
+
+            -- keep event_id sequence when dropping legacy partition
+            seq := pg_get_serial_sequence(
+                'audit.logged_actions_legacy', 'event_id'
+            );
+            IF seq IS NOT NULL THEN
+                EXECUTE format(
+                    'ALTER SEQUENCE %s OWNED BY audit.logged_actions.event_id',
+                    seq
+                );
+            END IF;
+
+            -- NOTE: add a CHECK constraint matching the partition bound, so
+            --       that ATTACH PARTITION skips its validation scan; the
+            --       constraint is redundant afterwards
+            EXECUTE format(
+                'ALTER TABLE audit.logged_actions_legacy
+                    ADD CONSTRAINT logged_actions_legacy_bound
+                    CHECK (
+                        action_tstamp_tx IS NOT NULL
+                        AND action_tstamp_tx < %L
+                    )',
+                next_month
+            );
+
+            EXECUTE format(
+                'ALTER TABLE audit.logged_actions
+                    ATTACH PARTITION audit.logged_actions_legacy
+                    FOR VALUES FROM (MINVALUE) TO (%L)',
+                next_month
+            );
+
+            ALTER TABLE audit.logged_actions_legacy
+                DROP CONSTRAINT logged_actions_legacy_bound;
+
+            -- NOTE: primary key must include partition key
+            ALTER TABLE audit.logged_actions
+                ADD PRIMARY KEY (event_id, action_tstamp_tx);
+
+            -- recreate indexes on parent table and attach existing indexes
+            -- of legacy partition
+            FOR idx IN
+                SELECT c.relname AS indexname,
+                    pg_get_indexdef(x.indexrelid) AS indexdef
+                FROM pg_index x
+                    JOIN pg_class c ON c.oid = x.indexrelid
+                WHERE x.indrelid = 'audit.logged_actions_legacy'::regclass
+                    AND NOT x.indisunique
+            LOOP
+                legacy_idx := left(idx.indexname, 56) || '_legacy';
+                EXECUTE format(
+                    'ALTER INDEX audit.%I RENAME TO %I',
+                    idx.indexname, legacy_idx
+                );
+                EXECUTE regexp_replace(
+                    idx.indexdef,
+                    ' ON (audit\\.)?logged_actions_legacy ',
+                    ' ON ONLY audit.logged_actions '
+                );
+                EXECUTE format(
+                    'ALTER INDEX audit.%I ATTACH PARTITION audit.%I',
+                    idx.indexname, legacy_idx
+                );
+            END LOOP;
+
+            -- copy privileges
+            FOR grant_row IN
+                SELECT grantee, privilege_type
+                FROM information_schema.role_table_grants
+                WHERE table_schema = 'audit'
+                    AND table_name = 'logged_actions_legacy'
+            LOOP
+                EXECUTE format(
+                    'GRANT %s ON audit.logged_actions TO %s',
+                    grant_row.privilege_type,
+                    CASE WHEN grant_row.grantee = 'PUBLIC' THEN 'PUBLIC'
+                        ELSE quote_ident(grant_row.grantee) END
+                );
+            END LOOP;
+
+            -- partitions for next two months
+            FOR i IN 0..1 LOOP
+                EXECUTE format(
+                    'CREATE TABLE audit.%I PARTITION OF audit.logged_actions
+                        FOR VALUES FROM (%L) TO (%L)',
+                    'logged_actions_p' || to_char(
+                        next_month + i * interval '1 month', 'YYYYMM'
+                    ),
+                    next_month + i * interval '1 month',
+                    next_month + (i + 1) * interval '1 month'
+                );
+            END LOOP;
+
+            -- keep rows after the last partition if maintain-audit-log has
+            -- not been run in time (moved to their partition once created)
+            CREATE TABLE audit.logged_actions_default
+                PARTITION OF audit.logged_actions DEFAULT;
+        END
+        $$;
+    """)
+
+    conn = op.get_bind()
+    conn.execute(sql)
+
+
+def downgrade():
+    # NOTE: copies all rows of partitions (including any archived partitions
+    #       that have been restored) into a plain table
+    sql = sa.sql.text("""
+        DO $$
+        DECLARE
+            seq text;
+        BEGIN
+            CREATE TABLE audit.logged_actions_plain (
+                LIKE audit.logged_actions
+                INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING COMMENTS
+            );
+            INSERT INTO audit.logged_actions_plain
+                SELECT * FROM audit.logged_actions;
+
+            seq := pg_get_serial_sequence('audit.logged_actions', 'event_id');
+            IF seq IS NOT NULL THEN
+                EXECUTE format(
+                    'ALTER SEQUENCE %s OWNED BY '
+                    'audit.logged_actions_plain.event_id',
+                    seq
+                );
+            END IF;
+
+            DROP TABLE audit.logged_actions;
+            ALTER TABLE audit.logged_actions_plain RENAME TO logged_actions;
+            ALTER TABLE audit.logged_actions
+                ADD CONSTRAINT logged_actions_pkey PRIMARY KEY (event_id);
+
+            REVOKE ALL ON audit.logged_actions FROM public;
+        END
+        $$;
+
+        CREATE INDEX logged_actions_relid_idx
+          ON audit.logged_actions (relid);
+        CREATE INDEX logged_actions_action_tstamp_tx_stm_idx
+          ON audit.logged_actions (action_tstamp_stm);
+        CREATE INDEX logged_actions_action_idx
+          ON audit.logged_actions (action);
+        CREATE INDEX logged_actions_tstamp_event_idx
+          ON audit.logged_actions (action_tstamp_tx, event_id);
+        CREATE INDEX logged_actions_table_tstamp_event_idx
+          ON audit.logged_actions (table_name, action_tstamp_tx, event_id);
+        CREATE INDEX logged_actions_user_tstamp_event_idx
+          ON audit.logged_actions
+            (session_user_name, action_tstamp_tx, event_id);
+        CREATE INDEX logged_actions_gdi_oid_tstamp_event_idx
+          ON audit.logged_actions
+            ((row_data -> 'gdi_oid'), action_tstamp_tx, event_id)
+          WHERE (row_data -> 'gdi_oid') IS NOT NULL;
+    """)
+
+    conn = op.get_bind()
+    conn.execute(sql)
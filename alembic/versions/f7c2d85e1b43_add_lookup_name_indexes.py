@@ -0,0 +1,53 @@
+"""add lookup name indexes
+
+Revision ID: f7c2d85e1b43
+Revises: e5b7a2d94c18
+Create Date: 2026-10-19 19:08:47.215930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7c2d85e1b43'
+down_revision = 'e5b7a2d94c18'
+branch_labels = None
+depends_on = None
+
+
+# tables with names for typeahead lookups
+TABLES = [
+    ('contacts', 'contact'),
+    ('gdi_knoten', 'data_set_view'),
+    ('gdi_knoten', 'ows_layer'),
+    ('iam', 'role')
+]
+
+
+def upgrade():
+    # indexes for case insensitive prefix search on names
+    # (lower(name) LIKE '<prefix>%') and ordering by lower(name)
+    statements = []
+    for schema, table in TABLES:
+        statements.append("""
+            CREATE INDEX IF NOT EXISTS {table}_name_lower_pattern_idx
+              ON {schema}.{table} (lower(name) text_pattern_ops);
+            CREATE INDEX IF NOT EXISTS {table}_name_lower_idx
+              ON {schema}.{table} (lower(name));
+        """.format(schema=schema, table=table))
+
+    conn = op.get_bind()
+    conn.execute(sa.sql.text("".join(statements)))
+
+
+def downgrade():
+    statements = []
+    for schema, table in TABLES:
+        statements.append("""
+            DROP INDEX {schema}.{table}_name_lower_pattern_idx;
+            DROP INDEX {schema}.{table}_name_lower_idx;
+        """.format(schema=schema, table=table))
+
+    conn = op.get_bind()
+    conn.execute(sa.sql.text("".join(statements)))
@@ -9,8 +9,17 @@ from .templates_controller import TemplatesController
 from .transformation_controller import TransformationController
 from .wms_wfs_controller import WmsWfsController
 from .publish_controller import PublishController
+from .index_advisor_controller import IndexAdvisorController
+from .config_diff_controller import ConfigDiffController
+from .config_lint_controller import ConfigLintController
+from .impact_controller import ImpactController
+from .audit_controller import AuditController
+from .lookup_controller import LookupController
+from .name_check_controller import NameCheckController
 
 from .users_controller import UsersController
+from .effective_permissions_controller import \
+    EffectivePermissionsController
 from .groups_controller import GroupsController
 from .roles_controller import RolesController
 
@@ -0,0 +1,314 @@
+from datetime import datetime
+
+from flask import abort, json, jsonify, render_template, request, \
+    Response, stream_with_context, url_for
+from sqlalchemy.sql import select, tuple_
+
+
+class AuditController:
+    """Controller for audit log
+
+    Browse audit.logged_actions with keyset pagination on
+    (action_tstamp_tx, event_id), newest first.
+    """
+
+    # default and max number of entries per page
+    PAGE_SIZE = 100
+    MAX_PAGE_SIZE = 1000
+
+    # number of entries in resource history
+    HISTORY_SIZE = 50
+
+    # rows per fetch from server-side cursor for exports
+    EXPORT_BATCH_SIZE = 1000
+
+    # audit actions
+    ACTIONS = {
+        'I': 'INSERT',
+        'U': 'UPDATE',
+        'D': 'DELETE',
+        'T': 'TRUNCATE'
+    }
+
+    # accepted formats for time range filters
+    TIME_FORMATS = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d']
+
+    def __init__(self, app, config_models):
+        """Constructor
+
+        :param Flask app: Flask application
+        :param TenantConfigModels config_models: Helper for ORM models
+        """
+        self.resource_name = "Audit-Log"
+        self.base_route = 'audit'
+        self.templates_dir = 'audit'
+        self.logger = app.logger
+        self.config_models = config_models
+
+        # add custom routes
+        base_route = self.base_route
+        # audit log page
+        app.add_url_rule(
+            '/%s' % base_route, base_route, self.index, methods=['GET']
+        )
+        # JSON lines export
+        app.add_url_rule(
+            '/%s/export' % base_route, '%s_export' % base_route,
+            self.export, methods=['GET']
+        )
+        # history of GDI resource
+        app.add_url_rule(
+            '/%s/history/<int:gdi_oid>' % base_route,
+            '%s_history' % base_route, self.history, methods=['GET']
+        )
+
+    def index(self):
+        """Show page of audit log entries.
+
+        URL params:
+            table: Optional table name filter
+            action: Optional action filter ('I', 'U', 'D' or 'T')
+            user: Optional DB user filter
+            from: Optional start of time range
+            to: Optional end of time range
+            gdi_oid: Optional GDI resource ID filter
+            cursor: Optional cursor of last entry of previous page
+            limit: Optional number of entries per page
+        """
+        error = None
+        entries = []
+        next_cursor = None
+        try:
+            filters = self.filters(request.args)
+            limit = self.limit(request.args.get('limit'))
+            cursor = self.parse_cursor(request.args.get('cursor'))
+
+            query = self.query(filters, cursor).limit(limit + 1)
+            conn = self.config_models.engine.connect()
+            try:
+                rows = conn.execute(query).fetchall()
+            finally:
+                conn.close()
+
+            entries = [self.entry(row) for row in rows[:limit]]
+            if len(rows) > limit:
+                next_cursor = self.cursor(rows[limit - 1])
+        except ValueError as e:
+            error = str(e)
+
+        args = {
+            key: value for key, value in request.args.items()
+            if key != 'cursor' and value
+        }
+        next_url = None
+        if next_cursor:
+            next_url = url_for(self.base_route, cursor=next_cursor, **args)
+
+        return render_template(
+            '%s/index.html' % self.templates_dir, title=self.resource_name,
+            entries=entries, actions=self.ACTIONS, args=args,
+            first_page=not request.args.get('cursor'), next_url=next_url,
+            export_url=url_for('%s_export' % self.base_route, **args),
+            error=error
+        )
+
+    def export(self):
+        """Stream all matching audit log entries as JSON lines.
+
+        URL params: see index()
+        """
+        try:
+            filters = self.filters(request.args)
+        except ValueError as e:
+            abort(400, str(e))
+
+        def lines():
+            conn = self.config_models.engine.connect()
+            try:
+                # NOTE: use server-side cursor, so that rows are not all
+                #       loaded into memory
+                result = conn.execution_options(stream_results=True) \
+                    .execute(self.query(filters))
+                while True:
+                    rows = result.fetchmany(self.EXPORT_BATCH_SIZE)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield json.dumps(
+                            self.entry(row, True), ensure_ascii=False
+                        ) + "\n"
+            finally:
+                conn.close()
+
+        return Response(
+            stream_with_context(lines()),
+            content_type='application/x-ndjson; charset=utf-8',
+            headers={
+                'content-disposition': 'attachment; filename=audit_log.jsonl'
+            },
+            status=200
+        )
+
+    def history(self, gdi_oid):
+        """Return latest audit log entries of a GDI resource as JSON.
+
+        :param int gdi_oid: GDI resource ID
+        """
+        query = self.query({'gdi_oid': gdi_oid}).limit(self.HISTORY_SIZE)
+        conn = self.config_models.engine.connect()
+        try:
+            rows = conn.execute(query).fetchall()
+        finally:
+            conn.close()
+
+        return jsonify({
+            'entries': [self.entry(row) for row in rows],
+            'more_url': url_for(self.base_route, gdi_oid=gdi_oid)
+        })
+
+    def table(self):
+        """Return reflected audit.logged_actions table."""
+        return self.config_models.base.metadata.tables['audit.logged_actions']
+
+    def filters(self, args):
+        """Return filters from URL params.
+
+        Raise ValueError for invalid params.
+
+        :param obj args: URL params
+        """
+        filters = {}
+        for key in ['table', 'user']:
+            if args.get(key):
+                filters[key] = args.get(key)
+
+        action = args.get('action')
+        if action:
+            if action not in self.ACTIONS:
+                raise ValueError("Ungültige Aktion '%s'" % action)
+            filters['action'] = action
+
+        for key in ['from', 'to']:
+            if args.get(key):
+                filters[key] = self.parse_time(args.get(key))
+
+        if args.get('gdi_oid'):
+            try:
+                filters['gdi_oid'] = int(args.get('gdi_oid'))
+            except ValueError:
+                raise ValueError(
+                    "Ungültige Ressourcen-ID '%s'" % args.get('gdi_oid')
+                )
+
+        return filters
+
+    def parse_time(self, value):
+        """Return datetime for time filter.
+
+        :param str value: Time as 'YYYY-MM-DD[ HH:MM[:SS]]'
+        """
+        for time_format in self.TIME_FORMATS:
+            try:
+                return datetime.strptime(value.strip(), time_format)
+            except ValueError:
+                pass
+
+        raise ValueError("Ungültige Zeitangabe '%s'" % value)
+
+    def limit(self, value):
+        """Return number of entries per page.
+
+        :param str value: Optional limit URL param
+        """
+        if not value:
+            return self.PAGE_SIZE
+        try:
+            return max(1, min(int(value), self.MAX_PAGE_SIZE))
+        except ValueError:
+            raise ValueError("Ungültige Anzahl '%s'" % value)
+
+    def query(self, filters, cursor=None):
+        """Return query for audit log entries, newest first.
+
+        :param obj filters: Filters from filters()
+        :param tuple cursor: Optional (<action_tstamp_tx>, <event_id>) of
+                             last entry of previous page
+        """
+        t = self.table()
+        gdi_oid = t.c.row_data['gdi_oid']
+        query = select([
+            t.c.event_id, t.c.action_tstamp_tx, t.c.schema_name,
+            t.c.table_name, t.c.action, t.c.session_user_name,
+            t.c.row_data, t.c.changed_fields
+        ])
+
+        if 'table' in filters:
+            query = query.where(t.c.table_name == filters['table'])
+        if 'action' in filters:
+            query = query.where(t.c.action == filters['action'])
+        if 'user' in filters:
+            query = query.where(t.c.session_user_name == filters['user'])
+        if 'from' in filters:
+            query = query.where(t.c.action_tstamp_tx >= filters['from'])
+        if 'to' in filters:
+            query = query.where(t.c.action_tstamp_tx <= filters['to'])
+        if 'gdi_oid' in filters:
+            query = query.where(gdi_oid == str(filters['gdi_oid']))
+
+        if cursor is not None:
+            # NOTE: row value comparison in index order instead of OFFSET,
+            #       so that later pages are as fast as the first one
+            tstamp, event_id = cursor
+            query = query.where(
+                tuple_(t.c.action_tstamp_tx, t.c.event_id) <
+                tuple_(tstamp, event_id)
+            )
+
+        return query.order_by(
+            t.c.action_tstamp_tx.desc(), t.c.event_id.desc()
+        )
+
+    def cursor(self, row):
+        """Return cursor for an entry as '<event_id>@<ISO timestamp>'.
+
+        :param obj row: Audit log row
+        """
+        return "%d@%s" % (row['event_id'], row['action_tstamp_tx'].isoformat())
+
+    def parse_cursor(self, value):
+        """Return (<action_tstamp_tx>, <event_id>) for cursor, or None.
+
+        :param str value: Optional cursor from cursor()
+        """
+        if not value:
+            return None
+
+        event_id, _, tstamp = value.partition('@')
+        try:
+            # NOTE: keep timestamp as string, compared as timestamptz
+            datetime.strptime(tstamp[:19], '%Y-%m-%dT%H:%M:%S')
+            return (tstamp, int(event_id))
+        except ValueError:
+            raise ValueError("Ungültiger Cursor '%s'" % value)
+
+    def entry(self, row, full=False):
+        """Return audit log entry.
+
+        :param obj row: Audit log row
+        :param bool full: Set to include row data
+        """
+        row_data = row['row_data'] or {}
+        entry = {
+            'event_id': row['event_id'],
+            'timestamp': row['action_tstamp_tx'].isoformat(),
+            'table': "%s.%s" % (row['schema_name'], row['table_name']),
+            'action': row['action'],
+            'user': row['session_user_name'],
+            'gdi_oid': row_data.get('gdi_oid'),
+            'name': row_data.get('name'),
+            'changed_fields': row['changed_fields'] or {}
+        }
+        if full:
+            entry['row_data'] = row_data
+
+        return entry
@@ -0,0 +1,394 @@
+from datetime import datetime
+import gzip
+import os
+import time
+
+from flask import json
+from sqlalchemy.sql import text as sql_text
+
+
+class AuditRetentionHelper:
+    """Helper class for maintaining partitions of audit log
+
+    audit.logged_actions is partitioned by month of action_tstamp_tx
+    (see migration e5b7a2d94c18). Partitions for upcoming months are created
+    in advance, and partitions older than the retention period are archived
+    to gzipped JSON lines files and dropped, or just detached if no archive
+    dir is set.
+    """
+
+    # parent table
+    TABLE = 'logged_actions'
+
+    # rows per fetch from server-side cursor when archiving
+    ARCHIVE_BATCH_SIZE = 5000
+
+    def __init__(self, config_models, logger):
+        """Constructor
+
+        :param TenantConfigModels config_models: Helper for ORM models
+        :param Logger logger: Application logger
+        """
+        self.config_models = config_models
+        self.logger = logger
+
+    def maintain(self, months_ahead, retention_months, archive_dir=None,
+                 dry_run=False):
+        """Create upcoming partitions and remove old partitions, and return
+        report as
+        {
+            'created': [<partition name>],
+            'archived': [{
+                'partition': <partition name>, 'rows': <int>,
+                'file': <archive file or None if detached only>
+            }]
+        }
+
+        :param int months_ahead: Number of months after current month with
+                                 partitions
+        :param int retention_months: Number of months before current month
+                                     to keep
+        :param str archive_dir: Optional dir for archive files
+        :param bool dry_run: Only list changes if set
+        """
+        report = {'created': [], 'archived': []}
+
+        conn = self.config_models.engine.connect()
+        try:
+            if not self.partitioned(conn):
+                raise ValueError(
+                    "audit.%s is not partitioned, run migrations first" %
+                    self.TABLE
+                )
+
+            # NOTE: month boundaries are computed by the DB in its session
+            #       time zone, as in migration e5b7a2d94c18
+            month = self.add_months(conn, None, 0)
+            partitions = self.partitions(conn)
+
+            # create missing partitions after the last partition
+            last_upper = max(
+                [p['upper'] for p in partitions if p['upper'] is not None],
+                default=None
+            )
+            end = self.add_months(conn, month, months_ahead + 1)
+            start = last_upper or month
+            while start < end:
+                upper = self.add_months(conn, start, 1)
+                name = "%s_p%s" % (self.TABLE, start.strftime('%Y%m'))
+                if not dry_run:
+                    self.create_partition(conn, name, start, upper)
+                report['created'].append(name)
+                start = upper
+
+            # archive partitions before cutoff
+            cutoff = self.add_months(conn, month, -retention_months)
+            for partition in partitions:
+                if partition['upper'] is None or partition['upper'] > cutoff:
+                    continue
+
+                entry = {
+                    'partition': partition['name'],
+                    'rows': partition['rows'],
+                    'file': None
+                }
+                if not dry_run:
+                    if archive_dir:
+                        entry['file'], entry['rows'] = self.archive_partition(
+                            conn, partition['name'], archive_dir
+                        )
+                    self.remove_partition(
+                        conn, partition['name'], archive_dir is not None
+                    )
+                elif archive_dir:
+                    entry['file'] = self.archive_path(
+                        archive_dir, partition['name']
+                    )
+                report['archived'].append(entry)
+        finally:
+            conn.close()
+
+        return report
+
+    def partitioned(self, conn):
+        """Return whether audit log is a partitioned table.
+
+        :param Connection conn: ConfigDB connection
+        """
+        sql = sql_text("""
+            SELECT c.relkind
+            FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = 'audit' AND c.relname = :table;
+        """)
+        return conn.execute(sql, table=self.TABLE).scalar() == 'p'
+
+    def partitions(self, conn):
+        """Return partitions of audit log ordered by upper bound as
+        [{'name': <str>, 'upper': <datetime or None>, 'rows': <estimate>}]
+
+        NOTE: upper is None for the default partition
+
+        :param Connection conn: ConfigDB connection
+        """
+        sql = sql_text("""
+            SELECT c.relname AS name,
+                substring(
+                    pg_get_expr(c.relpartbound, c.oid)
+                    FROM 'TO \\(''([^'']+)''\\)'
+                )::timestamptz AS upper,
+                c.reltuples::bigint AS rows
+            FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = CAST(:table AS regclass)
+            ORDER BY 2 NULLS LAST;
+        """)
+        result = conn.execute(sql, table='audit.%s' % self.TABLE)
+        return [
+            {
+                'name': row.name,
+                'upper': row.upper,
+                'rows': max(row.rows, 0)
+            }
+            for row in result
+        ]
+
+    def create_partition(self, conn, name, start, upper):
+        """Create partition for a time range.
+
+        Any rows of the time range in the default partition are moved to the
+        new partition.
+
+        :param Connection conn: ConfigDB connection
+        :param str name: Partition name
+        :param datetime start: Lower bound
+        :param datetime upper: Upper bound (exclusive)
+        """
+        sql = sql_text("""
+            SELECT format(
+                'CREATE TABLE IF NOT EXISTS audit.%I PARTITION OF audit.%I
+                    FOR VALUES FROM (%L) TO (%L)',
+                CAST(:name AS text), CAST(:table AS text),
+                CAST(:start AS timestamptz), CAST(:upper AS timestamptz)
+            ), format(
+                'SELECT EXISTS (
+                    SELECT 1 FROM audit.%I
+                    WHERE action_tstamp_tx >= %L AND action_tstamp_tx < %L
+                )',
+                CAST(:table AS text),
+                CAST(:start AS timestamptz), CAST(:upper AS timestamptz)
+            );
+        """)
+        create, in_default = conn.execute(
+            sql, name=name, table=self.TABLE, start=start, upper=upper
+        ).first()
+
+        # NOTE: only the default partition may contain rows of a time range
+        #       without partition
+        if not conn.execute(sql_text(in_default)).scalar():
+            conn.execute(sql_text(create))
+            self.logger.info("Created audit log partition %s" % name)
+            return
+
+        sql = sql_text("""
+            SELECT format(
+                'CREATE TABLE audit.%I (
+                    LIKE audit.%I INCLUDING DEFAULTS INCLUDING CONSTRAINTS
+                )',
+                CAST(:name AS text), CAST(:table AS text)
+            ), format(
+                'WITH moved AS (
+                    DELETE FROM audit.%I
+                    WHERE action_tstamp_tx >= %L AND action_tstamp_tx < %L
+                    RETURNING *
+                )
+                INSERT INTO audit.%I SELECT * FROM moved',
+                CAST(:table AS text),
+                CAST(:start AS timestamptz), CAST(:upper AS timestamptz),
+                CAST(:name AS text)
+            ), format(
+                'ALTER TABLE audit.%I ATTACH PARTITION audit.%I
+                    FOR VALUES FROM (%L) TO (%L)',
+                CAST(:table AS text), CAST(:name AS text),
+                CAST(:start AS timestamptz), CAST(:upper AS timestamptz)
+            );
+        """)
+        create_table, move_rows, attach = conn.execute(
+            sql, name=name, table=self.TABLE, start=start, upper=upper
+        ).first()
+
+        with conn.begin():
+            conn.execute(sql_text(create_table))
+            moved = conn.execute(sql_text(move_rows)).rowcount
+            conn.execute(sql_text(attach))
+
+        self.logger.info(
+            "Created audit log partition %s with %d rows from default "
+            "partition" % (name, moved)
+        )
+
+    def archive_partition(self, conn, name, archive_dir):
+        """Write all rows of a partition to a gzipped JSON lines file and
+        return (<file path>, <number of rows>).
+
+        :param Connection conn: ConfigDB connection
+        :param str name: Partition name
+        :param str archive_dir: Dir for archive files
+        """
+        path = self.archive_path(archive_dir, name)
+        os.makedirs(archive_dir, exist_ok=True)
+
+        # NOTE: quote partition name via format()
+        sql = sql_text(
+            "SELECT format('SELECT * FROM audit.%I', CAST(:name AS text));"
+        )
+        query = conn.execute(sql, name=name).scalar()
+
+        rows = 0
+        tmp_path = "%s.tmp" % path
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            # NOTE: use server-side cursor, so that rows are not all loaded
+            #       into memory
+            result = conn.execution_options(stream_results=True).execute(
+                sql_text(query)
+            )
+            while True:
+                batch = result.fetchmany(self.ARCHIVE_BATCH_SIZE)
+                if not batch:
+                    break
+                for row in batch:
+                    f.write(json.dumps(
+                        {
+                            key: self.json_value(value)
+                            for key, value in row.items()
+                        },
+                        ensure_ascii=False
+                    ))
+                    f.write("\n")
+                rows += len(batch)
+        # NOTE: only replace archive file when complete
+        os.replace(tmp_path, path)
+
+        self.logger.info(
+            "Archived %d rows of audit log partition %s to %s" %
+            (rows, name, path)
+        )
+        return path, rows
+
+    def remove_partition(self, conn, name, drop):
+        """Detach partition from audit log and optionally drop it.
+
+        :param Connection conn: ConfigDB connection
+        :param str name: Partition name
+        :param bool drop: Set to drop partition after detaching
+        """
+        sql = sql_text("""
+            SELECT format(
+                'ALTER TABLE audit.%I DETACH PARTITION audit.%I',
+                CAST(:table AS text), CAST(:name AS text)
+            ), format('DROP TABLE audit.%I', CAST(:name AS text));
+        """)
+        detach, drop_table = conn.execute(
+            sql, name=name, table=self.TABLE
+        ).first()
+
+        with conn.begin():
+            conn.execute(sql_text(detach))
+            if drop:
+                conn.execute(sql_text(drop_table))
+
+        self.logger.info(
+            "%s audit log partition %s" % (
+                'Dropped' if drop else 'Detached', name
+            )
+        )
+
+    def insert_latency(self, rows):
+        """Measure latency of single row inserts into audit log and return
+        stats as {'rows': <int>, 'mean': <ms>, 'median': <ms>, 'p95': <ms>}.
+
+        NOTE: synthetic rows are inserted in a transaction, which is rolled
+              back afterwards
+
+        :param int rows: Number of inserted rows
+        """
+        sql = sql_text("""
+            INSERT INTO audit.logged_actions (
+                schema_name, table_name, relid, session_user_name,
+                action_tstamp_tx, action_tstamp_stm, action_tstamp_clk,
+                transaction_id, action, row_data, statement_only
+            )
+            VALUES (
+                'gdi_knoten', 'agdi_benchmark', 0, session_user,
+                now(), statement_timestamp(), clock_timestamp(),
+                txid_current(), 'I',
+                hstore(ARRAY[
+                    'gdi_oid', CAST(:gdi_oid AS text),
+                    'name', CAST(:name AS text)
+                ]),
+                false
+            );
+        """)
+
+        durations = []
+        conn = self.config_models.engine.connect()
+        trans = conn.begin()
+        try:
+            for i in range(rows):
+                start = time.perf_counter()
+                conn.execute(
+                    sql, gdi_oid=i, name="agdi_benchmark_%d" % i
+                )
+                durations.append((time.perf_counter() - start) * 1000)
+        finally:
+            trans.rollback()
+            conn.close()
+
+        durations.sort()
+        count = len(durations)
+        if count == 0:
+            return {'rows': 0, 'mean': 0, 'median': 0, 'p95': 0}
+
+        return {
+            'rows': count,
+            'mean': sum(durations) / count,
+            'median': durations[count // 2],
+            'p95': durations[min(int(count * 0.95), count - 1)]
+        }
+
+    def archive_path(self, archive_dir, name):
+        """Return path of archive file for a partition.
+
+        :param str archive_dir: Dir for archive files
+        :param str name: Partition name
+        """
+        return os.path.join(archive_dir, "audit_%s.jsonl.gz" % name)
+
+    def json_value(self, value):
+        """Return JSON serializable value of audit log column.
+
+        :param obj value: Column value
+        """
+        if isinstance(value, datetime):
+            return value.isoformat()
+        elif value is None or isinstance(value, (str, int, float, bool,
+                                                 dict, list)):
+            return value
+        return str(value)
+
+    def add_months(self, conn, dt, months):
+        """Return start of month a number of months after a timestamp as
+        timezone aware datetime.
+
+        :param Connection conn: ConfigDB connection
+        :param datetime dt: Timezone aware datetime (default: now)
+        :param int months: Number of months (negative for months before)
+        """
+        sql = sql_text("""
+            SELECT date_trunc(
+                'month',
+                COALESCE(CAST(:dt AS timestamptz), now())
+                    + make_interval(months => CAST(:months AS int))
+            );
+        """)
+        return conn.execute(sql, dt=dt, months=months).scalar()
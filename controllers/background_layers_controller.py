@@ -1,11 +1,11 @@
 from flask import json
 from flask import request
-import os
-import uuid
 
 from .controller import Controller
 from .permissions_helper import PermissionsHelper
+from .thumbnail_helper import ThumbnailHelper
 from forms import BackgroundLayerForm
+from service_lib.tenant_config_models import TenantModel
 
 
 class BackgroundLayersController(Controller):
@@ -14,20 +14,35 @@ class BackgroundLayersController(Controller):
     Manage background_layer from GUI.
     """
 
-    def __init__(self, app, config_models, service_config):
+    # NOTE: edit form shows status of upload tasks, which is not tracked by
+    #       data versions
+    CONDITIONAL_EDIT = False
+
+    # ConfigDB models of current tenant
+    BackgroundLayer = TenantModel('background_layer')
+
+    def __init__(self, app, config_models, data_versions, name_registry,
+                 service_config, task_queue):
         """Constructor
 
         :param Flask app: Flask application
         :param ConfigModels config_models: Helper for ORM models
+        :param DataVersions data_versions: Change counters of ConfigDB tables
+        :param NameRegistry name_registry: Registry of resource names
         :param func service_config: Helper method for reading service config
+        :param TaskQueue task_queue: Queue for upload post-processing tasks
         """
         super(BackgroundLayersController, self).__init__(
             "BackgroundLayer", 'background_layers', 'background_layer',
-            'background_layers', app, config_models
+            'background_layers', app, config_models,
+            data_versions, name_registry
         )
         self.service_config = service_config
+        self.task_queue = task_queue
         self.PermissionsHelper = PermissionsHelper(config_models)
-        self.BackgroundLayer = self.config_models.model('background_layer')
+        self.ThumbnailHelper = ThumbnailHelper(
+            config_models, service_config, task_queue, app.logger
+        )
 
     def resource_pkey(self):
         """Return primary key column name."""
@@ -95,13 +110,22 @@ class BackgroundLayersController(Controller):
         :param object resource: Optional background_layer object
         :param bool edit_form: Set if edit form
         """
-        form = BackgroundLayerForm(self.config_models, obj=resource)
+        form = BackgroundLayerForm(
+            self.config_models, self.name_registry, obj=resource
+        )
 
         if edit_form:
             if resource.thumbnail_image:
                 # set that thumbnail image is present
                 form.thumbnail_present = True
 
+            # show status of any thumbnail processing
+            status_message = self.task_queue.status_message(resource.gdi_oid)
+            if status_message:
+                form.thumbnail_file.description = (
+                    "<strong>%s</strong>" % status_message
+                )
+
         return form
 
     def create_or_update_resources(self, resource, form, session):
@@ -132,23 +156,15 @@ class BackgroundLayersController(Controller):
 
         if form.thumbnail_file.data:
             # save uploaded thumbnail image
-            target_filename = (
-                str(uuid.uuid4()) +
-                os.path.splitext(form.thumbnail_file.data.filename)[1]
-            )
-            target_path = os.path.join(self.qwc_assets_dir(), target_filename)
-            with open(target_path, 'wb') as f:
-                f.write(request.files[form.thumbnail_file.name].read())
-            background_layer.thumbnail_image = target_filename
-        elif form.remove_thumbnail.data:
-            thumbnail_path = os.path.join(
-                self.qwc_assets_dir(), background_layer.thumbnail_image
-            )
             try:
-                os.remove(thumbnail_path)
-            except Exception as e:
-                pass
-            background_layer.thumbnail_image = None
+                self.ThumbnailHelper.save_upload(
+                    background_layer, 'background_layer',
+                    request.files[form.thumbnail_file.name], session
+                )
+            except ValueError as e:
+                self.raise_validation_error(form.thumbnail_file, str(e))
+        elif form.remove_thumbnail.data:
+            self.ThumbnailHelper.remove(background_layer)
 
         # NOTE: flush object changes in session to update gdi_oid of a
         #       new background_layer
@@ -173,9 +189,3 @@ class BackgroundLayersController(Controller):
             background_layer.gdi_oid, session
         )
         session.delete(background_layer)
-
-    def qwc_assets_dir(self):
-        """Return target dir for QWC assets."""
-        # get dir from service config
-        config = self.service_config()
-        return config.get('qwc_assets_dir', '/tmp/')
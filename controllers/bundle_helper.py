@@ -0,0 +1,1600 @@
+import base64
+from datetime import datetime
+import hashlib
+import io
+import os
+import tarfile
+import tempfile
+import time
+import uuid
+from xml.etree import ElementTree
+
+from flask import json
+from sqlalchemy.orm import joinedload, with_polymorphic
+
+from .contacts_helper import ContactsHelper
+from .data_set_transfer_helper import DataSetTransferHelper
+from .order_helper import OrderHelper
+from .ows_helper import OWSHelper
+from service_lib.tenant_config_models import TenantModel
+
+
+class BundleHelper:
+    """Helper class for promotion bundles of ConfigDB subsets
+
+    A bundle is a gzipped tar archive with a selected closure of DataSets,
+    ProductSets, maps and templates and their uploaded files:
+
+        manifest.json                   format version and counts
+        resources/templates.jsonl       one template per line
+        resources/data_sets.jsonl       one DataSet per line
+                                        (see DataSetTransferHelper)
+        resources/product_sets.jsonl    one ProductSet per line
+        resources/maps.jsonl            one map per line
+        files/<SHA-256>                 content-addressed file contents
+
+    Records reference related resources by name and list their files as
+    {<target path>: <SHA-256>}, where target paths are relative to one of
+    the file areas 'qgs' (project_output_dir), 'jasper' (jasper_reports_dir)
+    or 'assets' (qwc_assets_dir), e.g. 'qgs/symbols/<MD5>.svg'. Identical
+    files (e.g. symbols shared by many styles) are stored only once.
+
+    Imports are matched on names. All conflicts are collected before
+    writing anything, and imports are only applied if there are no
+    conflicts.
+    """
+
+    FORMAT = 'agdi-bundle'
+    VERSION = 1
+
+    # resource types in import order
+    RESOURCE_TYPES = ['templates', 'data_sets', 'product_sets', 'maps']
+
+    # symbol layer props with symbol paths in QML
+    # NOTE: keep in sync with DataSetGUIController
+    QML_SYMBOL_PROPS = [
+        ('SvgMarker', 'name'), ('SVGFill', 'svgFile'),
+        ('RasterFill', 'imageFile')
+    ]
+
+    # subdirs relative to PROJECT_OUTPUT_DIR resp. JASPER_REPORTS_DIR
+    # NOTE: keep in sync with DataSetGUIController and TemplatesController
+    SYMBOLS_SUB_DIR = 'symbols'
+    PRINT_RESOURCES_SUB_DIR = 'print'
+    UPLOADS_SUB_DIR = 'uploads'
+
+    # buffer size for hashing and copying files
+    BUFFER_SIZE = 1024 * 1024
+
+    # ConfigDB models of current tenant
+    DataSetView = TenantModel('data_set_view')
+    DataSet = TenantModel('data_set')
+    OWSLayer = TenantModel('ows_layer')
+    OWSLayerData = TenantModel('ows_layer_data')
+    OWSLayerGroup = TenantModel('ows_layer_group')
+    GroupLayer = TenantModel('group_layer')
+    Map = TenantModel('map')
+    MapLayer = TenantModel('map_layer')
+    BackgroundLayer = TenantModel('background_layer')
+    WmsWfs = TenantModel('wms_wfs')
+    Template = TenantModel('template')
+    TemplateJasper = TenantModel('template_jasper')
+    TemplateQGIS = TenantModel('template_qgis')
+    TemplateInfo = TenantModel('template_info')
+    Role = TenantModel('role')
+    ResourcePermission = TenantModel('resource_permission')
+    Contact = TenantModel('contact')
+    ContactRole = TenantModel('contact_role')
+    ResourceContact = TenantModel('resource_contact')
+
+    def __init__(self, config_models, db_engine, service_config, logger):
+        """Constructor
+
+        :param ConfigModels config_models: Helper for ORM models
+        :param DatabaseEngine db_engine: Database engine with DB connections
+        :param func service_config: Helper method for reading service config
+        :param Logger logger: Application logger
+        """
+        self.config_models = config_models
+        self.service_config = service_config
+        self.logger = logger
+        self.DataSetTransferHelper = DataSetTransferHelper(
+            config_models, db_engine, service_config, logger
+        )
+        self.OrderHelper = OrderHelper()
+        self.OWSHelper = OWSHelper(config_models)
+
+    # export
+
+    def export(self, fileobj, selection):
+        """Write bundle with closure of selected resources and return stats.
+
+        Raise ValueError if any selected resources are not found.
+
+        NOTE: the archive is written as a stream, so that fileobj does not
+              need to be seekable
+
+        :param file fileobj: Writable binary file
+        :param obj selection: Names of selected resources as
+                              {<resource type>: [<name>]}
+        """
+        start = time.time()
+        session = self.config_models.session()
+        try:
+            closure = self.closure(selection, session)
+            lookups = self.DataSetTransferHelper.lookups(session)
+
+            records = {
+                'templates': self.template_records(
+                    closure['templates'], session
+                ),
+                'data_sets': self.data_set_records(
+                    closure['data_sets'], lookups, session
+                ),
+                'product_sets': self.product_set_records(
+                    closure['product_sets'], lookups, session
+                ),
+                'maps': self.map_records(closure['maps'], session)
+            }
+        finally:
+            session.close()
+
+        stats = {
+            'counts': {},
+            'files': 0,
+            'file_refs': 0,
+            'file_bytes': 0,
+            'missing_files': [],
+            'size': 0
+        }
+        # hashes of files already in bundle
+        added_files = set()
+        # missing files as {<target path>: True}
+        missing_files = {}
+
+        counter = CountingWriter(fileobj)
+        with tarfile.open(fileobj=counter, mode='w|gz') as tar:
+            for resource_type in self.RESOURCE_TYPES:
+                stats['counts'][resource_type] = len(records[resource_type])
+                with tempfile.SpooledTemporaryFile(self.BUFFER_SIZE) as f:
+                    for record in records[resource_type]:
+                        # add referenced files
+                        files = {}
+                        for path in record.pop('file_paths', []):
+                            digest = self.add_file(
+                                tar, path, added_files, stats
+                            )
+                            if digest is None:
+                                missing_files[path] = True
+                            else:
+                                files[path] = digest
+                        record['files'] = files
+
+                        f.write(json.dumps(
+                            record, ensure_ascii=False
+                        ).encode('utf-8'))
+                        f.write(b"\n")
+                    self.add_member(
+                        tar, 'resources/%s.jsonl' % resource_type, f
+                    )
+
+            # NOTE: manifest is written last, as file stats are only known
+            #       after adding all files
+            stats['missing_files'] = sorted(missing_files.keys())
+            manifest = {
+                'format': self.FORMAT,
+                'version': self.VERSION,
+                'created': datetime.utcnow().isoformat(),
+                'counts': stats['counts'],
+                'files': stats['files'],
+                'missing_files': stats['missing_files']
+            }
+            self.add_member(
+                tar, 'manifest.json',
+                io.BytesIO(json.dumps(manifest, indent=2).encode('utf-8'))
+            )
+
+        stats['size'] = counter.size
+        stats['duration'] = round(time.time() - start, 3)
+
+        return stats
+
+    def closure(self, selection, session):
+        """Return IDs of selected resources and all resources they depend on
+        as {<resource type>: [<ID>]}.
+
+        Maps include their layers, ProductSets include their sub layers
+        (recursively) and DataSets include their info templates and object
+        sheets.
+
+        NOTE: back-references, e.g. data products of Jasper templates, are
+              not followed, so that the closure stays minimal
+
+        :param obj selection: Names of selected resources as
+                              {<resource type>: [<name>]}
+        :param Session session: DB session
+        """
+        not_found = []
+
+        def find(model, names, key='gdi_oid'):
+            names = list(set(names or []))
+            if not names:
+                return {}
+            query = session.query(model.name, getattr(model, key)) \
+                .filter(model.name.in_(names))
+            found = {name: id for name, id in query}
+            for name in names:
+                if name not in found:
+                    not_found.append(name)
+            return found
+
+        template_ids = set(
+            find(self.Template, selection.get('templates')).values()
+        )
+        view_ids = set(
+            find(self.DataSetView, selection.get('data_sets')).values()
+        )
+        layer_ids = set(
+            find(self.OWSLayerGroup, selection.get('product_sets')).values()
+        )
+        map_ids = set(find(self.Map, selection.get('maps')).values())
+        if not_found:
+            raise ValueError(
+                "Ressourcen nicht gefunden: %s" % ", ".join(sorted(not_found))
+            )
+
+        # layers of maps
+        if map_ids:
+            query = session.query(self.MapLayer.gdi_oid_ows_layer) \
+                .select_from(self.Map).join(self.Map.map_layers) \
+                .filter(self.Map.gdi_oid.in_(map_ids))
+            layer_ids.update(layer_id for layer_id, in query)
+
+        # layers of DataSets
+        if view_ids:
+            query = session.query(self.OWSLayerData.gdi_oid).filter(
+                self.OWSLayerData.gdi_oid_data_set_view.in_(view_ids)
+            )
+            layer_ids.update(layer_id for layer_id, in query)
+
+        # resolve nested layers, one query per nesting level
+        root_ids = set(
+            layer.gdi_oid for layer in self.OWSHelper.ows_root_layers(session)
+        )
+        layer_model = with_polymorphic(self.OWSLayer, '*')
+        group_ids = set()
+        seen = set()
+        pending = layer_ids - root_ids
+        while pending:
+            seen.update(pending)
+            new_group_ids = set()
+            query = session.query(layer_model) \
+                .filter(layer_model.gdi_oid.in_(pending))
+            for layer in query:
+                if layer.type == 'group':
+                    new_group_ids.add(layer.gdi_oid)
+                else:
+                    view_ids.add(layer.gdi_oid_data_set_view)
+                    for template_id in [
+                        layer.gdi_oid_info_template,
+                        layer.gdi_oid_object_sheet
+                    ]:
+                        if template_id is not None:
+                            template_ids.add(template_id)
+            group_ids.update(new_group_ids)
+
+            pending = set()
+            if new_group_ids:
+                query = session.query(self.GroupLayer.gdi_oid_sub_layer) \
+                    .filter(
+                        self.GroupLayer.gdi_oid_group_layer.in_(new_group_ids)
+                    )
+                pending = set(
+                    layer_id for layer_id, in query
+                ) - seen - root_ids
+
+        return {
+            'templates': sorted(template_ids),
+            'data_sets': sorted(view_ids),
+            'product_sets': sorted(group_ids),
+            'maps': sorted(map_ids)
+        }
+
+    def template_records(self, ids, session):
+        """Return records for templates.
+
+        :param list[int] ids: Template IDs
+        :param Session session: DB session
+        """
+        if not ids:
+            return []
+
+        permissions = self.resource_permissions(ids, session)
+        contacts = self.resource_contacts(
+            ids, ContactsHelper.ROLE_RESPONSIBLE, session
+        )
+
+        records = []
+        template_model = with_polymorphic(self.Template, '*')
+        query = session.query(template_model) \
+            .filter(template_model.gdi_oid.in_(ids)) \
+            .order_by(template_model.name)
+        for template in query:
+            record = {
+                'name': template.name,
+                'description': template.description,
+                'type': template.type,
+                'permissions': permissions.get(template.gdi_oid, []),
+                'responsible': contacts.get(template.gdi_oid),
+                'file_paths': []
+            }
+            if template.type == 'jasper':
+                record.update({
+                    'report_filename': template.report_filename,
+                    'uploaded_report': template.uploaded_report,
+                    'default_format': template.default_format,
+                    'data_products': [
+                        ows_layer.name for ows_layer in template.ows_layers
+                    ],
+                    'data_sets': [
+                        {
+                            'data_source': data_set.data_source.name,
+                            'data_set_name': data_set.data_set_name
+                        }
+                        for data_set in template.data_sets
+                    ]
+                })
+                if template.report_filename:
+                    # add all files of report dir
+                    report_dir = os.path.dirname(template.report_filename)
+                    if report_dir:
+                        record['file_paths'] += self.dir_paths(
+                            'jasper', report_dir
+                        )
+                    else:
+                        record['file_paths'].append(
+                            self.area_path('jasper', template.report_filename)
+                        )
+                if template.uploaded_report:
+                    record['file_paths'].append(self.area_path(
+                        'jasper', self.UPLOADS_SUB_DIR,
+                        template.uploaded_report
+                    ))
+            elif template.type == 'qgis':
+                record.update({
+                    'qgs_print_layout': template.qgs_print_layout,
+                    'uploaded_qpt': template.uploaded_qpt,
+                    'map_width': template.map_width,
+                    'map_height': template.map_height,
+                    'print_labels': template.print_labels
+                })
+                record['file_paths'] += self.qpt_resource_paths(
+                    template.qgs_print_layout
+                )
+                if template.uploaded_qpt:
+                    record['file_paths'].append(self.area_path(
+                        'qgs', self.UPLOADS_SUB_DIR, template.uploaded_qpt
+                    ))
+            elif template.type == 'info':
+                record.update({
+                    'info_template': template.info_template,
+                    'template_filename': template.template_filename,
+                    'info_type': template.info_type,
+                    'info_sql': template.info_sql,
+                    'info_module': template.info_module
+                })
+            records.append(record)
+
+        return records
+
+    def data_set_records(self, ids, lookups, session):
+        """Return records for DataSets.
+
+        :param list[int] ids: data_set_view IDs
+        :param obj lookups: Lookups of related records
+        :param Session session: DB session
+        """
+        if not ids:
+            return []
+
+        views = self.DataSetTransferHelper.data_set_views_query(session) \
+            .filter(self.DataSetView.gdi_oid.in_(ids)) \
+            .order_by(self.DataSetView.name).all()
+        serialized = self.DataSetTransferHelper.serialize(
+            views, lookups, session
+        )
+
+        records = []
+        for view in views:
+            record = serialized[view.gdi_oid]
+            file_paths = []
+            for ows_layer in view.ows_layers:
+                for qml in [ows_layer.qgs_style, ows_layer.client_qgs_style]:
+                    file_paths += self.qml_symbol_paths(qml)
+                for uploaded_qml in [
+                    ows_layer.uploaded_qml, ows_layer.uploaded_client_qml
+                ]:
+                    if uploaded_qml:
+                        file_paths.append(self.area_path(
+                            'qgs', self.UPLOADS_SUB_DIR, uploaded_qml
+                        ))
+            record['file_paths'] = file_paths
+            records.append(record)
+
+        return records
+
+    def product_set_records(self, ids, lookups, session):
+        """Return records for ProductSets.
+
+        :param list[int] ids: ows_layer_group IDs
+        :param obj lookups: Lookups of related records
+        :param Session session: DB session
+        """
+        if not ids:
+            return []
+
+        contacts = self.resource_contacts(
+            ids, ContactsHelper.ROLE_DATA_OWNER, session
+        )
+
+        # WMS/WFS layers as {<layer ID>: [<OWS type>]}
+        ows_types = {}
+        root_ids = {
+            gdi_oid: ows_type
+            for ows_type, gdi_oid in lookups['root_layers'].items()
+        }
+        if root_ids:
+            query = session.query(
+                self.GroupLayer.gdi_oid_group_layer,
+                self.GroupLayer.gdi_oid_sub_layer
+            ).filter(
+                self.GroupLayer.gdi_oid_group_layer.in_(list(root_ids.keys()))
+            ).filter(self.GroupLayer.gdi_oid_sub_layer.in_(ids))
+            for root_id, layer_id in query:
+                ows_types.setdefault(layer_id, []).append(root_ids[root_id])
+
+        records = []
+        query = session.query(self.OWSLayerGroup) \
+            .options(
+                joinedload(self.OWSLayerGroup.sub_layers)
+                .joinedload(self.GroupLayer.sub_layer)
+            ) \
+            .filter(self.OWSLayerGroup.gdi_oid.in_(ids)) \
+            .order_by(self.OWSLayerGroup.name)
+        for group in query:
+            legend_image = None
+            if group.legend_image:
+                legend_image = base64.b64encode(
+                    group.legend_image
+                ).decode('ascii')
+            records.append({
+                'name': group.name,
+                'description': group.description,
+                'title': group.title,
+                'facade': group.facade,
+                'synonyms': group.synonyms,
+                'keywords': group.keywords,
+                'ows_metadata': group.ows_metadata,
+                'legend_filename': group.legend_filename,
+                'legend_image': legend_image,
+                'sub_layers': [
+                    {
+                        'name': group_layer.sub_layer.name,
+                        'layer_active': group_layer.layer_active
+                    }
+                    for group_layer in group.sub_layers
+                ],
+                'in_wms': 'WMS' in ows_types.get(group.gdi_oid, []),
+                'in_wfs': 'WFS' in ows_types.get(group.gdi_oid, []),
+                'data_owner': contacts.get(group.gdi_oid)
+            })
+
+        return records
+
+    def map_records(self, ids, session):
+        """Return records for maps.
+
+        :param list[int] ids: Map IDs
+        :param Session session: DB session
+        """
+        if not ids:
+            return []
+
+        permissions = self.resource_permissions(ids, session)
+        contacts = self.resource_contacts(
+            ids, ContactsHelper.ROLE_RESPONSIBLE, session
+        )
+        background_layers = {
+            gdi_oid: name for gdi_oid, name in session.query(
+                self.BackgroundLayer.gdi_oid, self.BackgroundLayer.name
+            )
+        }
+
+        records = []
+        query = session.query(self.Map) \
+            .options(
+                joinedload(self.Map.map_layers)
+                .joinedload(self.MapLayer.owslayer)
+            ) \
+            .filter(self.Map.gdi_oid.in_(ids)) \
+            .order_by(self.Map.map_order)
+        for map_obj in query:
+            file_paths = []
+            if map_obj.thumbnail_image:
+                file_paths.append(
+                    self.area_path('assets', map_obj.thumbnail_image)
+                )
+            records.append({
+                'name': map_obj.name,
+                'description': map_obj.description,
+                'title': map_obj.title,
+                'initial_extent': map_obj.initial_extent,
+                'initial_scale': map_obj.initial_scale,
+                'background_layer': background_layers.get(
+                    map_obj.gdi_oid_default_bg_layer
+                ),
+                'thumbnail_image': map_obj.thumbnail_image,
+                'layers': [
+                    {
+                        'name': map_layer.owslayer.name,
+                        'layer_active': map_layer.layer_active,
+                        'layer_transparency': map_layer.layer_transparency
+                    }
+                    for map_layer in map_obj.map_layers
+                ],
+                'permissions': permissions.get(map_obj.gdi_oid, []),
+                'responsible': contacts.get(map_obj.gdi_oid),
+                'file_paths': file_paths
+            })
+
+        return records
+
+    def resource_permissions(self, ids, session):
+        """Return names of roles with read permissions as
+        {<resource ID>: [<role name>]}.
+
+        :param list[int] ids: GDI resource IDs
+        :param Session session: DB session
+        """
+        permissions = {}
+        query = session.query(
+            self.ResourcePermission.gdi_oid_resource, self.Role.name
+        ).join(self.ResourcePermission.role) \
+            .filter(self.ResourcePermission.gdi_oid_resource.in_(ids)) \
+            .order_by(self.Role.name)
+        for resource_id, role_name in query:
+            permissions.setdefault(resource_id, []).append(role_name)
+
+        return permissions
+
+    def resource_contacts(self, ids, role_type, session):
+        """Return contact names for a contact role as
+        {<resource ID>: <contact name>}.
+
+        :param list[int] ids: GDI resource IDs
+        :param str role_type: Contact role type
+        :param Session session: DB session
+        """
+        query = session.query(
+            self.ResourceContact.gdi_oid_resource, self.Contact.name
+        ).join(
+            self.Contact, self.ResourceContact.id_contact == self.Contact.id
+        ).join(
+            self.ContactRole,
+            self.ResourceContact.id_contact_role == self.ContactRole.id
+        ).filter(self.ContactRole.type == role_type) \
+            .filter(self.ResourceContact.gdi_oid_resource.in_(ids))
+
+        return {resource_id: name for resource_id, name in query}
+
+    def qml_symbol_paths(self, qml_data):
+        """Return target paths of uploaded symbols referenced in QML.
+
+        :param str qml_data: QML style
+        """
+        paths = []
+        if not qml_data:
+            return paths
+
+        try:
+            root = ElementTree.fromstring(qml_data)
+        except ElementTree.ParseError as e:
+            self.logger.warning("Could not parse QML: %s" % e)
+            return paths
+
+        for layer_class, prop_key in self.QML_SYMBOL_PROPS:
+            for svgprop in root.findall(
+                ".//layer[@class='%s']/prop[@k='%s']" % (layer_class, prop_key)
+            ):
+                symbol_path = svgprop.get('v')
+                if (
+                    symbol_path and
+                    os.path.dirname(symbol_path) == self.SYMBOLS_SUB_DIR
+                ):
+                    # NOTE: skip default QGIS symbols
+                    paths.append(self.area_path(
+                        'qgs', self.SYMBOLS_SUB_DIR,
+                        os.path.basename(symbol_path)
+                    ))
+
+        return paths
+
+    def qpt_resource_paths(self, qpt_data):
+        """Return target paths of print resources referenced in QPT.
+
+        :param str qpt_data: QGIS print layout
+        """
+        paths = []
+        if not qpt_data:
+            return paths
+
+        try:
+            root = ElementTree.fromstring(qpt_data)
+        except ElementTree.ParseError as e:
+            self.logger.warning("Could not parse QPT: %s" % e)
+            return paths
+
+        for picture in root.findall(".//ComposerPicture"):
+            resource_path = picture.get('file')
+            if (
+                resource_path and
+                os.path.dirname(resource_path) == self.PRINT_RESOURCES_SUB_DIR
+            ):
+                paths.append(self.area_path(
+                    'qgs', self.PRINT_RESOURCES_SUB_DIR,
+                    os.path.basename(resource_path)
+                ))
+
+        return paths
+
+    def dir_paths(self, area, sub_dir):
+        """Return target paths of all files in a dir.
+
+        :param str area: File area
+        :param str sub_dir: Dir relative to file area
+        """
+        paths = []
+        base_dir = self.file_areas()[area]
+        for root, dirs, files in os.walk(os.path.join(base_dir, sub_dir)):
+            for filename in sorted(files):
+                rel_path = os.path.relpath(
+                    os.path.join(root, filename), base_dir
+                )
+                paths.append(self.area_path(area, rel_path))
+
+        return sorted(paths)
+
+    def add_file(self, tar, path, added_files, stats):
+        """Add file contents to bundle, unless already present, and return
+        its SHA-256, or None if the file is missing.
+
+        :param TarFile tar: Bundle archive
+        :param str path: Target path
+        :param set added_files: Hashes of files already in bundle
+        :param obj stats: Export stats
+        """
+        file_path = self.file_path(path)
+        try:
+            digest = self.file_digest(file_path)
+            stats['file_refs'] += 1
+            if digest in added_files:
+                return digest
+
+            with open(file_path, 'rb') as f:
+                self.add_member(tar, 'files/%s' % digest, f)
+        except OSError as e:
+            self.logger.warning("Could not add file %s: %s" % (path, e))
+            return None
+
+        added_files.add(digest)
+        stats['files'] += 1
+        stats['file_bytes'] += os.path.getsize(file_path)
+
+        return digest
+
+    def add_member(self, tar, name, f):
+        """Add archive member with contents of a file object.
+
+        :param TarFile tar: Bundle archive
+        :param str name: Member name
+        :param file f: Readable binary file
+        """
+        f.seek(0, os.SEEK_END)
+        info = tarfile.TarInfo(name)
+        info.size = f.tell()
+        info.mtime = time.time()
+        f.seek(0)
+        tar.addfile(info, f)
+
+    # import
+
+    def import_bundle(self, path, dry_run=True, chunk_size=None):
+        """Check bundle for conflicts and import it, and return report as
+        {
+            'conflicts': [{'type': <resource type>, 'name': <name>,
+                           'message': <conflict>}],
+            'actions': {<resource type>: {'create': <int>, 'update': <int>}},
+            'data_sets': <DataSetTransferHelper import report>,
+            'files': {'new': <int>, 'unchanged': <int>},
+            'applied': <whether import was applied>,
+            'duration': <s>
+        }
+
+        NOTE: nothing is written if there are any conflicts, and a failed
+              import is reported as conflict with all changes rolled back
+
+        :param str path: Path to bundle file
+        :param bool dry_run: Only check for conflicts if set
+        :param int chunk_size: Number of DataSets per transaction
+        """
+        start = time.time()
+        report = {
+            'conflicts': [],
+            'actions': {},
+            'data_sets': None,
+            'files': {'new': 0, 'unchanged': 0},
+            'applied': False
+        }
+
+        with tarfile.open(path, mode='r:*') as tar:
+            bundle = self.read_bundle(tar, report)
+            if bundle is not None:
+                session = self.config_models.session()
+                try:
+                    self.check_bundle(bundle, report, chunk_size, session)
+                finally:
+                    session.close()
+
+                if not dry_run and not report['conflicts']:
+                    try:
+                        self.apply_bundle(tar, bundle, report, chunk_size)
+                        report['applied'] = True
+                    except Exception as e:
+                        self.logger.error(
+                            "Could not apply bundle: %s" % e
+                        )
+                        self.add_conflict(
+                            report, 'bundle', None,
+                            "Import fehlgeschlagen: %s" % e
+                        )
+
+        report['duration'] = round(time.time() - start, 3)
+
+        return report
+
+    def read_bundle(self, tar, report):
+        """Read manifest and resource records of bundle, or return None
+        if bundle is invalid.
+
+        :param TarFile tar: Bundle archive
+        :param obj report: Import report
+        """
+        try:
+            manifest = json.loads(
+                tar.extractfile('manifest.json').read().decode('utf-8')
+            )
+        except (KeyError, ValueError) as e:
+            self.add_conflict(
+                report, 'bundle', None, "Ungültiges Bundle: %s" % e
+            )
+            return None
+        if (
+            manifest.get('format') != self.FORMAT or
+            manifest.get('version') != self.VERSION
+        ):
+            self.add_conflict(
+                report, 'bundle', None,
+                "Nicht unterstütztes Bundle-Format %s %s" %
+                (manifest.get('format'), manifest.get('version'))
+            )
+            return None
+
+        bundle = {
+            'manifest': manifest,
+            'members': set(tar.getnames())
+        }
+        for resource_type in self.RESOURCE_TYPES:
+            name = 'resources/%s.jsonl' % resource_type
+            if name not in bundle['members']:
+                bundle[resource_type] = []
+                continue
+            lines = tar.extractfile(name).read().decode('utf-8').splitlines()
+            bundle['%s_lines' % resource_type] = lines
+            records = []
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError as e:
+                    self.add_conflict(
+                        report, resource_type, None,
+                        "Ungültiges JSON: %s" % e
+                    )
+            bundle[resource_type] = records
+
+        return bundle
+
+    def check_bundle(self, bundle, report, chunk_size, session):
+        """Collect conflicts of bundle with target ConfigDB and files.
+
+        :param obj bundle: Bundle contents
+        :param obj report: Import report
+        :param int chunk_size: Number of DataSets per transaction
+        :param Session session: DB session
+        """
+        lookups = self.DataSetTransferHelper.lookups(session)
+
+        # names of layers in bundle and target
+        bundle_layers = {}
+        for record in bundle['data_sets']:
+            if record.get('layer') is not None:
+                bundle_layers[record['name']] = 'data'
+        for record in bundle['product_sets']:
+            bundle_layers[record['name']] = 'group'
+        names = list(bundle_layers.keys()) + [
+            layer['name']
+            for record in bundle['product_sets']
+            for layer in record.get('sub_layers', [])
+        ] + [
+            layer['name']
+            for record in bundle['maps']
+            for layer in record.get('layers', [])
+        ] + [
+            name
+            for record in bundle['templates']
+            for name in record.get('data_products', [])
+        ]
+        target_layers = self.layer_types(names, session)
+        layers = dict(target_layers)
+        layers.update(bundle_layers)
+
+        # templates
+        template_types = {
+            name: template_type for name, template_type in session.query(
+                self.Template.name, self.Template.type
+            ).filter(self.Template.name.in_([
+                record['name'] for record in bundle['templates']
+            ]))
+        }
+        actions = {'create': 0, 'update': 0}
+        for record in bundle['templates']:
+            existing_type = template_types.get(record['name'])
+            if existing_type is None:
+                actions['create'] += 1
+            elif existing_type != record['type']:
+                self.add_conflict(
+                    report, 'templates', record['name'],
+                    "Template vom Typ '%s' ist bereits vorhanden" %
+                    existing_type
+                )
+            else:
+                actions['update'] += 1
+            self.check_references(
+                report, 'templates', record, lookups,
+                ContactsHelper.ROLE_RESPONSIBLE
+            )
+            for name in record.get('data_products', []):
+                if name not in layers:
+                    self.add_conflict(
+                        report, 'templates', record['name'],
+                        "DataProduct '%s' nicht gefunden" % name
+                    )
+            for data_set in record.get('data_sets', []):
+                if data_set['data_source'] not in lookups['data_sources']:
+                    self.add_conflict(
+                        report, 'templates', record['name'],
+                        "DataSource '%s' nicht gefunden" %
+                        data_set['data_source']
+                    )
+        report['actions']['templates'] = actions
+
+        # DataSets
+        # NOTE: info templates and object sheets may be part of the bundle
+        for record in bundle['templates']:
+            if record['type'] == 'info':
+                lookups['info_templates'].setdefault(record['name'], None)
+            elif record['type'] == 'jasper':
+                lookups['object_sheets'].setdefault(record['name'], None)
+        entries = self.DataSetTransferHelper.parse_lines(
+            bundle.get('data_sets_lines', [])
+        )
+        self.DataSetTransferHelper.validate_entries(entries, lookups, session)
+        self.DataSetTransferHelper.validate_tables(entries, lookups)
+        existing_views = set(
+            name for name, in session.query(self.DataSetView.name).filter(
+                self.DataSetView.name.in_([
+                    record['name'] for record in bundle['data_sets']
+                ])
+            )
+        )
+        actions = {'create': 0, 'update': 0}
+        for entry in entries:
+            name = entry['record'].get('name')
+            for error in entry['errors']:
+                self.add_conflict(report, 'data_sets', name, error)
+            if name in existing_views:
+                actions['update'] += 1
+            else:
+                actions['create'] += 1
+        report['actions']['data_sets'] = actions
+
+        # ProductSets
+        actions = {'create': 0, 'update': 0}
+        for record in bundle['product_sets']:
+            if target_layers.get(record['name']) == 'data':
+                self.add_conflict(
+                    report, 'product_sets', record['name'],
+                    "Ein DataSet mit diesem Namen ist bereits vorhanden"
+                )
+            elif record['name'] in target_layers:
+                actions['update'] += 1
+            else:
+                actions['create'] += 1
+            for layer in record.get('sub_layers', []):
+                if layer['name'] not in layers:
+                    self.add_conflict(
+                        report, 'product_sets', record['name'],
+                        "Layer '%s' nicht gefunden" % layer['name']
+                    )
+            self.check_references(
+                report, 'product_sets', record, lookups,
+                ContactsHelper.ROLE_DATA_OWNER
+            )
+        report['actions']['product_sets'] = actions
+
+        # maps
+        existing_maps = set(
+            name for name, in session.query(self.Map.name).filter(
+                self.Map.name.in_([
+                    record['name'] for record in bundle['maps']
+                ])
+            )
+        )
+        background_layers = set(
+            name for name, in session.query(self.BackgroundLayer.name)
+        )
+        actions = {'create': 0, 'update': 0}
+        for record in bundle['maps']:
+            if record['name'] in existing_maps:
+                actions['update'] += 1
+            else:
+                actions['create'] += 1
+            if (
+                record.get('background_layer') and
+                record['background_layer'] not in background_layers
+            ):
+                self.add_conflict(
+                    report, 'maps', record['name'],
+                    "BackgroundLayer '%s' nicht gefunden" %
+                    record['background_layer']
+                )
+            for layer in record.get('layers', []):
+                if layer['name'] not in layers:
+                    self.add_conflict(
+                        report, 'maps', record['name'],
+                        "Layer '%s' nicht gefunden" % layer['name']
+                    )
+            self.check_references(
+                report, 'maps', record, lookups,
+                ContactsHelper.ROLE_RESPONSIBLE
+            )
+        report['actions']['maps'] = actions
+
+        # files
+        for resource_type in self.RESOURCE_TYPES:
+            for record in bundle[resource_type]:
+                for path, digest in record.get('files', {}).items():
+                    self.check_file(
+                        report, resource_type, record['name'], path, digest,
+                        bundle['members']
+                    )
+
+    def check_references(self, report, resource_type, record, lookups,
+                         contact_role):
+        """Collect conflicts for roles and contacts referenced by a record.
+
+        :param obj report: Import report
+        :param str resource_type: Resource type
+        :param obj record: Resource record
+        :param obj lookups: Lookups of related records
+        :param str contact_role: Contact role of contact in record
+        """
+        for role_name in record.get('permissions', []):
+            if role_name not in lookups['roles']:
+                self.add_conflict(
+                    report, resource_type, record['name'],
+                    "Rolle '%s' nicht gefunden" % role_name
+                )
+
+        if contact_role == ContactsHelper.ROLE_DATA_OWNER:
+            contact_name = record.get('data_owner')
+        else:
+            contact_name = record.get('responsible')
+        if (
+            contact_name and
+            len(lookups['contacts'].get(contact_name, [])) != 1
+        ):
+            self.add_conflict(
+                report, resource_type, record['name'],
+                "Kontakt '%s' nicht gefunden oder nicht eindeutig" %
+                contact_name
+            )
+
+    def check_file(self, report, resource_type, name, path, digest, members):
+        """Collect conflicts for a file of the bundle.
+
+        :param obj report: Import report
+        :param str resource_type: Resource type
+        :param str name: Resource name
+        :param str path: Target path
+        :param str digest: SHA-256 of file contents
+        :param set members: Names of archive members
+        """
+        if 'files/%s' % digest not in members:
+            self.add_conflict(
+                report, resource_type, name,
+                "Datei '%s' fehlt im Bundle" % path
+            )
+            return
+
+        try:
+            file_path = self.file_path(path)
+        except ValueError as e:
+            self.add_conflict(report, resource_type, name, str(e))
+            return
+
+        if not os.path.exists(file_path):
+            report['files']['new'] += 1
+        elif self.file_digest(file_path) == digest:
+            report['files']['unchanged'] += 1
+        else:
+            self.add_conflict(
+                report, resource_type, name,
+                "Datei '%s' ist bereits mit anderem Inhalt vorhanden" % path
+            )
+
+    def add_conflict(self, report, resource_type, name, message):
+        """Add conflict to import report.
+
+        :param obj report: Import report
+        :param str resource_type: Resource type
+        :param str name: Resource name
+        :param str message: Conflict message
+        """
+        report['conflicts'].append({
+            'type': resource_type,
+            'name': name,
+            'message': message
+        })
+
+    def layer_types(self, names, session):
+        """Return types of existing layers as {<name>: <'data' or 'group'>}.
+
+        :param list[str] names: Layer names
+        :param Session session: DB session
+        """
+        names = list(set(names))
+        if not names:
+            return {}
+        query = session.query(self.OWSLayer.name, self.OWSLayer.type) \
+            .filter(self.OWSLayer.name.in_(names))
+        return {name: layer_type for name, layer_type in query}
+
+    def apply_bundle(self, tar, bundle, report, chunk_size):
+        """Write resources and files of a checked bundle.
+
+        NOTE: all resources are written in a single transaction, which is
+              only committed after all files have been extracted, so that
+              a failed import leaves no resources behind; any new files of
+              a failed import are not referenced
+
+        :param TarFile tar: Bundle archive
+        :param obj bundle: Bundle contents
+        :param obj report: Import report
+        :param int chunk_size: Number of DataSets per flush
+        """
+        session = self.config_models.session()
+        try:
+            # templates
+            lookups = self.DataSetTransferHelper.lookups(session)
+            self.import_templates(bundle['templates'], lookups, session)
+            session.flush()
+
+            # DataSets
+            report['data_sets'] = self.DataSetTransferHelper.import_records(
+                bundle.get('data_sets_lines', []), False, chunk_size, session
+            )
+            if report['data_sets']['errors'] > 0:
+                raise Exception(
+                    "%d DataSets konnten nicht importiert werden" %
+                    report['data_sets']['errors']
+                )
+
+            # ProductSets, maps and template data products
+            lookups = self.DataSetTransferHelper.lookups(session)
+            self.import_product_sets(
+                bundle['product_sets'], lookups, session
+            )
+            self.import_maps(bundle['maps'], lookups, session)
+            self.import_template_data_products(
+                bundle['templates'], session
+            )
+            session.flush()
+
+            # files
+            for resource_type in self.RESOURCE_TYPES:
+                for record in bundle[resource_type]:
+                    for path, digest in record.get('files', {}).items():
+                        self.extract_file(tar, path, digest)
+
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def extract_file(self, tar, path, digest):
+        """Write file from bundle to its target path, unless already present.
+
+        :param TarFile tar: Bundle archive
+        :param str path: Target path
+        :param str digest: SHA-256 of file contents
+        """
+        file_path = self.file_path(path)
+        if os.path.exists(file_path):
+            # NOTE: existing files have been checked for identical contents
+            return
+
+        os.makedirs(os.path.dirname(file_path), 0o755, True)
+        # NOTE: write to temp file first, so that no partial files remain
+        tmp_path = "%s.%s.tmp" % (file_path, uuid.uuid4())
+        with tar.extractfile('files/%s' % digest) as src, \
+                open(tmp_path, 'wb') as dst:
+            while True:
+                data = src.read(self.BUFFER_SIZE)
+                if not data:
+                    break
+                dst.write(data)
+        os.replace(tmp_path, file_path)
+
+    def import_templates(self, records, lookups, session):
+        """Create or update templates matched on name.
+
+        :param list[obj] records: Template records
+        :param obj lookups: Lookups of related records
+        :param Session session: DB session
+        """
+        if not records:
+            return
+
+        template_model = with_polymorphic(self.Template, '*')
+        existing = {
+            template.name: template for template in session.query(
+                template_model
+            ).filter(template_model.name.in_(
+                [record['name'] for record in records]
+            ))
+        }
+        models = {
+            'jasper': self.TemplateJasper,
+            'qgis': self.TemplateQGIS,
+            'info': self.TemplateInfo
+        }
+
+        templates = []
+        for record in records:
+            template = existing.get(record['name'])
+            if template is None:
+                template = models[record['type']]()
+                session.add(template)
+            template.name = record['name']
+            template.description = record['description']
+
+            if record['type'] == 'jasper':
+                template.report_filename = record['report_filename']
+                template.uploaded_report = record['uploaded_report']
+                template.default_format = record['default_format']
+                self.update_template_data_sets(
+                    template, record.get('data_sets', []), lookups, session
+                )
+            elif record['type'] == 'qgis':
+                for field in [
+                    'qgs_print_layout', 'uploaded_qpt', 'map_width',
+                    'map_height', 'print_labels'
+                ]:
+                    setattr(template, field, record[field])
+            elif record['type'] == 'info':
+                for field in [
+                    'info_template', 'template_filename', 'info_type',
+                    'info_sql', 'info_module'
+                ]:
+                    setattr(template, field, record[field])
+            templates.append(template)
+
+        # NOTE: flush once to get gdi_oids of new templates
+        session.flush()
+
+        self.replace_permissions(templates, records, lookups, session)
+        self.replace_contacts(
+            templates, records, 'responsible',
+            ContactsHelper.ROLE_RESPONSIBLE, lookups, session
+        )
+
+    def update_template_data_sets(self, template, data_sets, lookups,
+                                  session):
+        """Replace separate data_sets of a Jasper template.
+
+        :param object template: template_jasper object
+        :param list[obj] data_sets: Record data_sets
+        :param obj lookups: Lookups of related records
+        :param Session session: DB session
+        """
+        for data_set in list(template.data_set_collection):
+            template.data_set_collection.remove(data_set)
+            session.delete(data_set)
+
+        for data_set in data_sets:
+            new_data_set = self.DataSet(
+                name=template.name,
+                description=template.description,
+                data_set_name=data_set['data_set_name'],
+                gdi_oid_data_source=lookups['data_sources'][
+                    data_set['data_source']
+                ]['id']
+            )
+            template.data_set_collection.append(new_data_set)
+            session.add(new_data_set)
+
+    def import_template_data_products(self, records, session):
+        """Update data products of Jasper templates.
+
+        NOTE: run after importing all layers of the bundle
+
+        :param list[obj] records: Template records
+        :param Session session: DB session
+        """
+        records = [record for record in records if record['type'] == 'jasper']
+        if not records:
+            return
+
+        names = set()
+        for record in records:
+            names.update(record.get('data_products', []))
+        ows_layers = {}
+        if names:
+            query = session.query(self.OWSLayer) \
+                .filter(self.OWSLayer.name.in_(names))
+            ows_layers = {ows_layer.name: ows_layer for ows_layer in query}
+
+        templates = {
+            template.name: template for template in session.query(
+                self.TemplateJasper
+            ).filter(self.TemplateJasper.name.in_(
+                [record['name'] for record in records]
+            ))
+        }
+        for record in records:
+            template = templates[record['name']]
+            template.ows_layers = [
+                ows_layers[name] for name in record.get('data_products', [])
+                if name in ows_layers
+            ]
+
+    def import_product_sets(self, records, lookups, session):
+        """Create or update ProductSets matched on name.
+
+        :param list[obj] records: ProductSet records
+        :param obj lookups: Lookups of related records
+        :param Session session: DB session
+        """
+        if not records:
+            return
+
+        existing = {
+            group.name: group for group in session.query(
+                self.OWSLayerGroup
+            ).filter(self.OWSLayerGroup.name.in_(
+                [record['name'] for record in records]
+            ))
+        }
+
+        # remove sub layers of existing ProductSets
+        if existing:
+            session.query(self.GroupLayer).filter(
+                self.GroupLayer.gdi_oid_group_layer.in_([
+                    group.gdi_oid for group in existing.values()
+                ])
+            ).delete(synchronize_session=False)
+            session.expire_all()
+
+        groups = []
+        for record in records:
+            group = existing.get(record['name'])
+            if group is None:
+                group = self.OWSLayerGroup()
+                session.add(group)
+            for field in [
+                'name', 'description', 'title', 'facade', 'synonyms',
+                'keywords', 'ows_metadata', 'legend_filename'
+            ]:
+                setattr(group, field, record[field])
+            group.legend_image = None
+            if record['legend_image']:
+                group.legend_image = base64.b64decode(record['legend_image'])
+            groups.append(group)
+
+        # NOTE: flush once to get gdi_oids of new ProductSets
+        session.flush()
+
+        # add sub layers
+        layer_ids = self.layer_ids([
+            layer['name'] for record in records
+            for layer in record['sub_layers']
+        ], session)
+        group_layers = []
+        for record, group in zip(records, groups):
+            for index, layer in enumerate(record['sub_layers']):
+                group_layers.append({
+                    'gdi_oid_group_layer': group.gdi_oid,
+                    'gdi_oid_sub_layer': layer_ids[layer['name']],
+                    'layer_active': layer['layer_active'],
+                    'layer_order': index
+                })
+        if group_layers:
+            session.bulk_insert_mappings(self.GroupLayer, group_layers)
+
+        # update WMS/WFS
+        ows_group_layers = {}
+        root_ids = {
+            gdi_oid: ows_type
+            for ows_type, gdi_oid in lookups['root_layers'].items()
+        }
+        if root_ids:
+            query = session.query(self.GroupLayer).filter(
+                self.GroupLayer.gdi_oid_group_layer.in_(list(root_ids.keys()))
+            ).filter(self.GroupLayer.gdi_oid_sub_layer.in_(
+                [group.gdi_oid for group in groups]
+            ))
+            for group_layer in query:
+                ows_group_layers[(
+                    root_ids[group_layer.gdi_oid_group_layer],
+                    group_layer.gdi_oid_sub_layer
+                )] = group_layer
+        for record, group in zip(records, groups):
+            for ows_type, field in [('WMS', 'in_wms'), ('WFS', 'in_wfs')]:
+                self.DataSetTransferHelper.update_ows_layers(
+                    group, ows_type, record[field], lookups, ows_group_layers,
+                    session
+                )
+
+        self.replace_contacts(
+            groups, records, 'data_owner', ContactsHelper.ROLE_DATA_OWNER,
+            lookups, session
+        )
+
+    def import_maps(self, records, lookups, session):
+        """Create or update maps matched on name.
+
+        :param list[obj] records: Map records
+        :param obj lookups: Lookups of related records
+        :param Session session: DB session
+        """
+        if not records:
+            return
+
+        existing = {
+            map_obj.name: map_obj for map_obj in session.query(self.Map)
+            .options(joinedload(self.Map.map_layers))
+            .filter(self.Map.name.in_([record['name'] for record in records]))
+        }
+        background_layers = {
+            name: gdi_oid for name, gdi_oid in session.query(
+                self.BackgroundLayer.name, self.BackgroundLayer.gdi_oid
+            )
+        }
+        wms_wfs = session.query(self.WmsWfs).filter_by(ows_type='WMS').first()
+        layer_ids = self.layer_ids([
+            layer['name'] for record in records for layer in record['layers']
+        ], session)
+        next_order = None
+
+        maps = []
+        for record in records:
+            map_obj = existing.get(record['name'])
+            if map_obj is None:
+                map_obj = self.Map()
+                session.add(map_obj)
+                # append new map to map list
+                if next_order is None:
+                    next_order = self.OrderHelper.next_order(
+                        session, self.Map.map_order
+                    )
+                map_obj.map_order = next_order
+                next_order += 1
+            else:
+                # replace map layers
+                for map_layer in list(map_obj.map_layers):
+                    map_obj.map_layers.remove(map_layer)
+                    session.delete(map_layer)
+
+            for field in [
+                'name', 'description', 'title', 'initial_extent',
+                'initial_scale', 'thumbnail_image'
+            ]:
+                setattr(map_obj, field, record[field])
+            if wms_wfs is not None:
+                map_obj.gdi_oid_wms_wfs = wms_wfs.gdi_oid
+            map_obj.gdi_oid_default_bg_layer = background_layers.get(
+                record['background_layer']
+            )
+
+            for index, layer in enumerate(record['layers']):
+                map_obj.map_layers.append(self.MapLayer(
+                    gdi_oid_ows_layer=layer_ids[layer['name']],
+                    layer_order=index,
+                    layer_active=layer['layer_active'],
+                    layer_transparency=layer['layer_transparency']
+                ))
+            maps.append(map_obj)
+
+        # NOTE: flush once to get gdi_oids of new maps
+        session.flush()
+
+        self.replace_permissions(maps, records, lookups, session)
+        self.replace_contacts(
+            maps, records, 'responsible', ContactsHelper.ROLE_RESPONSIBLE,
+            lookups, session
+        )
+
+    def layer_ids(self, names, session):
+        """Return IDs of layers as {<name>: <ID>}.
+
+        :param list[str] names: Layer names
+        :param Session session: DB session
+        """
+        names = list(set(names))
+        if not names:
+            return {}
+        query = session.query(self.OWSLayer.name, self.OWSLayer.gdi_oid) \
+            .filter(self.OWSLayer.name.in_(names))
+        return {name: gdi_oid for name, gdi_oid in query}
+
+    def replace_permissions(self, resources, records, lookups, session):
+        """Replace read permissions of resources with bulk inserts.
+
+        :param list[obj] resources: GDI resource objects
+        :param list[obj] records: Resource records
+        :param obj lookups: Lookups of related records
+        :param Session session: DB session
+        """
+        session.query(self.ResourcePermission).filter(
+            self.ResourcePermission.gdi_oid_resource.in_(
+                [resource.gdi_oid for resource in resources]
+            )
+        ).delete(synchronize_session=False)
+
+        permissions = []
+        for record, resource in zip(records, resources):
+            for role_name in record.get('permissions', []):
+                role_id = lookups['roles'][role_name]
+                permissions.append({
+                    'id_role': role_id,
+                    'gdi_oid_resource': resource.gdi_oid,
+                    'priority': (
+                        0 if role_id == lookups['public_role_id'] else 1
+                    ),
+                    'write': False
+                })
+        if permissions:
+            session.bulk_insert_mappings(self.ResourcePermission, permissions)
+
+    def replace_contacts(self, resources, records, field, role_type, lookups,
+                         session):
+        """Replace resource contacts for a contact role with bulk inserts.
+
+        :param list[obj] resources: GDI resource objects
+        :param list[obj] records: Resource records
+        :param str field: Record field with contact name
+        :param str role_type: Contact role type
+        :param obj lookups: Lookups of related records
+        :param Session session: DB session
+        """
+        role = session.query(self.ContactRole) \
+            .filter_by(type=role_type).first()
+        if role is not None:
+            session.query(self.ResourceContact).filter(
+                self.ResourceContact.id_contact_role == role.id
+            ).filter(self.ResourceContact.gdi_oid_resource.in_(
+                [resource.gdi_oid for resource in resources]
+            )).delete(synchronize_session=False)
+
+        contacts = []
+        for record, resource in zip(records, resources):
+            if not record.get(field):
+                continue
+            if role is None:
+                # create new contact role if missing
+                role = self.ContactRole(type=role_type)
+                session.add(role)
+                session.flush()
+            contacts.append({
+                'id_contact_role': role.id,
+                'id_contact': lookups['contacts'][record[field]][0],
+                'gdi_oid_resource': resource.gdi_oid
+            })
+        if contacts:
+            session.bulk_insert_mappings(self.ResourceContact, contacts)
+
+    # files
+
+    def file_areas(self):
+        """Return base dirs of file areas from service config."""
+        config = self.service_config()
+        return {
+            'qgs': config.get('project_output_dir', '/tmp/'),
+            'jasper': config.get('jasper_reports_dir', '/tmp/'),
+            'assets': config.get('qwc_assets_dir', '/tmp/')
+        }
+
+    def area_path(self, area, *parts):
+        """Return target path for a file in a file area.
+
+        :param str area: File area
+        :param list[str] parts: Path parts relative to file area
+        """
+        return '/'.join([area] + [
+            part.replace('\\', '/').strip('/') for part in parts
+        ])
+
+    def file_path(self, path):
+        """Return absolute file path for a target path.
+
+        Raise ValueError for invalid target paths.
+
+        :param str path: Target path
+        """
+        area, _, rel_path = path.partition('/')
+        base_dir = self.file_areas().get(area)
+        parts = rel_path.split('/')
+        if (
+            base_dir is None or not rel_path or
+            any(part in ['', '.', '..'] for part in parts)
+        ):
+            raise ValueError("Ungültiger Dateipfad '%s'" % path)
+
+        return os.path.join(base_dir, *parts)
+
+    def file_digest(self, file_path):
+        """Return SHA-256 of file contents.
+
+        :param str file_path: File path
+        """
+        m = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            while True:
+                data = f.read(self.BUFFER_SIZE)
+                if not data:
+                    break
+                m.update(data)
+        return m.hexdigest()
+
+
+class CountingWriter:
+    """File object wrapper counting written bytes"""
+
+    def __init__(self, fileobj):
+        """Constructor
+
+        :param file fileobj: Writable binary file
+        """
+        self.fileobj = fileobj
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        return self.fileobj.write(data)
+
+    def flush(self):
+        self.fileobj.flush()
@@ -0,0 +1,126 @@
+from flask import abort, json, render_template, request, Response, \
+    stream_with_context
+from sqlalchemy.exc import SQLAlchemyError
+
+from .config_diff_helper import ConfigDiffHelper
+
+
+class ConfigDiffController:
+    """Controller for ConfigDB diff
+
+    Compare resources of the ConfigDB with the ConfigDB of another
+    environment, configured in service config 'config_diff_targets'.
+    """
+
+    # max number of differences shown on page
+    MAX_ENTRIES = 1000
+
+    # default ConfigDB URL
+    # NOTE: keep in sync with TenantConfigModels
+    DEFAULT_DB_URL = 'postgresql:///?service=soconfig_services'
+
+    def __init__(self, app, config_models, db_engine, service_config):
+        """Constructor
+
+        :param Flask app: Flask application
+        :param TenantConfigModels config_models: Helper for ORM models
+        :param DatabaseEngine db_engine: Database engine with DB connections
+        :param func service_config: Helper method for reading service config
+        """
+        self.resource_name = "ConfigDB-Vergleich"
+        self.base_route = 'config_diff'
+        self.templates_dir = 'config_diff'
+        self.logger = app.logger
+        self.service_config = service_config
+        self.ConfigDiffHelper = ConfigDiffHelper(
+            config_models, db_engine, service_config, app.logger
+        )
+
+        # add custom routes
+        base_route = self.base_route
+        # diff page
+        app.add_url_rule(
+            '/%s' % base_route, base_route, self.index, methods=['GET']
+        )
+        # JSON lines report
+        app.add_url_rule(
+            '/%s/report' % base_route, '%s_report' % base_route,
+            self.json_report, methods=['GET']
+        )
+
+    def index(self):
+        """Show differences to selected target ConfigDB.
+
+        URL params:
+            target: Name of target ConfigDB
+            type: Optional resource types (multiple)
+        """
+        targets = self.targets()
+        target = request.args.get('target')
+        resource_types = request.args.getlist('type') or \
+            ConfigDiffHelper.RESOURCE_TYPES
+
+        entries = []
+        stats = {}
+        truncated = False
+        error = None
+        if target:
+            if target not in targets:
+                abort(404)
+            try:
+                for entry in self.ConfigDiffHelper.diff(
+                    self.source_url(), targets[target], resource_types, stats
+                ):
+                    if len(entries) >= self.MAX_ENTRIES:
+                        # NOTE: continue to count differences
+                        truncated = True
+                        continue
+                    entries.append(entry)
+            except (SQLAlchemyError, ValueError) as e:
+                self.logger.error(e)
+                error = str(e)
+
+        return render_template(
+            '%s/index.html' % self.templates_dir, title=self.resource_name,
+            targets=sorted(targets.keys()), target=target,
+            all_resource_types=ConfigDiffHelper.RESOURCE_TYPES,
+            resource_types=resource_types, entries=entries, stats=stats,
+            truncated=truncated, error=error
+        )
+
+    def json_report(self):
+        """Stream differences to selected target ConfigDB as JSON lines,
+        followed by a line with stats as {"stats": {...}}.
+
+        URL params:
+            target: Name of target ConfigDB
+            type: Optional resource types (multiple)
+        """
+        targets = self.targets()
+        target = request.args.get('target')
+        if target not in targets:
+            abort(404)
+        resource_types = request.args.getlist('type') or None
+
+        def lines():
+            stats = {}
+            for entry in self.ConfigDiffHelper.diff(
+                self.source_url(), targets[target], resource_types, stats
+            ):
+                yield json.dumps(entry, ensure_ascii=False) + "\n"
+            yield json.dumps({'stats': stats}) + "\n"
+
+        # NOTE: stream response, so that large diffs are not kept in memory
+        return Response(
+            stream_with_context(lines()),
+            content_type='application/x-ndjson; charset=utf-8',
+            status=200
+        )
+
+    def source_url(self):
+        """Return ConfigDB URL of current tenant."""
+        return self.service_config().get('db_url', self.DEFAULT_DB_URL)
+
+    def targets(self):
+        """Return target ConfigDBs from service config as {<name>: <URL>}."""
+        return self.service_config().get('config_diff_targets', {})
@@ -0,0 +1,346 @@
+import difflib
+import hashlib
+import time
+
+from sqlalchemy import and_, or_
+
+from .bundle_helper import BundleHelper
+
+
+class ConfigDiffHelper:
+    """Helper class for comparing resources of two ConfigDBs
+
+    Resources are matched on names. Each resource type is read from both
+    ConfigDBs in batches sorted by name (keyset pagination) and compared
+    with a merge join, so that neither ConfigDB is loaded fully into memory.
+
+    Resource records are the same as in promotion bundles
+    (see BundleHelper), with related resources referenced by name.
+
+    NOTE: resources with duplicate names within a ConfigDB are paired in
+          no particular order
+    """
+
+    # resource types in diff order
+    RESOURCE_TYPES = [
+        'data_sources', 'templates', 'data_sets', 'product_sets', 'maps'
+    ]
+
+    # text fields shown as unified diff
+    TEXT_DIFF_FIELDS = [
+        'qgs_style', 'client_qgs_style', 'qgs_print_layout', 'info_template',
+        'info_sql'
+    ]
+    # binary fields compared by hash
+    BINARY_FIELDS = ['legend_image']
+    # ignored record fields
+    IGNORED_FIELDS = ['file_paths']
+
+    # number of resources per query
+    BATCH_SIZE = 500
+    # max lines of a unified diff
+    MAX_DIFF_LINES = 200
+
+    def __init__(self, config_models, db_engine, service_config, logger):
+        """Constructor
+
+        :param TenantConfigModels config_models: Helper for ORM models
+        :param DatabaseEngine db_engine: Database engine with DB connections
+        :param func service_config: Helper method for reading service config
+        :param Logger logger: Application logger
+        """
+        self.config_models = config_models
+        self.db_engine = db_engine
+        self.service_config = service_config
+        self.logger = logger
+
+    def diff(self, source_url, target_url, resource_types=None, stats=None,
+             batch_size=None):
+        """Generate differences between resources of two ConfigDBs as
+        {
+            'type': <resource type>,
+            'name': <resource name>,
+            'status': <'added', 'removed' or 'changed'>,
+            'changes': [{
+                'field': <field path, e.g. 'layer.title'>,
+                'source': <value in source>,
+                'target': <value in target>,
+                'diff': <unified diff lines for text fields>
+            }]
+        }
+
+        'added' resources are only present in source, 'removed' resources
+        are only present in target.
+
+        :param str source_url: Source ConfigDB URL
+        :param str target_url: Target ConfigDB URL
+        :param list[str] resource_types: Optional resource types to compare
+                                         (default: RESOURCE_TYPES)
+        :param obj stats: Optional dict for collecting stats
+        :param int batch_size: Number of resources per query
+        """
+        start = time.time()
+        if stats is None:
+            stats = {}
+        stats.update({
+            'compared': 0,
+            'added': 0,
+            'removed': 0,
+            'changed': 0,
+            'unchanged': 0
+        })
+        batch_size = batch_size or self.BATCH_SIZE
+
+        source = self.open_config_db(source_url)
+        try:
+            target = self.open_config_db(target_url)
+        except Exception:
+            source['session'].close()
+            raise
+        try:
+            for resource_type in resource_types or self.RESOURCE_TYPES:
+                if resource_type not in self.RESOURCE_TYPES:
+                    raise ValueError(
+                        "Unbekannter Ressourcentyp '%s'" % resource_type
+                    )
+                source_records = self.records(source, resource_type, batch_size)
+                target_records = self.records(target, resource_type, batch_size)
+                for entry in self.merge(
+                    resource_type, source_records, target_records, stats
+                ):
+                    yield entry
+        finally:
+            for config_db in [source, target]:
+                config_db['session'].close()
+
+            stats['duration'] = round(time.time() - start, 3)
+            if stats['duration'] > 0:
+                stats['records_per_second'] = int(
+                    stats['compared'] / stats['duration']
+                )
+            else:
+                stats['records_per_second'] = stats['compared']
+
+    def open_config_db(self, db_url):
+        """Return ConfigModels, BundleHelper, session and lookups for a
+        ConfigDB.
+
+        :param str db_url: ConfigDB connection URL
+        """
+        config_models = self.config_models.config_models_for_url(db_url)
+        bundle = BundleHelper(
+            config_models, self.db_engine, self.service_config, self.logger
+        )
+        session = config_models.session()
+        try:
+            lookups = bundle.DataSetTransferHelper.lookups(session)
+        except Exception:
+            session.close()
+            raise
+
+        return {
+            'config_models': config_models,
+            'bundle': bundle,
+            'session': session,
+            'lookups': lookups
+        }
+
+    def records(self, config_db, resource_type, batch_size):
+        """Generate resource records of a ConfigDB sorted by name.
+
+        NOTE: names are sorted by code points (COLLATE "C"), so that the
+              order matches string comparison in Python
+
+        :param obj config_db: ConfigDB from open_config_db()
+        :param str resource_type: Resource type
+        :param int batch_size: Number of resources per query
+        """
+        config_models = config_db['config_models']
+        bundle = config_db['bundle']
+        session = config_db['session']
+        model = config_models.model({
+            'data_sources': 'data_source',
+            'templates': 'template',
+            'data_sets': 'data_set_view',
+            'product_sets': 'ows_layer_group',
+            'maps': 'map'
+        }[resource_type])
+        name_column = model.name.collate('C')
+
+        last = None
+        while True:
+            query = session.query(model.gdi_oid, model.name) \
+                .filter(model.name.isnot(None)) \
+                .order_by(name_column, model.gdi_oid)
+            if last is not None:
+                query = query.filter(or_(
+                    name_column > last[0],
+                    and_(model.name == last[0], model.gdi_oid > last[1])
+                ))
+            rows = query.limit(batch_size).all()
+            if not rows:
+                break
+            last = rows[-1]
+
+            ids = [row[0] for row in rows]
+            if resource_type == 'data_sources':
+                records = self.data_source_records(model, ids, session)
+            elif resource_type == 'templates':
+                records = bundle.template_records(ids, session)
+            elif resource_type == 'data_sets':
+                records = bundle.data_set_records(
+                    ids, config_db['lookups'], session
+                )
+            elif resource_type == 'product_sets':
+                records = bundle.product_set_records(
+                    ids, config_db['lookups'], session
+                )
+            else:
+                records = bundle.map_records(ids, session)
+
+            # NOTE: release loaded objects of this batch
+            session.expunge_all()
+
+            # NOTE: sort records in Python, as ORDER BY name of
+            #       record queries uses the DB collation
+            for record in sorted(records, key=lambda r: r['name']):
+                yield self.normalize(record)
+
+    def data_source_records(self, model, ids, session):
+        """Return records for data_sources.
+
+        :param obj model: data_source model
+        :param list[int] ids: data_source IDs
+        :param Session session: DB session
+        """
+        query = session.query(model).filter(model.gdi_oid.in_(ids))
+        return [
+            {
+                'name': data_source.name,
+                'description': data_source.description,
+                'connection_type': data_source.connection_type,
+                'connection': data_source.connection
+            }
+            for data_source in query
+        ]
+
+    def normalize(self, record):
+        """Return record with hashed binary fields and without ignored
+        fields.
+
+        :param obj record: Resource record
+        """
+        normalized = {}
+        for field, value in record.items():
+            if field in self.IGNORED_FIELDS:
+                continue
+            if isinstance(value, dict):
+                value = self.normalize(value)
+            elif field in self.BINARY_FIELDS and value:
+                value = "sha256:%s" % hashlib.sha256(
+                    value.encode('ascii')
+                ).hexdigest()
+            normalized[field] = value
+
+        return normalized
+
+    def merge(self, resource_type, source_records, target_records, stats):
+        """Generate differences of two record streams sorted by name.
+
+        :param str resource_type: Resource type
+        :param iterator source_records: Source records sorted by name
+        :param iterator target_records: Target records sorted by name
+        :param obj stats: Stats to update
+        """
+        source = next(source_records, None)
+        target = next(target_records, None)
+        while source is not None or target is not None:
+            stats['compared'] += 1
+            if target is None or (
+                source is not None and source['name'] < target['name']
+            ):
+                stats['added'] += 1
+                yield {
+                    'type': resource_type,
+                    'name': source['name'],
+                    'status': 'added',
+                    'changes': []
+                }
+                source = next(source_records, None)
+            elif source is None or target['name'] < source['name']:
+                stats['removed'] += 1
+                yield {
+                    'type': resource_type,
+                    'name': target['name'],
+                    'status': 'removed',
+                    'changes': []
+                }
+                target = next(target_records, None)
+            else:
+                changes = self.compare(source, target)
+                if changes:
+                    stats['changed'] += 1
+                    yield {
+                        'type': resource_type,
+                        'name': source['name'],
+                        'status': 'changed',
+                        'changes': changes
+                    }
+                else:
+                    stats['unchanged'] += 1
+                source = next(source_records, None)
+                target = next(target_records, None)
+
+    def compare(self, source, target, prefix=''):
+        """Return changed fields of two records.
+
+        :param obj source: Source record
+        :param obj target: Target record
+        :param str prefix: Field path prefix for nested records
+        """
+        changes = []
+        for field in sorted(set(source.keys()) | set(target.keys())):
+            source_value = source.get(field)
+            target_value = target.get(field)
+            if source_value == target_value:
+                continue
+
+            path = prefix + field
+            if isinstance(source_value, dict) and \
+                    isinstance(target_value, dict):
+                changes += self.compare(
+                    source_value, target_value, path + '.'
+                )
+            elif field in self.TEXT_DIFF_FIELDS:
+                changes.append({
+                    'field': path,
+                    'source': None,
+                    'target': None,
+                    'diff': self.text_diff(source_value, target_value)
+                })
+            else:
+                changes.append({
+                    'field': path,
+                    'source': source_value,
+                    'target': target_value,
+                    'diff': None
+                })
+
+        return changes
+
+    def text_diff(self, source_text, target_text):
+        """Return unified diff lines from target to source text.
+
+        :param str source_text: Source text
+        :param str target_text: Target text
+        """
+        lines = list(difflib.unified_diff(
+            (target_text or '').splitlines(), (source_text or '').splitlines(),
+            'target', 'source', n=2, lineterm=''
+        ))
+        if len(lines) > self.MAX_DIFF_LINES:
+            omitted = len(lines) - self.MAX_DIFF_LINES
+            lines = lines[:self.MAX_DIFF_LINES]
+            lines.append("... %d weitere Zeilen" % omitted)
+
+        return lines
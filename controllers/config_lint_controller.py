@@ -0,0 +1,116 @@
+from flask import flash, json, redirect, render_template, request, \
+    Response, stream_with_context, url_for
+from sqlalchemy.exc import SQLAlchemyError
+
+from .config_linter_helper import ConfigLinterHelper
+
+
+class ConfigLintController:
+    """Controller for ConfigDB consistency checks
+
+    Check all resources of the ConfigDB and show the last results.
+    """
+
+    # max number of findings shown on page
+    MAX_FINDINGS = 2000
+
+    def __init__(self, app, config_models, db_engine, service_config):
+        """Constructor
+
+        :param Flask app: Flask application
+        :param TenantConfigModels config_models: Helper for ORM models
+        :param DatabaseEngine db_engine: Database engine with DB connections
+        :param func service_config: Helper method for reading service config
+        """
+        self.resource_name = "Konsistenzprüfung"
+        self.base_route = 'config_lint'
+        self.templates_dir = 'config_lint'
+        self.logger = app.logger
+        self.ConfigLinterHelper = ConfigLinterHelper(
+            config_models, db_engine, service_config, app.logger
+        )
+
+        # add custom routes
+        base_route = self.base_route
+        # last results
+        app.add_url_rule(
+            '/%s' % base_route, base_route, self.index, methods=['GET']
+        )
+        # run checks
+        app.add_url_rule(
+            '/%s' % base_route, 'run_%s' % base_route, self.run,
+            methods=['POST']
+        )
+        # JSON lines report
+        app.add_url_rule(
+            '/%s/report' % base_route, '%s_report' % base_route,
+            self.json_report, methods=['GET']
+        )
+
+    def index(self):
+        """Show last results.
+
+        URL params:
+            severity: Optional severity filter
+            check: Optional check filter
+        """
+        results = self.ConfigLinterHelper.load_results()
+        severity = request.args.get('severity')
+        check = request.args.get('check')
+
+        findings = []
+        checks = []
+        truncated = False
+        if results is not None:
+            checks = sorted(set(
+                finding['check'] for finding in results['findings']
+            ))
+            findings = [
+                finding for finding in results['findings']
+                if (not severity or finding['severity'] == severity) and
+                (not check or finding['check'] == check)
+            ]
+            truncated = len(findings) > self.MAX_FINDINGS
+            findings = findings[:self.MAX_FINDINGS]
+
+        return render_template(
+            '%s/index.html' % self.templates_dir, title=self.resource_name,
+            results=results, findings=findings, checks=checks,
+            severity=severity, check=check, truncated=truncated
+        )
+
+    def run(self):
+        """Run checks and show results."""
+        try:
+            stats = {}
+            findings = list(self.ConfigLinterHelper.lint(stats))
+            self.ConfigLinterHelper.save_results(findings, stats)
+            flash(
+                "Prüfung von %d Ressourcen in %.1fs abgeschlossen." %
+                (stats['resources'], stats['duration']), 'success'
+            )
+        except (SQLAlchemyError, OSError) as e:
+            self.logger.error(e)
+            flash("Prüfung fehlgeschlagen: %s" % e, 'error')
+
+        return redirect(url_for(self.base_route))
+
+    def json_report(self):
+        """Run checks and stream findings as JSON lines, followed by a line
+        with stats as {"stats": {...}}.
+        """
+        def lines():
+            stats = {}
+            findings = []
+            for finding in self.ConfigLinterHelper.lint(stats):
+                findings.append(finding)
+                yield json.dumps(finding, ensure_ascii=False) + "\n"
+            yield json.dumps({'stats': stats}) + "\n"
+            self.ConfigLinterHelper.save_results(findings, stats)
+
+        # NOTE: stream response, so that findings are sent while checking
+        return Response(
+            stream_with_context(lines()),
+            content_type='application/x-ndjson; charset=utf-8',
+            status=200
+        )
@@ -0,0 +1,591 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import hashlib
+import os
+import tempfile
+import time
+from xml.etree import ElementTree
+
+from flask import json
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from .bundle_helper import BundleHelper
+from service_lib.tenant_config_models import TenantModel
+
+
+class ConfigLinterHelper:
+    """Helper class for checking consistency of all resources in the
+    ConfigDB
+
+    Resources are read from the ConfigDB in batches in the calling thread.
+    The checks run on a worker pool, with one task per data_source for the
+    tables of its DataSets (single catalog query) and one task per batch of
+    resources for QMLs, QPTs, JSON and files.
+
+    NOTE: workers do not access the ConfigDB or the service config, as these
+          depend on the tenant of the current request
+    """
+
+    # finding severities
+    SEVERITY_ERROR = 'error'
+    SEVERITY_WARNING = 'warning'
+
+    # number of resources per batch
+    BATCH_SIZE = 200
+    # default number of workers
+    WORKERS = 8
+
+    # ConfigDB models of current tenant
+    DataSource = TenantModel('data_source')
+    DataSet = TenantModel('data_set')
+    DataSetView = TenantModel('data_set_view')
+    Attribute = TenantModel('data_set_view_attributes')
+    OWSLayer = TenantModel('ows_layer')
+    OWSLayerData = TenantModel('ows_layer_data')
+    WmsWfs = TenantModel('wms_wfs')
+    TemplateJasper = TenantModel('template_jasper')
+    TemplateQGIS = TenantModel('template_qgis')
+
+    def __init__(self, config_models, db_engine, service_config, logger):
+        """Constructor
+
+        :param TenantConfigModels config_models: Helper for ORM models
+        :param DatabaseEngine db_engine: Database engine with DB connections
+        :param func service_config: Helper method for reading service config
+        :param Logger logger: Application logger
+        """
+        self.config_models = config_models
+        self.service_config = service_config
+        self.logger = logger
+        self.BundleHelper = BundleHelper(
+            config_models, db_engine, service_config, logger
+        )
+        self.DataSetTransferHelper = self.BundleHelper.DataSetTransferHelper
+        self.GeoDBHelper = self.DataSetTransferHelper.GeoDBHelper
+
+    def lint(self, stats=None, workers=None):
+        """Check all resources and generate findings as
+        {
+            'check': <check name>,
+            'severity': <'error' or 'warning'>,
+            'resource_type': <table of resource>,
+            'gdi_oid': <resource ID>,
+            'name': <resource name>,
+            'message': <message>
+        }
+
+        NOTE: findings are generated in order of completed tasks
+
+        :param obj stats: Optional dict for collecting stats
+        :param int workers: Number of workers (default: WORKERS)
+        """
+        start = time.time()
+        if stats is None:
+            stats = {}
+        stats.update({
+            'tasks': 0,
+            'resources': 0,
+            'errors': 0,
+            'warnings': 0
+        })
+        workers = workers or self.WORKERS
+
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            # NOTE: limit pending tasks, so that not all resources are kept
+            #       in memory
+            pending = set()
+            for func, args, count in self.tasks():
+                stats['tasks'] += 1
+                stats['resources'] += count
+                pending.add(executor.submit(func, *args))
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for finding in self.task_findings(done, stats):
+                        yield finding
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for finding in self.task_findings(done, stats):
+                    yield finding
+        finally:
+            executor.shutdown(wait=False)
+            stats['duration'] = round(time.time() - start, 3)
+
+    def task_findings(self, futures, stats):
+        """Return findings of completed tasks and update stats.
+
+        :param set[Future] futures: Completed tasks
+        :param obj stats: Stats to update
+        """
+        findings = []
+        for future in futures:
+            for finding in future.result():
+                if finding['severity'] == self.SEVERITY_ERROR:
+                    stats['errors'] += 1
+                else:
+                    stats['warnings'] += 1
+                findings.append(finding)
+
+        return findings
+
+    def tasks(self):
+        """Generate check tasks as (<func>, <args>, <number of resources>).
+
+        NOTE: resources are queried when the next task is requested
+        """
+        areas = self.BundleHelper.file_areas()
+
+        for task in self.data_set_tasks():
+            yield task
+
+        # ows_metadata of ProductSets and data layers
+        for rows in self.batches(
+            self.OWSLayer, [
+                self.OWSLayer.gdi_oid, self.OWSLayer.type,
+                self.OWSLayer.name, self.OWSLayer.ows_metadata
+            ],
+            self.OWSLayer.ows_metadata.isnot(None)
+        ):
+            yield (self.check_ows_metadata, (rows,), len(rows))
+
+        # ows_metadata of WMS/WFS
+        for rows in self.batches(
+            self.WmsWfs, [
+                self.WmsWfs.gdi_oid, self.WmsWfs.ows_type,
+                self.WmsWfs.ows_metadata
+            ],
+            self.WmsWfs.ows_metadata.isnot(None)
+        ):
+            rows = [
+                (gdi_oid, 'wms_wfs', ows_type, ows_metadata)
+                for gdi_oid, ows_type, ows_metadata in rows
+            ]
+            yield (self.check_ows_metadata, (rows,), len(rows))
+
+        # QML styles and their symbols
+        for rows in self.batches(
+            self.OWSLayerData, [
+                self.OWSLayerData.gdi_oid, self.OWSLayerData.name,
+                self.OWSLayerData.qgs_style,
+                self.OWSLayerData.client_qgs_style
+            ]
+        ):
+            yield (self.check_qml_styles, (rows, areas), len(rows))
+
+        # Jasper reports
+        for rows in self.batches(
+            self.TemplateJasper, [
+                self.TemplateJasper.gdi_oid, self.TemplateJasper.name,
+                self.TemplateJasper.report_filename
+            ]
+        ):
+            yield (self.check_jasper_reports, (rows, areas), len(rows))
+
+        # QGIS print layouts and their resources
+        for rows in self.batches(
+            self.TemplateQGIS, [
+                self.TemplateQGIS.gdi_oid, self.TemplateQGIS.name,
+                self.TemplateQGIS.qgs_print_layout
+            ]
+        ):
+            yield (self.check_print_layouts, (rows, areas), len(rows))
+
+    def batches(self, model, columns, *filters):
+        """Generate batches of rows for resources of a model, sorted by
+        gdi_oid (keyset pagination).
+
+        :param obj model: Resource model
+        :param list[Column] columns: Queried columns, starting with gdi_oid
+        :param list filters: Optional filter expressions
+        """
+        last_id = None
+        while True:
+            session = self.config_models.session()
+            query = session.query(*columns).filter(*filters) \
+                .order_by(model.gdi_oid)
+            if last_id is not None:
+                query = query.filter(model.gdi_oid > last_id)
+            rows = [tuple(row) for row in query.limit(self.BATCH_SIZE)]
+            session.close()
+
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            yield rows
+
+    def data_set_tasks(self):
+        """Generate check tasks for DataSets, with one task per database
+        data_source and a task for DataSets without data_source.
+        """
+        session = self.config_models.session()
+        query = session.query(
+            self.DataSetView.gdi_oid, self.DataSetView.name,
+            self.DataSetView.geometry_column, self.DataSet.data_set_name,
+            self.DataSet.primary_key, self.DataSource.gdi_oid,
+            self.DataSource.name, self.DataSource.connection_type,
+            self.DataSource.connection
+        ).join(self.DataSetView.data_set) \
+            .outerjoin(self.DataSet.data_source) \
+            .order_by(self.DataSetView.gdi_oid)
+
+        # attribute names of all DataSets
+        attributes = {}
+        attr_query = session.query(
+            self.DataSetView.gdi_oid, self.Attribute.name
+        ).join(self.DataSetView.attributes)
+        for gdi_oid, name in attr_query:
+            attributes.setdefault(gdi_oid, []).append(name)
+
+        data_sources = {}
+        dangling = []
+        for row in query:
+            entry = {
+                'gdi_oid': row[0],
+                'name': row[1],
+                'geometry_column': row[2],
+                'table': row[3],
+                'primary_key': row[4],
+                'attributes': attributes.get(row[0], [])
+            }
+            if row[5] is None:
+                dangling.append(entry)
+            elif row[7] == 'database':
+                data_source = data_sources.setdefault(row[5], {
+                    'gdi_oid': row[5],
+                    'name': row[6],
+                    'connection': row[8],
+                    'data_sets': []
+                })
+                data_source['data_sets'].append(entry)
+        session.close()
+
+        if dangling:
+            yield (self.check_dangling_data_sets, (dangling,), len(dangling))
+
+        for data_source in data_sources.values():
+            # NOTE: resolve engine with data_source options from service
+            #       config in calling thread
+            engine = self.GeoDBHelper.engine(self.DataSource(
+                name=data_source['name'],
+                connection=data_source['connection']
+            ))
+            yield (
+                self.check_data_source, (data_source, engine),
+                len(data_source['data_sets'])
+            )
+
+    def check_dangling_data_sets(self, data_sets):
+        """Return findings for DataSets without data_source.
+
+        :param list[obj] data_sets: DataSets
+        """
+        return [
+            self.finding(
+                'dangling_data_source', self.SEVERITY_ERROR, 'data_set_view',
+                data_set['gdi_oid'], data_set['name'],
+                "DataSource nicht vorhanden"
+            )
+            for data_set in data_sets
+        ]
+
+    def check_data_source(self, data_source, engine):
+        """Return findings for tables of DataSets of a database data_source.
+
+        :param obj data_source: data_source with its DataSets
+        :param Engine engine: Database engine for data_source
+        """
+        findings = []
+        tables = {}
+        for data_set in data_source['data_sets']:
+            if data_set['table']:
+                tables[data_set['gdi_oid']] = \
+                    self.DataSetTransferHelper.parse_table_name(
+                        data_set['table']
+                    )
+
+        try:
+            table_infos = self.DataSetTransferHelper.engine_table_infos(
+                engine, list(set(tables.values()))
+            )
+        except OperationalError as e:
+            self.logger.error(e.orig)
+            return [self.finding(
+                'data_source_unavailable', self.SEVERITY_ERROR, 'data_source',
+                data_source['gdi_oid'], data_source['name'],
+                self.GeoDBHelper.error_message(e)
+            )]
+        except ProgrammingError as e:
+            self.logger.error(e.orig)
+            return [self.finding(
+                'data_source_unavailable', self.SEVERITY_ERROR, 'data_source',
+                data_source['gdi_oid'], data_source['name'],
+                "ProgrammingError: %s" % e.orig
+            )]
+
+        for data_set in data_source['data_sets']:
+            def add(check, severity, message):
+                findings.append(self.finding(
+                    check, severity, 'data_set_view', data_set['gdi_oid'],
+                    data_set['name'], message
+                ))
+
+            table = tables.get(data_set['gdi_oid'])
+            if table is None:
+                add('missing_table', self.SEVERITY_ERROR,
+                    "Keine Tabelle konfiguriert")
+                continue
+            table_info = table_infos.get(table)
+            if table_info is None:
+                add('missing_table', self.SEVERITY_ERROR,
+                    "Tabelle %s.%s nicht gefunden" % table)
+                continue
+
+            if not table_info['primary_key'] and not data_set['primary_key']:
+                add('missing_primary_key', self.SEVERITY_ERROR,
+                    "Kein Primärschlüssel vorhanden oder konfiguriert")
+
+            columns = table_info['columns']
+            geometry_column = data_set['geometry_column']
+            if geometry_column and geometry_column not in columns:
+                add('missing_geometry_column', self.SEVERITY_ERROR,
+                    "Geometriespalte '%s' nicht gefunden" % geometry_column)
+
+            missing = [
+                name for name in data_set['attributes']
+                if name not in columns
+            ]
+            if missing:
+                add('missing_attribute_columns', self.SEVERITY_WARNING,
+                    "Attribute ohne Tabellenspalte: %s" % ', '.join(missing))
+
+        return findings
+
+    def check_ows_metadata(self, rows):
+        """Return findings for invalid ows_metadata JSON.
+
+        :param list[tuple] rows: Rows as (<gdi_oid>, <type>, <name>,
+                                 <ows_metadata>)
+        """
+        findings = []
+        for gdi_oid, resource_type, name, ows_metadata in rows:
+            try:
+                json.loads(ows_metadata)
+            except ValueError as e:
+                findings.append(self.finding(
+                    'invalid_ows_metadata', self.SEVERITY_ERROR,
+                    self.resource_type(resource_type), gdi_oid, name,
+                    "Ungültiges JSON in ows_metadata: %s" % e
+                ))
+
+        return findings
+
+    def check_qml_styles(self, rows, areas):
+        """Return findings for invalid QMLs and missing uploaded symbols.
+
+        :param list[tuple] rows: Rows as (<gdi_oid>, <name>, <qgs_style>,
+                                 <client_qgs_style>)
+        :param obj areas: Base dirs of file areas
+        """
+        findings = []
+        for gdi_oid, name, qgs_style, client_qgs_style in rows:
+            for field, qml in [
+                ('qgs_style', qgs_style),
+                ('client_qgs_style', client_qgs_style)
+            ]:
+                if not qml:
+                    continue
+                message = self.xml_error(qml, "QML")
+                if message:
+                    findings.append(self.finding(
+                        'invalid_qml', self.SEVERITY_ERROR, 'ows_layer_data',
+                        gdi_oid, name, "%s: %s" % (field, message)
+                    ))
+                    continue
+
+                missing = self.missing_files(
+                    self.BundleHelper.qml_symbol_paths(qml), areas
+                )
+                if missing:
+                    findings.append(self.finding(
+                        'missing_symbols', self.SEVERITY_ERROR,
+                        'ows_layer_data', gdi_oid, name,
+                        "%s: Symbole nicht gefunden: %s" %
+                        (field, ', '.join(missing))
+                    ))
+
+        return findings
+
+    def check_jasper_reports(self, rows, areas):
+        """Return findings for Jasper templates with missing reports.
+
+        :param list[tuple] rows: Rows as (<gdi_oid>, <name>,
+                                 <report_filename>)
+        :param obj areas: Base dirs of file areas
+        """
+        findings = []
+        for gdi_oid, name, report_filename in rows:
+            if not report_filename:
+                findings.append(self.finding(
+                    'missing_report', self.SEVERITY_ERROR, 'template_jasper',
+                    gdi_oid, name, "Kein Report konfiguriert"
+                ))
+                continue
+
+            path = self.BundleHelper.area_path('jasper', report_filename)
+            if self.missing_files([path], areas):
+                findings.append(self.finding(
+                    'missing_report', self.SEVERITY_ERROR, 'template_jasper',
+                    gdi_oid, name,
+                    "Report '%s' nicht gefunden" % report_filename
+                ))
+
+        return findings
+
+    def check_print_layouts(self, rows, areas):
+        """Return findings for invalid QPTs and missing print resources.
+
+        :param list[tuple] rows: Rows as (<gdi_oid>, <name>,
+                                 <qgs_print_layout>)
+        :param obj areas: Base dirs of file areas
+        """
+        findings = []
+        for gdi_oid, name, qpt in rows:
+            if not qpt:
+                continue
+            message = self.xml_error(qpt, "QPT")
+            if message:
+                findings.append(self.finding(
+                    'invalid_print_layout', self.SEVERITY_ERROR,
+                    'template_qgis', gdi_oid, name, message
+                ))
+                continue
+
+            missing = self.missing_files(
+                self.BundleHelper.qpt_resource_paths(qpt), areas
+            )
+            if missing:
+                findings.append(self.finding(
+                    'missing_print_resources', self.SEVERITY_ERROR,
+                    'template_qgis', gdi_oid, name,
+                    "Druckressourcen nicht gefunden: %s" % ', '.join(missing)
+                ))
+
+        return findings
+
+    def xml_error(self, xml, label):
+        """Return error message if XML could not be parsed, else None.
+
+        :param str xml: XML document
+        :param str label: Document type for message
+        """
+        try:
+            ElementTree.fromstring(xml)
+            return None
+        except ElementTree.ParseError as e:
+            return "Ungültiges %s: %s" % (label, e)
+
+    def missing_files(self, paths, areas):
+        """Return target paths of missing or invalid files.
+
+        :param list[str] paths: Target paths as '<area>/<relative path>'
+        :param obj areas: Base dirs of file areas
+        """
+        missing = []
+        for path in paths:
+            area, _, rel_path = path.partition('/')
+            parts = rel_path.split('/')
+            if (
+                area not in areas or not rel_path or
+                any(part in ['', '.', '..'] for part in parts) or
+                not os.path.isfile(os.path.join(areas[area], *parts))
+            ):
+                missing.append(rel_path)
+
+        return missing
+
+    def resource_type(self, ows_type):
+        """Return resource table for ows_layer type or WMS/WFS.
+
+        :param str ows_type: ows_layer type ('data' or 'group') or 'wms_wfs'
+        """
+        return {
+            'data': 'ows_layer_data',
+            'group': 'ows_layer_group'
+        }.get(ows_type, ows_type)
+
+    def finding(self, check, severity, resource_type, gdi_oid, name,
+                message):
+        """Return finding.
+
+        :param str check: Check name
+        :param str severity: Finding severity ('error' or 'warning')
+        :param str resource_type: Table of resource
+        :param int gdi_oid: Resource ID
+        :param str name: Resource name
+        :param str message: Message
+        """
+        return {
+            'check': check,
+            'severity': severity,
+            'resource_type': resource_type,
+            'gdi_oid': gdi_oid,
+            'name': name,
+            'message': message
+        }
+
+    # cached results
+
+    def results_path(self):
+        """Return path of file with last results for ConfigDB of current
+        tenant.
+        """
+        config = self.service_config()
+        path = config.get('config_lint_results_file')
+        if path:
+            return path
+
+        # NOTE: separate default files per ConfigDB
+        db_url = str(self.config_models.engine.url)
+        digest = hashlib.sha1(db_url.encode('utf-8')).hexdigest()[:12]
+        return os.path.join(
+            tempfile.gettempdir(), 'agdi_config_lint_%s.json' % digest
+        )
+
+    def save_results(self, findings, stats):
+        """Write last results to file, with findings sorted by severity,
+        check and resource name.
+
+        :param list[obj] findings: Findings
+        :param obj stats: Stats
+        """
+        findings = sorted(findings, key=lambda f: (
+            f['severity'] != self.SEVERITY_ERROR, f['check'], f['name'] or '',
+            f['gdi_oid']
+        ))
+        path = self.results_path()
+        tmp_path = "%s.tmp" % path
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'stats': stats,
+                'findings': findings
+            }, f, ensure_ascii=False)
+        # NOTE: replace atomically, so that readers never see partial results
+        os.replace(tmp_path, path)
+
+    def load_results(self):
+        """Return last results as {'timestamp', 'stats', 'findings'},
+        or None if there are none.
+        """
+        path = self.results_path()
+        if not os.path.isfile(path):
+            return None
+
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(
+                "Could not read lint results '%s': %s" % (path, e)
+            )
+            return None
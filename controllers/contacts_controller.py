@@ -2,6 +2,7 @@ from sqlalchemy.orm import joinedload
 
 from .controller import Controller
 from forms import ContactForm
+from service_lib.tenant_config_models import TenantModel
 
 
 class ContactsController(Controller):
@@ -10,18 +11,28 @@ class ContactsController(Controller):
     Manage contact and related models from combined GUI.
     """
 
-    def __init__(self, app, config_models):
+    # tables shown in contacts list
+    INDEX_TABLES = [
+        'contacts.contact', 'contacts.person', 'contacts.organisation'
+    ]
+
+    # ConfigDB models of current tenant
+    Contact = TenantModel('contact')
+    Person = TenantModel('person')
+    Organisation = TenantModel('organisation')
+
+    def __init__(self, app, config_models, data_versions, name_registry):
         """Constructor
 
         :param Flask app: Flask application
         :param ConfigModels config_models: Helper for ORM models
+        :param DataVersions data_versions: Change counters of ConfigDB tables
+        :param NameRegistry name_registry: Registry of resource names
         """
         super(ContactsController, self).__init__(
-            "Kontakt", 'contacts', 'contact', 'contacts', app, config_models
+            "Kontakt", 'contacts', 'contact', 'contacts', app, config_models,
+            data_versions, name_registry
         )
-        self.Contact = self.config_models.model('contact')
-        self.Person = self.config_models.model('person')
-        self.Organisation = self.config_models.model('organisation')
 
     def resources_for_index(self, session):
         """Return contacts list.
@@ -1,4 +1,5 @@
 from sqlalchemy.orm import joinedload
+from service_lib.tenant_config_models import TenantModel
 
 
 class ContactsHelper:
@@ -8,6 +9,13 @@ class ContactsHelper:
     ROLE_DATA_OWNER = "Datenherr"
     ROLE_SUPPLIER = "Lieferant"
 
+    # ConfigDB models of current tenant
+    Contact = TenantModel('contact')
+    Person = TenantModel('person')
+    Organisation = TenantModel('organisation')
+    ContactRole = TenantModel('contact_role')
+    ResourceContact = TenantModel('resource_contact')
+
     def __init__(self, config_models, logger):
         """Constructor
 
@@ -17,12 +25,6 @@ class ContactsHelper:
         self.config_models = config_models
         self.logger = logger
 
-        self.Contact = self.config_models.model('contact')
-        self.Person = self.config_models.model('person')
-        self.Organisation = self.config_models.model('organisation')
-        self.ContactRole = self.config_models.model('contact_role')
-        self.ResourceContact = self.config_models.model('resource_contact')
-
     def contact_choices(self):
         """Return choices for a contact select field."""
         choices = []
@@ -1,7 +1,18 @@
-from flask import abort, flash, redirect, render_template, request, url_for
+import hashlib
+import os
+import time
+
+from flask import abort, flash, jsonify, make_response, Markup, redirect, \
+    render_template, request, url_for
+from flask import session as http_session
+from flask_wtf.csrf import generate_csrf
 from sqlalchemy.exc import IntegrityError, InternalError
 from wtforms import ValidationError
 
+from service_lib.auth import get_auth_user
+from service_lib.fragment_cache import FragmentCache
+from .order_helper import OrderHelper
+
 
 class Controller:
     """Controller base class
@@ -9,8 +20,34 @@ class Controller:
     Add routes for specific controller and provide generic RESTful actions.
     """
 
+    # tables shown in resources list as '<schema>.<table>', for caching the
+    # rendered index table by their data versions (None to disable caching)
+    INDEX_TABLES = None
+
+    # shared cache for rendered index tables of all controllers and tenants
+    index_cache = FragmentCache(
+        int(os.environ.get('INDEX_CACHE_SIZE_MB', 32)) * 1024 * 1024
+    )
+
+    # placeholder for CSRF token in cached index tables
+    CSRF_MARKER = '__AGDI_CSRF_TOKEN__'
+
+    # schemas of ConfigDB tables for versions of pages without specific
+    # tables (e.g. edit forms with select fields for other resources)
+    VERSION_SCHEMAS = ['gdi_knoten', 'iam', 'contacts']
+
+    # max age in seconds of pages validated by ETag
+    # NOTE: shorter than CSRF token lifetime (default: 1h), so that forms
+    #       on pages from the browser cache can still be submitted
+    ETAG_MAX_AGE = int(os.environ.get('ETAG_MAX_AGE', 1800))
+
+    # set to support conditional GET of edit forms
+    # (disable for forms with data not tracked by data versions)
+    CONDITIONAL_EDIT = True
+
     def __init__(self, resource_name, base_route, endpoint_suffix,
-                 templates_dir, app, config_models):
+                 templates_dir, app, config_models, data_versions,
+                 name_registry):
         """Constructor
 
         :param str resource_name: Visible name of resource (e.g. 'Benutzer')
@@ -19,6 +56,8 @@ class Controller:
         :param str templates_dir: Subdir for resource templates (e.g. 'users')
         :param Flask app: Flask application
         :param ConfigModels config_models: Helper for ORM models
+        :param DataVersions data_versions: Change counters of ConfigDB tables
+        :param NameRegistry name_registry: Registry of resource names
         """
         self.resource_name = resource_name
         self.base_route = base_route
@@ -26,6 +65,8 @@ class Controller:
         self.templates_dir = templates_dir
         self.logger = app.logger
         self.config_models = config_models
+        self.data_versions = data_versions
+        self.name_registry = name_registry
 
         self.add_routes(app)
 
@@ -88,15 +129,115 @@ class Controller:
 
     def index(self):
         """Show resources list."""
+        return self.conditional_page(self.INDEX_TABLES, self.render_index)
+
+    def render_index(self, version):
+        """Render resources list.
+
+        :param obj version: Data version of INDEX_TABLES, or None if not
+                            available
+        """
+        template = '%s/index.html' % self.templates_dir
+        cache_key = None
+        if self.INDEX_TABLES and version is not None:
+            cache_key = self.index_cache_key()
+            index_table = self.index_cache.get(cache_key, version)
+            if index_table is not None:
+                # NOTE: skip query and rendering of unchanged index table
+                return render_template(
+                    template, resources=[],
+                    endpoint_suffix=self.endpoint_suffix,
+                    pkey=self.resource_pkey(),
+                    index_table=Markup(index_table.replace(
+                        self.CSRF_MARKER, generate_csrf()
+                    ))
+                )
+
         session = self.session()
         resources = self.resources_for_index(session)
         session.close()
 
+        def cache_index_table(index_table):
+            """Add rendered index table to cache and return it."""
+            if cache_key is not None:
+                # NOTE: CSRF token is specific to the user session
+                self.index_cache.set(
+                    cache_key, version,
+                    str(index_table).replace(
+                        generate_csrf(), self.CSRF_MARKER
+                    )
+                )
+            return index_table
+
         return render_template(
-            '%s/index.html' % self.templates_dir, resources=resources,
-            endpoint_suffix=self.endpoint_suffix, pkey=self.resource_pkey()
+            template, resources=resources,
+            endpoint_suffix=self.endpoint_suffix, pkey=self.resource_pkey(),
+            cache_index_table=cache_index_table
+        )
+
+    def index_cache_key(self):
+        """Return cache key for index table of current tenant."""
+        return (
+            str(self.config_models.engine.url), request.script_root,
+            self.templates_dir
         )
 
+    # conditional GET
+
+    def conditional_page(self, tables, render):
+        """Return rendered page with ETag, or empty response with status 304
+        if the page in the browser cache is still valid.
+
+        :param list[str] tables: Tables shown on page as '<schema>.<table>',
+                                 or None for all tables in VERSION_SCHEMAS
+        :param func render: Render page for data version
+        """
+        version = self.page_version(tables)
+        if version is None:
+            return render(None)
+
+        etag = self.page_etag(version)
+        # NOTE: weak comparison, as ETag is weakened by compression
+        if request.if_none_match.contains_weak(etag):
+            # NOTE: skip queries and rendering of unchanged page
+            response = make_response('', 304)
+        else:
+            response = make_response(render(version))
+            # NOTE: CSRF token may have been added to session while rendering
+            etag = self.page_etag(version)
+
+        response.set_etag(etag)
+        # NOTE: always revalidate with ETag
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def page_version(self, tables):
+        """Return data version for page, or None if not available.
+
+        :param list[str] tables: Tables shown on page as '<schema>.<table>',
+                                 or None for all tables in VERSION_SCHEMAS
+        """
+        if '_flashes' in http_session:
+            # NOTE: flashed messages are shown only once
+            return None
+
+        if tables:
+            return self.data_versions.tables_key(tables)
+        else:
+            return self.data_versions.version_key(self.VERSION_SCHEMAS)
+
+    def page_etag(self, version):
+        """Return ETag for current page.
+
+        :param obj version: Data version for page
+        """
+        parts = [
+            str(self.config_models.engine.url), request.full_path,
+            get_auth_user(), http_session.get('csrf_token'),
+            int(time.time() // self.ETAG_MAX_AGE), version
+        ]
+        return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
     # new
 
     def form_for_new(self):
@@ -146,6 +287,7 @@ class Controller:
                 self.create_resource(form, session)
                 session.commit()
                 session.close()
+                self.name_registry.invalidate()
                 flash('%s wurde hinzugefügt.' % self.resource_name, 'success')
 
                 return redirect(url_for(self.base_route))
@@ -193,6 +335,18 @@ class Controller:
     def edit(self, id):
         """Show edit resource form.
 
+        :param int id: Resource ID
+        """
+        if not self.CONDITIONAL_EDIT:
+            return self.render_edit(id)
+
+        return self.conditional_page(
+            None, lambda version: self.render_edit(id)
+        )
+
+    def render_edit(self, id):
+        """Render edit resource form.
+
         :param int id: Resource ID
         """
         # find resource
@@ -207,13 +361,24 @@ class Controller:
             action = url_for('update_%s' % self.endpoint_suffix, id=id)
 
             return render_template(
-                template, title=title, form=form, action=action, method='PUT'
+                template, title=title, form=form, action=action, method='PUT',
+                impact_id=self.impact_id(id)
             )
         else:
             # resource not found
             session.close()
             abort(404)
 
+    def impact_id(self, id):
+        """Return ID for impact analysis panel on edit form, or None if
+        resource is not a GDI resource.
+
+        :param int id: Resource ID
+        """
+        if self.resource_pkey() == 'gdi_oid':
+            return id
+        return None
+
     # update
 
     def form_for_update(self, resource):
@@ -253,6 +418,7 @@ class Controller:
                     self.update_resource(resource, form, session)
                     session.commit()
                     session.close()
+                    self.name_registry.invalidate()
                     flash('%s wurde aktualisiert.' % self.resource_name,
                           'success')
 
@@ -276,7 +442,8 @@ class Controller:
             action = url_for('update_%s' % self.endpoint_suffix, id=id)
 
             return render_template(
-                template, title=title, form=form, action=action, method='PUT'
+                template, title=title, form=form, action=action, method='PUT',
+                impact_id=self.impact_id(id)
             )
         else:
             # resource not found
@@ -307,6 +474,7 @@ class Controller:
                 # update and commit resource
                 self.destroy_resource(resource, session)
                 session.commit()
+                self.name_registry.invalidate()
                 flash('%s wurde entfernt.' % self.resource_name, 'success')
             except InternalError as e:
                 flash('InternalError: %s' % e.orig, 'error')
@@ -333,6 +501,61 @@ class Controller:
         else:
             abort(405)
 
+    # order
+
+    def update_order(self, form_field, redirect_url, success_msg,
+                     order_column, key_column, scope_column=None,
+                     scope_value=None):
+        """Update order of records from submitted ordered IDs.
+
+        IDs are submitted as JSON {"ids": [<ID>]}, with a JSON response,
+        or as comma separated form field, with a redirect.
+
+        :param str form_field: Name of form field with IDs
+        :param str redirect_url: Redirect URL for form requests
+        :param str success_msg: Flash message on success
+        :param Column order_column: Model attribute of order column
+        :param Column key_column: Model attribute of key column of IDs
+        :param Column scope_column: Optional model attribute for restricting
+                                    records
+        :param int scope_value: Value of scope_column
+        """
+        if request.is_json:
+            ids = (request.get_json(silent=True) or {}).get('ids')
+        else:
+            ids = request.form.get(form_field)
+            if not ids:
+                # nothing to reorder
+                return redirect(redirect_url)
+
+        error = None
+        session = self.session()
+        try:
+            OrderHelper().reorder(
+                session, order_column, key_column, ids, scope_column,
+                scope_value
+            )
+            session.commit()
+        except ValueError as e:
+            session.rollback()
+            error = str(e)
+        except InternalError as e:
+            session.rollback()
+            error = 'InternalError: %s' % e.orig
+        finally:
+            session.close()
+
+        if request.is_json:
+            if error:
+                return jsonify({'error': error}), 400
+            return jsonify({'success': True})
+
+        if error:
+            flash(error, 'error')
+        else:
+            flash(success_msg, 'success')
+        return redirect(redirect_url)
+
     def session(self):
         """Return new session for ConfigDB."""
         return self.config_models.session()
@@ -1,4 +1,3 @@
-from collections import OrderedDict
 import hashlib
 import mimetypes
 import os
@@ -8,16 +7,22 @@ import zipfile
 from xml.etree import ElementTree
 
 from flask import abort, flash, json, jsonify, request, Response, \
-    send_from_directory
+    send_from_directory, stream_with_context
 from sqlalchemy.exc import OperationalError, ProgrammingError
 from sqlalchemy.orm import joinedload
 from sqlalchemy.sql import text as sql_text
 
 from .contacts_helper import ContactsHelper
 from .controller import Controller
+from .data_set_transfer_helper import DataSetTransferHelper
+from .geodb_helper import GeoDBHelper
+from .json_attributes_helper import JSONAttributesHelper
+from .lookup_helper import LookupHelper
+from .table_stats_helper import TableStatsHelper
 from .ows_helper import OWSHelper
 from .permissions_helper import PermissionsHelper
 from forms import DataSetGUIForm
+from service_lib.tenant_config_models import TenantModel
 
 
 class DataSetGUIController(Controller):
@@ -26,42 +31,64 @@ class DataSetGUIController(Controller):
     Manage data_set_view and related models from combined GUI.
     """
 
+    # tables shown in DataSet list
+    INDEX_TABLES = [
+        'gdi_knoten.data_set_view', 'gdi_knoten.data_set',
+        'gdi_knoten.ows_layer', 'gdi_knoten.ows_layer_data'
+    ]
+
+    # NOTE: edit form lists tables and raster files of data sources, which
+    #       are not tracked by data versions
+    CONDITIONAL_EDIT = False
+
     # subdir for QGS symbols relative to PROJECT_OUTPUT_DIR
     SYMBOLS_SUB_DIR = 'symbols'
 
     # subdir for uploaded files relative to PROJECT_OUTPUT_DIR
     UPLOADS_SUB_DIR = 'uploads'
 
-    def __init__(self, app, config_models, db_engine, service_config):
+    # ConfigDB models of current tenant
+    DataSetView = TenantModel('data_set_view')
+    DataSet = TenantModel('data_set')
+    DataSource = TenantModel('data_source')
+    Attribute = TenantModel('data_set_view_attributes')
+    OWSLayerData = TenantModel('ows_layer_data')
+    DataSetEdit = TenantModel('data_set_edit')
+    TemplateInfo = TenantModel('template_info')
+    TemplateJasper = TenantModel('template_jasper')
+    Role = TenantModel('role')
+    ResourcePermission = TenantModel('resource_permission')
+
+    def __init__(self, app, config_models, data_versions, name_registry,
+                 db_engine, service_config, task_queue, raster_index):
         """Constructor
 
         :param Flask app: Flask application
         :param ConfigModels config_models: Helper for ORM models
+        :param DataVersions data_versions: Change counters of ConfigDB tables
+        :param NameRegistry name_registry: Registry of resource names
         :param DatabaseEngine db_engine: Database engine with DB connections
         :param func service_config: Helper method for reading service config
+        :param TaskQueue task_queue: Queue for upload post-processing tasks
+        :param RasterIndex raster_index: Cached index of raster files
         """
         super(DataSetGUIController, self).__init__(
             "DataSet", 'data_sets', 'data_set', 'data_set_gui', app,
-            config_models
+            config_models, data_versions, name_registry
         )
         self.db_engine = db_engine
         self.service_config = service_config
+        self.task_queue = task_queue
+        self.raster_index = raster_index
         self.OWSHelper = OWSHelper(config_models)
         self.ContactsHelper = ContactsHelper(config_models, app.logger)
+        self.LookupHelper = LookupHelper(config_models, app.logger)
+        self.GeoDBHelper = GeoDBHelper(db_engine, service_config)
         self.PermissionsHelper = PermissionsHelper(config_models)
-
-        self.DataSetView = self.config_models.model('data_set_view')
-        self.DataSet = self.config_models.model('data_set')
-        self.DataSource = self.config_models.model('data_source')
-        self.Attribute = self.config_models.model('data_set_view_attributes')
-        self.OWSLayerData = self.config_models.model('ows_layer_data')
-        self.DataSetEdit = self.config_models.model('data_set_edit')
-        self.TemplateInfo = self.config_models.model('template_info')
-        self.TemplateJasper = self.config_models.model('template_jasper')
-
-        self.Role = self.config_models.model('role')
-        self.ResourcePermission = self.config_models.model(
-            'resource_permission'
+        self.JSONAttributesHelper = JSONAttributesHelper(app.logger)
+        self.TableStatsHelper = TableStatsHelper(app.logger)
+        self.DataSetTransferHelper = DataSetTransferHelper(
+            config_models, db_engine, service_config, app.logger
         )
 
         # add custom routes
@@ -101,6 +128,11 @@ class DataSetGUIController(Controller):
             '/%s/<int:id>/client_qml/<string:filename>' % base_route,
             '%s_client_gml' % suffix, self.download_client_qml, methods=['GET']
         )
+        # export DataSets as JSON lines
+        app.add_url_rule(
+            '/%s/export' % base_route,
+            '%s_export' % suffix, self.export, methods=['GET']
+        )
 
     def resource_pkey(self):
         """Return primary key column name."""
@@ -175,7 +207,9 @@ class DataSetGUIController(Controller):
         :param object resource: Optional data_set_view object
         :param bool edit_form: Set if edit form
         """
-        form = DataSetGUIForm(self.config_models, obj=resource)
+        form = DataSetGUIForm(
+            self.config_models, self.name_registry, obj=resource
+        )
         if resource is not None:
             # select DataSet type
             form.connection_type.data = resource.data_set.data_source \
@@ -235,14 +269,10 @@ class DataSetGUIController(Controller):
             .order_by(self.TemplateJasper.name)
         object_sheets = object_sheet_query.all()
 
-        roles_query = session.query(self.Role).order_by(self.Role.name)
-        roles = roles_query.all()
-
         session.close()
 
         # set choices for data owner select field
-        form.data_owner.choices = [(0, "")] + \
-            self.ContactsHelper.person_choices()
+        self.LookupHelper.lazy_choices(form.data_owner, 'persons')
 
         # set choices for data source select field (PostGIS data sources)
         postgis_data_sources = self.postgis_data_source_choices(data_sources)
@@ -429,6 +459,15 @@ class DataSetGUIController(Controller):
                             (filename, filename)
                         )
 
+                # show status of any symbols post-processing
+                status_message = self.task_queue.status_message(
+                    ows_layer.gdi_oid
+                )
+                if status_message:
+                    form.qml_file.description = "%s<br><strong>%s</strong>" % (
+                        form.qml_file.description or '', status_message
+                    )
+
         # reorder fields by attr_order
         form.attrs.entries.sort(key=lambda x: int(x.form.attr_order.data))
 
@@ -436,17 +475,13 @@ class DataSetGUIController(Controller):
             # add permissions for resource on edit
             self.add_form_permissions(resource, form)
 
-        # collect role ids from permissions subform
-        role_permission_ids = [
-            int(permission.data['role_id']) for permission in form.permissions
-        ]
-
         # set choices for role permission select field
-        # skip roles from permissions subform
-        form.role.choices = [
-            (role.id, role.name) for role in roles
-            if role.id not in role_permission_ids
-        ]
+        # NOTE: roles are loaded via lookup endpoint, skipping roles from
+        #       permissions subform
+        self.LookupHelper.lazy_choices(
+            form.role, 'roles',
+            exclude_inputs='input[name^="permissions-"][name$="-role_id"]'
+        )
 
         return form
 
@@ -869,7 +904,7 @@ class DataSetGUIController(Controller):
             ows_layer_data.legend_filename = None
         if form.qml_file.data:
             # save uploaded QML and symbols
-            self.save_qgs_style(ows_layer_data, form)
+            self.save_qgs_style(ows_layer_data, form, session)
         elif form.remove_qml.data:
             # remove existing symbols
             self.cleanup_qgs_style_symbols(ows_layer_data.qgs_style)
@@ -879,7 +914,7 @@ class DataSetGUIController(Controller):
             ows_layer_data.uploaded_qml = None
         if form.client_qml_file.data:
             # save uploaded client QML and symbols
-            self.save_qgs_style(ows_layer_data, form, False)
+            self.save_qgs_style(ows_layer_data, form, session, False)
         elif form.remove_client_qml.data:
             # remove existing symbols
             self.cleanup_qgs_style_symbols(ows_layer_data.client_qgs_style)
@@ -1029,12 +1064,14 @@ class DataSetGUIController(Controller):
         """
         data_source_id = request.args.get('data_source_id')
         table_name = request.args.get('table_name')
-        metadata = self.dataset_info(data_source_id, table_name)
+        metadata = self.dataset_info(data_source_id, table_name, True)
         if 'error' not in metadata:
             return jsonify({
                 'attributes': metadata.get('attributes'),
                 'primary_key': metadata.get('primary_key'),
-                'geometry_columns': metadata.get('geometry_columns')
+                'geometry_columns': metadata.get('geometry_columns'),
+                'rows': metadata.get('rows'),
+                'size': metadata.get('size')
             })
         else:
             # data_set not found or db error
@@ -1042,11 +1079,12 @@ class DataSetGUIController(Controller):
                 'error': metadata.get('error')
             }), 404
 
-    def dataset_info(self, data_source_id, table_name):
+    def dataset_info(self, data_source_id, table_name, with_stats=False):
         """Return table metadata for a data_set.
 
         :param int data_source_id: data_source ID
         :param str table_name: Table name as "<schema>.<table>"
+        :param bool with_stats: Set to add table stats and extents
         """
         # NOTE: form field returns 'None' as string if not set
         if not table_name or table_name == 'None':
@@ -1061,7 +1099,9 @@ class DataSetGUIController(Controller):
         else:
             schema = 'public'
 
-        return self.postgis_metadata(data_source_id, schema, table_name)
+        return self.postgis_metadata(
+            data_source_id, schema, table_name, with_stats
+        )
 
     def data_source_tables(self):
         """Return tables for a vector data_source as JSON.
@@ -1073,7 +1113,8 @@ class DataSetGUIController(Controller):
         postgis_tables = self.postgis_tables(data_source_id)
         if 'error' not in postgis_tables:
             return jsonify({
-                'tables': postgis_tables.get('tables', [])
+                'tables': postgis_tables.get('tables', []),
+                'table_stats': postgis_tables.get('table_stats', {})
             })
         else:
             # data_source not found or db error
@@ -1096,7 +1137,7 @@ class DataSetGUIController(Controller):
         session.close()
 
         if data_source is not None:
-            engine = self.db_engine.db_engine(data_source.connection)
+            engine = self.GeoDBHelper.engine(data_source)
 
         return engine
 
@@ -1116,47 +1157,45 @@ class DataSetGUIController(Controller):
                     continue
 
                 # connect to data_source
-                engine = self.db_engine.db_engine(data_source.connection)
-                conn = engine.connect()
-
-                # check for PostGIS extension
-
-                # build query SQL
-                sql = sql_text("""
-                    SELECT extname FROM pg_extension
-                    WHERE extname = 'postgis' LIMIT 1;
-                """)
-
-                # execute query
-                result = conn.execute(sql)
-                postgis_present = result.first() is not None
-
-                if not postgis_present:
-                    # fallback for PostGIS 1.x
-                    # check for geometry_columns
+                engine = self.GeoDBHelper.engine(data_source)
+                with engine.connect() as conn:
+                    # check for PostGIS extension
 
                     # build query SQL
                     sql = sql_text("""
-                        SELECT table_name FROM information_schema.columns
-                        WHERE table_name = 'geometry_columns' LIMIT 1;
+                        SELECT extname FROM pg_extension
+                        WHERE extname = 'postgis' LIMIT 1;
                     """)
 
                     # execute query
                     result = conn.execute(sql)
                     postgis_present = result.first() is not None
 
-                if postgis_present:
-                    # add choice if PostGIS present
-                    postgis_data_sources.append(
-                        (data_source.gdi_oid, data_source.name)
-                    )
+                    if not postgis_present:
+                        # fallback for PostGIS 1.x
+                        # check for geometry_columns
 
-                # close database connection
-                conn.close()
+                        # build query SQL
+                        sql = sql_text("""
+                            SELECT table_name FROM information_schema.columns
+                            WHERE table_name = 'geometry_columns' LIMIT 1;
+                        """)
+
+                        # execute query
+                        result = conn.execute(sql)
+                        postgis_present = result.first() is not None
+
+                    if postgis_present:
+                        # add choice if PostGIS present
+                        postgis_data_sources.append(
+                            (data_source.gdi_oid, data_source.name)
+                        )
             except OperationalError as e:
+                # NOTE: skip failed or timed out data_source and continue
+                #       with remaining data_sources
                 self.logger.warning(
                     "PostGIS Check für %s fehlgeschlagen:\n%s" %
-                    (data_source.connection, e.orig)
+                    (data_source.connection, self.GeoDBHelper.error_message(e))
                 )
                 # add choice marked with unicode "WARNING SIGN" prefix
                 postgis_data_sources.append(
@@ -1166,11 +1205,12 @@ class DataSetGUIController(Controller):
         return postgis_data_sources
 
     def postgis_tables(self, data_source_id):
-        """Return table names for all PostGIS tables of a data_source.
+        """Return table names and stats for all PostGIS tables of a
+        data_source.
 
         :param int data_source_id: data_source ID
         """
-        tables = []
+        table_stats = {}
 
         try:
             engine = self.engine_for_data_source(data_source_id)
@@ -1180,31 +1220,14 @@ class DataSetGUIController(Controller):
                 }
 
             # connect to data_source
-            conn = engine.connect()
-
-            # get all tables with geometry columns from PostGIS DB
-
-            # build query SQL
-            sql = sql_text("""
-                SELECT DISTINCT ON (f_table_schema, f_table_name)
-                    f_table_schema, f_table_name
-                FROM geometry_columns;
-            """)
-
-            # execute query
-            primary_key = None
-            result = conn.execute(sql)
-            for row in result:
-                tables.append(
-                    "%s.%s" % (row['f_table_schema'], row['f_table_name'])
-                )
-
-            # close database connection
-            conn.close()
+            with engine.connect() as conn:
+                # get all tables with geometry columns and their stats
+                # from PostGIS DB
+                table_stats = self.TableStatsHelper.table_stats(conn)
         except OperationalError as e:
             self.logger.error(e.orig)
             return {
-                'error': "OperationalError: %s" % e.orig
+                'error': self.GeoDBHelper.error_message(e)
             }
         except ProgrammingError as e:
             self.logger.error(e.orig)
@@ -1213,19 +1236,25 @@ class DataSetGUIController(Controller):
             }
 
         return {
-            'tables': tables
+            'tables': list(table_stats.keys()),
+            'table_stats': table_stats
         }
 
-    def postgis_metadata(self, data_source_id, schema, table_name):
+    def postgis_metadata(self, data_source_id, schema, table_name,
+                         with_stats=False):
         """Return attributes, primary key, geometry columns, types and srids
         from a PostGIS table.
 
         :param int data_source_id: data_source ID
         :param str schema: DB schema name
         :param str table_name: DB table name
+        :param bool with_stats: Set to add estimated row count, size,
+                                spatial indexes and estimated extents
         """
         metadata = {}
 
+        # current step for error messages
+        step = "Verbindung"
         try:
             engine = self.engine_for_data_source(data_source_id)
             if engine is None:
@@ -1234,81 +1263,106 @@ class DataSetGUIController(Controller):
                 }
 
             # connect to data_source
-            conn = engine.connect()
-
-            # get primary key
-
-            # build query SQL
-            sql = sql_text("""
-                SELECT a.attname
-                FROM pg_index i
-                    JOIN pg_attribute a ON a.attrelid = i.indrelid
-                        AND a.attnum = ANY(i.indkey)
-                WHERE i.indrelid = '{schema}.{table}'::regclass
-                    AND i.indisprimary;
-            """.format(schema=schema, table=table_name))
-
-            # execute query
-            primary_key = None
-            result = conn.execute(sql)
-            for row in result:
-                primary_key = row['attname']
-
-            # get geometry column and srid
-
-            # build query SQL
-            sql = sql_text("""
-                SELECT f_geometry_column, srid, type
-                FROM geometry_columns
-                WHERE f_table_schema = '{schema}' AND f_table_name = '{table}';
-            """.format(schema=schema, table=table_name))
-
-            # execute query
-            geometry_columns = []
-            result = conn.execute(sql)
-            for row in result:
-                geometry_columns.append({
-                    'geometry_column': row['f_geometry_column'],
-                    'geometry_type': row['type'],
-                    'srid': row['srid']
-                })
+            with engine.connect() as conn:
+                # get primary key
+                step = "Primärschlüssel"
 
-            # get other table attributes
+                # build query SQL
+                sql = sql_text("""
+                    SELECT a.attname
+                    FROM pg_index i
+                        JOIN pg_attribute a ON a.attrelid = i.indrelid
+                            AND a.attnum = ANY(i.indkey)
+                    WHERE i.indrelid = '{schema}.{table}'::regclass
+                        AND i.indisprimary;
+                """.format(schema=schema, table=table_name))
 
-            # collect attributes to skip (geometry columns)
-            skip_attrs = [
-                c['geometry_column'] for c in geometry_columns
-            ]
+                # execute query
+                primary_key = None
+                result = conn.execute(sql)
+                for row in result:
+                    primary_key = row['attname']
 
-            # build query SQL
-            sql = sql_text("""
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_schema = '{schema}' AND table_name = '{table}'
-                ORDER BY ordinal_position;
-            """.format(schema=schema, table=table_name))
+                # get geometry column and srid
+                step = "Geometriespalten"
 
-            # execute query
-            attributes = []
-            result = conn.execute(sql)
-            for row in result:
-                if row['column_name'] not in skip_attrs:
-                    attributes.append(row['column_name'])
+                # build query SQL
+                sql = sql_text("""
+                    SELECT f_geometry_column, srid, type
+                    FROM geometry_columns
+                    WHERE f_table_schema = '{schema}'
+                        AND f_table_name = '{table}';
+                """.format(schema=schema, table=table_name))
 
-            # close database connection
-            conn.close()
+                # execute query
+                geometry_columns = []
+                result = conn.execute(sql)
+                for row in result:
+                    geometry_columns.append({
+                        'geometry_column': row['f_geometry_column'],
+                        'geometry_type': row['type'],
+                        'srid': row['srid']
+                    })
+
+                # get other table attributes
+                step = "Attribute"
+
+                # collect attributes to skip (geometry columns)
+                skip_attrs = [
+                    c['geometry_column'] for c in geometry_columns
+                ]
+
+                # build query SQL
+                sql = sql_text("""
+                    SELECT column_name
+                    FROM information_schema.columns
+                    WHERE table_schema = '{schema}' AND table_name = '{table}'
+                    ORDER BY ordinal_position;
+                """.format(schema=schema, table=table_name))
+
+                # execute query
+                attributes = []
+                result = conn.execute(sql)
+                for row in result:
+                    if row['column_name'] not in skip_attrs:
+                        attributes.append(row['column_name'])
+
+                table_stats = {}
+                if with_stats:
+                    # get table stats
+                    step = "Statistiken"
+                    table_stats = self.TableStatsHelper.table_stats(
+                        conn, schema, table_name
+                    ).get("%s.%s" % (schema, table_name), {})
+
+            if with_stats:
+                # add spatial index and estimated extent to geometry columns
+                # NOTE: extents are cached
+                extents = self.TableStatsHelper.estimated_extents(
+                    engine, schema, table_name, skip_attrs
+                )
+                for geometry_column in geometry_columns:
+                    column = geometry_column['geometry_column']
+                    geometry_column['spatial_index'] = table_stats.get(
+                        'spatial_index', {}
+                    ).get(column)
+                    geometry_column['extent'] = extents.get(column)
 
             metadata = {
                 'schema': schema,
                 'table': table_name,
                 'primary_key': primary_key,
                 'attributes': attributes,
-                'geometry_columns': geometry_columns
+                'geometry_columns': geometry_columns,
+                'rows': table_stats.get('rows'),
+                'size': table_stats.get('size')
             }
         except OperationalError as e:
             self.logger.error(e.orig)
             return {
-                'error': "OperationalError: %s" % e.orig
+                'error': "%s\n(beim Laden von: %s)" % (
+                    self.GeoDBHelper.error_message(e), step
+                )
             }
         except ProgrammingError as e:
             self.logger.error(e.orig)
@@ -1323,10 +1377,43 @@ class DataSetGUIController(Controller):
 
         URL params:
             data_source_id: data_source ID
+            q: Optional path prefix (case-insensitive)
+            offset: Optional index of first returned file (default: 0)
+            limit: Optional max number of returned files
         """
         data_source_id = request.args.get('data_source_id')
+        prefix = request.args.get('q', '')
+        try:
+            offset = int(request.args.get('offset', 0))
+            limit = request.args.get('limit')
+            if limit is not None:
+                limit = int(limit)
+        except ValueError:
+            abort(400)
+
+        result = None
+        raster_dir = self.raster_dir(data_source_id)
+        if raster_dir is not None:
+            result = self.raster_index.search(
+                raster_dir, prefix, offset, limit, self.raster_recursive()
+            )
+            if result is None:
+                # invalid directory
+                msg = "Verzeichnis %s konnte nicht geöffnet werden" % raster_dir
+                return jsonify({
+                    'rasters': ["FEHLER: %s" % msg],
+                    'error': msg
+                })
+
+        if result is None:
+            result = {'total': 0, 'files': []}
+
         return jsonify({
-            'rasters': self.raster_files(data_source_id)
+            'rasters': [f['name'] for f in result['files']],
+            'files': result['files'],
+            'total': result['total'],
+            'offset': offset,
+            'limit': limit
         })
 
     def raster_files(self, data_source_id):
@@ -1336,27 +1423,38 @@ class DataSetGUIController(Controller):
         """
         rasters = []
 
+        raster_dir = self.raster_dir(data_source_id)
+        if raster_dir is not None:
+            # get filenames in data_source dir from cached index
+            rasters = self.raster_index.files(
+                raster_dir, self.raster_recursive()
+            )
+            if rasters is None:
+                # invalid directory
+                msg = "Verzeichnis %s konnte nicht geöffnet werden" % raster_dir
+                rasters = ["FEHLER: %s" % msg]
+
+        return rasters
+
+    def raster_dir(self, data_source_id):
+        """Return directory of a raster data_source or None if not found.
+
+        :param int data_source_id: data_source ID
+        """
         session = self.session()
         query = session.query(self.DataSource).filter_by(gdi_oid=data_source_id)
         data_source = query.first()
         session.close()
 
-        if data_source is not None:
-            raster_dir = data_source.connection
-            if os.path.exists(raster_dir):
-                # get filenames in data_source dir
-                for entry in os.scandir(raster_dir):
-                    if not entry.name.startswith('.') and entry.is_file():
-                        rasters.append(entry.name)
-
-                rasters.sort()
-            else:
-                # invalid directory
-                msg = "Verzeichnis %s konnte nicht geöffnet werden" % raster_dir
-                self.logger.error(msg)
-                rasters.append("FEHLER: %s" % msg)
+        if data_source is None:
+            return None
+        return data_source.connection
 
-        return rasters
+    def raster_recursive(self):
+        """Return whether raster files in subdirs of raster data_sources
+        are listed.
+        """
+        return self.service_config().get('raster_recursive', False)
 
     def json_attributes(self):
         """Try to read attribute data as JSON and return any keys found.
@@ -1368,9 +1466,9 @@ class DataSetGUIController(Controller):
                     "<key2>": "<value2>"
                 }
             ]
-        """
-        json_attrs = []
 
+        Keys are collected from a sample of rows and all list entries.
+        """
         data_source_id = request.args.get('data_source_id')
         table_name = request.args.get('table_name')
         attr_name = request.args.get('attr_name')
@@ -1383,41 +1481,17 @@ class DataSetGUIController(Controller):
                     'error': "FEHLER: DataSource nicht gefunden"
                 }), 404
 
-            # find potential JSON value
-
-            # connect to data_source
-            conn = engine.connect()
-
-            # build query SQL
-            # NOTE: also convert native PG json to text
-            #       to preserve original order of keys
-            sql = sql_text("""
-                SELECT {attr}::text AS value
-                FROM {table_name}
-                WHERE {attr}::text LIKE '[%]'
-                LIMIT 1;
-            """.format(attr=attr_name, table_name=table_name))
-
-            # execute query
-            result = conn.execute(sql)
-            for row in result:
-                value = row['value']
-                try:
-                    # parse JSON with original order of keys
-                    json_value = json.loads(
-                        value, object_pairs_hook=OrderedDict
-                    )
-                    if type(json_value) is list and len(json_value) > 0:
-                        if isinstance(json_value[0], dict):
-                            # collect JSON keys from first list entry
-                            json_attrs = list(json_value[0].keys())
-                except Exception as e:
-                    self.logger.warning(
-                        "Could not parse value as JSON: '%s'\n%s" % (value, e)
-                    )
-
-            # close database connection
-            conn.close()
+            result = self.JSONAttributesHelper.json_attributes(
+                engine, table_name, attr_name
+            )
+        except OperationalError as e:
+            # e.g. timeout while searching for a JSON value
+            self.logger.error(
+                "JSON Attribute konnten nicht geladen werden: %s" % e.orig
+            )
+            return jsonify({
+                'error': self.GeoDBHelper.error_message(e)
+            }), 504
         except Exception as e:
             self.logger.error(
                 "JSON Attribute konnten nicht geladen werden: %s" % e
@@ -1427,9 +1501,31 @@ class DataSetGUIController(Controller):
             }), 404
 
         return jsonify({
-            'json_attrs': json_attrs
+            'json_attrs': result['keys'],
+            'json_attr_stats': result['stats'],
+            'sampled_rows': result['rows'],
+            'sampled': result['sampled']
         })
 
+    def export(self):
+        """Download all DataSets as JSON lines.
+
+        Optional filter by data_source_id.
+        """
+        data_source_id = request.args.get('data_source_id', type=int)
+        lines = self.DataSetTransferHelper.export(data_source_id)
+
+        # NOTE: stream response, so that large dumps are not kept in memory
+        return Response(
+            stream_with_context(lines),
+            content_type='application/x-ndjson; charset=utf-8',
+            headers={
+                'content-disposition':
+                    'attachment; filename=data_sets.jsonl'
+            },
+            status=200
+        )
+
     def download_legend(self, id, filename):
         """Download uploaded legend image.
 
@@ -1528,12 +1624,16 @@ class DataSetGUIController(Controller):
         """
         return self.download_qml(id, filename, False)
 
-    def save_qgs_style(self, ows_layer_data, form, for_server=True):
+    def save_qgs_style(self, ows_layer_data, form, session, for_server=True):
         """Extract files from uploaded ZIP file and save symbols and QML
         with adjusted symbol paths.
 
+        NOTE: extraction of symbols from a ZIP file and removal of symbols
+              of the previous QML are queued as background task
+
         :param object ows_layer_data: ows_layer_data object
         :param FlaskForm form: Form for DataSet
+        :param Session session: DB session
         :param bool for_server: Set if server QML (default: True)
         """
         if for_server:
@@ -1543,8 +1643,11 @@ class DataSetGUIController(Controller):
             qgs_style = ows_layer_data.client_qgs_style
             qml_file_field = form.client_qml_file
 
-        self.cleanup_qgs_style_symbols(qgs_style)
         try:
+            # symbols of previous QML
+            old_symbols = self.qgs_style_symbols(qgs_style)
+
+            symbols = {}
             if qml_file_field.data.filename.endswith('.qml'):
                 # save uploaded QML
                 qml_data = request.files[qml_file_field.name].read()
@@ -1568,12 +1671,16 @@ class DataSetGUIController(Controller):
                     # parse XML
                     root = ElementTree.fromstring(qml_data)
 
-                    # save and update symbols
-                    self.update_qml_symbols(root, 'SvgMarker', 'name', zip_file)
-                    self.update_qml_symbols(root, 'SVGFill', 'svgFile',
-                                            zip_file)
-                    self.update_qml_symbols(root, 'RasterFill', 'imageFile',
-                                            zip_file)
+                    # update symbol paths
+                    symbols.update(self.update_qml_symbols(
+                        root, 'SvgMarker', 'name', zip_file
+                    ))
+                    symbols.update(self.update_qml_symbols(
+                        root, 'SVGFill', 'svgFile', zip_file
+                    ))
+                    symbols.update(self.update_qml_symbols(
+                        root, 'RasterFill', 'imageFile', zip_file
+                    ))
 
                     # save QML
                     qml_data = ElementTree.tostring(
@@ -1598,7 +1705,8 @@ class DataSetGUIController(Controller):
 
             # save uploaded original file
             filename = qml_file_field.data.filename
-            with open(os.path.join(target_dir, filename), 'wb') as f:
+            upload_path = os.path.join(target_dir, filename)
+            with open(upload_path, 'wb') as f:
                 # reset file stream
                 request.files[qml_file_field.name].seek(0)
 
@@ -1610,6 +1718,33 @@ class DataSetGUIController(Controller):
             else:
                 ows_layer_data.uploaded_client_qml = os.path.join(sub_dir,
                                                                   filename)
+
+            # remove symbols of previous QML in background, after any new
+            # symbols have been extracted
+            # NOTE: keep symbols which are also referenced by the new QML
+            if for_server:
+                qgs_style = ows_layer_data.qgs_style
+            else:
+                qgs_style = ows_layer_data.client_qgs_style
+            new_symbols = self.qgs_style_symbols(qgs_style)
+            remove_files = [
+                filename for filename in old_symbols
+                if filename not in new_symbols
+            ]
+
+            if symbols:
+                # extract symbols from uploaded ZIP in background
+                self.task_queue.enqueue('extract_zip', ows_layer_data, {
+                    'zip_path': upload_path,
+                    'target_dir': self.symbols_dir(),
+                    'members': symbols,
+                    'remove_files': remove_files
+                }, session)
+            elif remove_files:
+                self.task_queue.enqueue('remove_files', ows_layer_data, {
+                    'target_dir': self.symbols_dir(),
+                    'files': remove_files
+                }, session)
         except zipfile.BadZipFile as e:
             self.raise_validation_error(
                 qml_file_field, "Datei ist kein ZIP"
@@ -1620,13 +1755,15 @@ class DataSetGUIController(Controller):
             )
 
     def update_qml_symbols(self, root, layer_class, prop_key, zip_file):
-        """Save symbol resources with hashed filename and update symbol paths in QML.
+        """Update symbol paths in QML with hashed filenames and return lookup
+        for symbol files to extract as {<filename in ZIP>: <hashed filename>}.
 
         :param xml.etree.ElementTree.Element root: XML root node
         :param str layer_class: Symbol layer class
         :param str prop_key: Symbol layer prop key for symbol path
         :param zipfile.ZipFile zip_file: ZIP file
         """
+        symbols = {}
         for svgprop in root.findall(".//layer[@class='%s']/prop[@k='%s']" %
                                     (layer_class, prop_key)):
             symbol_path = svgprop.get('v')
@@ -1644,13 +1781,13 @@ class DataSetGUIController(Controller):
                 new_path = os.path.join(self.SYMBOLS_SUB_DIR, new_filename)
                 svgprop.set('v', new_path)
 
-                self.logger.info("Save and update symbol: %s => %s" %
+                self.logger.info("Update symbol: %s => %s" %
                                  (symbol_path, new_path))
 
-                # save symbol file with hashed filename
-                target_path = os.path.join(self.symbols_dir(), new_filename)
-                with open(target_path, 'wb') as f:
-                    f.write(zip_file.open(symbol_filename).read())
+                # mark symbol file for saving with hashed filename
+                symbols[symbol_filename] = new_filename
+
+        return symbols
 
     def get_edit_config(self, data_set_view):
         """Get any associated data_set_edit for a data_set_view.
@@ -1666,29 +1803,41 @@ class DataSetGUIController(Controller):
 
         return edit_config
 
-    def cleanup_qgs_style_symbols(self, qml_data):
-        """ Cleanup files referenced by QML
-        :param string qgs_style: The QML style
-        """
+    def qgs_style_symbols(self, qml_data):
+        """Return filenames of symbols referenced by QML.
 
+        :param string qml_data: The QML style
+        """
+        symbols = []
         if not qml_data:
-            return
+            return symbols
 
         root = ElementTree.fromstring(qml_data)
 
-        for layer_class, prop_key in [('SvgMarker', 'name'), ('SVGFill', 'svgFile'), ('RasterFill', 'imageFile')]:
-            for svgprop in root.findall(".//layer[@class='%s']/prop[@k='%s']" %
-                                    (layer_class, prop_key)):
-                symbol_path = svgprop.get('v')
+        for layer_class, prop_key in [
+            ('SvgMarker', 'name'), ('SVGFill', 'svgFile'),
+            ('RasterFill', 'imageFile')
+        ]:
+            for svgprop in root.findall(
+                ".//layer[@class='%s']/prop[@k='%s']" % (layer_class, prop_key)
+            ):
+                filename = os.path.basename(svgprop.get('v') or '')
+                if filename and filename not in symbols:
+                    symbols.append(filename)
 
-                try:
-                    os.remove(os.path.join(
-                        self.symbols_dir(), os.path.basename(symbol_path))
-                    )
-                except Exception as e:
-                    self.logger.warning(
-                        "Failed to remove: %s\n%s" % (symbol_path, e)
-                    )
+        return symbols
+
+    def cleanup_qgs_style_symbols(self, qml_data):
+        """ Cleanup files referenced by QML
+        :param string qgs_style: The QML style
+        """
+        for filename in self.qgs_style_symbols(qml_data):
+            try:
+                os.remove(os.path.join(self.symbols_dir(), filename))
+            except Exception as e:
+                self.logger.warning(
+                    "Failed to remove: %s\n%s" % (filename, e)
+                )
 
     def cleanup_uploaded_qml(self, ows_layer_data, for_server=True):
         """Cleanup uploaded QML file.
@@ -0,0 +1,1183 @@
+import base64
+import time
+
+from flask import json
+from sqlalchemy.exc import DBAPIError, IntegrityError, InternalError
+from sqlalchemy.orm import joinedload
+
+from .contacts_helper import ContactsHelper
+from .geodb_helper import GeoDBHelper
+from .ows_helper import OWSHelper
+from .permissions_helper import PermissionsHelper
+from .table_stats_helper import TableStatsHelper
+from service_lib.tenant_config_models import TenantModel
+
+
+class DataSetTransferHelper:
+    """Helper class for bulk export and import of DataSets as JSON lines
+
+    Each line contains a DataSet with its data_set_view, attributes,
+    ows_layer_data, permissions and data owner. Related records are
+    referenced by name, so that dumps can be imported into other ConfigDBs.
+
+    Example record:
+        {
+            "name": "ch.so.afu.gewaesser",
+            "description": "",
+            "type": "vector",
+            "data_source": "sogis_services",
+            "data_set_name": "afu.gewaesser",
+            "primary_key": null,
+            "geometry_column": "geom",
+            "feature_id_column": "",
+            "facet": null,
+            "filter_word": null,
+            "searchable": 0,
+            "attributes": [
+                {"name": "name", "alias": "Name", "format": null,
+                 "displayfield": true}
+            ],
+            "layer": {
+                "title": "Gewässer", "transparency": 0, "synonyms": null,
+                "keywords": null, "ows_metadata": null,
+                "info_template": null, "object_sheet": null,
+                "qgs_style": "<qgis>...</qgis>", "client_qgs_style": null,
+                "uploaded_qml": null, "uploaded_client_qml": null,
+                "legend_filename": null, "legend_image": null,
+                "in_wms": true, "in_wfs": false
+            },
+            "permissions": [{"role": "public", "write": false}],
+            "data_owner": "Amt für Umwelt"
+        }
+
+    Imports are validated in batches (one lookup per related table and one
+    catalog query per data_source) and written in chunks with one
+    transaction per chunk.
+
+    NOTE: uploaded files (QML symbols and uploaded QMLs) are referenced by
+          their filenames and are not included
+    """
+
+    # DataSet types
+    TYPES = ['vector', 'raster', 'ows', 'basic']
+    # connection types of data_sources by DataSet type
+    CONNECTION_TYPES = {
+        'vector': ['database'],
+        'raster': ['directory'],
+        'ows': ['wms', 'wmts'],
+        'basic': ['database']
+    }
+
+    # default values of optional record fields
+    DEFAULTS = {
+        'description': None,
+        'primary_key': None,
+        'geometry_column': None,
+        'feature_id_column': None,
+        'facet': None,
+        'filter_word': None,
+        'searchable': 0,
+        'attributes': [],
+        'layer': None,
+        'permissions': [],
+        'data_owner': None
+    }
+    LAYER_DEFAULTS = {
+        'title': None,
+        'transparency': 0,
+        'synonyms': None,
+        'keywords': None,
+        'ows_metadata': None,
+        'info_template': None,
+        'object_sheet': None,
+        'qgs_style': "",
+        'client_qgs_style': None,
+        'uploaded_qml': None,
+        'uploaded_client_qml': None,
+        'legend_filename': None,
+        'legend_image': None,
+        'in_wms': False,
+        'in_wfs': False
+    }
+    ATTRIBUTE_DEFAULTS = {
+        'alias': None,
+        'format': None,
+        'displayfield': False
+    }
+
+    # number of DataSets per query on export and per transaction on import
+    CHUNK_SIZE = 500
+
+    # ConfigDB models of current tenant
+    DataSetView = TenantModel('data_set_view')
+    DataSet = TenantModel('data_set')
+    DataSource = TenantModel('data_source')
+    Attribute = TenantModel('data_set_view_attributes')
+    OWSLayerData = TenantModel('ows_layer_data')
+    OWSLayerGroup = TenantModel('ows_layer_group')
+    DataSetEdit = TenantModel('data_set_edit')
+    GroupLayer = TenantModel('group_layer')
+    TemplateInfo = TenantModel('template_info')
+    TemplateJasper = TenantModel('template_jasper')
+    Role = TenantModel('role')
+    ResourcePermission = TenantModel('resource_permission')
+    Contact = TenantModel('contact')
+    ContactRole = TenantModel('contact_role')
+    ResourceContact = TenantModel('resource_contact')
+
+    def __init__(self, config_models, db_engine, service_config, logger):
+        """Constructor
+
+        :param ConfigModels config_models: Helper for ORM models
+        :param DatabaseEngine db_engine: Database engine with DB connections
+        :param func service_config: Helper method for reading service config
+        :param Logger logger: Application logger
+        """
+        self.config_models = config_models
+        self.logger = logger
+        self.GeoDBHelper = GeoDBHelper(db_engine, service_config)
+        self.OWSHelper = OWSHelper(config_models)
+        self.TableStatsHelper = TableStatsHelper(logger)
+
+    # export
+
+    def export(self, data_source_id=None, chunk_size=None):
+        """Generate DataSets as JSON lines, ordered by ID.
+
+        NOTE: DataSets are loaded in chunks using keyset pagination
+
+        :param int data_source_id: Optional data_source ID filter
+        :param int chunk_size: Number of DataSets per query
+        """
+        chunk_size = chunk_size or self.CHUNK_SIZE
+        session = self.config_models.session()
+        try:
+            lookups = self.lookups(session)
+            last_id = None
+            while True:
+                query = self.data_set_views_query(session) \
+                    .order_by(self.DataSetView.gdi_oid)
+                if data_source_id:
+                    query = query.join(self.DataSetView.data_set).filter(
+                        self.DataSet.gdi_oid_data_source == data_source_id
+                    )
+                if last_id is not None:
+                    query = query.filter(self.DataSetView.gdi_oid > last_id)
+                views = query.limit(chunk_size).all()
+                if not views:
+                    break
+
+                records = self.serialize(views, lookups, session)
+                for view in views:
+                    yield json.dumps(
+                        records[view.gdi_oid], ensure_ascii=False
+                    ) + "\n"
+
+                last_id = views[-1].gdi_oid
+                # NOTE: release loaded objects of this chunk
+                session.expunge_all()
+        finally:
+            session.close()
+
+    def data_set_views_query(self, session):
+        """Return query for data_set_views with eager loaded relations.
+
+        :param Session session: DB session
+        """
+        return session.query(self.DataSetView).options(
+            joinedload(self.DataSetView.data_set)
+            .joinedload(self.DataSet.data_source),
+            joinedload(self.DataSetView.attributes),
+            joinedload(self.DataSetView.ows_layers),
+            joinedload(self.DataSetView.data_set_edit_collection)
+        )
+
+    def lookups(self, session):
+        """Load lookups of related records by ID and by name.
+
+        :param Session session: DB session
+        """
+        lookups = {
+            'templates': {},
+            'info_templates': {},
+            'object_sheets': {},
+            'roles': {},
+            'contacts': {},
+            'data_sources': {},
+            'root_layers': {}
+        }
+
+        for template in session.query(self.TemplateInfo).all():
+            lookups['templates'][template.gdi_oid] = template.name
+            lookups['info_templates'][template.name] = template.gdi_oid
+        for template in session.query(self.TemplateJasper).all():
+            lookups['templates'][template.gdi_oid] = template.name
+            lookups['object_sheets'][template.name] = template.gdi_oid
+
+        for role in session.query(self.Role).all():
+            lookups['roles'][role.name] = role.id
+        lookups['public_role_id'] = lookups['roles'].get(
+            PermissionsHelper.PUBLIC_ROLE_NAME
+        )
+
+        # NOTE: contact names are not unique
+        for contact_id, name in session.query(
+            self.Contact.id, self.Contact.name
+        ):
+            lookups['contacts'].setdefault(name, []).append(contact_id)
+
+        data_owner_role = session.query(self.ContactRole) \
+            .filter_by(type=ContactsHelper.ROLE_DATA_OWNER).first()
+        lookups['data_owner_role_id'] = (
+            data_owner_role.id if data_owner_role is not None else None
+        )
+
+        for data_source in session.query(self.DataSource).all():
+            lookups['data_sources'][data_source.name] = {
+                'id': data_source.gdi_oid,
+                'name': data_source.name,
+                'connection_type': data_source.connection_type,
+                'connection': data_source.connection
+            }
+
+        for ows_type in ['WMS', 'WFS']:
+            root_layer = self.OWSHelper.find_ows_root_layer(ows_type, session)
+            if root_layer is not None:
+                lookups['root_layers'][ows_type] = root_layer.gdi_oid
+
+        return lookups
+
+    def serialize(self, views, lookups, session):
+        """Return records for data_set_views as lookup by ID.
+
+        NOTE: permissions, data owners and WMS/WFS layers are loaded with
+              a single query each for all data_set_views
+
+        :param list[obj] views: data_set_views with eager loaded relations
+        :param obj lookups: Lookups of related records
+        :param Session session: DB session
+        """
+        view_ids = [view.gdi_oid for view in views]
+        edit_config_ids = {}
+        layer_ids = {}
+        for view in views:
+            if view.data_set_edit_collection:
+                edit_config_ids[view.gdi_oid] = \
+                    view.data_set_edit_collection[0].gdi_oid
+            if view.ows_layers:
+                layer_ids[view.gdi_oid] = view.ows_layers[0].gdi_oid
+
+        # permissions as {<resource ID>: {<role name>: <write>}}
+        permissions = {}
+        resource_ids = view_ids + list(edit_config_ids.values())
+        if resource_ids:
+            query = session.query(
+                self.ResourcePermission.gdi_oid_resource, self.Role.name,
+                self.ResourcePermission.write
+            ).join(self.ResourcePermission.role) \
+                .filter(
+                    self.ResourcePermission.gdi_oid_resource.in_(resource_ids)
+                )
+            for resource_id, role_name, write in query:
+                permissions.setdefault(resource_id, {})[role_name] = write
+
+        # data owner names as {<resource ID>: <contact name>}
+        data_owners = {}
+        if view_ids and lookups['data_owner_role_id'] is not None:
+            query = session.query(
+                self.ResourceContact.gdi_oid_resource, self.Contact.name
+            ).join(
+                self.Contact, self.ResourceContact.id_contact == self.Contact.id
+            ).filter(
+                self.ResourceContact.id_contact_role ==
+                lookups['data_owner_role_id']
+            ).filter(self.ResourceContact.gdi_oid_resource.in_(view_ids))
+            for resource_id, name in query:
+                data_owners[resource_id] = name
+
+        # WMS/WFS layers as {<layer ID>: [<OWS type>]}
+        ows_types = {}
+        root_ids = {
+            gdi_oid: ows_type
+            for ows_type, gdi_oid in lookups['root_layers'].items()
+        }
+        if layer_ids and root_ids:
+            query = session.query(
+                self.GroupLayer.gdi_oid_group_layer,
+                self.GroupLayer.gdi_oid_sub_layer
+            ).filter(
+                self.GroupLayer.gdi_oid_group_layer.in_(list(root_ids.keys()))
+            ).filter(
+                self.GroupLayer.gdi_oid_sub_layer.in_(
+                    list(layer_ids.values())
+                )
+            )
+            for root_id, layer_id in query:
+                ows_types.setdefault(layer_id, []).append(root_ids[root_id])
+
+        records = {}
+        for view in views:
+            data_set = view.data_set
+            data_source = data_set.data_source
+
+            # DataSet type as in DataSet GUI
+            connection_type = data_source.connection_type
+            if connection_type == 'directory':
+                data_set_type = 'raster'
+            elif connection_type in ['wms', 'wmts']:
+                data_set_type = 'ows'
+            elif view.ows_layers:
+                data_set_type = 'vector'
+            else:
+                data_set_type = 'basic'
+
+            layer = None
+            if view.ows_layers:
+                ows_layer = view.ows_layers[0]
+                legend_image = None
+                if ows_layer.legend_image:
+                    legend_image = base64.b64encode(
+                        ows_layer.legend_image
+                    ).decode('ascii')
+                layer = {
+                    'title': ows_layer.title,
+                    'transparency': ows_layer.layer_transparency,
+                    'synonyms': ows_layer.synonyms,
+                    'keywords': ows_layer.keywords,
+                    'ows_metadata': ows_layer.ows_metadata,
+                    'info_template': lookups['templates'].get(
+                        ows_layer.gdi_oid_info_template
+                    ),
+                    'object_sheet': lookups['templates'].get(
+                        ows_layer.gdi_oid_object_sheet
+                    ),
+                    'qgs_style': ows_layer.qgs_style,
+                    'client_qgs_style': ows_layer.client_qgs_style,
+                    'uploaded_qml': ows_layer.uploaded_qml,
+                    'uploaded_client_qml': ows_layer.uploaded_client_qml,
+                    'legend_filename': ows_layer.legend_filename,
+                    'legend_image': legend_image,
+                    'in_wms': 'WMS' in ows_types.get(ows_layer.gdi_oid, []),
+                    'in_wfs': 'WFS' in ows_types.get(ows_layer.gdi_oid, [])
+                }
+
+            # roles with read permission on data_set_view,
+            # with write permission from edit config
+            edit_permissions = permissions.get(
+                edit_config_ids.get(view.gdi_oid), {}
+            )
+            record_permissions = [
+                {
+                    'role': role_name,
+                    'write': bool(edit_permissions.get(role_name, False))
+                }
+                for role_name in sorted(permissions.get(view.gdi_oid, {}))
+            ]
+
+            records[view.gdi_oid] = {
+                'name': view.name,
+                'description': view.description,
+                'type': data_set_type,
+                'data_source': data_source.name,
+                'data_set_name': data_set.data_set_name,
+                'primary_key': data_set.primary_key,
+                'geometry_column': view.geometry_column,
+                'feature_id_column': view.feature_id_column,
+                'facet': view.facet,
+                'filter_word': view.filter_word,
+                'searchable': view.searchable,
+                'attributes': [
+                    {
+                        'name': attr.name,
+                        'alias': attr.alias,
+                        'format': attr.format,
+                        'displayfield': attr.displayfield
+                    }
+                    for attr in view.attributes
+                ],
+                'layer': layer,
+                'permissions': record_permissions,
+                'data_owner': data_owners.get(view.gdi_oid)
+            }
+
+        return records
+
+    # import
+
+    def import_records(self, lines, dry_run=True, chunk_size=None,
+                       session=None):
+        """Validate and import DataSets from JSON lines and return report as
+        {
+            'results': [{
+                'line': <line number>,
+                'name': <DataSet name>,
+                'action': <'create', 'update', 'unchanged' or 'error'>,
+                'changes': [<changed field>],
+                'errors': [<error message>]
+            }],
+            'created': <int>, 'updated': <int>, 'unchanged': <int>,
+            'errors': <int>, 'duration': <s>,
+            'records_per_second': <imported records per second>
+        }
+
+        NOTE: records with errors are skipped
+
+        :param iterable lines: JSON lines
+        :param bool dry_run: Only validate and compare records if set
+        :param int chunk_size: Number of DataSets per transaction
+        :param Session session: Optional DB session of an enclosing
+                                transaction, where chunks are only flushed
+                                and any write errors are raised
+        """
+        start = time.time()
+        chunk_size = chunk_size or self.CHUNK_SIZE
+
+        # parse and normalize records
+        entries = self.parse_lines(lines)
+
+        own_session = session is None
+        if own_session:
+            session = self.config_models.session()
+        try:
+            lookups = self.lookups(session)
+
+            # validate records and resolve references
+            self.validate_entries(entries, lookups, session)
+            self.validate_tables(entries, lookups)
+
+            # compare with existing DataSets and write changes in chunks
+            valid = [entry for entry in entries if not entry['errors']]
+            for i in range(0, len(valid), chunk_size):
+                chunk = valid[i:i + chunk_size]
+                self.process_chunk(
+                    chunk, lookups, dry_run, session, own_session
+                )
+                session.expunge_all()
+        finally:
+            if own_session:
+                session.close()
+
+        report = {
+            'results': [],
+            'created': 0,
+            'updated': 0,
+            'unchanged': 0,
+            'errors': 0
+        }
+        for entry in entries:
+            action = 'error' if entry['errors'] else entry['action']
+            report['results'].append({
+                'line': entry['line'],
+                'name': entry['record'].get('name'),
+                'action': action,
+                'changes': entry['changes'],
+                'errors': entry['errors']
+            })
+            if action == 'create':
+                report['created'] += 1
+            elif action == 'update':
+                report['updated'] += 1
+            elif action == 'unchanged':
+                report['unchanged'] += 1
+            else:
+                report['errors'] += 1
+
+        duration = time.time() - start
+        report['duration'] = round(duration, 3)
+        report['records_per_second'] = (
+            int(len(entries) / duration) if duration > 0 else 0
+        )
+
+        return report
+
+    def parse_lines(self, lines):
+        """Parse JSON lines and return import entries with normalized records.
+
+        :param iterable lines: JSON lines
+        """
+        entries = []
+        for line_no, line in enumerate(lines, 1):
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            if not line.strip():
+                continue
+
+            entry = {
+                'line': line_no,
+                'record': {},
+                'action': None,
+                'changes': [],
+                'errors': []
+            }
+            entries.append(entry)
+            try:
+                record = json.loads(line)
+            except Exception as e:
+                entry['errors'].append("Ungültiges JSON: %s" % e)
+                continue
+            if not isinstance(record, dict):
+                entry['errors'].append("Eintrag ist kein JSON-Objekt")
+                continue
+
+            entry['record'] = self.normalize(record)
+
+        return entries
+
+    def normalize(self, record):
+        """Return record with default values for missing optional fields.
+
+        :param obj record: DataSet record
+        """
+        normalized = dict(self.DEFAULTS)
+        normalized.update(record)
+
+        if isinstance(normalized['layer'], dict):
+            layer = dict(self.LAYER_DEFAULTS)
+            layer.update(normalized['layer'])
+            normalized['layer'] = layer
+
+        if isinstance(normalized['attributes'], list):
+            attributes = []
+            for attr in normalized['attributes']:
+                if isinstance(attr, dict):
+                    attribute = dict(self.ATTRIBUTE_DEFAULTS)
+                    attribute.update(attr)
+                    attr = attribute
+                attributes.append(attr)
+            normalized['attributes'] = attributes
+
+        if isinstance(normalized['permissions'], list):
+            permissions = []
+            for permission in normalized['permissions']:
+                if isinstance(permission, dict):
+                    permission = {
+                        'role': permission.get('role'),
+                        'write': bool(permission.get('write', False))
+                    }
+                permissions.append(permission)
+            normalized['permissions'] = sorted(
+                permissions,
+                key=lambda p: str(p.get('role') if isinstance(p, dict) else p)
+            )
+
+        return normalized
+
+    def validate_entries(self, entries, lookups, session):
+        """Validate records and resolve references by name.
+
+        :param list[obj] entries: Import entries
+        :param obj lookups: Lookups of related records
+        :param Session session: DB session
+        """
+        # ProductSet names, which must not be used by DataSets
+        names = [
+            entry['record'].get('name') for entry in entries
+            if isinstance(entry['record'].get('name'), str)
+        ]
+        product_set_names = set()
+        for i in range(0, len(names), self.CHUNK_SIZE):
+            query = session.query(self.OWSLayerGroup.name).filter(
+                self.OWSLayerGroup.name.in_(names[i:i + self.CHUNK_SIZE])
+            )
+            product_set_names.update(name for name, in query)
+
+        seen_names = set()
+        for entry in entries:
+            if entry['errors']:
+                continue
+            record = entry['record']
+            errors = entry['errors']
+
+            name = record.get('name')
+            if not isinstance(name, str) or not name:
+                errors.append("Name darf nicht leer sein")
+            elif len(name.split()) != 1 or name.strip() != name:
+                errors.append("Name darf keine Leerzeichen enthalten")
+            elif name in seen_names:
+                errors.append("Name ist mehrfach vorhanden")
+            elif name in product_set_names:
+                errors.append(
+                    "Ein ProductSet mit diesem Namen ist bereits vorhanden"
+                )
+            seen_names.add(name)
+
+            data_set_type = record.get('type')
+            if data_set_type not in self.TYPES:
+                errors.append("Ungültiger Typ '%s'" % data_set_type)
+                continue
+
+            data_source = lookups['data_sources'].get(record.get('data_source'))
+            if data_source is None:
+                errors.append(
+                    "DataSource '%s' nicht gefunden" % record.get('data_source')
+                )
+            elif (
+                data_source['connection_type'] not in
+                self.CONNECTION_TYPES[data_set_type]
+            ):
+                errors.append(
+                    "DataSource '%s' passt nicht zu Typ '%s'" %
+                    (data_source['name'], data_set_type)
+                )
+            entry['data_source'] = data_source
+
+            if not record.get('data_set_name'):
+                errors.append("data_set_name darf nicht leer sein")
+
+            if not isinstance(record['attributes'], list) or not all(
+                isinstance(attr, dict) and attr.get('name')
+                for attr in record['attributes']
+            ):
+                errors.append("Ungültige Attribute")
+
+            # permissions
+            entry['permissions'] = []
+            if not isinstance(record['permissions'], list):
+                errors.append("Ungültige Permissions")
+            else:
+                for permission in record['permissions']:
+                    role_id = None
+                    if isinstance(permission, dict):
+                        role_id = lookups['roles'].get(permission['role'])
+                    if role_id is None:
+                        errors.append(
+                            "Rolle '%s' nicht gefunden" %
+                            (permission.get('role')
+                             if isinstance(permission, dict) else permission)
+                        )
+                    else:
+                        entry['permissions'].append(
+                            (role_id, permission['write'])
+                        )
+
+            # data owner
+            entry['data_owner_id'] = None
+            if record['data_owner']:
+                contact_ids = lookups['contacts'].get(record['data_owner'], [])
+                if len(contact_ids) == 1:
+                    entry['data_owner_id'] = contact_ids[0]
+                elif contact_ids:
+                    errors.append(
+                        "Kontakt '%s' ist nicht eindeutig" %
+                        record['data_owner']
+                    )
+                else:
+                    errors.append(
+                        "Kontakt '%s' nicht gefunden" % record['data_owner']
+                    )
+
+            # layer
+            layer = record['layer']
+            if data_set_type == 'basic':
+                if layer is not None:
+                    errors.append("Basis-DataSet darf keinen Layer haben")
+            elif not isinstance(layer, dict):
+                errors.append("Layer fehlt")
+            else:
+                if not layer['title']:
+                    errors.append("Titel darf nicht leer sein")
+                for field, lookup in [
+                    ('info_template', 'info_templates'),
+                    ('object_sheet', 'object_sheets')
+                ]:
+                    if (
+                        layer[field] and
+                        layer[field] not in lookups[lookup]
+                    ):
+                        errors.append(
+                            "Template '%s' nicht gefunden" % layer[field]
+                        )
+                if layer['legend_image']:
+                    try:
+                        base64.b64decode(layer['legend_image'], validate=True)
+                    except Exception:
+                        errors.append("Ungültiges Legendenbild")
+
+    def validate_tables(self, entries, lookups):
+        """Validate tables and columns of vector and basic DataSets against
+        their data_sources, with a single catalog query per data_source.
+
+        :param list[obj] entries: Import entries
+        :param obj lookups: Lookups of related records
+        """
+        # group entries by data_source
+        data_sources = {}
+        for entry in entries:
+            if entry['errors']:
+                continue
+            if entry['record']['type'] not in ['vector', 'basic']:
+                continue
+            data_source = entry['data_source']
+            data_sources.setdefault(data_source['name'], []).append(entry)
+
+        for data_source_name, data_source_entries in data_sources.items():
+            data_source = lookups['data_sources'][data_source_name]
+
+            # parse schema and table names
+            tables = set()
+            for entry in data_source_entries:
+                entry['table'] = self.parse_table_name(
+                    entry['record']['data_set_name']
+                )
+                tables.add(entry['table'])
+
+            try:
+                table_infos = self.table_infos(data_source, list(tables))
+            except DBAPIError as e:
+                self.logger.error(e.orig)
+                msg = self.GeoDBHelper.error_message(e)
+                for entry in data_source_entries:
+                    entry['errors'].append(
+                        "DataSource '%s' nicht verfügbar: %s" %
+                        (data_source_name, msg)
+                    )
+                continue
+
+            for entry in data_source_entries:
+                self.validate_table(entry, table_infos.get(entry['table']))
+
+    def parse_table_name(self, table_name):
+        """Return (<schema>, <table>) for a table name.
+
+        :param str table_name: Table name as "<schema>.<table>" or "<table>"
+        """
+        parts = table_name.split('.', 1)
+        if len(parts) > 1:
+            return (parts[0], parts[1])
+        return ('public', parts[0])
+
+    def table_infos(self, data_source, tables):
+        """Return columns, primary key and geometry columns of tables
+        as lookup by (<schema>, <table>).
+
+        :param obj data_source: data_source lookup
+        :param list[(str, str)] tables: List of (<schema>, <table>)
+        """
+        engine = self.GeoDBHelper.engine(
+            self.DataSource(
+                name=data_source['name'],
+                connection=data_source['connection']
+            )
+        )
+        return self.engine_table_infos(engine, tables)
+
+    def engine_table_infos(self, engine, tables):
+        """Return catalog info of tables in a data_source DB as lookup by
+        (<schema>, <table>) (see TableStatsHelper.table_infos).
+
+        :param Engine engine: Database engine for data_source
+        :param list[(str, str)] tables: List of (<schema>, <table>)
+        """
+        with engine.connect() as conn:
+            return self.TableStatsHelper.table_infos(conn, tables)
+
+    def validate_table(self, entry, table_info):
+        """Validate record against table metadata.
+
+        :param obj entry: Import entry
+        :param obj table_info: Table metadata or None if not found
+        """
+        record = entry['record']
+        errors = entry['errors']
+        if table_info is None:
+            errors.append("Tabelle '%s' nicht gefunden" % record['data_set_name'])
+            return
+
+        columns = table_info['columns']
+        if not table_info['primary_key']:
+            if not record['primary_key']:
+                errors.append("Primary Key darf nicht leer sein")
+            elif record['primary_key'] not in columns:
+                errors.append("Ungültiger Primary Key")
+
+        if record['type'] != 'vector':
+            return
+
+        if (
+            record['geometry_column'] and
+            record['geometry_column'] not in table_info['geometry_columns']
+        ):
+            errors.append(
+                "Geometriespalte '%s' nicht gefunden" %
+                record['geometry_column']
+            )
+        if (
+            record['feature_id_column'] and
+            record['feature_id_column'] not in columns
+        ):
+            errors.append(
+                "Feature-ID-Spalte '%s' nicht gefunden" %
+                record['feature_id_column']
+            )
+        for attr in record['attributes']:
+            if attr['name'] not in columns:
+                errors.append("Attribut '%s' nicht gefunden" % attr['name'])
+
+    def process_chunk(self, chunk, lookups, dry_run, session, commit=True):
+        """Compare a chunk of records with existing DataSets and write any
+        changes in a single transaction.
+
+        :param list[obj] chunk: Valid import entries
+        :param obj lookups: Lookups of related records
+        :param bool dry_run: Only compare records if set
+        :param Session session: DB session
+        :param bool commit: Commit changes if set, otherwise only flush
+                            them and raise any errors
+        """
+        # load existing DataSets of chunk
+        names = [entry['record']['name'] for entry in chunk]
+        views = self.data_set_views_query(session) \
+            .filter(self.DataSetView.name.in_(names)).all()
+        existing_views = {view.name: view for view in views}
+        existing_records = self.serialize(views, lookups, session)
+
+        changed = []
+        for entry in chunk:
+            record = entry['record']
+            view = existing_views.get(record['name'])
+            if view is None:
+                entry['action'] = 'create'
+                changed.append((entry, None))
+                continue
+
+            existing = existing_records[view.gdi_oid]
+            entry['changes'] = self.diff(existing, record)
+            if not entry['changes']:
+                entry['action'] = 'unchanged'
+            elif existing['type'] != record['type']:
+                entry['errors'].append(
+                    "Typ kann nicht von '%s' zu '%s' geändert werden" %
+                    (existing['type'], record['type'])
+                )
+            else:
+                entry['action'] = 'update'
+                changed.append((entry, view))
+
+        if dry_run or not changed:
+            return
+
+        if not commit:
+            self.write_chunk(changed, lookups, session)
+            session.flush()
+            return
+
+        try:
+            self.write_chunk(changed, lookups, session)
+            session.commit()
+        except (IntegrityError, InternalError) as e:
+            session.rollback()
+            self.logger.error(e.orig)
+            for entry, view in changed:
+                entry['errors'].append(
+                    "Fehler beim Speichern des Blocks: %s" % e.orig
+                )
+
+    def diff(self, existing, record):
+        """Return names of changed fields.
+
+        :param obj existing: Record of existing DataSet
+        :param obj record: Imported record
+        """
+        changes = []
+        for field, value in existing.items():
+            if field == 'layer' and value and record.get(field):
+                for layer_field, layer_value in value.items():
+                    if record[field].get(layer_field) != layer_value:
+                        changes.append('layer.%s' % layer_field)
+            elif record.get(field) != value:
+                changes.append(field)
+
+        return changes
+
+    def write_chunk(self, changed, lookups, session):
+        """Create or update DataSets of a chunk.
+
+        :param list[(obj, obj)] changed: Import entries with any existing
+                                         data_set_view
+        :param obj lookups: Lookups of related records
+        :param Session session: DB session
+        """
+        # remove permissions and data owners of existing resources
+        # NOTE: before any ORM changes, so that removed resources are
+        #       included and no autoflush is triggered
+        old_resource_ids = []
+        for entry, view in changed:
+            if view is not None:
+                old_resource_ids += self.resource_ids(view)
+        if old_resource_ids:
+            session.query(self.ResourcePermission).filter(
+                self.ResourcePermission.gdi_oid_resource.in_(
+                    old_resource_ids
+                )
+            ).delete(synchronize_session=False)
+            if lookups['data_owner_role_id'] is not None:
+                session.query(self.ResourceContact).filter(
+                    self.ResourceContact.id_contact_role ==
+                    lookups['data_owner_role_id']
+                ).filter(
+                    self.ResourceContact.gdi_oid_resource.in_(
+                        old_resource_ids
+                    )
+                ).delete(synchronize_session=False)
+
+        # load WMS/WFS membership of existing layers
+        ows_group_layers = {}
+        layer_ids = [
+            view.ows_layers[0].gdi_oid for entry, view in changed
+            if view is not None and view.ows_layers
+        ]
+        root_ids = {
+            gdi_oid: ows_type
+            for ows_type, gdi_oid in lookups['root_layers'].items()
+        }
+        if layer_ids and root_ids:
+            query = session.query(self.GroupLayer).filter(
+                self.GroupLayer.gdi_oid_group_layer.in_(list(root_ids.keys()))
+            ).filter(self.GroupLayer.gdi_oid_sub_layer.in_(layer_ids))
+            for group_layer in query:
+                ows_group_layers[(
+                    root_ids[group_layer.gdi_oid_group_layer],
+                    group_layer.gdi_oid_sub_layer
+                )] = group_layer
+
+        # update DataSets
+        views = []
+        for entry, view in changed:
+            views.append(
+                self.update_data_set(entry, view, lookups, session)
+            )
+
+        # NOTE: flush once to get gdi_oids of new resources
+        session.flush()
+
+        # add WMS/WFS layers
+        for (entry, _), view in zip(changed, views):
+            if not view.ows_layers:
+                continue
+            ows_layer = view.ows_layers[0]
+            layer = entry['record']['layer']
+            self.update_ows_layers(
+                ows_layer, 'WMS', layer['in_wms'], lookups, ows_group_layers,
+                session
+            )
+            self.update_ows_layers(
+                ows_layer, 'WFS',
+                layer['in_wfs'] and entry['record']['type'] == 'vector',
+                lookups, ows_group_layers, session
+            )
+
+        # add permissions and data owners with bulk inserts
+        permissions = []
+        contacts = []
+        for (entry, _), view in zip(changed, views):
+            edit_config_id = None
+            if view.data_set_edit_collection:
+                edit_config_id = view.data_set_edit_collection[0].gdi_oid
+            resource_ids = self.resource_ids(view)
+
+            for role_id, write in entry['permissions']:
+                priority = 0 if role_id == lookups['public_role_id'] else 1
+                for resource_id in resource_ids:
+                    permissions.append({
+                        'id_role': role_id,
+                        'gdi_oid_resource': resource_id,
+                        'priority': priority,
+                        'write': write and resource_id == edit_config_id
+                    })
+
+            if entry['data_owner_id'] is not None:
+                if lookups['data_owner_role_id'] is None:
+                    # create new contact role if missing
+                    role = self.ContactRole(
+                        type=ContactsHelper.ROLE_DATA_OWNER
+                    )
+                    session.add(role)
+                    session.flush()
+                    lookups['data_owner_role_id'] = role.id
+
+                # NOTE: attributes have no resource contacts
+                attribute_ids = set(attr.gdi_oid for attr in view.attributes)
+                for resource_id in resource_ids:
+                    if resource_id in attribute_ids:
+                        continue
+                    contacts.append({
+                        'id_contact_role': lookups['data_owner_role_id'],
+                        'id_contact': entry['data_owner_id'],
+                        'gdi_oid_resource': resource_id
+                    })
+
+        if permissions:
+            session.bulk_insert_mappings(self.ResourcePermission, permissions)
+        if contacts:
+            session.bulk_insert_mappings(self.ResourceContact, contacts)
+
+    def resource_ids(self, view):
+        """Return IDs of all GDI resources of a DataSet.
+
+        :param obj view: data_set_view object
+        """
+        resource_ids = [view.data_set.gdi_oid, view.gdi_oid]
+        resource_ids += [layer.gdi_oid for layer in view.ows_layers]
+        resource_ids += [attr.gdi_oid for attr in view.attributes]
+        resource_ids += [
+            edit_config.gdi_oid for edit_config
+            in view.data_set_edit_collection
+        ]
+        return resource_ids
+
+    def update_data_set(self, entry, view, lookups, session):
+        """Create or update data_set_view and related records from a record
+        and return the data_set_view.
+
+        :param obj entry: Import entry
+        :param obj view: Existing data_set_view or None
+        :param obj lookups: Lookups of related records
+        :param Session session: DB session
+        """
+        record = entry['record']
+        data_set_type = record['type']
+
+        if view is None:
+            # create new data_set_view and data_set
+            view = self.DataSetView()
+            session.add(view)
+            data_set = self.DataSet()
+            view.data_set = data_set
+            session.add(data_set)
+
+        view.name = record['name']
+        view.description = record['description']
+        if data_set_type == 'vector':
+            view.geometry_column = record['geometry_column'] or None
+        view.feature_id_column = record['feature_id_column']
+        view.facet = record['facet']
+        view.filter_word = record['filter_word']
+        view.searchable = record['searchable']
+
+        data_set = view.data_set
+        data_set.name = record['name']
+        data_set.description = record['description']
+        data_set.data_set_name = record['data_set_name']
+        data_set.gdi_oid_data_source = entry['data_source']['id']
+        if data_set_type == 'vector':
+            data_set.primary_key = record['primary_key'] or None
+
+            self.update_attributes(view, record['attributes'], session)
+
+            # edit config for DataSets with any permissions
+            edit_config = None
+            if view.data_set_edit_collection:
+                edit_config = view.data_set_edit_collection[0]
+            if entry['permissions']:
+                if edit_config is None:
+                    edit_config = self.DataSetEdit()
+                    edit_config.data_set_view = view
+                    session.add(edit_config)
+                edit_config.name = record['name']
+                edit_config.description = record['description']
+            elif edit_config is not None:
+                view.data_set_edit_collection.remove(edit_config)
+                session.delete(edit_config)
+
+        if data_set_type != 'basic':
+            self.update_layer(view, record['layer'], lookups, session)
+
+        return view
+
+    def update_attributes(self, view, attributes, session):
+        """Update data_set_view_attributes in order of record attributes.
+
+        :param obj view: data_set_view object
+        :param list[obj] attributes: Record attributes
+        :param Session session: DB session
+        """
+        existing = {attr.name: attr for attr in view.attributes}
+        names = set()
+        for index, attr in enumerate(attributes):
+            names.add(attr['name'])
+            view_attr = existing.get(attr['name'])
+            if view_attr is None:
+                view_attr = self.Attribute(name=attr['name'], description="-")
+                view.attributes.append(view_attr)
+            view_attr.alias = attr['alias']
+            view_attr.format = attr['format']
+            view_attr.displayfield = attr['displayfield']
+            view_attr.attribute_order = index
+
+        # remove attributes not in record
+        # NOTE: their permissions have already been removed
+        for name, view_attr in existing.items():
+            if name not in names:
+                view.attributes.remove(view_attr)
+                session.delete(view_attr)
+
+    def update_layer(self, view, layer, lookups, session):
+        """Create or update ows_layer_data of a DataSet.
+
+        :param obj view: data_set_view object
+        :param obj layer: Record layer
+        :param obj lookups: Lookups of related records
+        :param Session session: DB session
+        """
+        if view.ows_layers:
+            ows_layer = view.ows_layers[0]
+        else:
+            ows_layer = self.OWSLayerData()
+            ows_layer.data_set_view = view
+            session.add(ows_layer)
+
+        ows_layer.name = view.name
+        ows_layer.description = view.description
+        ows_layer.title = layer['title']
+        ows_layer.layer_transparency = layer['transparency'] or 0
+        ows_layer.synonyms = layer['synonyms']
+        ows_layer.keywords = layer['keywords']
+        ows_layer.ows_metadata = layer['ows_metadata']
+        ows_layer.gdi_oid_info_template = lookups['info_templates'].get(
+            layer['info_template']
+        )
+        ows_layer.gdi_oid_object_sheet = lookups['object_sheets'].get(
+            layer['object_sheet']
+        )
+        ows_layer.qgs_style = layer['qgs_style'] or ""
+        ows_layer.client_qgs_style = layer['client_qgs_style']
+        ows_layer.uploaded_qml = layer['uploaded_qml']
+        ows_layer.uploaded_client_qml = layer['uploaded_client_qml']
+        ows_layer.legend_filename = layer['legend_filename']
+        ows_layer.legend_image = None
+        if layer['legend_image']:
+            ows_layer.legend_image = base64.b64decode(layer['legend_image'])
+
+    def update_ows_layers(self, ows_layer, ows_type, add_layer, lookups,
+                          ows_group_layers, session):
+        """Add or remove layer to WMS/WFS root layer.
+
+        :param obj ows_layer: ows_layer_data object
+        :param str ows_type: OWS type (WMS or WFS)
+        :param bool add_layer: Add layer if true, remove if false
+        :param obj lookups: Lookups of related records
+        :param obj ows_group_layers: Existing group_layers of WMS/WFS as
+                                     lookup by (<OWS type>, <layer ID>)
+        :param Session session: DB session
+        """
+        root_id = lookups['root_layers'].get(ows_type)
+        if root_id is None:
+            return
+
+        group_layer = ows_group_layers.get((ows_type, ows_layer.gdi_oid))
+        if add_layer and group_layer is None:
+            # append to WMS/WFS root layer
+            layer_counts = lookups.setdefault('root_layer_counts', {})
+            if ows_type not in layer_counts:
+                layer_counts[ows_type] = session.query(self.GroupLayer) \
+                    .filter_by(gdi_oid_group_layer=root_id).count()
+            session.add(self.GroupLayer(
+                gdi_oid_group_layer=root_id,
+                gdi_oid_sub_layer=ows_layer.gdi_oid,
+                layer_order=layer_counts[ows_type],
+                layer_active=True
+            ))
+            layer_counts[ows_type] += 1
+        elif not add_layer and group_layer is not None:
+            # remove from WMS/WFS root layer
+            session.delete(group_layer)
@@ -1,7 +1,9 @@
 from .contacts_helper import ContactsHelper
 from .controller import Controller
+from .lookup_helper import LookupHelper
 from .permissions_helper import PermissionsHelper
 from forms import DataSourceForm
+from service_lib.tenant_config_models import TenantModel
 
 
 class DataSourcesController(Controller):
@@ -10,20 +12,25 @@ class DataSourcesController(Controller):
     Manage data_source and related models from combined GUI.
     """
 
-    def __init__(self, app, config_models):
+    # ConfigDB models of current tenant
+    DataSource = TenantModel('data_source')
+    Person = TenantModel('person')
+
+    def __init__(self, app, config_models, data_versions, name_registry):
         """Constructor
 
         :param Flask app: Flask application
         :param ConfigModels config_models: Helper for ORM models
+        :param DataVersions data_versions: Change counters of ConfigDB tables
+        :param NameRegistry name_registry: Registry of resource names
         """
         super(DataSourcesController, self).__init__(
             "DataSource", 'data_sources', 'data_source', 'data_sources', app,
-            config_models
+            config_models, data_versions, name_registry
         )
         self.ContactsHelper = ContactsHelper(config_models, app.logger)
+        self.LookupHelper = LookupHelper(config_models, app.logger)
         self.PermissionsHelper = PermissionsHelper(config_models)
-        self.DataSource = self.config_models.model('data_source')
-        self.Person = self.config_models.model('person')
 
     def resource_pkey(self):
         """Return primary key column name."""
@@ -90,7 +97,9 @@ class DataSourcesController(Controller):
         :param object resource: Optional data_source object
         :param bool edit_form: Set if edit form
         """
-        form = DataSourceForm(self.config_models, obj=resource)
+        form = DataSourceForm(
+            self.config_models, self.name_registry, obj=resource
+        )
 
         if edit_form:
             # override form fields with resource values on edit
@@ -99,8 +108,7 @@ class DataSourcesController(Controller):
             )
 
         # set choices for responsible select field
-        form.responsible.choices = [(0, "")] + \
-            self.ContactsHelper.person_choices()
+        self.LookupHelper.lazy_choices(form.responsible, 'persons')
 
         return form
 
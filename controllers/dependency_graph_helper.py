@@ -0,0 +1,304 @@
+from collections import deque
+import threading
+import time
+
+from sqlalchemy.sql import select
+
+
+class DependencyGraphHelper:
+    """Helper class for dependencies between GDI resources
+
+    Keeps an in-memory graph of all references between GDI resources per
+    ConfigDB, built with one query per reference type. The graph is rebuilt
+    when the data versions of 'gdi_knoten' have changed.
+
+    An edge A -> B means that A uses B, i.e. A is affected by changes of B.
+    """
+
+    # references as (<table>, <dependent>, <dependency>)
+    # NOTE: dependent and dependency are column names or, if the table has
+    #       no such column, the name of the referenced table
+    REFERENCES = [
+        ('data_set', 'gdi_oid', 'data_source'),
+        ('data_set_view', 'gdi_oid', 'data_set'),
+        ('data_set_edit', 'gdi_oid', 'data_set_view'),
+        ('ows_layer_data', 'gdi_oid', 'gdi_oid_data_set_view'),
+        ('ows_layer_data', 'gdi_oid', 'gdi_oid_info_template'),
+        ('ows_layer_data', 'gdi_oid', 'gdi_oid_object_sheet'),
+        ('group_layer', 'gdi_oid_group_layer', 'gdi_oid_sub_layer'),
+        ('wms_wfs', 'gdi_oid', 'ows_layer_group'),
+        ('map_layer', 'map', 'gdi_oid_ows_layer'),
+        ('map', 'gdi_oid', 'gdi_oid_default_bg_layer'),
+        ('map', 'gdi_oid', 'gdi_oid_wms_wfs'),
+        ('template_ows_layer', 'gdi_oid_template_jasper', 'gdi_oid_ows_layer'),
+        ('template_data_set', 'gdi_oid_template_jasper', 'gdi_oid_data_set'),
+        ('service_data_product', 'gdi_oid_service', 'gdi_oid_data_product'),
+        ('service_module', 'service', 'module'),
+        ('module_data_product', 'gdi_oid_module', 'gdi_oid_data_product'),
+        ('module_service', 'module', 'service'),
+        ('transformation', 'gdi_oid', 'data_set'),
+        ('transformation_data_set', 'gdi_oid_transformation',
+         'gdi_oid_data_set')
+    ]
+
+    # schemas of graph tables
+    SCHEMAS = ['gdi_knoten']
+
+    # max age of graph in seconds if data versions are not available
+    FALLBACK_TTL = 60
+
+    def __init__(self, config_models, data_versions, logger):
+        """Constructor
+
+        :param TenantConfigModels config_models: Helper for ORM models
+        :param DataVersions data_versions: Change counters of ConfigDB tables
+        :param Logger logger: Application logger
+        """
+        self.config_models = config_models
+        self.data_versions = data_versions
+        self.logger = logger
+
+        # cached graphs as {<ConfigDB URL>: <graph>}
+        self.graphs = {}
+        self.lock = threading.Lock()
+
+    def graph(self):
+        """Return current dependency graph for ConfigDB of current tenant as
+        {
+            'resources': {<gdi_oid>: (<table>, <name>)},
+            'uses': {<gdi_oid>: set(<gdi_oid>)},
+            'used_by': {<gdi_oid>: set(<gdi_oid>)},
+            'version_key': <data versions of graph>,
+            'built_at': <timestamp>
+        }
+        """
+        db_url = str(self.config_models.engine.url)
+        version_key = self.data_versions.version_key(self.SCHEMAS)
+
+        graph = self.graphs.get(db_url)
+        if self.is_current(graph, version_key):
+            return graph
+
+        # NOTE: build graph only once for concurrent requests
+        with self.lock:
+            graph = self.graphs.get(db_url)
+            if not self.is_current(graph, version_key):
+                graph = self.build_graph(version_key)
+                self.graphs[db_url] = graph
+
+        return graph
+
+    def is_current(self, graph, version_key):
+        """Return whether a cached graph is still valid.
+
+        :param obj graph: Cached graph or None
+        :param tuple version_key: Current data versions or None
+        """
+        if graph is None:
+            return False
+        if version_key is None:
+            return time.time() - graph['built_at'] < self.FALLBACK_TTL
+        return graph['version_key'] == version_key
+
+    def build_graph(self, version_key):
+        """Build dependency graph from ConfigDB.
+
+        :param tuple version_key: Data versions of graph
+        """
+        start = time.time()
+        resources = {}
+        uses = {}
+        used_by = {}
+        edge_count = 0
+
+        metadata = self.config_models.base.metadata
+        conn = self.config_models.engine.connect()
+        try:
+            # resources from gdi_resource view
+            GDIResource = self.config_models.model('gdi_resource')
+            table = GDIResource.__table__
+            query = select([table.c.gdi_oid, table.c.table_name, table.c.name])
+            for gdi_oid, table_name, name in conn.execute(query):
+                resources[gdi_oid] = (table_name, name)
+
+            # references
+            for table_name, dependent, dependency in self.REFERENCES:
+                table = metadata.tables.get('gdi_knoten.%s' % table_name)
+                if table is None:
+                    self.logger.warning(
+                        "DependencyGraph: unknown table '%s'" % table_name
+                    )
+                    continue
+
+                dependent_col = self.column(table, dependent)
+                dependency_col = self.column(table, dependency)
+                if dependent_col is None or dependency_col is None:
+                    self.logger.warning(
+                        "DependencyGraph: unknown reference %s(%s -> %s)" %
+                        (table_name, dependent, dependency)
+                    )
+                    continue
+
+                dependent_table = self.target_table(dependent_col, table_name)
+                dependency_table = self.target_table(
+                    dependency_col, table_name
+                )
+
+                query = select([dependent_col, dependency_col]).where(
+                    dependent_col.isnot(None)
+                ).where(dependency_col.isnot(None)).distinct()
+                for source, target in conn.execute(query):
+                    if source == target:
+                        continue
+                    uses.setdefault(source, set()).add(target)
+                    used_by.setdefault(target, set()).add(source)
+                    edge_count += 1
+
+                    # add resources missing in gdi_resource
+                    if source not in resources:
+                        resources[source] = (dependent_table, None)
+                    if target not in resources:
+                        resources[target] = (dependency_table, None)
+        finally:
+            conn.close()
+
+        self.logger.info(
+            "DependencyGraph: loaded %d resources and %d references "
+            "in %.3fs" % (len(resources), edge_count, time.time() - start)
+        )
+
+        return {
+            'resources': resources,
+            'uses': uses,
+            'used_by': used_by,
+            'version_key': version_key,
+            'built_at': time.time()
+        }
+
+    def column(self, table, ref):
+        """Return column by name or first foreign key column referencing
+        a table in 'gdi_knoten', or None if not found.
+
+        :param Table table: Table
+        :param str ref: Column or referenced table name
+        """
+        if ref in table.columns:
+            return table.columns[ref]
+
+        for column in table.columns:
+            for fk in column.foreign_keys:
+                if fk.target_fullname.startswith('gdi_knoten.%s.' % ref):
+                    return column
+
+        return None
+
+    def target_table(self, column, table_name):
+        """Return table name of resources referenced by a column.
+
+        :param Column column: Column
+        :param str table_name: Table of column
+        """
+        for fk in column.foreign_keys:
+            # NOTE: skip inheritance foreign keys of primary keys
+            if not column.primary_key:
+                return fk.column.table.name
+
+        return table_name
+
+    def impact(self, graph, gdi_oid, max_results):
+        """Return resource with transitive dependencies and dependents as
+        {
+            'resource': <resource>,
+            'uses': [<resource>],
+            'used_by': [<resource>],
+            'truncated': <True if results have been limited>
+        }
+        with resources as
+        {
+            'gdi_oid': <gdi_oid>,
+            'table_name': <table>,
+            'name': <name>,
+            'depth': <distance from resource>,
+            'via': <gdi_oid of previous resource on path>
+        }
+        or None if the resource is unknown.
+
+        :param obj graph: Dependency graph
+        :param int gdi_oid: Resource ID
+        :param int max_results: Max number of resources per direction
+        """
+        if gdi_oid not in graph['resources']:
+            return None
+
+        uses, uses_truncated = self.traverse(
+            graph, graph['uses'], gdi_oid, max_results
+        )
+        used_by, used_by_truncated = self.traverse(
+            graph, graph['used_by'], gdi_oid, max_results
+        )
+
+        return {
+            'resource': self.resource(graph, gdi_oid, 0, None),
+            'uses': uses,
+            'used_by': used_by,
+            'truncated': uses_truncated or used_by_truncated
+        }
+
+    def traverse(self, graph, edges, gdi_oid, max_results):
+        """Return resources reachable from a resource in breadth first
+        order, and whether results have been limited.
+
+        :param obj graph: Dependency graph
+        :param obj edges: Adjacency sets of graph
+        :param int gdi_oid: Start resource ID
+        :param int max_results: Max number of resources
+        """
+        results = []
+        visited = set([gdi_oid])
+        queue = deque([(gdi_oid, 0)])
+        while queue:
+            current, depth = queue.popleft()
+            # NOTE: sort for stable results
+            for neighbor in sorted(edges.get(current, ())):
+                if neighbor in visited:
+                    continue
+                if len(results) >= max_results:
+                    return results, True
+
+                visited.add(neighbor)
+                results.append(
+                    self.resource(graph, neighbor, depth + 1, current)
+                )
+                queue.append((neighbor, depth + 1))
+
+        return results, False
+
+    def resource(self, graph, gdi_oid, depth, via):
+        """Return resource entry.
+
+        :param obj graph: Dependency graph
+        :param int gdi_oid: Resource ID
+        :param int depth: Distance from start resource
+        :param int via: Previous resource on path
+        """
+        table_name, name = graph['resources'].get(gdi_oid, (None, None))
+        return {
+            'gdi_oid': gdi_oid,
+            'table_name': table_name,
+            'name': name,
+            'depth': depth,
+            'via': via
+        }
+
+    def related(self, graph, gdi_oid, table_name):
+        """Return ID of a directly used resource of a table, or None.
+
+        :param obj graph: Dependency graph
+        :param int gdi_oid: Resource ID
+        :param str table_name: Table of related resource
+        """
+        for target in sorted(graph['uses'].get(gdi_oid, ())):
+            if graph['resources'].get(target, (None,))[0] == table_name:
+                return target
+
+        return None
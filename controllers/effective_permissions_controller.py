@@ -0,0 +1,67 @@
+import time
+
+from flask import abort, jsonify
+
+from .effective_permissions_helper import EffectivePermissionsHelper
+
+
+class EffectivePermissionsController:
+    """Controller for effective permissions
+
+    Show resolved permissions of a user and all principals with permissions
+    on a GDI resource.
+    """
+
+    def __init__(self, app, config_models, data_versions):
+        """Constructor
+
+        :param Flask app: Flask application
+        :param TenantConfigModels config_models: Helper for ORM models
+        :param DataVersions data_versions: Change counters of ConfigDB tables
+        """
+        self.resource_name = "Effektive Berechtigungen"
+        self.logger = app.logger
+        self.EffectivePermissionsHelper = EffectivePermissionsHelper(
+            config_models, data_versions, app.logger
+        )
+
+        # add custom routes
+        # permissions of user
+        app.add_url_rule(
+            '/users/<int:id>/permissions', 'user_permissions',
+            self.user_permissions, methods=['GET']
+        )
+        # principals of GDI resource
+        app.add_url_rule(
+            '/resources/<int:gdi_oid>/principals', 'resource_principals',
+            self.resource_principals, methods=['GET']
+        )
+
+    def user_permissions(self, id):
+        """Return readable and writable resources of a user as JSON.
+
+        :param int id: User ID
+        """
+        start = time.time()
+        permissions = self.EffectivePermissionsHelper.user_permissions(id)
+        if permissions is None:
+            abort(404)
+
+        permissions['duration'] = round(time.time() - start, 3)
+        return jsonify(permissions)
+
+    def resource_principals(self, gdi_oid):
+        """Return roles, groups and users with permissions on a GDI resource
+        as JSON.
+
+        :param int gdi_oid: GDI resource ID
+        """
+        start = time.time()
+        principals = self.EffectivePermissionsHelper.resource_principals(
+            gdi_oid
+        )
+        if principals is None:
+            abort(404)
+
+        principals['duration'] = round(time.time() - start, 3)
+        return jsonify(principals)
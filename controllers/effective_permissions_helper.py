@@ -0,0 +1,464 @@
+import threading
+import time
+
+from sqlalchemy.sql import select
+
+from service_lib.cache import TTLCache
+from .permissions_helper import PermissionsHelper
+
+
+class EffectivePermissionsHelper:
+    """Helper class for resolving effective permissions of users
+
+    Loads users, groups, roles and resource permissions of a ConfigDB in
+    one query per table and indexes all GDI resources by integer position.
+    The permissions of each role are stored as bitsets (Python ints) of
+    readable and writable resources per priority, so that the permissions
+    of a user are resolved with a few bitwise operations over its roles.
+
+    A user has the roles assigned directly, the roles of its groups and the
+    public role. For each resource, the permissions with the highest
+    priority among these roles define whether the resource is writable.
+
+    The index is rebuilt when the data versions of 'iam' or 'gdi_knoten'
+    have changed.
+    """
+
+    # schemas of index tables
+    SCHEMAS = ['iam', 'gdi_knoten']
+
+    # max age of index in seconds if data versions are not available
+    FALLBACK_TTL = 60
+
+    # max number of cached user permissions per index
+    USER_CACHE_SIZE = 1000
+
+    def __init__(self, config_models, data_versions, logger):
+        """Constructor
+
+        :param TenantConfigModels config_models: Helper for ORM models
+        :param DataVersions data_versions: Change counters of ConfigDB tables
+        :param Logger logger: Application logger
+        """
+        self.config_models = config_models
+        self.data_versions = data_versions
+        self.logger = logger
+
+        # cached indexes as {<ConfigDB URL>: <index>}
+        self.indexes = {}
+        self.lock = threading.Lock()
+
+    def index(self):
+        """Return current permissions index for ConfigDB of current tenant.
+        """
+        db_url = str(self.config_models.engine.url)
+        version_key = self.data_versions.version_key(self.SCHEMAS)
+
+        index = self.indexes.get(db_url)
+        if self.is_current(index, version_key):
+            return index
+
+        # NOTE: build index only once for concurrent requests
+        with self.lock:
+            index = self.indexes.get(db_url)
+            if not self.is_current(index, version_key):
+                index = self.build_index(version_key)
+                self.indexes[db_url] = index
+
+        return index
+
+    def is_current(self, index, version_key):
+        """Return whether a cached index is still valid.
+
+        :param obj index: Cached index or None
+        :param tuple version_key: Current data versions or None
+        """
+        if index is None:
+            return False
+        if version_key is None:
+            return time.time() - index['built_at'] < self.FALLBACK_TTL
+        return index['version_key'] == version_key
+
+    def build_index(self, version_key):
+        """Load IAM tables and resource permissions and build index.
+
+        :param tuple version_key: Data versions of index
+        """
+        start = time.time()
+        metadata = self.config_models.base.metadata
+        User = metadata.tables['iam.user']
+        Group = metadata.tables['iam.group']
+        Role = metadata.tables['iam.role']
+        GroupUser = metadata.tables['iam.group_user']
+        UserRole = metadata.tables['iam.user_role']
+        GroupRole = metadata.tables['iam.group_role']
+        Permission = metadata.tables['iam.resource_permission']
+        GDIResource = self.config_models.model('gdi_resource').__table__
+
+        conn = self.config_models.engine.connect()
+        try:
+            users = {
+                row[0]: row[1] for row in
+                conn.execute(select([User.c.id, User.c.name]))
+            }
+            groups = {
+                row[0]: row[1] for row in
+                conn.execute(select([Group.c.id, Group.c.name]))
+            }
+            roles = {
+                row[0]: row[1] for row in
+                conn.execute(select([Role.c.id, Role.c.name]))
+            }
+
+            # resources by integer position
+            resource_ids = []
+            resources = {}
+            query = select([
+                GDIResource.c.gdi_oid, GDIResource.c.table_name,
+                GDIResource.c.name
+            ]).order_by(GDIResource.c.gdi_oid)
+            for gdi_oid, table_name, name in conn.execute(query):
+                resources[gdi_oid] = (len(resource_ids), table_name, name)
+                resource_ids.append(gdi_oid)
+
+            user_roles = self.relations(conn, UserRole, 'user', 'role')
+            group_roles = self.relations(conn, GroupRole, 'group', 'role')
+            user_groups = self.relations(conn, GroupUser, 'user', 'group')
+
+            # resource positions per (<role>, <priority>) and permissions
+            # per resource
+            readable = {}
+            writable = {}
+            resource_permissions = {}
+            count = 0
+            query = select([
+                Permission.c.id_role, Permission.c.gdi_oid_resource,
+                Permission.c.write, Permission.c.priority
+            ])
+            for role_id, gdi_oid, write, priority in conn.execute(query):
+                resource = resources.get(gdi_oid)
+                if resource is None:
+                    continue
+                count += 1
+                priority = priority or 0
+                key = (role_id, priority)
+                readable.setdefault(key, []).append(resource[0])
+                if write:
+                    writable.setdefault(key, []).append(resource[0])
+                resource_permissions.setdefault(gdi_oid, []).append(
+                    (role_id, bool(write), priority)
+                )
+        finally:
+            conn.close()
+
+        # role bitsets as {<role>: [(<priority>, <readable>, <writable>)]}
+        # sorted by priority descending
+        size = len(resource_ids)
+        role_bitsets = {}
+        for key, positions in readable.items():
+            role_id, priority = key
+            role_bitsets.setdefault(role_id, []).append((
+                priority, self.bitset(positions, size),
+                self.bitset(writable.get(key, []), size)
+            ))
+        for bitsets in role_bitsets.values():
+            bitsets.sort(key=lambda entry: -entry[0])
+
+        public_role_id = None
+        for role_id, name in roles.items():
+            if name == PermissionsHelper.PUBLIC_ROLE_NAME:
+                public_role_id = role_id
+
+        self.logger.info(
+            "EffectivePermissions: loaded %d users, %d groups, %d roles "
+            "and %d permissions on %d resources in %.3fs" % (
+                len(users), len(groups), len(roles), count, size,
+                time.time() - start
+            )
+        )
+
+        return {
+            'users': users,
+            'groups': groups,
+            'roles': roles,
+            'public_role_id': public_role_id,
+            'resources': resources,
+            'resource_ids': resource_ids,
+            'user_roles': user_roles,
+            'group_roles': group_roles,
+            'user_groups': user_groups,
+            'role_bitsets': role_bitsets,
+            'resource_permissions': resource_permissions,
+            # resolved user permissions as {<user ID>: (<read>, <write>)}
+            'user_cache': TTLCache(self.USER_CACHE_SIZE, float('inf')),
+            'version_key': version_key,
+            'built_at': time.time()
+        }
+
+    def relations(self, conn, table, source, target):
+        """Return link table rows as {<source ID>: set(<target ID>)}.
+
+        :param Connection conn: DB connection to ConfigDB
+        :param Table table: IAM link table
+        :param str source: Referenced table of source column
+        :param str target: Referenced table of target column
+        """
+        source_col = self.fk_column(table, source)
+        target_col = self.fk_column(table, target)
+        relations = {}
+        for source_id, target_id in conn.execute(
+            select([source_col, target_col])
+        ):
+            relations.setdefault(source_id, set()).add(target_id)
+
+        return relations
+
+    def fk_column(self, table, target):
+        """Return column of an IAM link table referencing a table.
+
+        :param Table table: IAM link table
+        :param str target: Referenced table in schema 'iam'
+        """
+        for column in table.columns:
+            for fk in column.foreign_keys:
+                if fk.target_fullname.startswith('iam.%s.' % target):
+                    return column
+
+        raise Exception(
+            "No foreign key to iam.%s in %s" % (target, table.fullname)
+        )
+
+    def bitset(self, positions, size):
+        """Return bitset with bits set at positions.
+
+        NOTE: bits are set in a bytearray, as repeated int operations would
+              copy the whole bitset for each bit
+
+        :param list[int] positions: Bit positions
+        :param int size: Number of bits
+        """
+        data = bytearray((size + 7) // 8)
+        for pos in positions:
+            data[pos >> 3] |= 1 << (pos & 7)
+        return int.from_bytes(bytes(data), 'little')
+
+    def bit_positions(self, bits):
+        """Return positions of set bits.
+
+        :param int bits: Bitset
+        """
+        positions = []
+        data = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+        for byte_pos, byte in enumerate(data):
+            if byte:
+                for bit in range(8):
+                    if byte & (1 << bit):
+                        positions.append((byte_pos << 3) + bit)
+        return positions
+
+    def user_role_ids(self, index, user_id):
+        """Return IDs of direct, group and public roles of a user.
+
+        :param obj index: Permissions index
+        :param int user_id: User ID
+        """
+        role_ids = set(index['user_roles'].get(user_id, ()))
+        for group_id in index['user_groups'].get(user_id, ()):
+            role_ids.update(index['group_roles'].get(group_id, ()))
+        if index['public_role_id'] is not None:
+            role_ids.add(index['public_role_id'])
+        return role_ids
+
+    def resolve(self, index, role_ids):
+        """Return bitsets of readable and writable resources for roles.
+
+        Permissions with higher priority override those with lower
+        priority for the same resource.
+
+        :param obj index: Permissions index
+        :param set[int] role_ids: Role IDs
+        """
+        # collect bitsets of all roles by priority
+        priorities = {}
+        for role_id in role_ids:
+            for priority, read, write in index['role_bitsets'].get(
+                role_id, ()
+            ):
+                entry = priorities.setdefault(priority, [0, 0])
+                entry[0] |= read
+                entry[1] |= write
+
+        read = 0
+        write = 0
+        for priority in sorted(priorities, reverse=True):
+            priority_read, priority_write = priorities[priority]
+            # NOTE: only resources not covered by higher priorities
+            write |= priority_write & ~read
+            read |= priority_read
+
+        return read, write
+
+    def user_permissions(self, user_id):
+        """Return effective permissions of a user as
+        {
+            'user': {'id': <ID>, 'name': <name>},
+            'roles': [{'id': <ID>, 'name': <name>}],
+            'groups': [{'id': <ID>, 'name': <name>}],
+            'resources': [{
+                'gdi_oid': <ID>, 'table_name': <table>, 'name': <name>,
+                'write': <bool>
+            }]
+        }
+        or None if the user is unknown.
+
+        :param int user_id: User ID
+        """
+        index = self.index()
+        if user_id not in index['users']:
+            return None
+
+        bitsets = index['user_cache'].get(user_id)
+        if bitsets is None:
+            bitsets = self.resolve(index, self.user_role_ids(index, user_id))
+            index['user_cache'].set(user_id, bitsets)
+        read, write = bitsets
+
+        resources = []
+        for pos in self.bit_positions(read):
+            gdi_oid = index['resource_ids'][pos]
+            position, table_name, name = index['resources'][gdi_oid]
+            resources.append({
+                'gdi_oid': gdi_oid,
+                'table_name': table_name,
+                'name': name,
+                'write': bool(write >> pos & 1)
+            })
+
+        return {
+            'user': {'id': user_id, 'name': index['users'][user_id]},
+            'roles': self.named(
+                index['roles'], self.user_role_ids(index, user_id)
+            ),
+            'groups': self.named(
+                index['groups'], index['user_groups'].get(user_id, ())
+            ),
+            'resources': resources
+        }
+
+    def resource_principals(self, gdi_oid):
+        """Return roles, groups and users with permissions on a resource as
+        {
+            'resource': {'gdi_oid': <ID>, 'table_name': <table>,
+                         'name': <name>},
+            'public': <None or {'write': <bool>}>,
+            'roles': [{'id', 'name', 'write', 'priority'}],
+            'groups': [{'id', 'name', 'roles': [<role name>]}],
+            'users': [{'id', 'name', 'write'}]
+        }
+        or None if the resource is unknown.
+
+        NOTE: users only permitted by the public role are not listed
+
+        :param int gdi_oid: GDI resource ID
+        """
+        index = self.index()
+        resource = index['resources'].get(gdi_oid)
+        if resource is None:
+            return None
+
+        permissions = index['resource_permissions'].get(gdi_oid, [])
+        permitted_roles = {}
+        for role_id, write, priority in permissions:
+            permitted_roles.setdefault(role_id, []).append((priority, write))
+
+        public = None
+        public_role_id = index['public_role_id']
+        if public_role_id in permitted_roles:
+            public = {
+                'write': self.effective_write(
+                    permitted_roles, set([public_role_id])
+                )
+            }
+
+        # groups with permitted roles
+        groups = []
+        permitted_groups = set()
+        for group_id, role_ids in index['group_roles'].items():
+            matching = role_ids & permitted_roles.keys()
+            if matching:
+                permitted_groups.add(group_id)
+                groups.append({
+                    'id': group_id,
+                    'name': index['groups'].get(group_id),
+                    'roles': sorted(
+                        index['roles'].get(role_id) for role_id in matching
+                    )
+                })
+
+        # users with permitted roles, directly or by group
+        candidates = set(
+            user_id for user_id, role_ids in index['user_roles'].items()
+            if role_ids & permitted_roles.keys()
+        )
+        for user_id, group_ids in index['user_groups'].items():
+            if group_ids & permitted_groups:
+                candidates.add(user_id)
+        users = []
+        for user_id in candidates:
+            users.append({
+                'id': user_id,
+                'name': index['users'].get(user_id),
+                'write': self.effective_write(
+                    permitted_roles, self.user_role_ids(index, user_id)
+                )
+            })
+
+        return {
+            'resource': {
+                'gdi_oid': gdi_oid,
+                'table_name': resource[1],
+                'name': resource[2]
+            },
+            'public': public,
+            'roles': sorted([
+                {
+                    'id': role_id,
+                    'name': index['roles'].get(role_id),
+                    'write': write,
+                    'priority': priority
+                }
+                for role_id, write, priority in permissions
+            ], key=lambda r: (r['name'] or '', r['priority'])),
+            'groups': sorted(groups, key=lambda g: g['name'] or ''),
+            'users': sorted(users, key=lambda u: u['name'] or '')
+        }
+
+    def effective_write(self, permitted_roles, role_ids):
+        """Return whether a resource is writable for roles, from the
+        permissions with the highest priority among these roles.
+
+        :param obj permitted_roles: Permissions of resource as
+                                    {<role ID>: [(<priority>, <write>)]}
+        :param set[int] role_ids: Role IDs
+        """
+        max_priority = None
+        write = False
+        for role_id in role_ids:
+            for priority, role_write in permitted_roles.get(role_id, ()):
+                if max_priority is None or priority > max_priority:
+                    max_priority = priority
+                    write = role_write
+                elif priority == max_priority:
+                    write = write or role_write
+        return write
+
+    def named(self, names, ids):
+        """Return entries sorted by name as [{'id': <ID>, 'name': <name>}].
+
+        :param obj names: Lookup for names by ID
+        :param list[int] ids: IDs
+        """
+        return sorted(
+            [{'id': id, 'name': names.get(id)} for id in ids],
+            key=lambda entry: entry['name'] or ''
+        )
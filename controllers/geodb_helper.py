@@ -0,0 +1,77 @@
+class GeoDBHelper:
+    """Helper class for connections to data_source DBs
+
+    Apply connection pool options and timeouts from service config and
+    provide clear error messages for failed queries.
+    """
+
+    # default timeouts for data_source DBs
+    # (connect_timeout in s, statement_timeout and lock_timeout in ms)
+    DEFAULT_TIMEOUTS = {
+        'connect_timeout': 5,
+        'statement_timeout': 15000,
+        'lock_timeout': 5000
+    }
+
+    def __init__(self, db_engine, service_config):
+        """Constructor
+
+        :param DatabaseEngine db_engine: Database engine with DB connections
+        :param func service_config: Helper method for reading service config
+        """
+        self.db_engine = db_engine
+        self.service_config = service_config
+
+    def engine(self, data_source):
+        """Return SQLAlchemy engine for a data_source.
+
+        :param object data_source: data_source object
+        """
+        return self.db_engine.db_engine(
+            data_source.connection,
+            engine_options=self.engine_options(data_source)
+        )
+
+    def engine_options(self, data_source):
+        """Return connection pool options and timeouts for a data_source
+        from service config.
+
+        :param object data_source: data_source object
+        """
+        config = self.service_config()
+        # default timeouts for introspection queries
+        engine_options = dict(self.DEFAULT_TIMEOUTS)
+        # default options for all data sources
+        engine_options.update(config.get('geodb_options', {}))
+        # any options for this data source
+        engine_options.update(
+            config.get('data_source_options', {}).get(data_source.name, {})
+        )
+        return engine_options
+
+    def error_message(self, e):
+        """Return error message for an OperationalError from a data_source,
+        with a clear message for any timeouts.
+
+        :param OperationalError e: Database error
+        """
+        pgcode = getattr(e.orig, 'pgcode', None)
+        if pgcode == '57014':
+            # query_canceled
+            return (
+                "Zeitüberschreitung: Abfrage wurde nach Ablauf von "
+                "statement_timeout abgebrochen"
+            )
+        elif pgcode == '55P03':
+            # lock_not_available
+            return (
+                "Zeitüberschreitung: Tabelle ist gesperrt "
+                "(lock_timeout abgelaufen)"
+            )
+        elif 'timeout expired' in str(e.orig):
+            return (
+                "Zeitüberschreitung: Keine Verbindung zur Datenbank "
+                "(connect_timeout abgelaufen)"
+            )
+        else:
+            return "OperationalError: %s" % e.orig
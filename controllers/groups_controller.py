@@ -1,22 +1,28 @@
 from .controller import Controller
 from forms import GroupForm
+from service_lib.tenant_config_models import TenantModel
 
 
 class GroupsController(Controller):
     """Controller for group model"""
 
-    def __init__(self, app, config_models):
+    # ConfigDB models of current tenant
+    Group = TenantModel('group')
+    User = TenantModel('user')
+    Role = TenantModel('role')
+
+    def __init__(self, app, config_models, data_versions, name_registry):
         """Constructor
 
         :param Flask app: Flask application
         :param ConfigModels config_models: Helper for ORM models
+        :param DataVersions data_versions: Change counters of ConfigDB tables
+        :param NameRegistry name_registry: Registry of resource names
         """
         super(GroupsController, self).__init__(
-            "Gruppe", 'groups', 'group', 'groups', app, config_models
+            "Gruppe", 'groups', 'group', 'groups', app, config_models,
+            data_versions, name_registry
         )
-        self.Group = self.config_models.model('group')
-        self.User = self.config_models.model('user')
-        self.Role = self.config_models.model('role')
 
     def resources_for_index(self, session):
         """Return groups list.
@@ -78,7 +84,7 @@ class GroupsController(Controller):
         :param object resource: Optional group object
         :param bool edit_form: Set if edit form
         """
-        form = GroupForm(self.config_models, obj=resource)
+        form = GroupForm(self.config_models, self.name_registry, obj=resource)
 
         session = self.session()
         self.update_form_users(resource, edit_form, form, session)
@@ -0,0 +1,504 @@
+import csv
+import time
+
+from flask import json
+from sqlalchemy.sql import select
+from sqlalchemy.sql import text as sql_text
+
+
+class IAMSyncHelper:
+    """Helper class for syncing users and groups from a roster
+
+    A roster lists users with their groups and roles, and optionally groups
+    with their roles, as CSV or JSON. The current IAM tables are loaded in
+    one query per table and compared with the roster in memory. The minimal
+    changes are written with one set-based statement per table and change
+    type (using unnest() of arrays), all in a single transaction.
+
+    Memberships and roles of users in the roster, and roles of groups in the
+    roster, are replaced by those in the roster. Groups referenced by users
+    are created if missing. Roles are never created and must exist.
+
+    CSV columns: name, description, groups, roles
+    (groups and roles separated by LIST_SEPARATOR)
+
+    JSON:
+        {
+            "users": [{"name": <str>, "description": <str>,
+                       "groups": [<str>], "roles": [<str>]}],
+            "groups": [{"name": <str>, "description": <str>,
+                        "roles": [<str>]}]
+        }
+    """
+
+    # separator for groups and roles in CSV
+    LIST_SEPARATOR = ';'
+
+    # max number of listed changes per type in report
+    MAX_REPORT_ENTRIES = 100
+
+    # link tables as (<table>, <source table>, <target table>)
+    LINKS = [
+        ('group_user', 'group', 'user'),
+        ('user_role', 'user', 'role'),
+        ('group_role', 'group', 'role')
+    ]
+
+    def __init__(self, config_models, logger):
+        """Constructor
+
+        :param TenantConfigModels config_models: Helper for ORM models
+        :param Logger logger: Application logger
+        """
+        self.config_models = config_models
+        self.logger = logger
+
+    def sync(self, roster, fmt, dry_run=True, delete_users=False):
+        """Sync IAM tables with roster and return report as
+        {
+            'errors': [<error message>],
+            'changes': {
+                <change type>: {'count': <int>, 'entries': [<entry>]}
+            },
+            'users': <number of users in roster>,
+            'applied': <True if changes were written>,
+            'duration': <s>,
+            'users_per_second': <roster users per second>
+        }
+
+        NOTE: nothing is written if there are any errors
+
+        :param file roster: Roster file
+        :param str fmt: Roster format ('csv' or 'json')
+        :param bool dry_run: Only compare with IAM tables if set
+        :param bool delete_users: Set to delete users missing in roster
+        """
+        start = time.time()
+        errors = []
+        if fmt == 'json':
+            users, groups = self.parse_json(roster, errors)
+        else:
+            users, groups = self.parse_csv(roster, errors)
+
+        conn = self.config_models.engine.connect()
+        try:
+            current = self.load(conn)
+            changes = self.diff(users, groups, current, delete_users, errors)
+
+            applied = False
+            if not errors and not dry_run:
+                with conn.begin():
+                    self.apply(conn, changes)
+                applied = True
+        finally:
+            conn.close()
+
+        duration = time.time() - start
+        if duration > 0:
+            users_per_second = int(len(users) / duration)
+        else:
+            users_per_second = len(users)
+
+        return {
+            'errors': errors,
+            'changes': {
+                change_type: {
+                    'count': len(entries),
+                    'entries': sorted(entries)[:self.MAX_REPORT_ENTRIES]
+                }
+                for change_type, entries in changes.items()
+            },
+            'users': len(users),
+            'applied': applied,
+            'duration': round(duration, 3),
+            'users_per_second': users_per_second
+        }
+
+    # roster
+
+    def parse_csv(self, roster, errors):
+        """Return users and groups from CSV roster.
+
+        :param file roster: CSV file with header
+        :param list[str] errors: Errors to update
+        """
+        users = {}
+        reader = csv.DictReader(roster)
+        if 'name' not in (reader.fieldnames or []):
+            errors.append("CSV: Spalte 'name' fehlt")
+            return users, {}
+
+        for row in reader:
+            self.add_user(users, {
+                'name': row.get('name'),
+                'description': row.get('description'),
+                'groups': self.split_list(row.get('groups')),
+                'roles': self.split_list(row.get('roles'))
+            }, "Zeile %d" % reader.line_num, errors)
+
+        return users, {}
+
+    def parse_json(self, roster, errors):
+        """Return users and groups from JSON roster.
+
+        :param file roster: JSON file
+        :param list[str] errors: Errors to update
+        """
+        users = {}
+        groups = {}
+        try:
+            data = json.load(roster)
+        except ValueError as e:
+            errors.append("Ungültiges JSON: %s" % e)
+            return users, groups
+        if not isinstance(data, dict):
+            errors.append("JSON: Objekt mit 'users' und 'groups' erwartet")
+            return users, groups
+
+        for i, user in enumerate(data.get('users') or []):
+            if not isinstance(user, dict):
+                errors.append("users[%d]: Objekt erwartet" % i)
+                continue
+            self.add_user(users, user, "users[%d]" % i, errors)
+
+        for i, group in enumerate(data.get('groups') or []):
+            label = "groups[%d]" % i
+            name = (group.get('name') or '').strip() \
+                if isinstance(group, dict) else None
+            if not name:
+                errors.append("%s: Name fehlt" % label)
+                continue
+            if name in groups:
+                errors.append("%s: Gruppe '%s' doppelt" % (label, name))
+                continue
+            groups[name] = {
+                'description': group.get('description') or '',
+                'roles': self.name_set(group.get('roles'), label, errors)
+            }
+
+        return users, groups
+
+    def add_user(self, users, user, label, errors):
+        """Add roster user.
+
+        :param obj users: Roster users as {<name>: <user>}
+        :param obj user: User entry
+        :param str label: Roster position for errors
+        :param list[str] errors: Errors to update
+        """
+        name = (user.get('name') or '').strip()
+        if not name:
+            errors.append("%s: Name fehlt" % label)
+            return
+        if name in users:
+            errors.append("%s: Benutzer '%s' doppelt" % (label, name))
+            return
+
+        users[name] = {
+            'description': user.get('description') or '',
+            'groups': self.name_set(user.get('groups'), label, errors),
+            'roles': self.name_set(user.get('roles'), label, errors)
+        }
+
+    def split_list(self, value):
+        """Return list from CSV list value.
+
+        :param str value: Values separated by LIST_SEPARATOR
+        """
+        return [
+            part.strip() for part in (value or '').split(self.LIST_SEPARATOR)
+            if part.strip()
+        ]
+
+    def name_set(self, names, label, errors):
+        """Return set of names from roster list.
+
+        :param list[str] names: Names
+        :param str label: Roster position for errors
+        :param list[str] errors: Errors to update
+        """
+        if names is None:
+            return set()
+        if not isinstance(names, list) or not all(
+            isinstance(name, str) for name in names
+        ):
+            errors.append("%s: Liste von Namen erwartet" % label)
+            return set()
+        return set(name.strip() for name in names if name.strip())
+
+    # diff
+
+    def load(self, conn):
+        """Load IAM tables as
+        {
+            'users': {<name>: <description>},
+            'groups': {<name>: <description>},
+            'roles': set(<name>),
+            'group_user': set((<group>, <user>)),
+            'user_role': set((<user>, <role>)),
+            'group_role': set((<group>, <role>)),
+            'duplicates': [<error message>]
+        }
+
+        :param Connection conn: DB connection to ConfigDB
+        """
+        tables = self.tables()
+        current = {'duplicates': []}
+        for key in ['user', 'group', 'role']:
+            table = tables[key]
+            names = {}
+            for name, description in conn.execute(
+                select([table.c.name, table.c.description])
+            ):
+                if name in names:
+                    current['duplicates'].append(
+                        "%s '%s' in ConfigDB doppelt" % (key, name)
+                    )
+                names[name] = description
+            current['%ss' % key] = names
+        current['roles'] = set(current['roles'].keys())
+
+        for key, source, target in self.LINKS:
+            table = tables[key]
+            source_table = tables[source]
+            target_table = tables[target]
+            query = select([source_table.c.name, target_table.c.name]) \
+                .select_from(
+                    table.join(
+                        source_table,
+                        self.fk_column(table, source) == source_table.c.id
+                    ).join(
+                        target_table,
+                        self.fk_column(table, target) == target_table.c.id
+                    )
+                )
+            current[key] = set(tuple(row) for row in conn.execute(query))
+
+        return current
+
+    def diff(self, users, groups, current, delete_users, errors):
+        """Return changes as {<change type>: [<entry>]}.
+
+        :param obj users: Roster users
+        :param obj groups: Roster groups
+        :param obj current: Current IAM tables
+        :param bool delete_users: Set to delete users missing in roster
+        :param list[str] errors: Errors to update
+        """
+        errors += current['duplicates']
+
+        # groups referenced by users
+        all_groups = dict(
+            (name, current['groups'].get(name, ''))
+            for user in users.values() for name in user['groups']
+        )
+        all_groups.update({
+            name: group['description'] for name, group in groups.items()
+        })
+
+        # unknown roles
+        referenced_roles = set()
+        for entry in list(users.values()) + list(groups.values()):
+            referenced_roles |= entry['roles']
+        for role in sorted(referenced_roles - current['roles']):
+            errors.append("Rolle '%s' nicht vorhanden" % role)
+
+        changes = {
+            'create_users': [
+                (name, user['description']) for name, user in users.items()
+                if name not in current['users']
+            ],
+            'update_users': [
+                (name, user['description']) for name, user in users.items()
+                if name in current['users'] and
+                current['users'][name] != user['description']
+            ],
+            'delete_users': [],
+            'create_groups': [
+                (name, description)
+                for name, description in all_groups.items()
+                if name not in current['groups']
+            ],
+            'update_groups': [
+                (name, group['description'])
+                for name, group in groups.items()
+                if name in current['groups'] and
+                current['groups'][name] != group['description']
+            ]
+        }
+        if delete_users:
+            changes['delete_users'] = [
+                (name,) for name in current['users'] if name not in users
+            ]
+        deleted = set(entry[0] for entry in changes['delete_users'])
+
+        # desired memberships of roster users and roles of roster groups
+        desired = {
+            'group_user': set(
+                (group, name) for name, user in users.items()
+                for group in user['groups']
+            ),
+            'user_role': set(
+                (name, role) for name, user in users.items()
+                for role in user['roles']
+            ),
+            'group_role': set(
+                (name, role) for name, group in groups.items()
+                for role in group['roles']
+            )
+        }
+        # managed existing links
+        managed = {
+            'group_user': set(
+                link for link in current['group_user']
+                if link[1] in users or link[1] in deleted
+            ),
+            'user_role': set(
+                link for link in current['user_role']
+                if link[0] in users or link[0] in deleted
+            ),
+            'group_role': set(
+                link for link in current['group_role'] if link[0] in groups
+            )
+        }
+        for key, source, target in self.LINKS:
+            changes['add_%s' % key] = list(desired[key] - current[key])
+            changes['remove_%s' % key] = list(managed[key] - desired[key])
+
+        return changes
+
+    # apply
+
+    def apply(self, conn, changes):
+        """Write changes with set-based statements.
+
+        NOTE: links are removed before users are deleted and added after
+              users and groups are created
+
+        :param Connection conn: DB connection to ConfigDB in transaction
+        :param obj changes: Changes from diff()
+        """
+        tables = self.tables()
+        for key, source, target in self.LINKS:
+            self.remove_links(
+                conn, tables, key, source, target,
+                changes['remove_%s' % key]
+            )
+
+        if changes['delete_users']:
+            conn.execute(sql_text("""
+                DELETE FROM iam."user" WHERE name = ANY(:names);
+            """), names=[entry[0] for entry in changes['delete_users']])
+
+        for key in ['user', 'group']:
+            table = '"%s"' % key
+            created = changes['create_%ss' % key]
+            if created:
+                conn.execute(sql_text("""
+                    INSERT INTO iam.%s (name, description)
+                    SELECT * FROM unnest(
+                        CAST(:names AS text[]), CAST(:descriptions AS text[])
+                    );
+                """ % table), names=[entry[0] for entry in created],
+                    descriptions=[entry[1] for entry in created])
+            updated = changes['update_%ss' % key]
+            if updated:
+                conn.execute(sql_text("""
+                    UPDATE iam.%s r SET description = t.description
+                    FROM unnest(
+                        CAST(:names AS text[]), CAST(:descriptions AS text[])
+                    ) AS t(name, description)
+                    WHERE r.name = t.name;
+                """ % table), names=[entry[0] for entry in updated],
+                    descriptions=[entry[1] for entry in updated])
+
+        for key, source, target in self.LINKS:
+            self.add_links(
+                conn, tables, key, source, target, changes['add_%s' % key]
+            )
+
+    def add_links(self, conn, tables, key, source, target, links):
+        """Insert links by names.
+
+        :param Connection conn: DB connection to ConfigDB in transaction
+        :param obj tables: IAM tables
+        :param str key: Link table
+        :param str source: Source table
+        :param str target: Target table
+        :param list[(str, str)] links: Links as (<source name>, <target name>)
+        """
+        if not links:
+            return
+
+        table = tables[key]
+        conn.execute(sql_text("""
+            INSERT INTO iam.%(table)s ("%(source_col)s", "%(target_col)s")
+            SELECT s.id, t.id
+            FROM unnest(CAST(:sources AS text[]), CAST(:targets AS text[]))
+                    AS l(source, target)
+                JOIN iam."%(source)s" s ON s.name = l.source
+                JOIN iam."%(target)s" t ON t.name = l.target;
+        """ % {
+            'table': key,
+            'source_col': self.fk_column(table, source).name,
+            'target_col': self.fk_column(table, target).name,
+            'source': source,
+            'target': target
+        }), sources=[link[0] for link in links],
+            targets=[link[1] for link in links])
+
+    def remove_links(self, conn, tables, key, source, target, links):
+        """Delete links by names.
+
+        :param Connection conn: DB connection to ConfigDB in transaction
+        :param obj tables: IAM tables
+        :param str key: Link table
+        :param str source: Source table
+        :param str target: Target table
+        :param list[(str, str)] links: Links as (<source name>, <target name>)
+        """
+        if not links:
+            return
+
+        table = tables[key]
+        conn.execute(sql_text("""
+            DELETE FROM iam.%(table)s x
+            USING unnest(CAST(:sources AS text[]), CAST(:targets AS text[]))
+                    AS l(source, target),
+                iam."%(source)s" s, iam."%(target)s" t
+            WHERE s.name = l.source AND t.name = l.target
+                AND x."%(source_col)s" = s.id AND x."%(target_col)s" = t.id;
+        """ % {
+            'table': key,
+            'source_col': self.fk_column(table, source).name,
+            'target_col': self.fk_column(table, target).name,
+            'source': source,
+            'target': target
+        }), sources=[link[0] for link in links],
+            targets=[link[1] for link in links])
+
+    def tables(self):
+        """Return reflected IAM tables as lookup by name."""
+        metadata = self.config_models.base.metadata
+        return {
+            name: metadata.tables['iam.%s' % name]
+            for name in [
+                'user', 'group', 'role', 'group_user', 'user_role',
+                'group_role'
+            ]
+        }
+
+    def fk_column(self, table, target):
+        """Return column of an IAM link table referencing a table.
+
+        :param Table table: IAM link table
+        :param str target: Referenced table in schema 'iam'
+        """
+        for column in table.columns:
+            for fk in column.foreign_keys:
+                if fk.target_fullname.startswith('iam.%s.' % target):
+                    return column
+
+        raise Exception(
+            "No foreign key to iam.%s in %s" % (target, table.fullname)
+        )
@@ -0,0 +1,106 @@
+import time
+
+from flask import abort, jsonify, request, url_for
+
+from .dependency_graph_helper import DependencyGraphHelper
+
+
+class ImpactController:
+    """Controller for impact analysis
+
+    Show resources depending on a GDI resource and the resources it depends
+    on, e.g. before deleting or changing a DataSet.
+    """
+
+    # default and max number of resources per direction
+    DEFAULT_RESULTS = 200
+    MAX_RESULTS = 5000
+
+    # edit endpoints by resource table
+    EDIT_ENDPOINTS = {
+        'data_source': 'edit_data_source',
+        'data_set_view': 'edit_data_set',
+        'ows_layer_group': 'edit_product_set',
+        'background_layer': 'edit_background_layer',
+        'map': 'edit_map',
+        'template': 'edit_template',
+        'template_jasper': 'edit_template',
+        'template_qgis': 'edit_template',
+        'template_info': 'edit_template',
+        'service': 'edit_service',
+        'module': 'edit_module',
+        'transformation': 'edit_transformation'
+    }
+
+    def __init__(self, app, config_models, data_versions):
+        """Constructor
+
+        :param Flask app: Flask application
+        :param TenantConfigModels config_models: Helper for ORM models
+        :param DataVersions data_versions: Change counters of ConfigDB tables
+        """
+        self.resource_name = "Abhängigkeiten"
+        self.base_route = 'impact'
+        self.logger = app.logger
+        self.DependencyGraphHelper = DependencyGraphHelper(
+            config_models, data_versions, app.logger
+        )
+
+        # add custom routes
+        base_route = self.base_route
+        # dependencies of resource
+        app.add_url_rule(
+            '/%s/<int:gdi_oid>' % base_route, base_route, self.impact,
+            methods=['GET']
+        )
+
+    def impact(self, gdi_oid):
+        """Return resources depending on a GDI resource ('used_by') and
+        resources it depends on ('uses'), transitively, as JSON.
+
+        URL params:
+            limit: Optional max number of resources per direction
+
+        :param int gdi_oid: Resource ID
+        """
+        start = time.time()
+        try:
+            limit = int(request.args.get('limit', self.DEFAULT_RESULTS))
+        except ValueError:
+            abort(400)
+        limit = max(1, min(limit, self.MAX_RESULTS))
+
+        graph = self.DependencyGraphHelper.graph()
+        impact = self.DependencyGraphHelper.impact(graph, gdi_oid, limit)
+        if impact is None:
+            abort(404)
+
+        for resource in [impact['resource']] + impact['uses'] + \
+                impact['used_by']:
+            resource['url'] = self.resource_url(graph, resource)
+
+        impact['duration'] = round(time.time() - start, 3)
+        return jsonify(impact)
+
+    def resource_url(self, graph, resource):
+        """Return URL of edit form for a resource, or None.
+
+        :param obj graph: Dependency graph
+        :param obj resource: Resource entry
+        """
+        gdi_oid = resource['gdi_oid']
+        table_name = resource['table_name']
+        if table_name == 'ows_layer_data':
+            # NOTE: data layers are edited with their DataSet
+            gdi_oid = self.DependencyGraphHelper.related(
+                graph, gdi_oid, 'data_set_view'
+            )
+            table_name = 'data_set_view'
+        elif table_name == 'wms_wfs':
+            return url_for('wms_wfs')
+
+        endpoint = self.EDIT_ENDPOINTS.get(table_name)
+        if endpoint is None or gdi_oid is None:
+            return None
+
+        return url_for(endpoint, id=gdi_oid)
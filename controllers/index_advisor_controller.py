@@ -0,0 +1,321 @@
+from collections import OrderedDict
+
+from flask import jsonify, render_template, request
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import contains_eager
+
+from .geodb_helper import GeoDBHelper
+from .table_stats_helper import TableStatsHelper
+from service_lib.tenant_config_models import TenantModel
+
+
+class IndexAdvisorController:
+    """Controller for Index advisor
+
+    Check tables of vector DataSets for missing spatial indexes, missing
+    primary keys, non-indexed feature ID columns and stale statistics.
+    """
+
+    # statistics are stale if modified rows since last ANALYZE exceed
+    # STALE_STATS_MIN_ROWS + STALE_STATS_RATIO * <estimated rows>
+    STALE_STATS_MIN_ROWS = 1000
+    STALE_STATS_RATIO = 0.2
+
+    # issue severities
+    SEVERITY_ERROR = 'error'
+    SEVERITY_WARNING = 'warning'
+
+    # ConfigDB models of current tenant
+    DataSetView = TenantModel('data_set_view')
+    DataSet = TenantModel('data_set')
+    DataSource = TenantModel('data_source')
+
+    def __init__(self, app, config_models, db_engine, service_config):
+        """Constructor
+
+        :param Flask app: Flask application
+        :param ConfigModels config_models: Helper for ORM models
+        :param DatabaseEngine db_engine: Database engine with DB connections
+        :param func service_config: Helper method for reading service config
+        """
+        self.resource_name = "Index-Analyse"
+        self.base_route = 'index_advisor'
+        self.templates_dir = 'index_advisor'
+        self.logger = app.logger
+        self.config_models = config_models
+        self.GeoDBHelper = GeoDBHelper(db_engine, service_config)
+        self.TableStatsHelper = TableStatsHelper(app.logger)
+
+        # add custom routes
+        base_route = self.base_route
+        # report page
+        app.add_url_rule(
+            '/%s' % base_route, base_route, self.index, methods=['GET']
+        )
+        # JSON report
+        app.add_url_rule(
+            '/%s/report' % base_route, '%s_report' % base_route,
+            self.json_report, methods=['GET']
+        )
+
+    def index(self):
+        """Show report of DataSets with issues."""
+        report = self.report(request.args.get('data_source_id'))
+        return render_template(
+            '%s/index.html' % self.templates_dir, title=self.resource_name,
+            report=report
+        )
+
+    def json_report(self):
+        """Return report for all vector DataSets as JSON.
+
+        URL params:
+            data_source_id: Optional data_source ID filter
+        """
+        return jsonify(self.report(request.args.get('data_source_id')))
+
+    def report(self, data_source_id=None):
+        """Check tables of vector DataSets, grouped by data_source, and
+        return report as
+        {
+            'data_sources': [{
+                'id': <data_source ID>,
+                'name': <data_source name>,
+                'error': <error message if check failed>,
+                'data_sets': [{
+                    'id': <DataSet ID>,
+                    'name': <DataSet name>,
+                    'table': <"<schema>.<table>">,
+                    'relkind': <pg_class.relkind or None if not found>,
+                    'rows': <estimated row count or None if unknown>,
+                    'issues': [{
+                        'type': <issue type>,
+                        'severity': <'error' or 'warning'>,
+                        'message': <message>,
+                        'sql': <optional SQL for fixing issue>
+                    }]
+                }]
+            }],
+            'data_sets': <number of checked DataSets>,
+            'issues': <total number of issues>
+        }
+
+        :param int data_source_id: Optional data_source ID filter
+        """
+        # collect vector DataSets grouped by data_source
+        session = self.config_models.session()
+        query = session.query(self.DataSetView) \
+            .join(self.DataSetView.data_set) \
+            .join(self.DataSet.data_source) \
+            .filter(self.DataSource.connection_type == 'database') \
+            .options(
+                contains_eager(self.DataSetView.data_set)
+                .contains_eager(self.DataSet.data_source)
+            ) \
+            .order_by(self.DataSource.name, self.DataSetView.name)
+        if data_source_id:
+            query = query.filter(
+                self.DataSet.gdi_oid_data_source == data_source_id
+            )
+
+        data_sources = OrderedDict()
+        for data_set_view in query.all():
+            data_source = data_set_view.data_set.data_source
+            if data_source.gdi_oid not in data_sources:
+                data_sources[data_source.gdi_oid] = {
+                    'data_source': data_source,
+                    'data_sets': []
+                }
+            data_sources[data_source.gdi_oid]['data_sets'].append({
+                'id': data_set_view.gdi_oid,
+                'name': data_set_view.name,
+                'table': data_set_view.data_set.data_set_name,
+                'primary_key': data_set_view.data_set.primary_key,
+                'geometry_column': data_set_view.geometry_column,
+                'feature_id_column': data_set_view.feature_id_column
+            })
+        session.close()
+
+        report = {
+            'data_sources': [],
+            'data_sets': 0,
+            'issues': 0
+        }
+        for entry in data_sources.values():
+            data_source = entry['data_source']
+            data_source_report = {
+                'id': data_source.gdi_oid,
+                'name': data_source.name,
+                'data_sets': []
+            }
+            try:
+                data_source_report['data_sets'] = self.check_data_sets(
+                    data_source, entry['data_sets']
+                )
+            except OperationalError as e:
+                # NOTE: skip failed data_source and continue with remaining
+                #       data_sources
+                self.logger.error(e.orig)
+                data_source_report['error'] = \
+                    self.GeoDBHelper.error_message(e)
+            except ProgrammingError as e:
+                self.logger.error(e.orig)
+                data_source_report['error'] = "ProgrammingError: %s" % e.orig
+
+            report['data_sources'].append(data_source_report)
+            report['data_sets'] += len(data_source_report['data_sets'])
+            report['issues'] += sum(
+                len(data_set['issues'])
+                for data_set in data_source_report['data_sets']
+            )
+
+        return report
+
+    def check_data_sets(self, data_source, data_sets):
+        """Check tables of DataSets of a data_source and return DataSets
+        with their issues.
+
+        :param object data_source: data_source object
+        :param list[obj] data_sets: DataSets of this data_source
+        """
+        # parse schema and table names
+        tables = OrderedDict()
+        for data_set in data_sets:
+            parts = (data_set['table'] or '').split('.', 1)
+            if len(parts) > 1:
+                tables[data_set['table']] = (parts[0], parts[1])
+            else:
+                tables[data_set['table']] = ('public', parts[0])
+
+        engine = self.GeoDBHelper.engine(data_source)
+        with engine.connect() as conn:
+            table_infos = self.TableStatsHelper.table_infos(
+                conn, list(tables.values())
+            )
+
+        results = []
+        for data_set in data_sets:
+            schema, table_name = tables[data_set['table']]
+            table_info = table_infos.get((schema, table_name))
+            results.append({
+                'id': data_set['id'],
+                'name': data_set['name'],
+                'table': "%s.%s" % (schema, table_name),
+                'relkind': table_info['relkind'] if table_info else None,
+                'rows': table_info['rows'] if table_info else None,
+                'issues': self.check_data_set(
+                    data_set, schema, table_name, table_info
+                )
+            })
+
+        return results
+
+    def check_data_set(self, data_set, schema, table_name, table_info):
+        """Return issues of a DataSet table.
+
+        :param obj data_set: DataSet info
+        :param str schema: DB schema name
+        :param str table_name: DB table name
+        :param obj table_info: Catalog info for table or None if not found
+        """
+        issues = []
+        table = '"%s"."%s"' % (schema, table_name)
+
+        if table_info is None:
+            issues.append(self.issue(
+                'missing_table', self.SEVERITY_ERROR,
+                "Tabelle %s.%s nicht gefunden" % (schema, table_name)
+            ))
+            return issues
+
+        # NOTE: indexes and statistics are only available for tables,
+        #       materialized views and partitioned tables
+        indexable = table_info['relkind'] in ['r', 'm', 'p']
+
+        # primary key
+        primary_key = data_set['primary_key']
+        if not table_info['primary_key']:
+            if not primary_key:
+                issues.append(self.issue(
+                    'missing_primary_key', self.SEVERITY_ERROR,
+                    "Kein Primärschlüssel vorhanden oder konfiguriert"
+                ))
+            elif (
+                indexable and
+                primary_key not in table_info['unique_columns']
+            ):
+                issues.append(self.issue(
+                    'primary_key_not_unique', self.SEVERITY_WARNING,
+                    "Konfigurierter Primärschlüssel '%s' hat keinen "
+                    "Unique-Index" % primary_key,
+                    'CREATE UNIQUE INDEX ON %s ("%s");' % (table, primary_key)
+                ))
+
+        if not indexable:
+            return issues
+
+        # spatial index
+        geometry_column = data_set['geometry_column']
+        if (
+            geometry_column and
+            geometry_column not in table_info['spatial_index_columns']
+        ):
+            issues.append(self.issue(
+                'missing_spatial_index', self.SEVERITY_ERROR,
+                "Kein räumlicher Index auf Geometriespalte '%s'" %
+                geometry_column,
+                'CREATE INDEX ON %s USING GIST ("%s");' %
+                (table, geometry_column)
+            ))
+
+        # feature ID column
+        feature_id_column = data_set['feature_id_column']
+        if (
+            feature_id_column and
+            feature_id_column not in table_info['indexed_columns']
+        ):
+            issues.append(self.issue(
+                'feature_id_not_indexed', self.SEVERITY_WARNING,
+                "Kein Index auf Feature-ID-Spalte '%s'" % feature_id_column,
+                'CREATE INDEX ON %s ("%s");' % (table, feature_id_column)
+            ))
+
+        # statistics
+        # NOTE: partitioned tables have no statistics of their own
+        if table_info['relkind'] != 'p':
+            if not table_info['analyzed']:
+                issues.append(self.issue(
+                    'stale_statistics', self.SEVERITY_WARNING,
+                    "Tabelle wurde nie analysiert",
+                    'ANALYZE %s;' % table
+                ))
+            else:
+                mod_since_analyze = table_info['mod_since_analyze'] or 0
+                threshold = (
+                    self.STALE_STATS_MIN_ROWS +
+                    self.STALE_STATS_RATIO * (table_info['rows'] or 0)
+                )
+                if mod_since_analyze > threshold:
+                    issues.append(self.issue(
+                        'stale_statistics', self.SEVERITY_WARNING,
+                        "Statistiken veraltet: %d geänderte Zeilen seit "
+                        "letztem ANALYZE" % mod_since_analyze,
+                        'ANALYZE %s;' % table
+                    ))
+
+        return issues
+
+    def issue(self, issue_type, severity, message, sql=None):
+        """Return issue.
+
+        :param str issue_type: Issue type
+        :param str severity: Issue severity ('error' or 'warning')
+        :param str message: Message
+        :param str sql: Optional SQL for fixing issue
+        """
+        return {
+            'type': issue_type,
+            'severity': severity,
+            'message': message,
+            'sql': sql
+        }
@@ -0,0 +1,206 @@
+from collections import OrderedDict
+
+from flask import json
+from sqlalchemy.sql import text as sql_text
+
+from service_lib.cache import TTLCache
+
+
+class JSONAttributesHelper:
+    """Helper class for discovering keys of JSON attributes
+
+    Expected JSON structure of attribute values:
+        [
+            {
+                "<key>": "<value>",
+                "<key2>": "<value2>"
+            }
+        ]
+
+    Keys are collected from all list entries of a sample of rows, in order of
+    their first appearance. Results are cached per data_source, table and
+    attribute.
+    """
+
+    # max number of JSON values to analyze
+    MAX_SAMPLE_ROWS = 1000
+    # target number of rows to sample with TABLESAMPLE
+    # NOTE: larger than MAX_SAMPLE_ROWS, as not all rows contain a JSON list
+    TARGET_SAMPLE_ROWS = 20000
+    # min number of estimated table rows for using TABLESAMPLE
+    MIN_SAMPLE_TABLE_ROWS = 100000
+
+    # max number of cached results
+    CACHE_SIZE = 200
+    # seconds after which cached results expire
+    CACHE_TTL = 600
+
+    # relkinds supporting TABLESAMPLE (table, matview, partitioned table)
+    SAMPLE_RELKINDS = ['r', 'm', 'p']
+
+    def __init__(self, logger):
+        """Constructor
+
+        :param Logger logger: Application logger
+        """
+        self.logger = logger
+
+        # cached results by (<DB URL>, <table>, <attribute>)
+        self.cache = TTLCache(self.CACHE_SIZE, self.CACHE_TTL)
+
+    def json_attributes(self, engine, table_name, attr_name):
+        """Return keys of a JSON attribute with their stats as
+        {
+            'keys': [<key>],
+            'stats': [{'name': <key>, 'count': <int>, 'frequency': <float>,
+                       'types': [<JSON type>]}],
+            'rows': <number of analyzed JSON values>,
+            'sampled': <whether rows were sampled with TABLESAMPLE>
+        }
+
+        :param Engine engine: Database engine for data_source
+        :param str table_name: Table name as "<schema>.<table>"
+        :param str attr_name: Attribute name
+        """
+        # NOTE: use DB URL as key, as data_source IDs are not unique
+        #       across tenants
+        key = (str(engine.url), table_name, attr_name)
+
+        result = self.cache.get(key)
+        if result is None:
+            result = self.discover(engine, table_name, attr_name)
+            self.cache.set(key, result)
+
+        return result
+
+    def discover(self, engine, table_name, attr_name):
+        """Sample JSON values of an attribute and collect their keys.
+
+        :param Engine engine: Database engine for data_source
+        :param str table_name: Table name as "<schema>.<table>"
+        :param str attr_name: Attribute name
+        """
+        with engine.connect() as conn:
+            # get estimated row count and relkind
+            sql = sql_text("""
+                SELECT reltuples, relkind
+                FROM pg_class
+                WHERE oid = CAST(:table_name AS regclass);
+            """)
+            row = conn.execute(sql, table_name=table_name).first()
+            sampled = (
+                row is not None and
+                row['relkind'] in self.SAMPLE_RELKINDS and
+                row['reltuples'] >= self.MIN_SAMPLE_TABLE_ROWS
+            )
+
+            # NOTE: also convert native PG json to text
+            #       to preserve original order of keys
+            if sampled:
+                # sample random blocks of large tables
+                percent = min(
+                    100.0,
+                    100.0 * self.TARGET_SAMPLE_ROWS / row['reltuples']
+                )
+                sql = sql_text("""
+                    SELECT {attr}::text AS value
+                    FROM {table_name} TABLESAMPLE SYSTEM (:percent)
+                    WHERE {attr}::text LIKE '[%]'
+                    LIMIT :limit;
+                """.format(attr=attr_name, table_name=table_name))
+                values = [
+                    r['value'] for r in conn.execute(
+                        sql, percent=percent, limit=self.MAX_SAMPLE_ROWS
+                    )
+                ]
+            else:
+                values = []
+
+            if not values:
+                # scan small tables, views or sparse JSON values
+                # NOTE: limited by statement_timeout of data_source
+                sql = sql_text("""
+                    SELECT {attr}::text AS value
+                    FROM {table_name}
+                    WHERE {attr}::text LIKE '[%]'
+                    LIMIT :limit;
+                """.format(attr=attr_name, table_name=table_name))
+                values = [
+                    r['value'] for r in conn.execute(
+                        sql, limit=self.MAX_SAMPLE_ROWS
+                    )
+                ]
+                sampled = False
+
+        result = self.collect_keys(values)
+        result['sampled'] = sampled
+        return result
+
+    def collect_keys(self, values):
+        """Collect keys of JSON lists of objects in order of first appearance,
+        with their count, frequency and JSON types.
+
+        :param list[str] values: JSON values
+        """
+        # key stats as {<key>: {'count': <int>, 'types': OrderedDict}}
+        keys = OrderedDict()
+        entries = 0
+        rows = 0
+        for value in values:
+            try:
+                # parse JSON with original order of keys
+                json_value = json.loads(value, object_pairs_hook=OrderedDict)
+            except Exception as e:
+                self.logger.warning(
+                    "Could not parse value as JSON: '%s'\n%s" % (value, e)
+                )
+                continue
+
+            if type(json_value) is not list:
+                continue
+            rows += 1
+
+            for entry in json_value:
+                if not isinstance(entry, dict):
+                    continue
+                entries += 1
+
+                for key, entry_value in entry.items():
+                    stats = keys.get(key)
+                    if stats is None:
+                        stats = {'count': 0, 'types': OrderedDict()}
+                        keys[key] = stats
+                    stats['count'] += 1
+                    stats['types'][self.json_type(entry_value)] = True
+
+        return {
+            'keys': list(keys.keys()),
+            'stats': [
+                {
+                    'name': key,
+                    'count': stats['count'],
+                    'frequency': round(stats['count'] / entries, 3),
+                    'types': list(stats['types'].keys())
+                }
+                for key, stats in keys.items()
+            ],
+            'rows': rows
+        }
+
+    def json_type(self, value):
+        """Return JSON type name of a parsed JSON value.
+
+        :param obj value: JSON value
+        """
+        if value is None:
+            return 'null'
+        elif isinstance(value, bool):
+            return 'boolean'
+        elif isinstance(value, (int, float)):
+            return 'number'
+        elif isinstance(value, str):
+            return 'string'
+        elif isinstance(value, list):
+            return 'array'
+        else:
+            return 'object'
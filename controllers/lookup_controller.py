@@ -0,0 +1,75 @@
+from flask import abort, jsonify, request
+
+from .lookup_helper import LookupHelper
+
+
+class LookupController:
+    """Controller for typeahead lookups
+
+    Return select field options matching a name prefix as JSON, for select
+    fields with lazy loaded options (see LookupHelper.lazy_choices()).
+    """
+
+    # default and max number of options
+    DEFAULT_LIMIT = 20
+    MAX_LIMIT = 100
+
+    def __init__(self, app, config_models):
+        """Constructor
+
+        :param Flask app: Flask application
+        :param TenantConfigModels config_models: Helper for ORM models
+        """
+        self.resource_name = "Lookup"
+        self.base_route = 'lookup'
+        self.logger = app.logger
+        self.LookupHelper = LookupHelper(config_models, app.logger)
+
+        # add custom routes
+        base_route = self.base_route
+        # options of lookup type
+        app.add_url_rule(
+            '/%s/<type>' % base_route, base_route, self.lookup,
+            methods=['GET']
+        )
+
+    def lookup(self, type):
+        """Return options with names starting with search text as
+        {
+            'results': [{'id': <int>, 'label': <str>}],
+            'more': <whether there are more matching options>
+        }
+
+        URL params:
+            q: Optional search text
+            limit: Optional max number of options
+            exclude: Optional comma separated IDs of options to skip
+
+        :param str type: Lookup type
+        """
+        if type not in self.LookupHelper.TYPES:
+            abort(404, "Unknown lookup type '%s'" % type)
+
+        try:
+            limit = max(1, min(
+                int(request.args.get('limit', self.DEFAULT_LIMIT)),
+                self.MAX_LIMIT
+            ))
+            exclude_ids = [
+                int(id) for value in request.args.getlist('exclude')
+                for id in value.split(',') if id.strip()
+            ]
+        except ValueError as e:
+            abort(400, "Invalid lookup params: %s" % e)
+
+        # NOTE: query one more option to check for more results
+        options = self.LookupHelper.search(
+            type, request.args.get('q', '').strip(), limit + 1, exclude_ids
+        )
+
+        return jsonify({
+            'results': [
+                {'id': id, 'label': label} for id, label in options[:limit]
+            ],
+            'more': len(options) > limit
+        })
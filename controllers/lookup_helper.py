@@ -0,0 +1,218 @@
+from flask import url_for
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from service_lib.tenant_config_models import TenantModel
+
+
+class LookupHelper:
+    """Helper class for typeahead lookups of select field options
+
+    Large select fields (e.g. persons, data products, layers, roles) are
+    rendered with only the empty and the selected option. The remaining
+    options are loaded on demand from the lookup endpoint with a prefix
+    search on the names (see LookupController and static/js/lookup_select.js).
+    """
+
+    # lookup types
+    TYPES = ['persons', 'data_products', 'layers', 'roles']
+
+    # ConfigDB models of current tenant
+    Person = TenantModel('person')
+    Organisation = TenantModel('organisation')
+    DataSetView = TenantModel('data_set_view')
+    OWSLayer = TenantModel('ows_layer')
+    OWSLayerGroup = TenantModel('ows_layer_group')
+    WmsWfs = TenantModel('wms_wfs')
+    Role = TenantModel('role')
+
+    def __init__(self, config_models, logger):
+        """Constructor
+
+        :param ConfigModels config_models: Helper for ORM models
+        :param Logger logger: Application logger
+        """
+        self.config_models = config_models
+        self.logger = logger
+
+    def search(self, lookup_type, q, limit, exclude_ids=[]):
+        """Return options with names starting with search text as
+        [(<id>, <label>)], ordered by name.
+
+        :param str lookup_type: Lookup type
+        :param str q: Search text
+        :param int limit: Max number of options
+        :param list[int] exclude_ids: IDs of options to skip
+        """
+        return self.options(
+            lookup_type, prefix=q, limit=limit, exclude_ids=exclude_ids
+        )
+
+    def choices(self, lookup_type, ids):
+        """Return options for IDs as [(<id>, <label>)].
+
+        :param str lookup_type: Lookup type
+        :param list[int] ids: Option IDs
+        """
+        ids = [id for id in ids if id]
+        if not ids:
+            return []
+
+        return self.options(lookup_type, ids=ids)
+
+    def lazy_choices(self, field, lookup_type, exclude_inputs=None,
+                     **params):
+        """Set choices of a select field to the empty option and the options
+        of its current value, and load other options via lookup endpoint.
+
+        :param SelectField field: Select field with int values
+        :param str lookup_type: Lookup type
+        :param str exclude_inputs: Optional CSS selector for inputs with IDs
+                                   of options to skip (e.g. already added
+                                   entries of a subform)
+        :param obj params: Additional URL params for lookup endpoint
+                           (e.g. exclude=<comma separated IDs>)
+        """
+        # NOTE: keep current or submitted value, as it must be in choices
+        #       for validation
+        ids = []
+        if field.data:
+            ids.append(field.data)
+
+        field.choices = [(0, "")] + self.choices(lookup_type, ids)
+
+        render_kw = dict(field.render_kw or {})
+        render_kw['data-lookup-url'] = url_for(
+            'lookup', type=lookup_type, **params
+        )
+        if exclude_inputs:
+            render_kw['data-lookup-exclude'] = exclude_inputs
+        field.render_kw = render_kw
+
+    def options(self, lookup_type, prefix=None, ids=None, limit=None,
+                exclude_ids=[]):
+        """Query options of a lookup type.
+
+        :param str lookup_type: Lookup type
+        :param str prefix: Optional search text
+        :param list[int] ids: Optional option IDs
+        :param int limit: Optional max number of options
+        :param list[int] exclude_ids: IDs of options to skip
+        """
+        options = []
+
+        session = self.config_models.session()
+        try:
+            if lookup_type == 'persons':
+                options = self.person_options(
+                    session, prefix, ids, limit, exclude_ids
+                )
+            elif lookup_type == 'data_products':
+                # DataSets and ProductSets ordered by name
+                for model in [self.DataSetView, self.OWSLayerGroup]:
+                    query = self.filter(
+                        session.query(model.gdi_oid, model.name),
+                        model.gdi_oid, model.name, prefix, ids, exclude_ids
+                    )
+                    if limit:
+                        query = query.limit(limit)
+                    options += [(row.gdi_oid, row.name) for row in query]
+                options.sort(key=lambda o: o[1].lower())
+                if limit:
+                    options = options[:limit]
+            elif lookup_type == 'layers':
+                query = self.filter(
+                    session.query(self.OWSLayer.gdi_oid, self.OWSLayer.name),
+                    self.OWSLayer.gdi_oid, self.OWSLayer.name, prefix, ids,
+                    exclude_ids
+                )
+                # skip WMS/WFS root layers
+                root_layer_ids = [
+                    wms_wfs.root_layer.gdi_oid
+                    for wms_wfs in session.query(self.WmsWfs).all()
+                    if wms_wfs.root_layer is not None
+                ]
+                if root_layer_ids:
+                    query = query.filter(
+                        ~self.OWSLayer.gdi_oid.in_(root_layer_ids)
+                    )
+                if limit:
+                    query = query.limit(limit)
+                options = [(row.gdi_oid, row.name) for row in query]
+            elif lookup_type == 'roles':
+                query = self.filter(
+                    session.query(self.Role.id, self.Role.name),
+                    self.Role.id, self.Role.name, prefix, ids, exclude_ids
+                )
+                if limit:
+                    query = query.limit(limit)
+                options = [(row.id, row.name) for row in query]
+            else:
+                raise ValueError("Unknown lookup type '%s'" % lookup_type)
+        finally:
+            session.close()
+
+        return options
+
+    def person_options(self, session, prefix, ids, limit, exclude_ids):
+        """Query person options labeled as '<name> / <organisation>'.
+
+        :param Session session: DB session
+        :param str prefix: Optional search text
+        :param list[int] ids: Optional option IDs
+        :param int limit: Optional max number of options
+        :param list[int] exclude_ids: IDs of options to skip
+        """
+        query = self.filter(
+            session.query(self.Person), self.Person.id, self.Person.name,
+            prefix, ids, exclude_ids
+        )
+        # eager load relations
+        query = query.options(joinedload(self.Person.organisation))
+        if limit:
+            query = query.limit(limit)
+
+        options = []
+        for person in query.all():
+            name = person.name
+            organisation = person.organisation
+            if organisation:
+                name = "%s / %s" % (
+                    person.name, organisation.abbreviation or organisation.name
+                )
+            options.append((person.id, name))
+
+        return options
+
+    def filter(self, query, id_column, name_column, prefix, ids,
+               exclude_ids):
+        """Return query filtered by name prefix and IDs, ordered by name.
+
+        :param Query query: Options query
+        :param Column id_column: ID column
+        :param Column name_column: Name column
+        :param str prefix: Optional search text
+        :param list[int] ids: Optional option IDs
+        :param list[int] exclude_ids: IDs of options to skip
+        """
+        if prefix:
+            # NOTE: case insensitive prefix search, uses index on
+            #       lower(name) text_pattern_ops
+            query = query.filter(
+                func.lower(name_column).like(
+                    "%s%%" % self.escape_like(prefix.lower()), escape='\\'
+                )
+            )
+        if ids is not None:
+            query = query.filter(id_column.in_(ids))
+        if exclude_ids:
+            query = query.filter(~id_column.in_(exclude_ids))
+
+        return query.order_by(func.lower(name_column), id_column)
+
+    def escape_like(self, value):
+        """Escape wildcards in LIKE pattern.
+
+        :param str value: Search text
+        """
+        return value.replace('\\', '\\\\').replace('%', '\\%') \
+            .replace('_', '\\_')
@@ -1,13 +1,14 @@
-from flask import flash, redirect, request, url_for
-import os
-import uuid
-
+from flask import request, url_for
 
 from .contacts_helper import ContactsHelper
 from .controller import Controller
+from .lookup_helper import LookupHelper
+from .order_helper import OrderHelper
 from .ows_helper import OWSHelper
 from .permissions_helper import PermissionsHelper
+from .thumbnail_helper import ThumbnailHelper
 from forms import MapForm
+from service_lib.tenant_config_models import TenantModel
 
 
 class MapsController(Controller):
@@ -16,26 +17,44 @@ class MapsController(Controller):
     Manage maps and related models from combined GUI.
     """
 
-    def __init__(self, app, config_models, service_config):
+    # tables shown in maps list
+    INDEX_TABLES = ['gdi_knoten.map']
+
+    # NOTE: edit form shows status of upload tasks, which is not tracked by
+    #       data versions
+    CONDITIONAL_EDIT = False
+
+    # ConfigDB models of current tenant
+    Map = TenantModel('map')
+    MapLayer = TenantModel('map_layer')
+    BackgroundLayer = TenantModel('background_layer')
+    WmsWfs = TenantModel('wms_wfs')
+
+    def __init__(self, app, config_models, data_versions, name_registry,
+                 service_config, task_queue):
         """Constructor
 
         :param Flask app: Flask application
         :param ConfigModels config_models: Helper for ORM models
+        :param DataVersions data_versions: Change counters of ConfigDB tables
+        :param NameRegistry name_registry: Registry of resource names
         :param func service_config: Helper method for reading service config
+        :param TaskQueue task_queue: Queue for upload post-processing tasks
         """
         super(MapsController, self).__init__(
             "Map", 'maps', 'map', 'maps', app,
-            config_models
+            config_models, data_versions, name_registry
         )
         self.service_config = service_config
+        self.task_queue = task_queue
         self.OWSHelper = OWSHelper(config_models)
         self.ContactsHelper = ContactsHelper(config_models, app.logger)
+        self.LookupHelper = LookupHelper(config_models, app.logger)
         self.PermissionsHelper = PermissionsHelper(config_models)
-
-        self.Map = self.config_models.model('map')
-        self.MapLayer = self.config_models.model('map_layer')
-        self.BackgroundLayer = self.config_models.model('background_layer')
-        self.WmsWfs = self.config_models.model('wms_wfs')
+        self.OrderHelper = OrderHelper()
+        self.ThumbnailHelper = ThumbnailHelper(
+            config_models, service_config, task_queue, app.logger
+        )
 
         # add custom routes
         base_route = self.base_route
@@ -45,6 +64,12 @@ class MapsController(Controller):
             '/%s/map_order' % base_route,
             'map_order', self.update_map_order, methods=['POST']
         )
+        # update map layer order
+        app.add_url_rule(
+            '/%s/<int:id>/layer_order' % base_route,
+            '%s_layer_order' % suffix, self.update_layer_order,
+            methods=['POST']
+        )
 
     def resource_pkey(self):
         """Return primary key column name."""
@@ -111,7 +136,7 @@ class MapsController(Controller):
         :param object resource: Optional map object
         :param bool edit_form: Set if edit form
         """
-        form = MapForm(self.config_models, obj=resource)
+        form = MapForm(self.config_models, self.name_registry, obj=resource)
 
         if edit_form:
             # select responsible contact
@@ -134,6 +159,13 @@ class MapsController(Controller):
                 # set that thumbnail image is present
                 form.thumbnail_present = True
 
+            # show status of any thumbnail processing
+            status_message = self.task_queue.status_message(resource.gdi_oid)
+            if status_message:
+                form.thumbnail_file.description = (
+                    "<strong>%s</strong>" % status_message
+                )
+
             # select background layer
             form.background_layer.data = resource.gdi_oid_default_bg_layer
 
@@ -154,8 +186,7 @@ class MapsController(Controller):
         session.close()
 
         # set choices for responsible select field
-        form.responsible.choices = [(0, "")] + \
-            self.ContactsHelper.person_choices()
+        self.LookupHelper.lazy_choices(form.responsible, 'persons')
 
         # reorder fields by layer_order
         form.sublayers.entries.sort(key=lambda f: int(f.layer_order.data))
@@ -168,18 +199,13 @@ class MapsController(Controller):
             (bg_layer.gdi_oid, bg_layer.name) for bg_layer in background_layers
         ]
 
-        # collect role ids from permissions subform
-        role_permission_ids = [
-            int(permission.data['role_id']) for permission in form.permissions
-        ]
-
         # set choices for role permission select field
-        # skip roles from permissions subform
-        roles = self.PermissionsHelper.roles()
-        form.role.choices = [
-            (role.id, role.name) for role in roles
-            if role.id not in role_permission_ids
-        ]
+        # NOTE: roles are loaded via lookup endpoint, skipping roles from
+        #       permissions subform
+        self.LookupHelper.lazy_choices(
+            form.role, 'roles',
+            exclude_inputs='input[name^="permissions-"][name$="-role_id"]'
+        )
 
         return form
 
@@ -218,11 +244,9 @@ class MapsController(Controller):
 
         if map_obj.map_order is None:
             # set map_order of new map to be at end of map list
-            query = session.query(self.Map) \
-                .order_by(self.Map.map_order.desc())
-            last_map = query.first()
-            if last_map:
-                map_obj.map_order = last_map.map_order + 1
+            map_obj.map_order = self.OrderHelper.next_order(
+                session, self.Map.map_order
+            )
 
         # lookup for map_layer of map layers
         resource_map_layers = {}
@@ -262,23 +286,15 @@ class MapsController(Controller):
 
         if form.thumbnail_file.data:
             # save uploaded thumbnail image
-            target_filename = (
-                str(uuid.uuid4()) +
-                os.path.splitext(form.thumbnail_file.data.filename)[1]
-            )
-            target_path = os.path.join(self.qwc_assets_dir(), target_filename)
-            with open(target_path, 'wb') as f:
-                f.write(request.files[form.thumbnail_file.name].read())
-            map_obj.thumbnail_image = target_filename
-        elif form.remove_thumbnail.data:
-            thumbnail_path = os.path.join(
-                self.qwc_assets_dir(), map_obj.thumbnail_image
-            )
             try:
-                os.remove(thumbnail_path)
-            except Exception as e:
-                pass
-            map_obj.thumbnail_image = None
+                self.ThumbnailHelper.save_upload(
+                    map_obj, 'map', request.files[form.thumbnail_file.name],
+                    session
+                )
+            except ValueError as e:
+                self.raise_validation_error(form.thumbnail_file, str(e))
+        elif form.remove_thumbnail.data:
+            self.ThumbnailHelper.remove(map_obj)
 
         # NOTE: flush object changes in session to update gdi_oid of a new map
         session.flush()
@@ -309,25 +325,41 @@ class MapsController(Controller):
         session.delete(map_obj)
 
     def update_map_order(self):
-        """Update map_order in Map records."""
-        map_order = request.form.get('map_order')
-        if map_order:
-            session = self.session()
+        """Update map_order of all Map records.
+
+        Form params:
+            map_order: Comma separated IDs of all maps in new order
 
-            # update map_order fields
-            map_ids = map_order.split(',')
-            for order, map_id in enumerate(map_ids):
-                map_obj = self.find_resource(map_id, session)
-                if map_obj:
-                    map_obj.map_order = order
+        or JSON {"ids": [<map ID>]}
+        """
+        return self.update_order(
+            'map_order', url_for(self.base_route),
+            'Reihenfolge der Maps wurde aktualisiert.',
+            self.Map.map_order, self.Map.gdi_oid
+        )
 
-            # commit changes
-            session.commit()
-            session.close()
+    def update_layer_order(self, id):
+        """Update layer_order of all map_layer records of a map.
 
-            flash('Reihenfolge der Maps wurde aktualisiert.', 'success')
+        Form params:
+            layer_order: Comma separated IDs of all map layers in new order
 
-        return redirect(url_for(self.base_route))
+        or JSON {"ids": [<ows_layer ID>]}
+
+        :param int id: Map ID
+        """
+        return self.update_order(
+            'layer_order', url_for('edit_%s' % self.endpoint_suffix, id=id),
+            'Reihenfolge der Layer wurde aktualisiert.',
+            self.MapLayer.layer_order, self.MapLayer.gdi_oid_ows_layer,
+            self.map_layer_map_column(), id
+        )
+
+    def map_layer_map_column(self):
+        """Return model attribute of map_layer column referencing map."""
+        for fk in self.MapLayer.__table__.foreign_keys:
+            if fk.column.table is self.Map.__table__:
+                return getattr(self.MapLayer, fk.parent.name)
 
     def wms_layer_choices(self):
         """Return select field choices for all WMS layers."""
@@ -383,9 +415,3 @@ class MapsController(Controller):
                 self.PermissionsHelper.update_resource_permission(
                     map_obj.gdi_oid, role.id, read, False, session
                 )
-
-    def qwc_assets_dir(self):
-        """Return target dir for QWC assets."""
-        # get dir from service config
-        config = self.service_config()
-        return config.get('qwc_assets_dir', '/tmp/')
@@ -1,6 +1,8 @@
 from .contacts_helper import ContactsHelper
 from .controller import Controller
+from .lookup_helper import LookupHelper
 from forms import ModuleForm
+from service_lib.tenant_config_models import TenantModel
 
 
 class ModuleController(Controller):
@@ -9,23 +11,26 @@ class ModuleController(Controller):
     Manage module from GUI.
     """
 
-    def __init__(self, app, config_models):
+    # ConfigDB models of current tenant
+    Module = TenantModel('module')
+    GDIResource = TenantModel('gdi_resource')
+    Service = TenantModel('service')
+
+    def __init__(self, app, config_models, data_versions, name_registry):
         """Constructor
 
         :param Flask app: Flask application
         :param ConfigModels config_models: Helper for ORM models
+        :param DataVersions data_versions: Change counters of ConfigDB tables
+        :param NameRegistry name_registry: Registry of resource names
         """
         super(ModuleController, self).__init__(
             "Module", 'module', 'module',
-            'module', app, config_models
+            'module', app, config_models,
+            data_versions, name_registry
         )
         self.ContactsHelper = ContactsHelper(config_models, app.logger)
-
-        self.Module = self.config_models.model('module')
-        self.DataSetView = self.config_models.model('data_set_view')
-        self.OWSLayerGroup = self.config_models.model('ows_layer_group')
-        self.GDIResource = self.config_models.model('gdi_resource')
-        self.Service = self.config_models.model('service')
+        self.LookupHelper = LookupHelper(config_models, app.logger)
 
     def resource_pkey(self):
         """Return primary key column name."""
@@ -91,7 +96,7 @@ class ModuleController(Controller):
         :param object resource: Optional module object
         :param bool edit_form: Set if edit form
         """
-        form = ModuleForm(self.config_models, obj=resource)
+        form = ModuleForm(self.config_models, self.name_registry, obj=resource)
 
         session = self.session()
         self.update_form_resource_contacts(resource, edit_form, form)
@@ -158,8 +163,7 @@ class ModuleController(Controller):
             )
 
         # set choices for responsible select field
-        form.responsible.choices = [(0, "")] + \
-            self.ContactsHelper.person_choices()
+        self.LookupHelper.lazy_choices(form.responsible, 'persons')
 
         # set choices for supplier select field
         form.supplier.choices = [(0, "")] + \
@@ -181,24 +185,15 @@ class ModuleController(Controller):
                     'data_product_name': data_product.name,
                 })
 
-        # load related resources from DB
-        # get DataSets
-        query = session.query(self.DataSetView).order_by(self.DataSetView.name)
-        data_set_views = query.all()
-
-        # get ProductSets
-        query = session.query(self.OWSLayerGroup) \
-            .order_by(self.OWSLayerGroup.name)
-        ows_layer_groups = query.all()
-
-        # order by name
-        data_products = data_set_views + ows_layer_groups
-        data_products.sort(key=lambda d: d.name.lower())
-
         # set choices for data product select field
-        form.data_product.choices = [(0, "")] + [
-            (d.gdi_oid, d.name) for d in data_products
-        ]
+        # NOTE: DataSets and ProductSets are loaded via lookup endpoint,
+        #       skipping data products from data products subform
+        self.LookupHelper.lazy_choices(
+            form.data_product, 'data_products',
+            exclude_inputs=(
+                'input[name^="data_products-"][name$="-data_product_id"]'
+            )
+        )
 
     def update_form_module_services(self, module, edit_form, form, session):
         """Update services subform for resource.
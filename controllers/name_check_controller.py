@@ -0,0 +1,71 @@
+from flask import abort, jsonify, request
+
+from service_lib.name_registry import NameRegistry
+
+
+class NameCheckController:
+    """Controller for availability checks of resource names
+
+    Check names against the shared NameRegistry while typing in the forms
+    (see static/js/name_check.js).
+    """
+
+    def __init__(self, app, name_registry):
+        """Constructor
+
+        :param Flask app: Flask application
+        :param NameRegistry name_registry: Registry of resource names
+        """
+        self.resource_name = "Namen"
+        self.base_route = 'names'
+        self.logger = app.logger
+        self.name_registry = name_registry
+
+        # add custom routes
+        base_route = self.base_route
+        # check name
+        app.add_url_rule(
+            '/%s/check' % base_route, '%s_check' % base_route, self.check,
+            methods=['GET']
+        )
+
+    def check(self):
+        """Return whether a name is available for a resource type as
+        {
+            'name': <name>,
+            'available': <bool>,
+            'message': <validation message or None>,
+            'resources': [{'type': <type>, 'id': <ID>}]
+        }
+
+        URL params:
+            type: Resource type (e.g. 'data_set', 'map')
+            name: Resource name
+            id: Optional ID of current resource
+        """
+        resource_type = request.args.get('type')
+        if resource_type not in NameRegistry.TYPES:
+            abort(400, "Unknown resource type '%s'" % resource_type)
+
+        resource_id = None
+        if request.args.get('id'):
+            try:
+                resource_id = int(request.args.get('id'))
+            except ValueError:
+                abort(400, "Invalid resource ID '%s'" % request.args.get('id'))
+
+        name = request.args.get('name', '')
+        msg = None
+        if name:
+            msg = self.name_registry.check(resource_type, name, resource_id)
+
+        return jsonify({
+            'name': name,
+            'available': msg is None,
+            'message': msg,
+            'resources': [
+                {'type': other_type, 'id': id}
+                for other_type, id in self.name_registry.resources(name)
+                if id != resource_id
+            ]
+        })
@@ -0,0 +1,129 @@
+from sqlalchemy import func
+from sqlalchemy.sql import text as sql_text
+
+
+class OrderHelper:
+    """Helper class for ordering records, e.g. maps or sub layers
+
+    The order of all records within a scope is updated with a single
+    statement.
+    """
+
+    def reorder(self, session, order_column, key_column, ids,
+                scope_column=None, scope_value=None):
+        """Set order of records to their position in ids.
+
+        Raise ValueError if ids do not match the full set of records
+        within the scope.
+
+        :param Session session: DB session
+        :param Column order_column: Model attribute of order column
+                                    (e.g. Map.map_order)
+        :param Column key_column: Model attribute of key column of submitted
+                                  ids (e.g. Map.gdi_oid)
+        :param list[int] ids: Ordered keys of all records
+        :param Column scope_column: Optional model attribute for restricting
+                                    records (e.g. MapLayer.gdi_oid_map)
+        :param int scope_value: Value of scope_column
+        """
+        ids = self.parse_ids(ids)
+
+        table = self.table_name(session, key_column)
+        key = self.column_name(session, key_column)
+        order = self.column_name(session, order_column)
+        scope_filter = ''
+        params = {'ids': ids}
+        if scope_column is not None:
+            scope_filter = 'AND t.%s = :scope' % self.column_name(
+                session, scope_column
+            )
+            params['scope'] = scope_value
+
+        # get keys of all records within scope
+        # NOTE: lock records to avoid concurrent changes until commit
+        sql = sql_text("""
+            SELECT t.{key} AS key
+            FROM {table} t
+            WHERE TRUE {scope_filter}
+            FOR UPDATE;
+        """.format(key=key, table=table, scope_filter=scope_filter))
+        existing = set(
+            row['key'] for row in session.execute(sql, params)
+        )
+        if not set(ids) <= existing:
+            raise ValueError("Reihenfolge enthält unbekannte Einträge")
+        if len(ids) != len(existing):
+            raise ValueError(
+                "Reihenfolge unvollständig: %d von %d Einträgen übermittelt"
+                % (len(ids), len(existing))
+            )
+
+        # update order of all records in a single statement
+        # NOTE: skip unchanged records
+        sql = sql_text("""
+            UPDATE {table} t
+            SET {order} = o.position - 1
+            FROM unnest(CAST(:ids AS bigint[])) WITH ORDINALITY
+                AS o(key, position)
+            WHERE t.{key} = o.key {scope_filter}
+                AND t.{order} IS DISTINCT FROM o.position - 1;
+        """.format(
+            table=table, order=order, key=key, scope_filter=scope_filter
+        ))
+        session.execute(sql, params)
+
+    def next_order(self, session, order_column, scope_column=None,
+                   scope_value=None):
+        """Return order for appending a new record at the end.
+
+        :param Session session: DB session
+        :param Column order_column: Model attribute of order column
+        :param Column scope_column: Optional model attribute for restricting
+                                    records
+        :param int scope_value: Value of scope_column
+        """
+        query = session.query(
+            func.coalesce(func.max(order_column) + 1, 0)
+        )
+        if scope_column is not None:
+            query = query.filter(scope_column == scope_value)
+        return query.scalar()
+
+    def parse_ids(self, ids):
+        """Return ids as list of ints.
+
+        Raise ValueError for invalid or duplicate ids.
+
+        :param list ids: List of ids or comma separated string
+        """
+        if isinstance(ids, str):
+            ids = [id for id in ids.split(',') if id.strip()]
+        if not isinstance(ids, list):
+            raise ValueError("Ungültige Reihenfolge")
+
+        try:
+            ids = [int(id) for id in ids]
+        except (TypeError, ValueError):
+            raise ValueError("Ungültige ID in Reihenfolge")
+        if len(set(ids)) != len(ids):
+            raise ValueError("Doppelte ID in Reihenfolge")
+
+        return ids
+
+    def table_name(self, session, column):
+        """Return quoted table name of a model attribute.
+
+        :param Session session: DB session
+        :param Column column: Model attribute
+        """
+        preparer = session.bind.dialect.identifier_preparer
+        return preparer.format_table(column.property.columns[0].table)
+
+    def column_name(self, session, column):
+        """Return quoted column name of a model attribute.
+
+        :param Session session: DB session
+        :param Column column: Model attribute
+        """
+        preparer = session.bind.dialect.identifier_preparer
+        return preparer.quote(column.property.columns[0].name)
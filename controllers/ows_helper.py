@@ -1,6 +1,13 @@
+from service_lib.tenant_config_models import TenantModel
+
+
 class OWSHelper:
     """Helper class for managing WMS/WFS layers"""
 
+    # ConfigDB models of current tenant
+    GroupLayer = TenantModel('group_layer')
+    WmsWfs = TenantModel('wms_wfs')
+
     def __init__(self, config_models):
         """Constructor
 
@@ -8,9 +15,6 @@ class OWSHelper:
         """
         self.config_models = config_models
 
-        self.GroupLayer = self.config_models.model('group_layer')
-        self.WmsWfs = self.config_models.model('wms_wfs')
-
     def layer_in_ows(self, ows_layer, ows_type):
         """Return whether OWS layer is in WMS/WFS.
 
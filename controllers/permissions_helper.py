@@ -1,9 +1,16 @@
+from service_lib.tenant_config_models import TenantModel
+
+
 class PermissionsHelper:
     """Helper class for managing permissions"""
 
     # name of public iam.role
     PUBLIC_ROLE_NAME = 'public'
 
+    # ConfigDB models of current tenant
+    Role = TenantModel('role')
+    ResourcePermission = TenantModel('resource_permission')
+
     def __init__(self, config_models):
         """Constructor
 
@@ -11,11 +18,6 @@ class PermissionsHelper:
         """
         self.config_models = config_models
 
-        self.Role = self.config_models.model('role')
-        self.ResourcePermission = self.config_models.model(
-            'resource_permission'
-        )
-
     def roles(self):
         """Return all roles."""
         # load roles from DB
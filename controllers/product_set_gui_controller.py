@@ -1,12 +1,14 @@
 import mimetypes
 import os
 
-from flask import flash, json, jsonify, request, Response
+from flask import flash, json, jsonify, request, Response, url_for
 
 from .contacts_helper import ContactsHelper
 from .controller import Controller
+from .lookup_helper import LookupHelper
 from .ows_helper import OWSHelper
 from forms import ProductSetGUIForm
+from service_lib.tenant_config_models import TenantModel
 
 
 class ProductSetGUIController(Controller):
@@ -15,24 +17,28 @@ class ProductSetGUIController(Controller):
     Manage ows_layer_group and related models from combined GUI.
     """
 
-    def __init__(self, app, config_models):
+    # ConfigDB models of current tenant
+    OWSLayerGroup = TenantModel('ows_layer_group')
+    GroupLayer = TenantModel('group_layer')
+    TemplateInfo = TenantModel('template_info')
+    TemplateJasper = TenantModel('template_jasper')
+
+    def __init__(self, app, config_models, data_versions, name_registry):
         """Constructor
 
         :param Flask app: Flask application
         :param ConfigModels config_models: Helper for ORM models
+        :param DataVersions data_versions: Change counters of ConfigDB tables
+        :param NameRegistry name_registry: Registry of resource names
         """
         super(ProductSetGUIController, self).__init__(
             "ProductSet", 'product_sets', 'product_set', 'product_set_gui',
-            app, config_models
+            app, config_models,
+            data_versions, name_registry
         )
         self.OWSHelper = OWSHelper(config_models)
         self.ContactsHelper = ContactsHelper(config_models, app.logger)
-
-        self.OWSLayerGroup = self.config_models.model('ows_layer_group')
-        self.OWSLayer = self.config_models.model('ows_layer')
-        self.GroupLayer = self.config_models.model('group_layer')
-        self.TemplateInfo = self.config_models.model('template_info')
-        self.TemplateJasper = self.config_models.model('template_jasper')
+        self.LookupHelper = LookupHelper(config_models, app.logger)
 
         # add custom routes
         base_route = self.base_route
@@ -42,6 +48,12 @@ class ProductSetGUIController(Controller):
             '/%s/<int:id>/legend/<string:filename>' % base_route,
             '%s_legend' % suffix, self.download_legend, methods=['GET']
         )
+        # update sub layer order
+        app.add_url_rule(
+            '/%s/<int:id>/layer_order' % base_route,
+            '%s_layer_order' % suffix, self.update_layer_order,
+            methods=['POST']
+        )
 
     def resource_pkey(self):
         """Return primary key column name."""
@@ -108,25 +120,9 @@ class ProductSetGUIController(Controller):
         :param object resource: Optional ows_layer_group object
         :param bool edit_form: Set if edit form
         """
-        form = ProductSetGUIForm(self.config_models, obj=resource)
-
-        # load related resources from DB
-        session = self.session()
-
-        query = session.query(self.OWSLayer).order_by(self.OWSLayer.name)
-        if resource is not None:
-            # skip resource itself
-            query = query.filter(self.OWSLayer.gdi_oid != resource.gdi_oid)
-
-        # skip WMS root layers
-        root_layers = self.OWSHelper.ows_root_layers(session)
-        root_layer_ids = [l.gdi_oid for l in root_layers]
-        if root_layer_ids:
-            query = query.filter(~self.OWSLayer.gdi_oid.in_(root_layer_ids))
-
-        layers = query.all()
-
-        session.close()
+        form = ProductSetGUIForm(
+            self.config_models, self.name_registry, obj=resource
+        )
 
         if edit_form:
             # override form fields with resource values on edit
@@ -184,14 +180,22 @@ class ProductSetGUIController(Controller):
                     )
 
         # set choices for data owner select field
-        form.data_owner.choices = [(0, "")] + \
-            self.ContactsHelper.person_choices()
+        self.LookupHelper.lazy_choices(form.data_owner, 'persons')
 
         # reorder fields by layer_order
         form.sublayers.entries.sort(key=lambda x: int(x.layer_order.data))
 
         # set choices for sub layer select field
-        form.layer.choices = [(layer.gdi_oid, layer.name) for layer in layers]
+        # NOTE: layers are loaded via lookup endpoint, skipping WMS root
+        #       layers, resource itself and layers from sub layers subform
+        lookup_params = {}
+        if resource is not None:
+            lookup_params['exclude'] = resource.gdi_oid
+        self.LookupHelper.lazy_choices(
+            form.layer, 'layers',
+            exclude_inputs='input[name^="sublayers-"][name$="-layer_id"]',
+            **lookup_params
+        )
 
         return form
 
@@ -307,6 +311,23 @@ class ProductSetGUIController(Controller):
         # remove ows_layer_group and associated resources
         session.delete(ows_layer_group)
 
+    def update_layer_order(self, id):
+        """Update layer_order of all group_layer records of a ProductSet.
+
+        Form params:
+            layer_order: Comma separated IDs of all sub layers in new order
+
+        or JSON {"ids": [<sub layer ID>]}
+
+        :param int id: ProductSet ID
+        """
+        return self.update_order(
+            'layer_order', url_for('edit_%s' % self.endpoint_suffix, id=id),
+            'Reihenfolge der Layer wurde aktualisiert.',
+            self.GroupLayer.layer_order, self.GroupLayer.gdi_oid_sub_layer,
+            self.GroupLayer.gdi_oid_group_layer, id
+        )
+
     def download_legend(self, id, filename):
         """Download uploaded legend image.
 
@@ -2,23 +2,29 @@ from sqlalchemy.orm import joinedload
 
 from .controller import Controller
 from forms import RoleForm
+from service_lib.tenant_config_models import TenantModel
 
 
 class RolesController(Controller):
     """Controller for role model"""
 
-    def __init__(self, app, config_models):
+    # ConfigDB models of current tenant
+    Role = TenantModel('role')
+    User = TenantModel('user')
+    Group = TenantModel('group')
+
+    def __init__(self, app, config_models, data_versions, name_registry):
         """Constructor
 
         :param Flask app: Flask application
         :param ConfigModels config_models: Helper for ORM models
+        :param DataVersions data_versions: Change counters of ConfigDB tables
+        :param NameRegistry name_registry: Registry of resource names
         """
         super(RolesController, self).__init__(
-            "Rolle", 'roles', 'role', 'roles', app, config_models
+            "Rolle", 'roles', 'role', 'roles', app, config_models,
+            data_versions, name_registry
         )
-        self.Role = self.config_models.model('role')
-        self.User = self.config_models.model('user')
-        self.Group = self.config_models.model('group')
 
     def resources_for_index(self, session):
         """Return roles list.
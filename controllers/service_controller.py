@@ -1,6 +1,8 @@
 from .contacts_helper import ContactsHelper
 from .controller import Controller
+from .lookup_helper import LookupHelper
 from forms import ServiceForm
+from service_lib.tenant_config_models import TenantModel
 
 
 class ServiceController(Controller):
@@ -9,23 +11,26 @@ class ServiceController(Controller):
     Manage service from GUI.
     """
 
-    def __init__(self, app, config_models):
+    # ConfigDB models of current tenant
+    Service = TenantModel('service')
+    GDIResource = TenantModel('gdi_resource')
+    Module = TenantModel('module')
+
+    def __init__(self, app, config_models, data_versions, name_registry):
         """Constructor
 
         :param Flask app: Flask application
         :param ConfigModels config_models: Helper for ORM models
+        :param DataVersions data_versions: Change counters of ConfigDB tables
+        :param NameRegistry name_registry: Registry of resource names
         """
         super(ServiceController, self).__init__(
             "Service", 'service', 'service',
-            'service', app, config_models
+            'service', app, config_models,
+            data_versions, name_registry
         )
         self.ContactsHelper = ContactsHelper(config_models, app.logger)
-
-        self.Service = self.config_models.model('service')
-        self.DataSetView = self.config_models.model('data_set_view')
-        self.OWSLayerGroup = self.config_models.model('ows_layer_group')
-        self.GDIResource = self.config_models.model('gdi_resource')
-        self.Module = self.config_models.model('module')
+        self.LookupHelper = LookupHelper(config_models, app.logger)
 
     def resource_pkey(self):
         """Return primary key column name."""
@@ -154,8 +159,7 @@ class ServiceController(Controller):
             )
 
         # set choices for responsible select field
-        form.responsible.choices = [(0, "")] + \
-            self.ContactsHelper.person_choices()
+        self.LookupHelper.lazy_choices(form.responsible, 'persons')
 
     def update_form_data_products(self, service, edit_form, form, session):
         """Update data products subform for resource.
@@ -173,24 +177,15 @@ class ServiceController(Controller):
                     'data_product_name': data_product.name,
                 })
 
-        # load related resources from DB
-        # get DataSets
-        query = session.query(self.DataSetView).order_by(self.DataSetView.name)
-        data_set_views = query.all()
-
-        # get ProductSets
-        query = session.query(self.OWSLayerGroup) \
-            .order_by(self.OWSLayerGroup.name)
-        ows_layer_groups = query.all()
-
-        # order by name
-        data_products = data_set_views + ows_layer_groups
-        data_products.sort(key=lambda d: d.name.lower())
-
         # set choices for data product select field
-        form.data_product.choices = [(0, "")] + [
-            (d.gdi_oid, d.name) for d in data_products
-        ]
+        # NOTE: DataSets and ProductSets are loaded via lookup endpoint,
+        #       skipping data products from data products subform
+        self.LookupHelper.lazy_choices(
+            form.data_product, 'data_products',
+            exclude_inputs=(
+                'input[name^="data_products-"][name$="-data_product_id"]'
+            )
+        )
 
     def update_form_service_modules(self, service, edit_form, form, session):
         """Update modules subform for resource.
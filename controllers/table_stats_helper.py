@@ -0,0 +1,243 @@
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql import text as sql_text
+
+from service_lib.cache import TTLCache
+
+
+class TableStatsHelper:
+    """Helper class for statistics of PostGIS tables
+
+    Cheap statistics (estimated row count, size on disk, columns, indexes)
+    are read from the catalog for all tables with a single query, while
+    estimated extents are only queried on demand and cached per table.
+    """
+
+    # max number of cached extents
+    CACHE_SIZE = 500
+    # seconds after which cached extents expire
+    CACHE_TTL = 600
+
+    # index access methods for spatial indexes
+    SPATIAL_INDEX_METHODS = ['gist', 'spgist']
+
+    def __init__(self, logger):
+        """Constructor
+
+        :param Logger logger: Application logger
+        """
+        self.logger = logger
+
+        # cached extents by (<DB URL>, <schema>, <table>)
+        self.cache = TTLCache(self.CACHE_SIZE, self.CACHE_TTL)
+
+    def table_stats(self, conn, schema=None, table_name=None):
+        """Return stats for all PostGIS tables as lookup by
+        "<schema>.<table>" with
+        {
+            'rows': <estimated row count or None if unknown>,
+            'size': <total size in bytes or None for views>,
+            'spatial_index': {<geometry column>: <bool>}
+        }
+
+        :param Connection conn: DB connection to data_source
+        :param str schema: Optional DB schema name filter
+        :param str table_name: Optional DB table name filter
+        """
+        table_infos = self.table_infos(
+            conn, schema=schema, table_name=table_name
+        )
+
+        stats = {}
+        for (schema_name, name), table_info in sorted(table_infos.items()):
+            stats["%s.%s" % (schema_name, name)] = {
+                'rows': table_info['rows'],
+                'size': table_info['size'],
+                'spatial_index': {
+                    column: column in table_info['spatial_index_columns']
+                    for column in table_info['geometry_columns']
+                }
+            }
+
+        return stats
+
+    def table_infos(self, conn, tables=None, schema=None, table_name=None):
+        """Return catalog info for tables as lookup by (<schema>, <table>)
+        with
+        {
+            'relkind': <pg_class.relkind>,
+            'rows': <estimated row count or None if unknown>,
+            'size': <total size in bytes or None for views>,
+            'columns': [<column>],
+            'primary_key': [<primary key column>],
+            'geometry_columns': [<geometry column>],
+            'spatial_index_columns': [<first column of spatial indexes>],
+            'indexed_columns': [<first column of indexes>],
+            'unique_columns': [<column of single column unique indexes>],
+            'analyzed': <bool>,
+            'mod_since_analyze': <modified rows since last ANALYZE or None>
+        }
+
+        NOTE: all tables are checked with a single catalog query
+
+        :param Connection conn: DB connection to data_source
+        :param list[(str, str)] tables: List of (<schema>, <table>),
+                                        or None for all PostGIS tables
+        :param str schema: Optional DB schema name filter for PostGIS tables
+        :param str table_name: Optional DB table name filter for PostGIS
+                               tables
+        """
+        if tables is not None:
+            relations = """
+                unnest(CAST(:schemas AS text[]), CAST(:tables AS text[]))
+                    AS t(schema_name, table_name)
+            """
+        else:
+            relations = """
+                (
+                    SELECT DISTINCT f_table_schema AS schema_name,
+                        f_table_name AS table_name
+                    FROM geometry_columns
+                    WHERE (CAST(:schema AS text) IS NULL
+                            OR f_table_schema = :schema)
+                        AND (CAST(:table_name AS text) IS NULL
+                            OR f_table_name = :table_name)
+                ) AS t
+            """
+
+        sql = sql_text("""
+            SELECT t.schema_name, t.table_name, c.relkind, c.reltuples,
+                CASE WHEN c.relkind IN ('r', 'm', 'p')
+                    THEN pg_total_relation_size(c.oid)
+                END AS total_size,
+                ARRAY(
+                    SELECT a.attname
+                    FROM pg_attribute a
+                    WHERE a.attrelid = c.oid AND a.attnum > 0
+                        AND NOT a.attisdropped
+                    ORDER BY a.attnum
+                ) AS columns,
+                ARRAY(
+                    SELECT a.attname
+                    FROM pg_index i
+                        JOIN pg_attribute a ON a.attrelid = i.indrelid
+                            AND a.attnum = ANY(i.indkey)
+                    WHERE i.indrelid = c.oid AND i.indisprimary
+                ) AS primary_key,
+                ARRAY(
+                    SELECT g.f_geometry_column
+                    FROM geometry_columns g
+                    WHERE g.f_table_schema = t.schema_name
+                        AND g.f_table_name = t.table_name
+                ) AS geometry_columns,
+                ARRAY(
+                    SELECT a.attname
+                    FROM pg_index i
+                        JOIN pg_class ic ON ic.oid = i.indexrelid
+                        JOIN pg_am am ON am.oid = ic.relam
+                        JOIN pg_attribute a ON a.attrelid = i.indrelid
+                            AND a.attnum = i.indkey[0]
+                    WHERE i.indrelid = c.oid AND i.indisvalid
+                        AND am.amname = ANY(:index_methods)
+                ) AS spatial_index_columns,
+                ARRAY(
+                    SELECT a.attname
+                    FROM pg_index i
+                        JOIN pg_attribute a ON a.attrelid = i.indrelid
+                            AND a.attnum = i.indkey[0]
+                    WHERE i.indrelid = c.oid AND i.indisvalid
+                ) AS indexed_columns,
+                ARRAY(
+                    SELECT a.attname
+                    FROM pg_index i
+                        JOIN pg_attribute a ON a.attrelid = i.indrelid
+                            AND a.attnum = i.indkey[0]
+                    WHERE i.indrelid = c.oid AND i.indisvalid
+                        AND i.indisunique AND i.indnatts = 1
+                ) AS unique_columns,
+                (s.last_analyze IS NOT NULL
+                    OR s.last_autoanalyze IS NOT NULL) AS analyzed,
+                s.n_mod_since_analyze
+            FROM {relations}
+                JOIN pg_namespace n ON n.nspname = t.schema_name
+                JOIN pg_class c ON c.relnamespace = n.oid
+                    AND c.relname = t.table_name
+                LEFT JOIN pg_stat_all_tables s ON s.relid = c.oid;
+        """.format(relations=relations))
+
+        table_infos = {}
+        result = conn.execute(sql, {
+            'index_methods': self.SPATIAL_INDEX_METHODS,
+            'schemas': [table[0] for table in tables or []],
+            'tables': [table[1] for table in tables or []],
+            'schema': schema,
+            'table_name': table_name
+        })
+        for row in result:
+            rows = None
+            if row['relkind'] != 'v' and row['reltuples'] >= 0:
+                # NOTE: reltuples is -1 (PG 14+) or 0 if never analyzed
+                rows = int(row['reltuples'])
+
+            table_infos[(row['schema_name'], row['table_name'])] = {
+                'relkind': row['relkind'],
+                'rows': rows,
+                'size': row['total_size'],
+                'columns': row['columns'],
+                'primary_key': row['primary_key'],
+                'geometry_columns': row['geometry_columns'],
+                'spatial_index_columns': row['spatial_index_columns'],
+                'indexed_columns': row['indexed_columns'],
+                'unique_columns': row['unique_columns'],
+                'analyzed': row['analyzed'],
+                'mod_since_analyze': row['n_mod_since_analyze']
+            }
+
+        return table_infos
+
+    def estimated_extents(self, engine, schema, table_name, geometry_columns):
+        """Return estimated extents as lookup by geometry column with
+        [<xmin>, <ymin>, <xmax>, <ymax>] or None if unknown.
+
+        NOTE: extents are based on table statistics and are cached
+
+        :param Engine engine: Database engine for data_source
+        :param str schema: DB schema name
+        :param str table_name: DB table name
+        :param list[str] geometry_columns: Geometry column names
+        """
+        key = (str(engine.url), schema, table_name)
+        extents = self.cache.get(key)
+        if extents is not None:
+            return extents
+
+        sql = sql_text("""
+            SELECT ST_XMin(e) AS xmin, ST_YMin(e) AS ymin,
+                ST_XMax(e) AS xmax, ST_YMax(e) AS ymax
+            FROM (
+                SELECT ST_EstimatedExtent(:schema, :table, :column) AS e
+            ) AS extent;
+        """)
+
+        extents = {}
+        with engine.connect() as conn:
+            for column in geometry_columns:
+                extents[column] = None
+                try:
+                    row = conn.execute(sql, {
+                        'schema': schema,
+                        'table': table_name,
+                        'column': column
+                    }).first()
+                    if row is not None and row['xmin'] is not None:
+                        extents[column] = [
+                            row['xmin'], row['ymin'], row['xmax'], row['ymax']
+                        ]
+                except DBAPIError as e:
+                    # e.g. no statistics for views or unanalyzed tables
+                    self.logger.info(
+                        "Could not get estimated extent of %s.%s.%s: %s" %
+                        (schema, table_name, column, e.orig)
+                    )
+
+        self.cache.set(key, extents)
+        return extents
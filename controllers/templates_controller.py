@@ -13,9 +13,10 @@ from flask import abort, flash, render_template, request, Response, \
 
 from .contacts_helper import ContactsHelper
 from .controller import Controller
-from .ows_helper import OWSHelper
+from .lookup_helper import LookupHelper
 from .permissions_helper import PermissionsHelper
 from forms import TemplateForm
+from service_lib.tenant_config_models import TenantModel
 
 
 class TemplatesController(Controller):
@@ -31,29 +32,39 @@ class TemplatesController(Controller):
     # relative to PROJECT_OUTPUT_DIR resp. JASPER_REPORTS_DIR
     UPLOADS_SUB_DIR = 'uploads'
 
-    def __init__(self, app, config_models, service_config):
+    # NOTE: edit form shows status of upload tasks, which is not tracked by
+    #       data versions
+    CONDITIONAL_EDIT = False
+
+    # ConfigDB models of current tenant
+    Template = TenantModel('template')
+    TemplateJasper = TenantModel('template_jasper')
+    TemplateInfo = TenantModel('template_info')
+    TemplateQGIS = TenantModel('template_qgis')
+    DataSet = TenantModel('data_set')
+    OWSLayer = TenantModel('ows_layer')
+
+    def __init__(self, app, config_models, data_versions, name_registry,
+                 service_config, task_queue):
         """Constructor
 
         :param Flask app: Flask application
         :param ConfigModels config_models: Helper for ORM models
+        :param DataVersions data_versions: Change counters of ConfigDB tables
+        :param NameRegistry name_registry: Registry of resource names
         :param func service_config: Helper method for reading service config
+        :param TaskQueue task_queue: Queue for upload post-processing tasks
         """
         super(TemplatesController, self).__init__(
             "Template", 'templates', 'template', 'templates_gui', app,
-            config_models
+            config_models, data_versions, name_registry
         )
         self.service_config = service_config
+        self.task_queue = task_queue
         self.ContactsHelper = ContactsHelper(config_models, app.logger)
-        self.OWSHelper = OWSHelper(config_models)
+        self.LookupHelper = LookupHelper(config_models, app.logger)
         self.PermissionsHelper = PermissionsHelper(config_models)
 
-        self.Template = self.config_models.model('template')
-        self.TemplateJasper = self.config_models.model('template_jasper')
-        self.TemplateInfo = self.config_models.model('template_info')
-        self.TemplateQGIS = self.config_models.model('template_qgis')
-        self.DataSet = self.config_models.model('data_set')
-        self.OWSLayer = self.config_models.model('ows_layer')
-
         # add custom routes
         base_route = self.base_route
         suffix = self.endpoint_suffix
@@ -190,6 +201,17 @@ class TemplatesController(Controller):
                         (filename, filename)
                     )
 
+            # show status of any upload post-processing
+            status_message = self.task_queue.status_message(resource.gdi_oid)
+            if status_message:
+                if resource.type == 'jasper':
+                    file_field = form.jasper_file
+                else:
+                    file_field = form.qgis_file
+                file_field.description = "%s<br><strong>%s</strong>" % (
+                    file_field.description, status_message
+                )
+
             if resource.type == 'jasper':
                 # add data products for resource on edit
                 for ows_layer in resource.ows_layers:
@@ -217,16 +239,6 @@ class TemplatesController(Controller):
         # load related resources from DB
         session = self.session()
 
-        # get OWS layers
-        query = session.query(self.OWSLayer).order_by(self.OWSLayer.name)
-        # skip WMS root layers
-        root_layers = self.OWSHelper.ows_root_layers(session)
-        root_layer_ids = [l.gdi_oid for l in root_layers]
-        if root_layer_ids:
-            query = query.filter(~self.OWSLayer.gdi_oid.in_(root_layer_ids))
-
-        ows_layers = query.all()
-
         # get data sets
         query = session.query(self.DataSet) \
             .order_by(self.DataSet.data_set_name) \
@@ -237,31 +249,30 @@ class TemplatesController(Controller):
         session.close()
 
         # set choices for responsible select field
-        form.responsible.choices = [(0, "")] + \
-            self.ContactsHelper.person_choices()
+        self.LookupHelper.lazy_choices(form.responsible, 'persons')
 
         # set choices for data product select field
-        form.data_product.choices = [(0, "")] + [
-            (d.gdi_oid, d.name) for d in ows_layers
-        ]
+        # NOTE: OWS layers are loaded via lookup endpoint, skipping WMS root
+        #       layers and data products from data products subform
+        self.LookupHelper.lazy_choices(
+            form.data_product, 'layers',
+            exclude_inputs=(
+                'input[name^="data_products-"][name$="-data_product_id"]'
+            )
+        )
 
         # set choices for data set select field
         form.data_set.choices = [(0, "")] + [
             (d.gdi_oid, d.data_set_name) for d in data_sets
         ]
 
-        # collect role ids from permissions subform
-        role_permission_ids = [
-            int(permission.data['role_id']) for permission in form.permissions
-        ]
-
         # set choices for role permission select field
-        # skip roles from permissions subform
-        roles = self.PermissionsHelper.roles()
-        form.role.choices = [
-            (role.id, role.name) for role in roles
-            if role.id not in role_permission_ids
-        ]
+        # NOTE: roles are loaded via lookup endpoint, skipping roles from
+        #       permissions subform
+        self.LookupHelper.lazy_choices(
+            form.role, 'roles',
+            exclude_inputs='input[name^="permissions-"][name$="-role_id"]'
+        )
 
         return form
 
@@ -296,7 +307,7 @@ class TemplatesController(Controller):
         if form.type.data == 'jasper':
             if form.jasper_file.data:
                 # save uploaded JasperReports file
-                self.save_jasper_report(template, form)
+                self.save_jasper_report(template, form, session)
             elif template.report_filename is None:
                 # upload missing for new template
                 self.raise_validation_error(
@@ -357,7 +368,7 @@ class TemplatesController(Controller):
         elif form.type.data == 'qgis':
             if form.qgis_file.data:
                 # save uploaded QPT and resources
-                self.save_qgs_print_layout(template, form)
+                self.save_qgs_print_layout(template, form, session)
             elif template.qgs_print_layout is None:
                 # upload missing for new template
                 self.raise_validation_error(
@@ -629,11 +640,14 @@ class TemplatesController(Controller):
             res.headers['content-disposition'] = "filename=%s" % filename
         return res
 
-    def save_jasper_report(self, template, form):
+    def save_jasper_report(self, template, form, session):
         """Save uploaded JasperReports report.
 
+        NOTE: extraction of a ZIP file is queued as background task
+
         :param object template: template object
         :param FlaskForm form: Form for Template
+        :param Session session: DB session
         """
 
         # Cleanup previous report
@@ -656,10 +670,10 @@ class TemplatesController(Controller):
 
                 # create uuid directory
                 extractdir = str(uuid.uuid4())
-                extractpath = os.path.join(self.jasper_reports_dir(), extractdir)
-                os.mkdir(extractpath, 0o755)
-
-                zip_file.extractall(extractpath)
+                target_path = os.path.join(
+                    self.jasper_reports_dir(), extractdir
+                )
+                os.mkdir(target_path, 0o755)
 
                 # save report filename
                 template.report_filename = extractdir + "/master.jrxml"
@@ -693,7 +707,8 @@ class TemplatesController(Controller):
 
             # save uploaded original file
             filename = form.jasper_file.data.filename
-            with open(os.path.join(target_dir, filename), 'wb') as f:
+            target_path = os.path.join(target_dir, filename)
+            with open(target_path, 'wb') as f:
                 # reset file stream
                 request.files[form.jasper_file.name].seek(0)
 
@@ -701,6 +716,16 @@ class TemplatesController(Controller):
 
             # save path to uploaded file
             template.uploaded_report = os.path.join(sub_dir, filename)
+
+            if is_zip:
+                # extract report files from uploaded ZIP in background
+                self.task_queue.enqueue('extract_zip', template, {
+                    'zip_path': target_path,
+                    'target_dir': os.path.join(
+                        self.jasper_reports_dir(), extractdir
+                    ),
+                    'members': None
+                }, session)
         except zipfile.BadZipFile as e:
             self.raise_validation_error(
                 form.qgis_file, "Datei ist kein ZIP"
@@ -734,14 +759,19 @@ class TemplatesController(Controller):
                 form.info_file, "HTML Encoding ist nicht UTF-8"
             )
 
-    def save_qgs_print_layout(self, template, form):
+    def save_qgs_print_layout(self, template, form, session):
         """Extract files from uploaded ZIP file and save resources and QPT
         with adjusted resource paths.
 
+        NOTE: extraction of resources from a ZIP file is queued as
+              background task
+
         :param object template: template object
         :param FlaskForm form: Form for Template
+        :param Session session: DB session
         """
         try:
+            resources = {}
             is_zip = not form.qgis_file.data.filename.endswith('.qpt')
             if is_zip:
                 # open uploaded ZIP data
@@ -772,8 +802,8 @@ class TemplatesController(Controller):
                 root = ElementTree.fromstring(qpt_data)
 
                 if is_zip:
-                    # save and update resources from ZIP
-                    self.update_qpt_resources(root, zip_file)
+                    # update resource paths from ZIP
+                    resources = self.update_qpt_resources(root, zip_file)
 
                 # extract size of first map item
                 template.map_width = 0
@@ -807,7 +837,8 @@ class TemplatesController(Controller):
 
             # save uploaded original file
             filename = form.qgis_file.data.filename
-            with open(os.path.join(target_dir, filename), 'wb') as f:
+            upload_path = os.path.join(target_dir, filename)
+            with open(upload_path, 'wb') as f:
                 # reset file stream
                 request.files[form.qgis_file.name].seek(0)
 
@@ -815,6 +846,14 @@ class TemplatesController(Controller):
 
             # save path to uploaded file
             template.uploaded_qpt = os.path.join(sub_dir, filename)
+
+            if resources:
+                # extract resources from uploaded ZIP in background
+                self.task_queue.enqueue('extract_zip', template, {
+                    'zip_path': upload_path,
+                    'target_dir': self.print_resources_dir(),
+                    'members': resources
+                }, session)
         except zipfile.BadZipFile as e:
             self.raise_validation_error(
                 form.qgis_file, "Datei ist kein ZIP"
@@ -825,11 +864,14 @@ class TemplatesController(Controller):
             )
 
     def update_qpt_resources(self, root, zip_file):
-        """Save resources with hashed filename and update resource paths in QPT.
+        """Update resource paths in QPT with hashed filenames and return
+        lookup for resource files to extract as
+        {<filename in ZIP>: <hashed filename>}.
 
         :param xml.etree.ElementTree.Element root: XML root node
         :param zipfile.ZipFile zip_file: ZIP file
         """
+        resources = {}
         for picture in root.findall(".//ComposerPicture"):
             resource_path = picture.get('file')
             resource_filename = os.path.basename(resource_path)
@@ -847,18 +889,16 @@ class TemplatesController(Controller):
                 )
                 picture.set('file', new_path)
 
-                self.logger.info("Save and update print resource: %s => %s" %
+                self.logger.info("Update print resource: %s => %s" %
                                  (resource_path, new_path))
 
-                # save resource file with hashed filename
-                target_path = os.path.join(
-                    self.print_resources_dir(), new_filename
-                )
-                with open(target_path, 'wb') as f:
-                    f.write(zip_file.open(resource_filename).read())
+                # mark resource file for saving with hashed filename
+                resources[resource_filename] = new_filename
             else:
                 self.logger.warning("Missing QPT resource: %s" % resource_path)
 
+        return resources
+
     def update_qpt_name(self, template, name):
         """Update composer name in QPT.
 
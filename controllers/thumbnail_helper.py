@@ -0,0 +1,367 @@
+import hashlib
+import io
+import os
+import re
+import uuid
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:
+    # NOTE: Pillow is optional
+    Image = None
+
+
+class ThumbnailHelper():
+    """Helper for thumbnail images of maps and background layers
+
+    Uploaded images are validated and saved unchanged, and then processed in
+    the background by the upload worker (see TaskQueue): they are scaled down
+    to the configured max size and re-encoded to optimized PNG and WebP
+    variants, which are named by the MD5 hash of their content. The
+    thumbnail_image of the resource is then switched to the variant in the
+    configured format.
+
+    Uploads and variants are written to the subdir 'thumbnails' of the QWC
+    assets dir, and thumbnail_image is relative to the QWC assets dir.
+
+    NOTE: thumbnails are saved unprocessed if Pillow is not installed
+    """
+
+    TASK_TYPE = 'process_thumbnail'
+
+    # models with thumbnails
+    MODELS = ['map', 'background_layer']
+
+    # supported image formats of uploads
+    FORMATS = ['PNG', 'JPEG', 'GIF', 'WEBP']
+    # max pixels of uploaded images
+    MAX_PIXELS = 50000000
+
+    # default max thumbnail size as [<width>, <height>]
+    DEFAULT_SIZE = [400, 300]
+    # default format of referenced variant
+    DEFAULT_FORMAT = 'webp'
+    WEBP_QUALITY = 85
+
+    # names of processed variants
+    # NOTE: keep in sync with UploadCleanup
+    VARIANT_PATTERN = re.compile(r'^[0-9a-f]{32}\.(png|webp)$')
+
+    # subdir for uploads and variants relative to QWC assets dir
+    # NOTE: keep in sync with UploadCleanup
+    THUMBNAILS_SUB_DIR = 'thumbnails'
+
+    def __init__(self, config_models, service_config, task_queue, logger):
+        """Constructor
+
+        :param ConfigModels config_models: Helper for ORM models
+        :param func service_config: Helper method for reading service config
+        :param TaskQueue task_queue: Queue for upload post-processing tasks
+        :param Logger logger: Application logger
+        """
+        self.config_models = config_models
+        self.service_config = service_config
+        self.task_queue = task_queue
+        self.logger = logger
+
+        task_queue.register_handler(self.TASK_TYPE, self.process_task)
+
+    def save_upload(self, resource, model_name, file, session):
+        """Validate and save an uploaded thumbnail image for a resource,
+        and queue its processing.
+
+        Raise ValueError with validation message if the upload is not a
+        supported image.
+
+        :param object resource: Map or background_layer object
+        :param str model_name: Model name of resource
+        :param FileStorage file: Uploaded file
+        :param Session session: DB session
+        """
+        data = file.read()
+        self.validate(data)
+
+        target_filename = self.thumbnail_path(
+            str(uuid.uuid4()) + os.path.splitext(file.filename)[1]
+        )
+        target_path = os.path.join(self.qwc_assets_dir(), target_filename)
+        os.makedirs(os.path.dirname(target_path), 0o755, True)
+        with open(target_path, 'wb') as f:
+            f.write(data)
+        resource.thumbnail_image = target_filename
+
+        if Image is not None:
+            # scale down and re-encode thumbnail in background
+            self.task_queue.enqueue(self.TASK_TYPE, resource, {
+                'model': model_name,
+                'filename': target_filename
+            }, session)
+
+    def remove(self, resource):
+        """Remove thumbnail image of a resource.
+
+        NOTE: processed variants may be shared by resources with identical
+              thumbnails, and are left for removal by cleanup-uploads
+
+        :param object resource: Map or background_layer object
+        """
+        filename = os.path.basename(resource.thumbnail_image or '')
+        if filename and not self.VARIANT_PATTERN.match(filename):
+            thumbnail_path = os.path.join(
+                self.qwc_assets_dir(), resource.thumbnail_image
+            )
+            try:
+                os.remove(thumbnail_path)
+            except Exception as e:
+                self.logger.warning(
+                    "Failed to remove thumbnail %s: %s" % (thumbnail_path, e)
+                )
+        resource.thumbnail_image = None
+
+    def validate(self, data):
+        """Raise ValueError with validation message if image data is not a
+        supported image.
+
+        :param bytes data: Image data
+        """
+        if Image is None:
+            # no validation without Pillow
+            return
+
+        try:
+            image = Image.open(io.BytesIO(data))
+            image_format = image.format
+            width, height = image.size
+            # check image integrity without decoding it
+            image.verify()
+        except Exception as e:
+            self.logger.info("Invalid thumbnail image: %s" % e)
+            raise ValueError("Datei ist kein gültiges Bild")
+
+        if image_format not in self.FORMATS:
+            raise ValueError(
+                "Bildformat %s wird nicht unterstützt (erlaubt: %s)" %
+                (image_format, ", ".join(self.FORMATS))
+            )
+        if width * height > self.MAX_PIXELS:
+            raise ValueError(
+                "Bild ist zu gross (%dx%d Pixel)" % (width, height)
+            )
+
+    def process_task(self, params, session):
+        """Task handler for processing an uploaded thumbnail image.
+
+        Task params:
+            model: Model name of resource
+            filename: Path of uploaded thumbnail relative to QWC assets dir
+
+        :param obj params: Task params
+        :param Session session: DB session
+        """
+        model = self.config_models.model(params['model'])
+        resources = session.query(model).filter(
+            model.thumbnail_image == params['filename']
+        ).all()
+        if not resources:
+            # thumbnail has since been replaced or removed
+            self.logger.info(
+                "Skipping unreferenced thumbnail %s" % params['filename']
+            )
+            return
+
+        result = self.optimize(
+            os.path.join(self.qwc_assets_dir(), params['filename'])
+        )
+        for resource in resources:
+            resource.thumbnail_image = result['filename']
+
+        self.logger.info(
+            "Thumbnail %s: %s" % (params['filename'], self.summary(result))
+        )
+
+    def optimize_existing(self, apply=False):
+        """Process thumbnails of all resources that have not been processed
+        yet, and return results as [(<model>, <name>, <result or error>)].
+
+        :param bool apply: Write variants and update resources if set
+        """
+        if Image is None:
+            raise ValueError("Pillow is required for processing thumbnails")
+
+        results = []
+        assets_dir = self.qwc_assets_dir()
+
+        session = self.config_models.session()
+        try:
+            for model_name in self.MODELS:
+                model = self.config_models.model(model_name)
+                query = session.query(model) \
+                    .filter(model.thumbnail_image.isnot(None)) \
+                    .order_by(model.name)
+                for resource in query.all():
+                    filename = os.path.basename(resource.thumbnail_image)
+                    if self.VARIANT_PATTERN.match(filename):
+                        # already processed
+                        continue
+
+                    try:
+                        result = self.optimize(
+                            os.path.join(
+                                assets_dir, resource.thumbnail_image
+                            ),
+                            apply
+                        )
+                    except Exception as e:
+                        results.append((model_name, resource.name, str(e)))
+                        continue
+
+                    if apply:
+                        resource.thumbnail_image = result['filename']
+                    results.append((model_name, resource.name, result))
+
+            if apply:
+                session.commit()
+        finally:
+            session.close()
+
+        return results
+
+    def optimize(self, path, write=True):
+        """Scale down and re-encode a thumbnail image to PNG and WebP
+        variants, and return the result as
+        {
+            'filename': <path of referenced variant relative to QWC
+                         assets dir>,
+            'width': <width>,
+            'height': <height>,
+            'original_size': <size of original in bytes>,
+            'size': <size of referenced variant in bytes>,
+            'variants': {<format>: <size in bytes>}
+        }
+
+        :param str path: Path to original image
+        :param bool write: Write variants to thumbnails dir if set
+        """
+        original_size = os.path.getsize(path)
+
+        with Image.open(path) as original:
+            # apply any EXIF orientation, e.g. of photos
+            image = ImageOps.exif_transpose(original)
+
+        if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            has_alpha = (
+                image.mode in ('PA', 'RGBa') or 'transparency' in image.info
+            )
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        # NOTE: only scales down, keeping the aspect ratio
+        image.thumbnail(tuple(self.max_size()), Image.LANCZOS)
+
+        variants = {
+            'png': self.encode(image, 'PNG', optimize=True)
+        }
+        if features.check('webp'):
+            variants['webp'] = self.encode(
+                image, 'WEBP', quality=self.WEBP_QUALITY, method=6
+            )
+
+        # name all variants by hash of PNG content
+        basename = hashlib.md5(variants['png']).hexdigest()
+        if write:
+            for ext, data in variants.items():
+                self.write_variant(
+                    self.thumbnail_path('%s.%s' % (basename, ext)), data
+                )
+
+        variant_format = self.thumbnail_format()
+        if variant_format not in variants:
+            variant_format = 'png'
+
+        return {
+            'filename': self.thumbnail_path(
+                '%s.%s' % (basename, variant_format)
+            ),
+            'width': image.width,
+            'height': image.height,
+            'original_size': original_size,
+            'size': len(variants[variant_format]),
+            'variants': {
+                ext: len(data) for ext, data in variants.items()
+            }
+        }
+
+    def encode(self, image, image_format, **options):
+        """Return encoded image data.
+
+        :param Image image: Image
+        :param str image_format: Target image format
+        :param obj options: Encoder options
+        """
+        output = io.BytesIO()
+        image.save(output, image_format, **options)
+        return output.getvalue()
+
+    def write_variant(self, filename, data):
+        """Write variant to thumbnails dir, unless already present.
+
+        :param str filename: Path of variant relative to QWC assets dir
+        :param bytes data: Image data
+        """
+        target_path = os.path.join(self.qwc_assets_dir(), filename)
+        if os.path.exists(target_path):
+            # NOTE: identical content for identical hash
+            return
+
+        os.makedirs(os.path.dirname(target_path), 0o755, True)
+
+        # NOTE: write to temp file first, so that clients never load a
+        #       partially written thumbnail
+        tmp_path = "%s.%s.tmp" % (target_path, uuid.uuid4().hex)
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, target_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def summary(self, result):
+        """Return summary of size savings of a processing result.
+
+        :param obj result: Result of optimize()
+        """
+        original_size = result['original_size']
+        savings = 100.0 * (original_size - result['size']) / \
+            max(original_size, 1)
+        return "%d -> %d bytes (%.0f%% saved), %dx%d, %s (%s)" % (
+            original_size, result['size'], savings,
+            result['width'], result['height'], result['filename'],
+            ", ".join([
+                "%s %d bytes" % (ext, size)
+                for ext, size in sorted(result['variants'].items())
+            ])
+        )
+
+    def max_size(self):
+        """Return max thumbnail size as [<width>, <height>]."""
+        config = self.service_config()
+        return config.get('thumbnail_size', self.DEFAULT_SIZE)
+
+    def thumbnail_format(self):
+        """Return format of referenced variant ('png' or 'webp')."""
+        config = self.service_config()
+        return config.get('thumbnail_format', self.DEFAULT_FORMAT)
+
+    def thumbnail_path(self, filename):
+        """Return path of a thumbnail file relative to QWC assets dir.
+
+        :param str filename: Filename of upload or variant
+        """
+        return '%s/%s' % (self.THUMBNAILS_SUB_DIR, filename)
+
+    def qwc_assets_dir(self):
+        """Return target dir for QWC assets."""
+        # get dir from service config
+        config = self.service_config()
+        return config.get('qwc_assets_dir', '/tmp/')
@@ -3,6 +3,7 @@ from sqlalchemy.sql import text as sql_text
 
 from .controller import Controller
 from forms import TransformationForm
+from service_lib.tenant_config_models import TenantModel
 
 
 class TransformationController(Controller):
@@ -11,21 +12,26 @@ class TransformationController(Controller):
     Manage transformation from GUI.
     """
 
-    def __init__(self, app, config_models, db_engine):
+    # ConfigDB models of current tenant
+    Transformation = TenantModel('transformation')
+    DataSet = TenantModel('data_set')
+
+    def __init__(self, app, config_models, data_versions, name_registry,
+                 db_engine):
         """Constructor
 
         :param Flask app: Flask application
         :param ConfigModels config_models: Helper for ORM models
+        :param DataVersions data_versions: Change counters of ConfigDB tables
+        :param NameRegistry name_registry: Registry of resource names
         """
         super(TransformationController, self).__init__(
             "Transformation", 'transformation', 'transformation',
-            'transformation', app, config_models
+            'transformation', app, config_models,
+            data_versions, name_registry
         )
         self.db_engine = db_engine
 
-        self.Transformation = self.config_models.model('transformation')
-        self.DataSet = self.config_models.model('data_set')
-
     def resource_pkey(self):
         """Return primary key column name."""
         return 'gdi_oid'
@@ -1,22 +1,28 @@
 from .controller import Controller
 from forms import UserForm
+from service_lib.tenant_config_models import TenantModel
 
 
 class UsersController(Controller):
     """Controller for user model"""
 
-    def __init__(self, app, config_models):
+    # ConfigDB models of current tenant
+    User = TenantModel('user')
+    Group = TenantModel('group')
+    Role = TenantModel('role')
+
+    def __init__(self, app, config_models, data_versions, name_registry):
         """Constructor
 
         :param Flask app: Flask application
         :param ConfigModels config_models: Helper for ORM models
+        :param DataVersions data_versions: Change counters of ConfigDB tables
+        :param NameRegistry name_registry: Registry of resource names
         """
         super(UsersController, self).__init__(
-            "Benutzer", 'users', 'user', 'users', app, config_models
+            "Benutzer", 'users', 'user', 'users', app, config_models,
+            data_versions, name_registry
         )
-        self.User = self.config_models.model('user')
-        self.Group = self.config_models.model('group')
-        self.Role = self.config_models.model('role')
 
     def resources_for_index(self, session):
         """Return users list.
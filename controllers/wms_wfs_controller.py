@@ -3,6 +3,7 @@ from sqlalchemy.exc import IntegrityError, InternalError
 from wtforms import ValidationError
 
 from forms import WmsWfsForm
+from service_lib.tenant_config_models import TenantModel
 
 
 class WmsWfsController:
@@ -11,6 +12,9 @@ class WmsWfsController:
     Update WMS/WFS metadata in wms_wfs.
     """
 
+    # ConfigDB models of current tenant
+    WmsWfs = TenantModel('wms_wfs')
+
     def __init__(self, app, config_models, db_engine):
         """Constructor
 
@@ -25,8 +29,6 @@ class WmsWfsController:
         self.logger = app.logger
         self.config_models = config_models
 
-        self.WmsWfs = self.config_models.model('wms_wfs')
-
         # add custom routes
         base_route = self.base_route
         suffix = self.endpoint_suffix
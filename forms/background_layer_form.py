@@ -26,36 +26,35 @@ class BackgroundLayerForm(FlaskForm):
 
     submit = SubmitField('Speichern')
 
-    def __init__(self, config_models, **kwargs):
+    def __init__(self, config_models, name_registry, **kwargs):
         """Constructor
 
         :param ConfigModels config_models: Helper for ORM models
+        :param NameRegistry name_registry: Registry of resource names
         """
         self.config_models = config_models
-        self.BackgroundLayer = self.config_models.model('background_layer')
+        self.name_registry = name_registry
 
         # store any provided user object
         self.obj = kwargs.get('obj')
 
         super(BackgroundLayerForm, self).__init__(**kwargs)
 
+        # check availability of name while typing
+        self.name_registry.enable_check(
+            self.name, 'background_layer',
+            self.obj.gdi_oid if self.obj else None
+        )
+
     def validate_name(self, field):
         """Validate uniqueness of name"""
         # check if BackgroundLayer name exists
-        session = self.config_models.session()
-        query = session.query(self.BackgroundLayer).filter_by(name=field.data)
-        if self.obj:
-            # ignore current background_layer
-            query = query.filter(
-                self.BackgroundLayer.gdi_oid != self.obj.gdi_oid
-            )
-        background_layer = query.first()
-        session.close()
-
-        if background_layer is not None:
-            raise ValidationError(
-                'Ein BackgroundLayer mit diesem Namen ist bereits vorhanden'
-            )
+        msg = self.name_registry.check(
+            'background_layer', field.data,
+            self.obj.gdi_oid if self.obj else None
+        )
+        if msg is not None:
+            raise ValidationError(msg)
 
     def validate_qwc2_bg_layer_config(self, field):
         """Validate QWC2 config"""
@@ -21,31 +21,30 @@ class DataSourceForm(FlaskForm):
 
     submit = SubmitField('Speichern')
 
-    def __init__(self, config_models, **kwargs):
+    def __init__(self, config_models, name_registry, **kwargs):
         """Constructor
 
         :param ConfigModels config_models: Helper for ORM models
+        :param NameRegistry name_registry: Registry of resource names
         """
         self.config_models = config_models
-        self.DataSource = self.config_models.model('data_source')
+        self.name_registry = name_registry
 
         # store any provided user object
         self.obj = kwargs.get('obj')
 
         super(DataSourceForm, self).__init__(**kwargs)
 
+        # check availability of name while typing
+        self.name_registry.enable_check(
+            self.name, 'data_source', self.obj.gdi_oid if self.obj else None
+        )
+
     def validate_name(self, field):
         """Validate uniqueness of name"""
         # check if DataSource name exists
-        session = self.config_models.session()
-        query = session.query(self.DataSource).filter_by(name=field.data)
-        if self.obj:
-            # ignore current data_source
-            query = query.filter(self.DataSource.gdi_oid != self.obj.gdi_oid)
-        data_source = query.first()
-        session.close()
-
-        if data_source is not None:
-            raise ValidationError(
-                'Eine DataSource mit diesem Namen ist bereits vorhanden'
-            )
+        msg = self.name_registry.check(
+            'data_source', field.data, self.obj.gdi_oid if self.obj else None
+        )
+        if msg is not None:
+            raise ValidationError(msg)
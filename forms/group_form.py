@@ -31,31 +31,30 @@ class GroupForm(FlaskForm):
 
     submit = SubmitField('Speichern')
 
-    def __init__(self, config_models, **kwargs):
+    def __init__(self, config_models, name_registry, **kwargs):
         """Constructor
 
         :param ConfigModels config_models: Helper for ORM models
+        :param NameRegistry name_registry: Registry of resource names
         """
         self.config_models = config_models
-        self.Group = self.config_models.model('group')
+        self.name_registry = name_registry
 
         # store any provided user object
         self.obj = kwargs.get('obj')
 
         super(GroupForm, self).__init__(**kwargs)
 
+        # check availability of name while typing
+        self.name_registry.enable_check(
+            self.name, 'group', self.obj.id if self.obj else None
+        )
+
     def validate_name(self, field):
         """Validate uniqueness of name"""
         # check if Group name exists
-        session = self.config_models.session()
-        query = session.query(self.Group).filter_by(name=field.data)
-        if self.obj:
-            # ignore current group
-            query = query.filter(self.Group.id != self.obj.id)
-        group = query.first()
-        session.close()
-
-        if group is not None:
-            raise ValidationError(
-                'Eine Gruppe mit diesem Namen ist bereits vorhanden'
-            )
+        msg = self.name_registry.check(
+            'group', field.data, self.obj.id if self.obj else None
+        )
+        if msg is not None:
+            raise ValidationError(msg)
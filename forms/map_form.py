@@ -65,31 +65,30 @@ class MapForm(FlaskForm):
 
     submit = SubmitField('Speichern')
 
-    def __init__(self, config_models, **kwargs):
+    def __init__(self, config_models, name_registry, **kwargs):
         """Constructor
 
         :param ConfigModels config_models: Helper for ORM models
+        :param NameRegistry name_registry: Registry of resource names
         """
         self.config_models = config_models
-        self.Map = self.config_models.model('map')
+        self.name_registry = name_registry
 
         # store any provided user object
         self.obj = kwargs.get('obj')
 
         super(MapForm, self).__init__(**kwargs)
 
+        # check availability of name while typing
+        self.name_registry.enable_check(
+            self.name, 'map', self.obj.gdi_oid if self.obj else None
+        )
+
     def validate_name(self, field):
         """Validate uniqueness of name"""
         # check if Map name exists
-        session = self.config_models.session()
-        query = session.query(self.Map).filter_by(name=field.data)
-        if self.obj:
-            # ignore current map
-            query = query.filter(self.Map.gdi_oid != self.obj.gdi_oid)
-        map_obj = query.first()
-        session.close()
-
-        if map_obj is not None:
-            raise ValidationError(
-                'Eine Map mit diesem Namen ist bereits vorhanden'
-            )
+        msg = self.name_registry.check(
+            'map', field.data, self.obj.gdi_oid if self.obj else None
+        )
+        if msg is not None:
+            raise ValidationError(msg)
@@ -40,31 +40,30 @@ class ModuleForm(FlaskForm):
 
     submit = SubmitField('Speichern')
 
-    def __init__(self, config_models, **kwargs):
+    def __init__(self, config_models, name_registry, **kwargs):
         """Constructor
 
         :param ConfigModels config_models: Helper for ORM models
+        :param NameRegistry name_registry: Registry of resource names
         """
         self.config_models = config_models
-        self.Module = self.config_models.model('module')
+        self.name_registry = name_registry
 
         # store any provided user object
         self.obj = kwargs.get('obj')
 
         super(ModuleForm, self).__init__(**kwargs)
 
+        # check availability of name while typing
+        self.name_registry.enable_check(
+            self.name, 'module', self.obj.gdi_oid if self.obj else None
+        )
+
     def validate_name(self, field):
         """Validate uniqueness of name"""
         # check if Module name exists
-        session = self.config_models.session()
-        query = session.query(self.Module).filter_by(name=field.data)
-        if self.obj:
-            # ignore current module
-            query = query.filter(self.Module.gdi_oid != self.obj.gdi_oid)
-        module = query.first()
-        session.close()
-
-        if module is not None:
-            raise ValidationError(
-                'Ein Module mit diesem Namen ist bereits vorhanden'
-            )
+        msg = self.name_registry.check(
+            'module', field.data, self.obj.gdi_oid if self.obj else None
+        )
+        if msg is not None:
+            raise ValidationError(msg)
@@ -46,50 +46,30 @@ class ProductSetGUIForm(FlaskForm):
 
     submit = SubmitField('Speichern')
 
-    def __init__(self, config_models, **kwargs):
+    def __init__(self, config_models, name_registry, **kwargs):
         """Constructor
 
         :param ConfigModels config_models: Helper for ORM models
+        :param NameRegistry name_registry: Registry of resource names
         """
         self.config_models = config_models
-        self.DataSetView = self.config_models.model('data_set_view')
-        self.OWSLayerGroup = self.config_models.model('ows_layer_group')
+        self.name_registry = name_registry
 
         # store any provided user object
         self.obj = kwargs.get('obj')
 
         super(ProductSetGUIForm, self).__init__(**kwargs)
 
+        # check availability of name while typing
+        self.name_registry.enable_check(
+            self.name, 'product_set', self.obj.gdi_oid if self.obj else None
+        )
+
     def validate_name(self, field):
         """Validate uniqueness of DataSet and ProductSet name"""
-        session = self.config_models.session()
-
-        # check if DataSet name exists
-        query = session.query(self.DataSetView).filter_by(name=field.data)
-        data_set_view = query.first()
-
-        # check if ProductSet name exists
-        query = session.query(self.OWSLayerGroup).filter_by(name=field.data)
-        if self.obj:
-            # ignore current ows_layer_data
-            query = query.filter(
-                self.OWSLayerGroup.gdi_oid != self.obj.gdi_oid
-            )
-        ows_layer_group = query.first()
-
-        # allow identical names for WMS and WFS root layers
-        skip_root_layers = (
-            ows_layer_group and self.obj and ows_layer_group.wms_wfs_collection
-            and self.obj.wms_wfs_collection
+        # check if DataSet or ProductSet name exists
+        msg = self.name_registry.check(
+            'product_set', field.data, self.obj.gdi_oid if self.obj else None
         )
-
-        session.close()
-
-        if data_set_view is not None:
-            raise ValidationError(
-                'Ein DataSet mit diesem Namen ist bereits vorhanden'
-            )
-        if ows_layer_group is not None and not skip_root_layers:
-            raise ValidationError(
-                'Ein ProductSet mit diesem Namen ist bereits vorhanden'
-            )
+        if msg is not None:
+            raise ValidationError(msg)
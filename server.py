@@ -1,7 +1,10 @@
+import functools
 import os
 import sys
+import time
 
-from flask import Flask, jsonify, render_template
+import click
+from flask import Flask, json, jsonify, render_template
 from flask_bootstrap import Bootstrap
 from flask_wtf.csrf import CSRFProtect
 
@@ -9,13 +12,32 @@ from controllers import DataSourcesController, DataSetGUIController,\
     ProductSetGUIController, BackgroundLayersController, MapsController,\
     TemplatesController, UsersController, GroupsController, RolesController, \
     ServiceController, ModuleController, TransformationController, \
-    WmsWfsController, ContactsController, PublishController
+    WmsWfsController, ContactsController, PublishController, \
+    IndexAdvisorController, ConfigDiffController, ImpactController, \
+    ConfigLintController, EffectivePermissionsController, AuditController, \
+    LookupController, NameCheckController
+from controllers.audit_retention_helper import AuditRetentionHelper
+from controllers.bundle_helper import BundleHelper
+from controllers.config_diff_helper import ConfigDiffHelper
+from controllers.config_linter_helper import ConfigLinterHelper
+from controllers.controller import Controller
+from controllers.data_set_transfer_helper import DataSetTransferHelper
+from controllers.iam_sync_helper import IAMSyncHelper
+from controllers.thumbnail_helper import ThumbnailHelper
 
 from qwc_services_core.runtime_config import RuntimeConfig
 from qwc_services_core.tenant_handler import TenantHandler
 from service_lib.auth import auth_manager, optional_auth, get_auth_user
+from service_lib.compression import ResponseCompression
+from service_lib.data_versions import DataVersions
 from service_lib.database import DatabaseEngine
-from service_lib.config_models import ConfigModels
+from service_lib.name_registry import NameRegistry
+from service_lib.raster_index import RasterIndex
+from service_lib.static_assets import StaticAssets
+from service_lib.task_queue import TaskQueue
+from service_lib.tenant_config_models import TenantConfigModels
+from service_lib.tenant_context import TenantContext
+from service_lib.upload_cleanup import UploadCleanup
 
 
 # Flask application
@@ -32,8 +54,21 @@ csrf = CSRFProtect(app)
 # load Bootstrap extension
 Bootstrap(app)
 
+# compress responses (if not compressed by reverse proxy)
+# NOTE: responses containing a CSRF token are never compressed
+COMPRESS_RESPONSES = os.environ.get('COMPRESS_RESPONSES', "False")
+if COMPRESS_RESPONSES.lower() in ("t", "true"):
+    ResponseCompression(
+        app, min_size=int(os.environ.get('COMPRESS_MIN_SIZE', 1024)),
+        level=int(os.environ.get('COMPRESS_LEVEL', 6))
+    )
+# fingerprinted and precompressed static files
+static_assets = StaticAssets(app)
+
 # create tenant and config handlers
 tenant_handler = TenantHandler(app.logger)
+# tenant of current request or CLI command
+tenant_context = TenantContext(tenant_handler)
 config_handler = RuntimeConfig('agdi', app.logger)
 
 
@@ -42,7 +77,7 @@ def service_config():
 
     NOTE: read config from file only if config has changed
     """
-    tenant = tenant_handler.tenant()
+    tenant = tenant_context.tenant()
     config = tenant_handler.handler('agdi', 'agdi', tenant)
     if config is None:
         # load current service config
@@ -54,46 +89,93 @@ def service_config():
     return config
 
 
-# get config DB connnection from service config
-# NOTE: this is loaded only once when the AGDI GUI application
-#       is started and will not be updated if the config changes later
-config_db_url = service_config().get(
-    'db_url', 'postgresql:///?service=soconfig_services'
+# DB engines and ORM models for ConfigDB of current tenant
+# NOTE: ConfigModels of a tenant are loaded on its first request
+db_engine = DatabaseEngine()
+config_models = TenantConfigModels(
+    tenant_context, service_config, db_engine, app.logger
 )
-
-try:
-    # load ORM models for ConfigDB
-    db_engine = DatabaseEngine()
-    config_db_engine = db_engine.db_engine(config_db_url)
-    config_models = ConfigModels(config_db_engine)
-except Exception as e:
-    msg = (
-        "Could not load ConfigModels for ConfigDB at '%s':\n%s" %
-        (config_db_url, e)
-    )
-    app.logger.error(msg)
-    raise Exception(msg)
+# queue for upload post-processing tasks
+task_queue = TaskQueue(config_models, app.logger)
+# change counters of ConfigDB tables for cache invalidation
+data_versions = DataVersions(config_models, app.logger)
+# index of resource names for uniqueness validation
+name_registry = NameRegistry(config_models, data_versions, app.logger)
+# cached index of raster files
+raster_index = RasterIndex(app.logger)
+raster_refresh_interval = int(
+    os.environ.get('RASTER_INDEX_REFRESH_INTERVAL', 300)
+)
+if raster_refresh_interval > 0:
+    raster_index.start_refresher(raster_refresh_interval)
 
 
 # create controllers (including their routes)
 # gdi_knoten
-DataSourcesController(app, config_models)
-DataSetGUIController(app, config_models, db_engine, service_config)
-ProductSetGUIController(app, config_models)
-BackgroundLayersController(app, config_models, service_config)
-MapsController(app, config_models, service_config)
-TemplatesController(app, config_models, service_config)
-ServiceController(app, config_models)
-ModuleController(app, config_models)
-TransformationController(app, config_models, db_engine)
+DataSourcesController(app, config_models, data_versions, name_registry)
+DataSetGUIController(
+    app, config_models, data_versions, name_registry, db_engine,
+    service_config, task_queue, raster_index
+)
+ProductSetGUIController(app, config_models, data_versions, name_registry)
+BackgroundLayersController(
+    app, config_models, data_versions, name_registry, service_config,
+    task_queue
+)
+MapsController(
+    app, config_models, data_versions, name_registry, service_config,
+    task_queue
+)
+TemplatesController(
+    app, config_models, data_versions, name_registry, service_config,
+    task_queue
+)
+ServiceController(app, config_models, data_versions, name_registry)
+ModuleController(app, config_models, data_versions, name_registry)
+TransformationController(
+    app, config_models, data_versions, name_registry, db_engine
+)
 wms_wfs_controller = WmsWfsController(app, config_models, db_engine)
 PublishController(app, config_models, service_config)
+IndexAdvisorController(app, config_models, db_engine, service_config)
+ConfigDiffController(app, config_models, db_engine, service_config)
+ImpactController(app, config_models, data_versions)
+ConfigLintController(app, config_models, db_engine, service_config)
+AuditController(app, config_models)
+LookupController(app, config_models)
+NameCheckController(app, name_registry)
 # iam
-UsersController(app, config_models)
-GroupsController(app, config_models)
-RolesController(app, config_models)
+UsersController(app, config_models, data_versions, name_registry)
+GroupsController(app, config_models, data_versions, name_registry)
+RolesController(app, config_models, data_versions, name_registry)
+EffectivePermissionsController(app, config_models, data_versions)
 # contacts
-ContactsController(app, config_models)
+ContactsController(app, config_models, data_versions, name_registry)
+
+
+@app.before_request
+def resolve_tenant():
+    """Resolve tenant of current request."""
+    tenant_context.tenant()
+
+
+def tenant_option(func):
+    """Decorator adding a --tenant option for selecting the tenant of a
+    CLI command.
+
+    :param func func: CLI command
+    """
+    @click.option(
+        '--tenant',
+        help="Tenant of ConfigDB (default: QWC_TENANT or 'default')"
+    )
+    @functools.wraps(func)
+    def wrapper(*args, tenant=None, **kwargs):
+        if tenant is not None:
+            tenant_context.use_tenant(tenant)
+        return func(*args, **kwargs)
+
+    return wrapper
 
 
 # routes
@@ -116,6 +198,484 @@ def healthz():
     return jsonify({"status": "OK"})
 
 
+""" DB connection pool statistics for monitoring """
+@app.route("/pool_stats", methods=['GET'])
+def pool_stats():
+    # dispose any idle engines before reporting
+    db_engine.reap_idle()
+    return jsonify({"engines": db_engine.pool_stats()})
+
+
+""" cache statistics of rendered index tables for monitoring """
+@app.route("/index_cache_stats", methods=['GET'])
+def index_cache_stats():
+    return jsonify(Controller.index_cache.stats())
+
+
+# commands
+@app.cli.command('upload-worker')
+@click.option(
+    '--poll-interval', default=2.0, show_default=True,
+    help="Seconds to wait if there are no pending tasks"
+)
+@click.option(
+    '--tenant', 'tenants', multiple=True,
+    help="Tenant of ConfigDB, may be repeated for processing tasks of "
+    "multiple tenants (default: QWC_TENANT or 'default')"
+)
+def upload_worker(poll_interval, tenants):
+    """Process queued upload post-processing tasks."""
+    task_queue.run_worker(
+        poll_interval, list(tenants) or [tenant_context.tenant()],
+        tenant_context
+    )
+
+
+@app.cli.command('cleanup-uploads')
+@tenant_option
+@click.option(
+    '--delete', is_flag=True,
+    help="Remove orphaned uploads (default: only report them)"
+)
+@click.option(
+    '--min-age', default=24.0, show_default=True,
+    help="Skip uploads modified within this many hours"
+)
+@click.option(
+    '--verbose', is_flag=True, help="List orphaned uploads"
+)
+def cleanup_uploads(delete, min_age, verbose):
+    """Report or remove uploaded files no longer referenced in ConfigDB."""
+    upload_cleanup = UploadCleanup(config_models, service_config, app.logger)
+    try:
+        stats = upload_cleanup.run(not delete, min_age)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    for key in stats['unconfigured']:
+        click.echo("Skipped upload dirs of unset %s" % key, err=True)
+    for path in stats['missing_dirs']:
+        click.echo("Missing upload dir: %s" % path, err=True)
+    if verbose:
+        for path in stats['orphans']:
+            click.echo(path)
+    click.echo(
+        "%d referenced, %d scanned, %d orphaned (%d bytes), %d removed, "
+        "%d recent skipped, %d errors" % (
+            stats['referenced'], stats['scanned'], stats['orphaned'],
+            stats['orphaned_bytes'], stats['removed'],
+            stats['skipped_recent'], stats['errors']
+        )
+    )
+    click.echo(
+        "Collected references in %.3fs, total %.3fs (%d entries/s)" % (
+            stats['refs_duration'], stats['duration'],
+            stats['entries_per_second']
+        )
+    )
+    if not delete and stats['orphaned'] > 0:
+        click.echo("Dry run, use --delete to remove orphaned uploads")
+
+
+@app.cli.command('optimize-thumbnails')
+@tenant_option
+@click.option(
+    '--apply', is_flag=True,
+    help="Write processed thumbnails and update resources "
+         "(default: only report size savings)"
+)
+def optimize_thumbnails(apply):
+    """Scale down and re-encode unprocessed thumbnails of maps and
+    background layers."""
+    thumbnail_helper = ThumbnailHelper(
+        config_models, service_config, task_queue, app.logger
+    )
+    try:
+        results = thumbnail_helper.optimize_existing(apply)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    original_size = 0
+    size = 0
+    errors = 0
+    for model_name, name, result in results:
+        if not isinstance(result, dict):
+            click.echo("%s '%s': %s" % (model_name, name, result), err=True)
+            errors += 1
+            continue
+
+        click.echo("%s '%s': %s" % (
+            model_name, name, thumbnail_helper.summary(result)
+        ))
+        original_size += result['original_size']
+        size += result['size']
+
+    click.echo(
+        "Total: %d -> %d bytes (%.0f%% saved), %d errors" % (
+            original_size, size,
+            100.0 * (original_size - size) / max(original_size, 1), errors
+        )
+    )
+    if not apply:
+        click.echo("Dry run, use --apply to write changes")
+
+
+@app.cli.command('export-data-sets')
+@tenant_option
+@click.argument('output', type=click.File('w', encoding='utf-8'))
+@click.option(
+    '--data-source-id', type=int, help="Only export DataSets of data_source"
+)
+def export_data_sets(output, data_source_id):
+    """Export DataSets as JSON lines."""
+    data_set_transfer = DataSetTransferHelper(
+        config_models, db_engine, service_config, app.logger
+    )
+    start = time.time()
+    count = 0
+    for line in data_set_transfer.export(data_source_id):
+        output.write(line)
+        count += 1
+
+    duration = time.time() - start
+    click.echo(
+        "Exported %d DataSets in %.3fs (%d records/s)" % (
+            count, duration, count / duration if duration > 0 else 0
+        ),
+        err=True
+    )
+
+
+@app.cli.command('import-data-sets')
+@tenant_option
+@click.argument('input', type=click.File('r', encoding='utf-8'))
+@click.option(
+    '--apply', is_flag=True,
+    help="Write changes (default: only validate and compare)"
+)
+@click.option(
+    '--chunk-size', default=200, show_default=True,
+    help="Number of DataSets per transaction"
+)
+@click.option(
+    '--verbose', is_flag=True, help="List results of all DataSets"
+)
+def import_data_sets(input, apply, chunk_size, verbose):
+    """Import DataSets from JSON lines."""
+    data_set_transfer = DataSetTransferHelper(
+        config_models, db_engine, service_config, app.logger
+    )
+    report = data_set_transfer.import_records(input, not apply, chunk_size)
+
+    for result in report['results']:
+        if result['action'] == 'error':
+            click.echo("%d %s: %s" % (
+                result['line'], result['name'], "; ".join(result['errors'])
+            ))
+        elif verbose and result['action'] != 'unchanged':
+            click.echo("%d %s: %s %s" % (
+                result['line'], result['name'], result['action'],
+                ", ".join(result['changes'])
+            ))
+    click.echo(
+        "%d created, %d updated, %d unchanged, %d errors" % (
+            report['created'], report['updated'], report['unchanged'],
+            report['errors']
+        )
+    )
+    click.echo(
+        "Processed %d records in %.3fs (%d records/s)" % (
+            len(report['results']), report['duration'],
+            report['records_per_second']
+        )
+    )
+    if not apply:
+        click.echo("Dry run, use --apply to write changes")
+
+
+@app.cli.command('sync-iam')
+@tenant_option
+@click.argument('roster', type=click.File('r', encoding='utf-8'))
+@click.option(
+    '--format', 'fmt', type=click.Choice(['csv', 'json']),
+    help="Roster format (default: from file extension)"
+)
+@click.option(
+    '--apply', is_flag=True,
+    help="Write changes (default: only compare)"
+)
+@click.option(
+    '--delete-users', is_flag=True, help="Delete users missing in roster"
+)
+@click.option(
+    '--verbose', is_flag=True, help="List changed entries"
+)
+def sync_iam(roster, fmt, apply, delete_users, verbose):
+    """Sync users, groups and their memberships and roles from a CSV or
+    JSON roster."""
+    if fmt is None:
+        fmt = 'json' if roster.name.lower().endswith('.json') else 'csv'
+
+    iam_sync = IAMSyncHelper(config_models, app.logger)
+    report = iam_sync.sync(roster, fmt, not apply, delete_users)
+
+    for error in report['errors']:
+        click.echo("Error: %s" % error)
+    for change_type, change in report['changes'].items():
+        click.echo("%s: %d" % (change_type, change['count']))
+        if verbose:
+            for entry in change['entries']:
+                click.echo("  %s" % ", ".join(entry))
+    click.echo(
+        "Processed %d users in %.3fs (%d users/s)" % (
+            report['users'], report['duration'], report['users_per_second']
+        )
+    )
+    if report['errors']:
+        click.echo("Nothing written due to errors")
+    elif not apply:
+        click.echo("Dry run, use --apply to write changes")
+
+
+@app.cli.command('export-bundle')
+@tenant_option
+@click.argument('output', type=click.File('wb'))
+@click.option('--data-set', multiple=True, help="Name of DataSet to export")
+@click.option(
+    '--product-set', multiple=True, help="Name of ProductSet to export"
+)
+@click.option('--map', multiple=True, help="Name of map to export")
+@click.option('--template', multiple=True, help="Name of template to export")
+def export_bundle(output, data_set, product_set, map, template):
+    """Export selected resources and their dependencies as bundle."""
+    bundle = BundleHelper(config_models, db_engine, service_config, app.logger)
+    try:
+        stats = bundle.export(output, {
+            'data_sets': data_set,
+            'product_sets': product_set,
+            'maps': map,
+            'templates': template
+        })
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    for path in stats['missing_files']:
+        click.echo("Missing file: %s" % path, err=True)
+    click.echo(
+        "Exported %s" % ", ".join([
+            "%d %s" % (count, resource_type)
+            for resource_type, count in stats['counts'].items()
+        ]),
+        err=True
+    )
+    click.echo(
+        "%d files (%d bytes) for %d references, bundle size %d bytes, "
+        "%.3fs" % (
+            stats['files'], stats['file_bytes'], stats['file_refs'],
+            stats['size'], stats['duration']
+        ),
+        err=True
+    )
+
+
+@app.cli.command('import-bundle')
+@tenant_option
+@click.argument('bundle_file', type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    '--apply', is_flag=True,
+    help="Write changes (default: only report conflicts)"
+)
+@click.option(
+    '--chunk-size', default=200, show_default=True,
+    help="Number of DataSets per transaction"
+)
+def import_bundle(bundle_file, apply, chunk_size):
+    """Import bundle, matching resources on names."""
+    bundle = BundleHelper(config_models, db_engine, service_config, app.logger)
+    report = bundle.import_bundle(bundle_file, not apply, chunk_size)
+
+    for conflict in report['conflicts']:
+        click.echo("Conflict: %s %s: %s" % (
+            conflict['type'], conflict['name'] or '', conflict['message']
+        ))
+    for resource_type, actions in report['actions'].items():
+        click.echo("%s: %d create, %d update" % (
+            resource_type, actions['create'], actions['update']
+        ))
+    click.echo("files: %d new, %d unchanged" % (
+        report['files']['new'], report['files']['unchanged']
+    ))
+    if report['data_sets'] is not None:
+        click.echo("Imported DataSets at %d records/s" % (
+            report['data_sets']['records_per_second']
+        ))
+    click.echo("Done in %.3fs" % report['duration'])
+
+    if report['conflicts']:
+        raise click.ClickException(
+            "%d conflicts, nothing imported" % len(report['conflicts'])
+        )
+    if not apply:
+        click.echo("Dry run, use --apply to import bundle")
+
+
+@app.cli.command('diff-config-db')
+@tenant_option
+@click.argument('source_url')
+@click.argument('target_url')
+@click.option(
+    '--type', 'resource_types', multiple=True,
+    type=click.Choice(ConfigDiffHelper.RESOURCE_TYPES),
+    help="Resource types to compare (default: all)"
+)
+@click.option(
+    '--batch-size', default=500, show_default=True,
+    help="Number of resources per query"
+)
+def diff_config_db(source_url, target_url, resource_types, batch_size):
+    """Compare resources of two ConfigDBs and write differences as
+    JSON lines."""
+    config_diff = ConfigDiffHelper(
+        config_models, db_engine, service_config, app.logger
+    )
+    stats = {}
+    for entry in config_diff.diff(
+        source_url, target_url, resource_types or None, stats, batch_size
+    ):
+        click.echo(json.dumps(entry, ensure_ascii=False))
+
+    click.echo(
+        "%d compared, %d added, %d removed, %d changed, %d unchanged "
+        "in %.3fs (%d records/s)" % (
+            stats['compared'], stats['added'], stats['removed'],
+            stats['changed'], stats['unchanged'], stats['duration'],
+            stats['records_per_second']
+        ),
+        err=True
+    )
+
+
+@app.cli.command('lint-config')
+@tenant_option
+@click.option(
+    '--workers', default=ConfigLinterHelper.WORKERS, show_default=True,
+    help="Number of parallel workers"
+)
+def lint_config(workers):
+    """Check consistency of all resources and write findings as
+    JSON lines."""
+    config_linter = ConfigLinterHelper(
+        config_models, db_engine, service_config, app.logger
+    )
+    stats = {}
+    findings = []
+    for finding in config_linter.lint(stats, workers):
+        findings.append(finding)
+        click.echo(json.dumps(finding, ensure_ascii=False))
+    # update last results shown in GUI
+    config_linter.save_results(findings, stats)
+
+    click.echo(
+        "%d resources checked in %d tasks, %d errors, %d warnings "
+        "in %.3fs" % (
+            stats['resources'], stats['tasks'], stats['errors'],
+            stats['warnings'], stats['duration']
+        ),
+        err=True
+    )
+
+
+@app.cli.command('maintain-audit-log')
+@tenant_option
+@click.option(
+    '--months-ahead', default=2, show_default=True,
+    help="Number of upcoming months with partitions"
+)
+@click.option(
+    '--retention-months', default=24, show_default=True,
+    help="Number of past months to keep in audit log"
+)
+@click.option(
+    '--archive-dir',
+    help="Dir for archived partitions (default: audit_archive_dir from "
+         "service config, if not set old partitions are only detached)"
+)
+@click.option(
+    '--apply', is_flag=True,
+    help="Write changes (default: only list changes)"
+)
+@click.option(
+    '--benchmark-rows', default=0, show_default=True,
+    help="Measure audit log insert latency before and after maintenance "
+         "with this number of synthetic rows (rolled back)"
+)
+def maintain_audit_log(months_ahead, retention_months, archive_dir, apply,
+                       benchmark_rows):
+    """Create upcoming partitions of audit log and archive old
+    partitions."""
+    audit_retention = AuditRetentionHelper(config_models, app.logger)
+    if archive_dir is None:
+        archive_dir = service_config().get('audit_archive_dir')
+
+    def benchmark(label):
+        if benchmark_rows > 0:
+            stats = audit_retention.insert_latency(benchmark_rows)
+            click.echo(
+                "Insert latency %s (%d rows): mean %.3fms, median %.3fms, "
+                "p95 %.3fms" % (
+                    label, stats['rows'], stats['mean'], stats['median'],
+                    stats['p95']
+                )
+            )
+
+    benchmark("before")
+    try:
+        report = audit_retention.maintain(
+            months_ahead, retention_months, archive_dir, not apply
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    for name in report['created']:
+        click.echo("Create partition %s" % name)
+    for entry in report['archived']:
+        if entry['file']:
+            click.echo(
+                "Archive partition %s (%d rows) to %s" % (
+                    entry['partition'], entry['rows'], entry['file']
+                )
+            )
+        else:
+            click.echo(
+                "Detach partition %s (%d rows)" % (
+                    entry['partition'], entry['rows']
+                )
+            )
+
+    if apply:
+        benchmark("after")
+    else:
+        click.echo("Dry run, use --apply to write changes")
+
+
+@app.cli.command('compress-static')
+def compress_static():
+    """Write precompressed gzip (and Brotli, if available) files of static
+    files."""
+    total = [0, 0, 0]
+    for filename, size, gzip_size, br_size in static_assets.precompress():
+        click.echo(
+            "%s: %d bytes, gzip %d bytes (%.0f%%)%s" % (
+                filename, size, gzip_size, 100.0 * gzip_size / max(size, 1),
+                ", br %d bytes" % br_size if br_size is not None else ""
+            )
+        )
+        total[0] += size
+        total[1] += gzip_size
+        total[2] += br_size or 0
+    click.echo("Total: %d bytes, gzip %d bytes, br %d bytes" % tuple(total))
+
+
 # local webserver
 if __name__ == '__main__':
     print("Starting AGDI service...")
@@ -0,0 +1,54 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+class TTLCache():
+    """Thread-safe LRU cache with expiring entries"""
+
+    def __init__(self, max_size, ttl):
+        """Constructor
+
+        :param int max_size: Max number of cached entries
+        :param float ttl: Seconds after which entries expire
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+
+        # cached entries as {<key>: (<timestamp>, <value>)}
+        # ordered from least to most recently used
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Return cached value, or None if missing or expired.
+
+        :param obj key: Cache key
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[0] >= self.ttl:
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        """Add or update cached value.
+
+        :param obj key: Cache key
+        :param obj value: Value
+        """
+        with self.lock:
+            self.entries[key] = (time.time(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all cached values."""
+        with self.lock:
+            self.entries.clear()
@@ -0,0 +1,126 @@
+import gzip
+
+from flask import current_app, g, request
+
+try:
+    import brotli
+except ImportError:
+    # NOTE: brotli is optional
+    brotli = None
+
+
+class ResponseCompression():
+    """Compression of responses
+
+    Compress responses with Brotli (if available) or gzip, depending on the
+    Accept-Encoding of the request.
+
+    Only complete responses of compressible content types and a min size are
+    compressed. Streamed responses (e.g. JSON lines exports) and files
+    (e.g. static files, downloads) are sent unchanged.
+
+    NOTE: responses containing a CSRF token (e.g. HTML forms) are never
+          compressed, as compressing secrets together with reflected
+          request params allows recovering them from the compressed sizes
+          (BREACH attack)
+    """
+
+    # compressible content types
+    MIMETYPES = [
+        'text/html', 'text/css', 'text/plain', 'text/xml',
+        'application/json', 'application/javascript', 'application/xml',
+        'image/svg+xml'
+    ]
+
+    def __init__(self, app, min_size=1024, level=6, mimetypes=None):
+        """Constructor
+
+        :param Flask app: Flask application
+        :param int min_size: Min size in bytes of compressed responses
+        :param int level: Compression level (1-9)
+        :param list[str] mimetypes: Compressible content types
+                                    (default: MIMETYPES)
+        """
+        self.min_size = min_size
+        self.level = level
+        self.mimetypes = mimetypes or self.MIMETYPES
+        self.logger = app.logger
+
+        app.after_request(self.compress_response)
+
+    def encoding(self, accept_encoding):
+        """Return preferred supported content encoding, or None.
+
+        :param werkzeug.datastructures.Accept accept_encoding: Accepted
+                                                               encodings
+        """
+        encodings = ['gzip']
+        if brotli is not None:
+            encodings.insert(0, 'br')
+
+        return accept_encoding.best_match(encodings)
+
+    def contains_csrf_token(self):
+        """Return whether a CSRF token has been generated for the current
+        request, e.g. for rendering a form.
+        """
+        # NOTE: Flask-WTF stores the token of the current request in g
+        field_name = current_app.config.get(
+            'WTF_CSRF_FIELD_NAME', 'csrf_token'
+        )
+        return field_name in g
+
+    def compressible(self, response):
+        """Return whether response should be compressed.
+
+        :param Response response: Response
+        """
+        return (
+            response.status_code == 200 and
+            not self.contains_csrf_token() and
+            not response.direct_passthrough and
+            not response.is_streamed and
+            'Content-Encoding' not in response.headers and
+            response.mimetype in self.mimetypes and
+            (response.content_length or 0) >= self.min_size
+        )
+
+    def compress_response(self, response):
+        """Compress response if supported by client.
+
+        :param Response response: Response
+        """
+        if not self.compressible(response):
+            return response
+
+        # NOTE: response depends on Accept-Encoding even if not compressed
+        response.vary.add('Accept-Encoding')
+
+        encoding = self.encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        if encoding == 'br':
+            # NOTE: map gzip level to Brotli quality (0-11)
+            compressed = brotli.compress(
+                data, quality=min(self.level + 1, 11)
+            )
+        else:
+            compressed = gzip.compress(data, compresslevel=self.level)
+
+        if len(compressed) >= len(data):
+            return response
+
+        self.logger.debug(
+            "Compressed %s with %s: %d -> %d bytes" %
+            (request.path, encoding, len(data), len(compressed))
+        )
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # NOTE: weaken ETag, as compressed body differs from original
+            response.set_etag(etag, weak=True)
+
+        return response
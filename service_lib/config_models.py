@@ -4,27 +4,45 @@ from sqlalchemy.ext.automap import automap_base
 from sqlalchemy.orm import Session, relationship, with_polymorphic
 
 
+class ConfigDBSession(Session):
+    """Session for ConfigDB queries
+
+    NOTE: ConfigDB specific session events (e.g. of TaskQueue) are listened
+          for on this class, so that they do not apply to other sessions
+          (e.g. for GeoDB queries)
+    """
+    pass
+
+
 class ConfigModels():
     """ConfigModels class
 
     Provide SQLAlchemy ORM models for ConfigDB queries.
     """
 
-    def __init__(self, config_db_engine):
+    def __init__(self, config_db_engine, shared_models=None):
         """Constructor
 
         :param Engine config_db_engine: Database engine for ConfigDB
+        :param ConfigModels shared_models: Optional ConfigModels for a
+                                           ConfigDB with identical schema,
+                                           whose models are reused
         """
         self.engine = config_db_engine
 
         # init models
         self.base = None
         self.custom_models = {}
-        self.init_models()
+        if shared_models is not None:
+            # reuse reflected models
+            self.base = shared_models.base
+            self.custom_models = shared_models.custom_models
+        else:
+            self.init_models()
 
     def session(self):
         """Create a new session."""
-        return Session(self.engine)
+        return ConfigDBSession(self.engine)
 
     def model(self, name):
         """Get SQLAlchemy model.
@@ -0,0 +1,78 @@
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql import text as sql_text
+
+
+class DataVersions():
+    """Change counters of ConfigDB tables
+
+    Reads the versions in public.agdi_data_version, which are incremented
+    on commit of any transaction writing to tables in the schemas
+    'gdi_knoten', 'iam' and 'contacts'. Cached data can be keyed by the
+    versions of its source tables, so that it is invalidated on any write,
+    including writes from outside of AGDI.
+    """
+
+    def __init__(self, config_models, logger):
+        """Constructor
+
+        :param TenantConfigModels config_models: Helper for ORM models
+        :param Logger logger: Application logger
+        """
+        self.config_models = config_models
+        self.logger = logger
+
+        # set if missing versions table has been logged
+        self.missing_logged = False
+
+    def versions(self):
+        """Return versions of ConfigDB tables of current tenant as
+        {<schema>.<table>: <version>}, or None if not available.
+        """
+        try:
+            conn = self.config_models.engine.connect()
+            try:
+                sql = sql_text("""
+                    SELECT table_name, version FROM public.agdi_data_version;
+                """)
+                return {row[0]: row[1] for row in conn.execute(sql)}
+            finally:
+                conn.close()
+        except SQLAlchemyError as e:
+            if not self.missing_logged:
+                # NOTE: log only once, as this is called on every lookup
+                self.logger.warning(
+                    "Could not read ConfigDB data versions, "
+                    "cached data expires by age only: %s" % e
+                )
+                self.missing_logged = True
+            return None
+
+    def version_key(self, schemas):
+        """Return hashable key of versions of all tables in schemas,
+        or None if not available.
+
+        :param list[str] schemas: Schema names
+        """
+        versions = self.versions()
+        if versions is None:
+            return None
+
+        prefixes = tuple("%s." % schema for schema in schemas)
+        return tuple(sorted(
+            (table, version) for table, version in versions.items()
+            if table.startswith(prefixes)
+        ))
+
+    def tables_key(self, tables):
+        """Return hashable key of versions of tables, or None if not
+        available.
+
+        :param list[str] tables: Table names as '<schema>.<table>'
+        """
+        versions = self.versions()
+        if versions is None:
+            return None
+
+        # NOTE: tables without writes since creation of triggers have no
+        #       version yet
+        return tuple(versions.get(table, 0) for table in tables)
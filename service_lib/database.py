@@ -1,16 +1,71 @@
-from sqlalchemy import create_engine
+from collections import OrderedDict
 import os
+import threading
+import time
+
+from sqlalchemy import create_engine, event
 
 
 class DatabaseEngine():
-    """Helper for database connections using SQLAlchemy engines"""
+    """Helper for database connections using SQLAlchemy engines
+
+    Engines are kept in a bounded registry. Least recently used and idle
+    engines are disposed, except for pinned engines (e.g. for ConfigDB) and
+    engines still in use.
+    """
+
+    # supported pool options
+    POOL_OPTIONS = ['pool_size', 'max_overflow', 'pool_recycle']
+    # supported PostgreSQL timeout options
+    # connect_timeout in seconds, statement_timeout and lock_timeout in ms
+    TIMEOUT_OPTIONS = ['connect_timeout', 'statement_timeout', 'lock_timeout']
+
+    def __init__(self, max_engines=None, idle_timeout=None,
+                 grace_period=None):
+        """Constructor
+
+        :param int max_engines: Max number of unpinned engines
+                                (default: env DB_ENGINE_CACHE_SIZE or 20)
+        :param int idle_timeout: Seconds after which unused engines are
+                                 disposed (default: env DB_ENGINE_IDLE_TIMEOUT
+                                 or 600, 0 to disable)
+        :param int grace_period: Seconds after being returned by db_engine()
+                                 during which an engine is never disposed
+                                 (default: env DB_ENGINE_GRACE_PERIOD or 60)
+        """
+        if max_engines is None:
+            max_engines = int(os.environ.get('DB_ENGINE_CACHE_SIZE', 20))
+        if idle_timeout is None:
+            idle_timeout = int(os.environ.get('DB_ENGINE_IDLE_TIMEOUT', 600))
+        if grace_period is None:
+            grace_period = int(os.environ.get('DB_ENGINE_GRACE_PERIOD', 60))
+        self.max_engines = max_engines
+        self.idle_timeout = idle_timeout
+        self.grace_period = grace_period
 
-    def __init__(self):
-        """Constructor"""
-        self.engines = {}
+        # engines ordered from least to most recently used
+        self.engines = OrderedDict()
+        # conn_strs of pinned engines
+        self.pinned = set()
+        # last use of engines as {<conn_str>: <timestamp>}
+        self.last_used = {}
 
-    def db_engine(self, conn_str, service_suffix=None):
-        """Return engine."""
+        self.lock = threading.Lock()
+
+    def db_engine(self, conn_str, service_suffix=None, engine_options=None,
+                  pinned=False):
+        """Return engine.
+
+        NOTE: engine_options are only applied when creating a new engine
+
+        :param str conn_str: DB connection URL
+        :param str service_suffix: Optional suffix for service name
+        :param obj engine_options: Optional pool options (pool_size,
+                                   max_overflow, pool_recycle) and
+                                   PostgreSQL timeouts (connect_timeout,
+                                   statement_timeout, lock_timeout)
+        :param bool pinned: Set to never evict this engine
+        """
         # conn_str:
         # http://docs.sqlalchemy.org/en/latest/core/engines.html#postgresql
 
@@ -21,13 +76,196 @@ class DatabaseEngine():
             # postgresql:///?service=sogis_services_write
             conn_str += service_suffix
 
-        engine = self.engines.get(conn_str)
-        if not engine:
-            engine = create_engine(
-                conn_str, pool_pre_ping=True, echo=False)
-            self.engines[conn_str] = engine
+        now = time.time()
+        with self.lock:
+            engine = self.engines.get(conn_str)
+            if engine is not None:
+                # mark as most recently used
+                self.engines.move_to_end(conn_str)
+            else:
+                engine = self.new_engine(conn_str, engine_options or {})
+                self.engines[conn_str] = engine
+
+            if pinned:
+                self.pinned.add(conn_str)
+            self.last_used[conn_str] = now
+
+            self.evict_engines(now)
+
+        return engine
+
+    def new_engine(self, conn_str, engine_options):
+        """Create engine with pool options and PostgreSQL timeouts.
+
+        :param str conn_str: DB connection URL
+        :param obj engine_options: Pool options and PostgreSQL timeouts
+        """
+        kwargs = {}
+        for option in self.POOL_OPTIONS:
+            if engine_options.get(option) is not None:
+                kwargs[option] = int(engine_options[option])
+
+        timeouts = {}
+        if conn_str.startswith('postgresql'):
+            for option in self.TIMEOUT_OPTIONS:
+                if engine_options.get(option) is not None:
+                    timeouts[option] = int(engine_options[option])
+
+        if 'connect_timeout' in timeouts:
+            kwargs['connect_args'] = {
+                'connect_timeout': timeouts.pop('connect_timeout')
+            }
+
+        engine = create_engine(
+            conn_str, pool_pre_ping=True, echo=False, **kwargs)
+
+        if timeouts:
+            # apply statement and lock timeouts to each new DB connection
+            @event.listens_for(engine, 'connect')
+            def set_timeouts(dbapi_connection, connection_record):
+                cursor = dbapi_connection.cursor()
+                for option, value in timeouts.items():
+                    # NOTE: option names are from TIMEOUT_OPTIONS
+                    cursor.execute("SET %s = %%s" % option, (value,))
+                cursor.close()
+                # NOTE: commit to keep settings after rollback on checkin
+                dbapi_connection.commit()
+
         return engine
 
+    def dispose(self, conn_str):
+        """Close all connections of an engine and remove it.
+
+        :param str conn_str: DB connection URL
+        """
+        with self.lock:
+            self.remove_engine(conn_str)
+
+    def reap_idle(self):
+        """Dispose idle engines and return number of disposed engines."""
+        with self.lock:
+            return self.evict_engines(time.time())
+
+    def evict_engines(self, now):
+        """Dispose least recently used engines beyond max_engines and idle
+        engines, skipping engines still in use.
+
+        NOTE: requires lock
+
+        :param float now: Current timestamp
+        """
+        unpinned = [
+            conn_str for conn_str in self.engines
+            if conn_str not in self.pinned
+        ]
+
+        evicted = []
+        # evict least recently used engines beyond limit
+        # NOTE: engines in use are skipped in favor of the next least
+        #       recently used idle engine, and evicted on a later call once
+        #       no longer in use; the most recently used engine is always
+        #       kept
+        excess = len(unpinned) - self.max_engines
+        for conn_str in unpinned[:-1]:
+            if excess <= 0:
+                break
+            if not self.in_use(conn_str, now):
+                evicted.append(conn_str)
+                excess -= 1
+
+        # evict idle engines
+        if self.idle_timeout > 0:
+            for conn_str in unpinned:
+                if conn_str in evicted:
+                    continue
+                idle = now - self.last_used.get(conn_str, now)
+                if idle <= self.idle_timeout:
+                    # remaining engines have been used more recently
+                    break
+                if not self.in_use(conn_str, now):
+                    evicted.append(conn_str)
+
+        for conn_str in evicted:
+            self.remove_engine(conn_str)
+
+        return len(evicted)
+
+    def in_use(self, conn_str, now):
+        """Return whether an engine has checked out connections, or has been
+        returned by db_engine() within the grace period.
+
+        NOTE: callers may hold an engine between connections, e.g. for
+              subsequent queries of a request or engines resolved ahead of
+              their use, without any checked out connections
+
+        :param str conn_str: DB connection URL
+        :param float now: Current timestamp
+        """
+        if now - self.last_used.get(conn_str, now) < self.grace_period:
+            return True
+        return self.pool_status(self.engines[conn_str])['checked_out'] > 0
+
+    def checked_out(self, conn_str):
+        """Return number of checked out connections of an engine.
+
+        :param str conn_str: DB connection URL
+        """
+        with self.lock:
+            engine = self.engines.get(conn_str)
+            if engine is None:
+                return 0
+            return self.pool_status(engine)['checked_out']
+
+    def remove_engine(self, conn_str):
+        """Dispose and remove engine.
+
+        NOTE: requires lock
+
+        :param str conn_str: DB connection URL
+        """
+        engine = self.engines.pop(conn_str, None)
+        self.pinned.discard(conn_str)
+        self.last_used.pop(conn_str, None)
+        if engine is not None:
+            # NOTE: any checked out connections are closed on return
+            engine.dispose()
+
+    def pool_stats(self):
+        """Return pool statistics for all engines, with masked URLs."""
+        now = time.time()
+        with self.lock:
+            stats = []
+            for conn_str, engine in self.engines.items():
+                status = self.pool_status(engine)
+                status.update({
+                    # NOTE: URL repr masks any password
+                    'url': repr(engine.url),
+                    'pinned': conn_str in self.pinned,
+                    'idle': int(now - self.last_used.get(conn_str, now))
+                })
+                stats.append(status)
+            return stats
+
+    def pool_status(self, engine):
+        """Return pool status of an engine.
+
+        :param Engine engine: Database engine
+        """
+        pool = engine.pool
+        status = {
+            'size': 0,
+            'checked_in': 0,
+            'checked_out': 0,
+            'overflow': 0
+        }
+        # NOTE: only QueuePool provides counters
+        if hasattr(pool, 'checkedout'):
+            status['size'] = pool.size()
+            status['checked_in'] = pool.checkedin()
+            status['checked_out'] = pool.checkedout()
+            status['overflow'] = max(pool.overflow(), 0)
+        return status
+
     def db_engine_env(self, env_name, default=None):
         """Return engine configured in environment variable."""
         conn_str = os.environ.get(env_name, default)
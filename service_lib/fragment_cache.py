@@ -0,0 +1,85 @@
+from collections import OrderedDict
+import threading
+
+
+class FragmentCache():
+    """Thread-safe LRU cache for rendered HTML fragments, bounded by their
+    total size
+
+    Each fragment is stored with the version of its source data, and is
+    only returned for the same version. A newer version replaces the cached
+    fragment, so that outdated fragments do not take up space.
+    """
+
+    def __init__(self, max_size):
+        """Constructor
+
+        :param int max_size: Max total number of characters of cached
+                             fragments
+        """
+        self.max_size = max_size
+
+        # cached fragments as {<key>: (<size>, <version>, <fragment>)}
+        # ordered from least to most recently used
+        self.entries = OrderedDict()
+        # total size of cached fragments
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, version):
+        """Return cached fragment, or None if missing or outdated.
+
+        :param obj key: Cache key
+        :param obj version: Version of source data
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] != version:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, version, fragment):
+        """Add or replace cached fragment, and evict least recently used
+        fragments if over max size.
+
+        :param obj key: Cache key
+        :param obj version: Version of source data
+        :param str fragment: Rendered fragment
+        """
+        size = len(fragment)
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= old[0]
+            if size > self.max_size:
+                # never cache fragments larger than the whole cache
+                return
+
+            self.entries[key] = (size, version, fragment)
+            self.size += size
+            while self.size > self.max_size:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= evicted[0]
+
+    def clear(self):
+        """Remove all cached fragments."""
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """Return cache statistics."""
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'size': self.size,
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses
+            }
@@ -0,0 +1,238 @@
+import threading
+import time
+
+from flask import url_for
+
+
+class NameRegistry():
+    """Registry of names of GDI resources for uniqueness validation
+
+    Keeps an in-memory index of the names of all resources with unique names
+    per ConfigDB, built with one query per resource type. The index is
+    rebuilt when the data versions of its tables have changed (e.g. after
+    writes by other workers or from outside of AGDI), or after writes by this
+    worker (see invalidate()).
+
+    NOTE: a single instance is shared by all controllers, and indexes of
+          different ConfigDBs are built independently of each other
+
+    DataSet and ProductSet names must also be unique against each other.
+    """
+
+    # resource types as
+    # {<type>: (<model name>, <ID column>, <validation message>)}
+    TYPES = {
+        'data_set': (
+            'data_set_view', 'gdi_oid',
+            'Ein DataSet mit diesem Namen ist bereits vorhanden'
+        ),
+        'product_set': (
+            'ows_layer_group', 'gdi_oid',
+            'Ein ProductSet mit diesem Namen ist bereits vorhanden'
+        ),
+        'map': (
+            'map', 'gdi_oid',
+            'Eine Map mit diesem Namen ist bereits vorhanden'
+        ),
+        'data_source': (
+            'data_source', 'gdi_oid',
+            'Eine DataSource mit diesem Namen ist bereits vorhanden'
+        ),
+        'module': (
+            'module', 'gdi_oid',
+            'Ein Module mit diesem Namen ist bereits vorhanden'
+        ),
+        'group': (
+            'group', 'id',
+            'Eine Gruppe mit diesem Namen ist bereits vorhanden'
+        ),
+        'background_layer': (
+            'background_layer', 'gdi_oid',
+            'Ein BackgroundLayer mit diesem Namen ist bereits vorhanden'
+        )
+    }
+
+    # resource types whose names must be unique against each other
+    # (default: only the type itself)
+    CONFLICTS = {
+        'data_set': ['data_set', 'product_set'],
+        'product_set': ['data_set', 'product_set']
+    }
+
+    # source tables of index as '<schema>.<table>'
+    TABLES = [
+        'gdi_knoten.data_set_view',
+        'gdi_knoten.ows_layer', 'gdi_knoten.ows_layer_group',
+        'gdi_knoten.wms_wfs',
+        'gdi_knoten.map',
+        'gdi_knoten.data_source',
+        'gdi_knoten.module',
+        'iam.group',
+        'gdi_knoten.background_layer'
+    ]
+
+    # max age of index in seconds if data versions are not available
+    FALLBACK_TTL = 60
+
+    def __init__(self, config_models, data_versions, logger):
+        """Constructor
+
+        :param TenantConfigModels config_models: Helper for ORM models
+        :param DataVersions data_versions: Change counters of ConfigDB tables
+        :param Logger logger: Application logger
+        """
+        self.config_models = config_models
+        self.data_versions = data_versions
+        self.logger = logger
+
+        # indexes as {<ConfigDB URL>: <index>}
+        self.indexes = {}
+        # locks for building indexes as {<ConfigDB URL>: <Lock>}
+        self.build_locks = {}
+        # lock for lookup of build locks
+        self.lock = threading.Lock()
+
+    def check(self, resource_type, name, resource_id=None):
+        """Return validation message if name is already used by another
+        resource, or None if available.
+
+        :param str resource_type: Resource type (see TYPES)
+        :param str name: Resource name
+        :param int resource_id: Optional ID of current resource
+        """
+        index = self.index()
+
+        skip_ids = set([resource_id])
+        if resource_type == 'product_set' and \
+                resource_id in index['root_layers']:
+            # allow identical names for WMS and WFS root layers
+            skip_ids |= index['root_layers']
+
+        for other_type in self.CONFLICTS.get(resource_type, [resource_type]):
+            ids = index['names'][other_type].get(name, set())
+            if ids - skip_ids:
+                return self.TYPES[other_type][2]
+
+        return None
+
+    def resources(self, name):
+        """Return all resources with a name as [(<type>, <ID>)].
+
+        :param str name: Resource name
+        """
+        index = self.index()
+        return [
+            (resource_type, id)
+            for resource_type in self.TYPES
+            for id in sorted(index['names'][resource_type].get(name, []))
+        ]
+
+    def enable_check(self, field, resource_type, resource_id=None):
+        """Add URL for availability checks while typing to a name field
+        (see static/js/name_check.js).
+
+        :param StringField field: Name field
+        :param str resource_type: Resource type (see TYPES)
+        :param int resource_id: Optional ID of current resource
+        """
+        params = {'type': resource_type}
+        if resource_id is not None:
+            params['id'] = resource_id
+
+        render_kw = dict(field.render_kw or {})
+        render_kw['data-name-check-url'] = url_for('names_check', **params)
+        field.render_kw = render_kw
+
+    def invalidate(self):
+        """Discard index of ConfigDB of current tenant after writes."""
+        with self.lock:
+            self.indexes.pop(str(self.config_models.engine.url), None)
+
+    def index(self):
+        """Return current name index for ConfigDB of current tenant as
+        {
+            'names': {<type>: {<name>: set(<ID>)}},
+            'root_layers': set(<gdi_oid of WMS/WFS root layers>),
+            'version_key': <data versions of index>,
+            'built_at': <timestamp>
+        }
+        """
+        db_url = str(self.config_models.engine.url)
+        version_key = self.data_versions.tables_key(self.TABLES)
+
+        index = self.indexes.get(db_url)
+        if self.is_current(index, version_key):
+            return index
+
+        # NOTE: build index only once for concurrent requests of a ConfigDB
+        with self.build_lock(db_url):
+            index = self.indexes.get(db_url)
+            if not self.is_current(index, version_key):
+                index = self.build_index(version_key)
+                self.indexes[db_url] = index
+
+        return index
+
+    def build_lock(self, db_url):
+        """Return lock for building the index of a ConfigDB.
+
+        :param str db_url: ConfigDB URL
+        """
+        with self.lock:
+            return self.build_locks.setdefault(db_url, threading.Lock())
+
+    def is_current(self, index, version_key):
+        """Return whether a cached index is still valid.
+
+        :param obj index: Cached index or None
+        :param tuple version_key: Current data versions or None
+        """
+        if index is None:
+            return False
+        if version_key is None:
+            return time.time() - index['built_at'] < self.FALLBACK_TTL
+        return index['version_key'] == version_key
+
+    def build_index(self, version_key):
+        """Build name index from ConfigDB.
+
+        :param tuple version_key: Data versions of index
+        """
+        start = time.time()
+        names = {}
+        count = 0
+
+        session = self.config_models.session()
+        try:
+            for resource_type, (model_name, id_column, _) in \
+                    self.TYPES.items():
+                model = self.config_models.model(model_name)
+                query = session.query(
+                    getattr(model, id_column), model.name
+                )
+                type_names = {}
+                for id, name in query:
+                    type_names.setdefault(name, set()).add(id)
+                    count += 1
+                names[resource_type] = type_names
+
+            WmsWfs = self.config_models.model('wms_wfs')
+            root_layers = set([
+                wms_wfs.root_layer.gdi_oid
+                for wms_wfs in session.query(WmsWfs).all()
+                if wms_wfs.root_layer is not None
+            ])
+        finally:
+            session.close()
+
+        self.logger.debug(
+            "Built name index with %d names in %.3fs" %
+            (count, time.time() - start)
+        )
+
+        return {
+            'names': names,
+            'root_layers': root_layers,
+            'version_key': version_key,
+            'built_at': time.time()
+        }
@@ -0,0 +1,281 @@
+from bisect import bisect_left
+import os
+import threading
+import time
+
+
+class RasterIndex():
+    """Cached index of raster files in data_source directories
+
+    Stores names, sizes and mtimes of all files per directory. On refresh,
+    only directories whose mtime has changed are scanned again, so that a
+    refresh of an unchanged tree costs a single stat() per directory.
+
+    NOTE: directory mtimes only change when entries are added, removed or
+          renamed, so that in-place changes of file sizes are only picked up
+          with a rescan of their directory
+    """
+
+    # min seconds between refreshes of a directory on lookup
+    CHECK_INTERVAL = 30
+    # directory mtimes within this many seconds of a scan are not trusted,
+    # as changes within the mtime granularity (e.g. on NFS) would be missed
+    MTIME_GRACE = 2
+
+    def __init__(self, logger, check_interval=None):
+        """Constructor
+
+        :param Logger logger: Application logger
+        :param float check_interval: Min seconds between refreshes of a
+                                     directory on lookup
+                                     (default: CHECK_INTERVAL)
+        """
+        self.logger = logger
+        if check_interval is None:
+            check_interval = self.CHECK_INTERVAL
+        self.check_interval = check_interval
+
+        # indexes as {(<root dir>, <recursive>): <index>}
+        self.indexes = {}
+        self.lock = threading.Lock()
+        self.refresher = None
+
+    def files(self, root, recursive=False):
+        """Return sorted relative paths of all files in a directory,
+        or None if the directory could not be read.
+
+        :param str root: Raster directory
+        :param bool recursive: Set to include files in subdirectories
+        """
+        index = self.index(root, recursive)
+        if index['names'] is None:
+            return None
+        return list(index['names'])
+
+    def search(self, root, prefix='', offset=0, limit=None, recursive=False):
+        """Return files whose relative path starts with prefix
+        (case-insensitive) as
+        {
+            'total': <number of matching files>,
+            'files': [{'name': <path>, 'size': <bytes>, 'mtime': <timestamp>}]
+        }
+        or None if the directory could not be read.
+
+        :param str root: Raster directory
+        :param str prefix: Optional path prefix
+        :param int offset: Index of first returned file
+        :param int limit: Optional max number of returned files
+        :param bool recursive: Set to include files in subdirectories
+        """
+        index = self.index(root, recursive)
+        # NOTE: take references under lock, as a concurrent refresh
+        #       replaces these lists
+        with index['lock']:
+            names = index['names']
+            keys = index['keys']
+            stats = index['stats']
+        if names is None:
+            return None
+
+        # find range of matching keys in list sorted by key
+        prefix = (prefix or '').lower()
+        start = bisect_left(keys, prefix)
+        if prefix:
+            # NOTE: any key with this prefix sorts before prefix + U+10FFFF
+            end = bisect_left(keys, prefix + '\U0010ffff', start)
+        else:
+            end = len(keys)
+
+        first = start + max(offset, 0)
+        last = end if limit is None else min(end, first + max(limit, 0))
+        files = []
+        for name in names[first:last]:
+            size, mtime = stats[name]
+            files.append({'name': name, 'size': size, 'mtime': mtime})
+
+        return {
+            'total': end - start,
+            'files': files
+        }
+
+    def index(self, root, recursive, force=False):
+        """Return index of a directory, refreshed if last check is older
+        than check_interval.
+
+        :param str root: Raster directory
+        :param bool recursive: Set to include files in subdirectories
+        :param bool force: Set to always refresh index
+        """
+        key = (root, recursive)
+        with self.lock:
+            index = self.indexes.get(key)
+            if index is None:
+                index = {
+                    'lock': threading.Lock(),
+                    # last refresh
+                    'checked': 0,
+                    # scanned dirs as {<relative path>: <dir entry>}
+                    'dirs': {},
+                    # relative paths of files sorted by key
+                    'names': None,
+                    # lowercase relative paths of files, sorted
+                    'keys': [],
+                    # file stats as {<relative path>: (<size>, <mtime>)}
+                    'stats': {}
+                }
+                self.indexes[key] = index
+
+        # NOTE: concurrent lookups wait for a running refresh
+        with index['lock']:
+            now = time.time()
+            if force or now - index['checked'] >= self.check_interval:
+                self.refresh(index, root, recursive)
+                index['checked'] = now
+
+        return index
+
+    def refresh(self, index, root, recursive):
+        """Update index and rescan any changed directories.
+
+        NOTE: requires index lock
+
+        :param obj index: Directory index
+        :param str root: Raster directory
+        :param bool recursive: Set to include files in subdirectories
+        """
+        start = time.time()
+        dirs = {}
+        scanned = 0
+        stack = ['']
+        while stack:
+            rel_path = stack.pop()
+            path = os.path.join(root, rel_path)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError as e:
+                if rel_path == '':
+                    # invalid root directory
+                    self.logger.error(
+                        "Could not read raster directory %s: %s" % (root, e)
+                    )
+                    self.clear_index(index)
+                    return
+                # skip removed subdir
+                continue
+
+            entry = index['dirs'].get(rel_path)
+            if entry is None or entry['mtime'] != mtime:
+                try:
+                    entry = self.scan_dir(path, mtime, recursive)
+                    scanned += 1
+                except OSError as e:
+                    if rel_path == '':
+                        self.logger.error(
+                            "Could not read raster directory %s: %s" %
+                            (root, e)
+                        )
+                        self.clear_index(index)
+                        return
+                    self.logger.warning(
+                        "Could not read raster directory %s: %s" % (path, e)
+                    )
+                    continue
+
+            dirs[rel_path] = entry
+            for subdir in entry['subdirs']:
+                stack.append(os.path.join(rel_path, subdir))
+
+        changed = (
+            scanned > 0 or index['names'] is None or
+            dirs.keys() != index['dirs'].keys()
+        )
+        index['dirs'] = dirs
+        if changed:
+            # rebuild sorted file lists
+            stats = {}
+            for rel_path, entry in dirs.items():
+                for name, stat in entry['files'].items():
+                    stats[os.path.join(rel_path, name)] = stat
+            names = sorted(stats.keys(), key=lambda name: (name.lower(), name))
+
+            index['names'] = names
+            index['keys'] = [name.lower() for name in names]
+            index['stats'] = stats
+
+            self.logger.debug(
+                "Raster index %s: rescanned %d of %d dirs, %d files in %.3fs"
+                % (root, scanned, len(dirs), len(names), time.time() - start)
+            )
+
+    def scan_dir(self, path, mtime, recursive):
+        """Scan a directory and return its entry for the index.
+
+        :param str path: Directory path
+        :param int mtime: Directory mtime in ns before scanning
+        :param bool recursive: Set to collect subdirs
+        """
+        files = {}
+        subdirs = []
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.name.startswith('.'):
+                    # skip hidden files and dirs
+                    continue
+                if entry.is_file():
+                    stat = entry.stat()
+                    files[entry.name] = (stat.st_size, int(stat.st_mtime))
+                elif recursive and entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+
+        if time.time() - mtime / 1e9 < self.MTIME_GRACE:
+            # NOTE: rescan recently changed directory on next refresh
+            mtime = None
+
+        return {
+            'mtime': mtime,
+            'files': files,
+            'subdirs': subdirs
+        }
+
+    def clear_index(self, index):
+        """Reset index of an unreadable directory.
+
+        NOTE: requires index lock
+
+        :param obj index: Directory index
+        """
+        index['dirs'] = {}
+        index['names'] = None
+        index['keys'] = []
+        index['stats'] = {}
+
+    def refresh_all(self):
+        """Refresh indexes of all known directories."""
+        with self.lock:
+            keys = list(self.indexes.keys())
+
+        for root, recursive in keys:
+            try:
+                self.index(root, recursive, True)
+            except Exception as e:
+                self.logger.error(
+                    "Could not refresh raster index %s: %s" % (root, e)
+                )
+
+    def start_refresher(self, interval):
+        """Start background thread for refreshing all known directories.
+
+        :param float interval: Seconds between refreshes
+        """
+        if self.refresher is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                self.refresh_all()
+
+        self.refresher = threading.Thread(
+            target=run, name='raster-index-refresher', daemon=True
+        )
+        self.refresher.start()
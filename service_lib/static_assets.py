@@ -0,0 +1,179 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+
+from flask import request, send_from_directory
+
+from .compression import brotli
+
+
+class StaticAssets():
+    """Fingerprinted and precompressed static files
+
+    Static URLs are versioned by a hash of the file contents
+    (e.g. /static/css/application.css?v=<hash>), so that they can be cached
+    by browsers for a long time and are still reloaded after any change.
+
+    Precompressed files (<file>.br or <file>.gz, see precompress()) are sent
+    instead of the original file if accepted by the client.
+    """
+
+    # extensions of precompressed static files
+    PRECOMPRESS_EXTENSIONS = ['.css', '.js', '.svg', '.json', '.html', '.txt']
+
+    # max age in seconds for versioned static URLs
+    MAX_AGE = 365 * 24 * 3600
+
+    def __init__(self, app, max_age=None):
+        """Constructor
+
+        :param Flask app: Flask application
+        :param int max_age: Max age in seconds for versioned static URLs
+                            (default: MAX_AGE)
+        """
+        self.static_folder = app.static_folder
+        self.max_age = max_age or self.MAX_AGE
+        self.send_static_file = app.send_static_file
+
+        # cached file hashes as {<filename>: (<mtime>, <hash>)}
+        self.hashes = {}
+        self.lock = threading.Lock()
+
+        app.url_defaults(self.add_version)
+        app.view_functions['static'] = self.static
+
+    def file_hash(self, filename):
+        """Return short hash of static file contents, or None if not found.
+
+        :param str filename: Path relative to static folder
+        """
+        path = os.path.join(self.static_folder, filename)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+
+        with self.lock:
+            cached = self.hashes.get(filename)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+
+        with open(path, 'rb') as f:
+            file_hash = hashlib.md5(f.read()).hexdigest()[:12]
+
+        with self.lock:
+            self.hashes[filename] = (mtime, file_hash)
+
+        return file_hash
+
+    def add_version(self, endpoint, values):
+        """Add file hash to URLs of static files.
+
+        :param str endpoint: URL endpoint
+        :param dict values: URL values
+        """
+        if endpoint == 'static' and 'filename' in values and \
+                'v' not in values:
+            file_hash = self.file_hash(values['filename'])
+            if file_hash is not None:
+                values['v'] = file_hash
+
+    def static(self, filename):
+        """Send static file, or precompressed file if available.
+
+        :param str filename: Path relative to static folder
+        """
+        response = None
+        for encoding, extension in self.encodings():
+            compressed = filename + extension
+            if self.fresh(filename, compressed):
+                mimetype, _ = mimetypes.guess_type(filename)
+                response = send_from_directory(
+                    self.static_folder, compressed,
+                    mimetype=mimetype or 'application/octet-stream'
+                )
+                response.headers['Content-Encoding'] = encoding
+                break
+
+        if response is None:
+            response = self.send_static_file(filename)
+
+        if os.path.splitext(filename)[1] in self.PRECOMPRESS_EXTENSIONS:
+            response.vary.add('Accept-Encoding')
+        if request.args.get('v'):
+            # NOTE: versioned URL changes with file contents
+            response.cache_control.public = True
+            response.cache_control.max_age = self.max_age
+            response.headers['Cache-Control'] += ', immutable'
+
+        return response
+
+    def encodings(self):
+        """Return list of (<content encoding>, <file extension>) of
+        precompressed files accepted by the client, in order of preference.
+        """
+        encodings = []
+        accept = request.accept_encodings
+        if brotli is not None and accept['br']:
+            encodings.append(('br', '.br'))
+        if accept['gzip']:
+            encodings.append(('gzip', '.gz'))
+        return encodings
+
+    def fresh(self, filename, compressed):
+        """Return whether precompressed file exists and is up to date.
+
+        :param str filename: Path of original file relative to static folder
+        :param str compressed: Path of precompressed file
+        """
+        try:
+            return os.path.getmtime(
+                os.path.join(self.static_folder, compressed)
+            ) >= os.path.getmtime(os.path.join(self.static_folder, filename))
+        except OSError:
+            return False
+
+    def precompress(self, level=9):
+        """Write precompressed files for all compressible static files and
+        return list of (<filename>, <size>, <gzip size>, <brotli size>).
+
+        :param int level: gzip compression level
+        """
+        results = []
+        for root, dirs, files in os.walk(self.static_folder):
+            for name in sorted(files):
+                if os.path.splitext(name)[1] not in \
+                        self.PRECOMPRESS_EXTENSIONS:
+                    continue
+
+                path = os.path.join(root, name)
+                with open(path, 'rb') as f:
+                    data = f.read()
+
+                gzip_data = gzip.compress(data, compresslevel=level)
+                self.write_file(path + '.gz', gzip_data)
+                br_size = None
+                if brotli is not None:
+                    br_data = brotli.compress(data, quality=11)
+                    self.write_file(path + '.br', br_data)
+                    br_size = len(br_data)
+
+                results.append((
+                    os.path.relpath(path, self.static_folder), len(data),
+                    len(gzip_data), br_size
+                ))
+
+        return results
+
+    def write_file(self, path, data):
+        """Write file atomically.
+
+        :param str path: File path
+        :param bytes data: File contents
+        """
+        tmp_path = "%s.tmp" % path
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
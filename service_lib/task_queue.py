@@ -0,0 +1,363 @@
+import os
+import time
+import zipfile
+
+from flask import json
+from markupsafe import escape
+from sqlalchemy import event
+from sqlalchemy.sql import text as sql_text
+
+from .config_models import ConfigDBSession
+
+
+class TaskQueue():
+    """Persistent task queue backed by the ConfigDB table public.agdi_tasks
+
+    Tasks are queued within the session of the resource changes and inserted
+    on commit. Worker processes claim pending tasks one by one using
+    'FOR UPDATE SKIP LOCKED', so that multiple workers never process the same
+    task. A task whose worker crashes is unlocked and processed again, until
+    it is marked as failed after TASK_MAX_ATTEMPTS attempts.
+
+    NOTE: each tenant has its own queue in its ConfigDB
+    """
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    # key for queued tasks in Session.info
+    SESSION_INFO_KEY = 'agdi_tasks'
+
+    # max number of attempts for processing a task, e.g. if the worker
+    # crashes while processing it
+    MAX_ATTEMPTS = int(os.environ.get('TASK_MAX_ATTEMPTS', 3))
+
+    # seconds after which a claimed task, which is not locked by a worker,
+    # is claimed again
+    # NOTE: a worker locks its claimed task right after claiming it
+    CLAIM_TIMEOUT = 60
+
+    def __init__(self, config_models, logger):
+        """Constructor
+
+        :param ConfigModels config_models: Helper for ORM models
+        :param Logger logger: Application logger
+        """
+        self.config_models = config_models
+        self.logger = logger
+
+        # task handlers as {<task type>: <func(params, session)>}
+        self.handlers = {
+            'extract_zip': self.extract_zip,
+            'remove_files': self.remove_files
+        }
+
+        # insert queued tasks on commit of any ConfigDB session, and discard
+        # them on rollback
+        if not event.contains(
+            ConfigDBSession, 'before_commit', insert_queued_tasks
+        ):
+            event.listen(ConfigDBSession, 'before_commit', insert_queued_tasks)
+        if not event.contains(
+            ConfigDBSession, 'after_soft_rollback', discard_queued_tasks
+        ):
+            event.listen(
+                ConfigDBSession, 'after_soft_rollback', discard_queued_tasks
+            )
+
+    def register_handler(self, task_type, handler):
+        """Register handler for a task type.
+
+        :param str task_type: Task type
+        :param func handler: Handler function with args (params, session)
+        """
+        self.handlers[task_type] = handler
+
+    def enqueue(self, task_type, resource, params, session):
+        """Queue a task for a GDI resource.
+
+        NOTE: task is inserted on commit of the session, after the resource
+              has been assigned its gdi_oid
+
+        :param str task_type: Task type
+        :param object resource: GDI resource object
+        :param obj params: JSON serializable task params
+        :param Session session: DB session
+        """
+        tasks = session.info.setdefault(self.SESSION_INFO_KEY, [])
+        tasks.append((task_type, resource, params))
+
+    def resource_status(self, gdi_oid):
+        """Return status of latest task for a GDI resource as
+        {'status': <status>, 'error': <error>}, or None if there are no tasks.
+
+        :param int gdi_oid: GDI resource ID
+        """
+        if gdi_oid is None:
+            return None
+
+        sql = sql_text("""
+            SELECT status, error
+            FROM public.agdi_tasks
+            WHERE gdi_oid_resource = :gdi_oid
+            ORDER BY id DESC
+            LIMIT 1;
+        """)
+
+        session = self.config_models.session()
+        row = session.execute(sql, {'gdi_oid': gdi_oid}).first()
+        session.close()
+
+        if row is None:
+            return None
+
+        return {
+            'status': row['status'],
+            'error': row['error']
+        }
+
+    def status_message(self, gdi_oid):
+        """Return status message for unfinished or failed post-processing
+        of a GDI resource, or None if done.
+
+        :param int gdi_oid: GDI resource ID
+        """
+        status = self.resource_status(gdi_oid)
+        if status is None or status['status'] == self.STATUS_DONE:
+            return None
+        elif status['status'] in [self.STATUS_PENDING, self.STATUS_RUNNING]:
+            return "Upload wird verarbeitet..."
+        else:
+            return "Verarbeitung des Uploads fehlgeschlagen: %s" % \
+                escape(status['error'])
+
+    def process_next(self):
+        """Claim and process the next pending task.
+
+        NOTE: the attempts of a task are counted in a separate transaction
+              before processing it, so that a task which crashes the worker
+              is not retried forever
+
+        Return True if a task was processed, False if the queue is empty.
+        """
+        # claim next pending task, or a claimed task of a crashed worker,
+        # skipping any tasks locked by other workers
+        sql = sql_text("""
+            UPDATE public.agdi_tasks
+            SET status = 'running', attempts = attempts + 1,
+                started_at = now()
+            WHERE id = (
+                SELECT id
+                FROM public.agdi_tasks
+                WHERE status = 'pending'
+                    OR (
+                        status = 'running' AND
+                        started_at < now() - make_interval(secs => :timeout)
+                    )
+                ORDER BY id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, task_type, attempts;
+        """)
+
+        session = self.config_models.session()
+        try:
+            claimed = session.execute(
+                sql, {'timeout': self.CLAIM_TIMEOUT}
+            ).first()
+            session.commit()
+            if claimed is None:
+                return False
+
+            # lock claimed task while processing it
+            sql = sql_text("""
+                SELECT id, task_type, params
+                FROM public.agdi_tasks
+                WHERE id = :id AND status = 'running'
+                FOR UPDATE SKIP LOCKED;
+            """)
+            task = session.execute(sql, {'id': claimed['id']}).first()
+            if task is None:
+                # claimed again by another worker after CLAIM_TIMEOUT
+                session.rollback()
+                return True
+
+            status = self.STATUS_DONE
+            error = None
+
+            if claimed['attempts'] > self.MAX_ATTEMPTS:
+                self.logger.error(
+                    "Task %s (%s) aborted after %d attempts" %
+                    (task['id'], task['task_type'], self.MAX_ATTEMPTS)
+                )
+                status = self.STATUS_FAILED
+                error = "Abgebrochen nach %d Versuchen" % self.MAX_ATTEMPTS
+            else:
+                # NOTE: run handler in a savepoint, so that any DB changes of
+                #       a failed task can be discarded while keeping the task
+                #       lock
+                savepoint = session.begin_nested()
+                try:
+                    handler = self.handlers.get(task['task_type'])
+                    if handler is None:
+                        raise Exception(
+                            "Unknown task type '%s'" % task['task_type']
+                        )
+
+                    handler(json.loads(task['params']), session)
+                    savepoint.commit()
+                except Exception as e:
+                    savepoint.rollback()
+                    self.logger.error(
+                        "Task %s (%s) failed: %s" %
+                        (task['id'], task['task_type'], e)
+                    )
+                    status = self.STATUS_FAILED
+                    error = str(e)
+
+            # update task status
+            sql = sql_text("""
+                UPDATE public.agdi_tasks
+                SET status = :status, error = :error, finished_at = now()
+                WHERE id = :id;
+            """)
+            session.execute(
+                sql, {'id': task['id'], 'status': status, 'error': error}
+            )
+            session.commit()
+
+            self.logger.info(
+                "Task %s (%s): %s" % (task['id'], task['task_type'], status)
+            )
+        finally:
+            session.close()
+
+        return True
+
+    def run_worker(self, poll_interval=2.0, tenants=None,
+                   tenant_context=None):
+        """Process tasks of one or more tenants until interrupted.
+
+        NOTE: tasks of multiple tenants are processed in turns, one task per
+              tenant at a time
+
+        :param float poll_interval: Seconds to wait if all queues are empty
+        :param list(str) tenants: Tenants to process tasks for
+                                  (default: current tenant)
+        :param TenantContext tenant_context: Tenant context for selecting
+                                             the tenant of the ConfigDB
+        """
+        tenants = tenants or [None]
+        self.logger.info(
+            "Waiting for tasks of tenants %s..." %
+            ", ".join([str(tenant) for tenant in tenants])
+        )
+        while True:
+            processed = False
+            for tenant in tenants:
+                if tenant is not None:
+                    tenant_context.use_tenant(tenant)
+                try:
+                    if self.process_next():
+                        processed = True
+                except Exception as e:
+                    # e.g. lost DB connection
+                    self.logger.error(
+                        "Could not process tasks of tenant %s: %s" %
+                        (tenant, e)
+                    )
+
+            if not processed:
+                time.sleep(poll_interval)
+
+    def extract_zip(self, params, session):
+        """Task handler for extracting files from an uploaded ZIP file.
+
+        Task params:
+            zip_path: Path to uploaded ZIP file
+            target_dir: Target dir for extracted files
+            members: Optional lookup for ZIP member names and their target
+                     filenames (extract all files if not set)
+            remove_files: Optional list of filenames in target dir to remove
+                          after extracting, e.g. files of a replaced upload
+
+        :param obj params: Task params
+        :param Session session: DB session
+        """
+        target_dir = params['target_dir']
+        os.makedirs(target_dir, 0o755, True)
+
+        with zipfile.ZipFile(params['zip_path']) as zip_file:
+            members = params.get('members')
+            if members is None:
+                zip_file.extractall(target_dir)
+            else:
+                for member, target_filename in members.items():
+                    target_path = os.path.join(target_dir, target_filename)
+                    with open(target_path, 'wb') as f:
+                        f.write(zip_file.open(member).read())
+
+        if params.get('remove_files'):
+            self.remove_files({
+                'target_dir': target_dir,
+                'files': params['remove_files']
+            }, session)
+
+    def remove_files(self, params, session):
+        """Task handler for removing files, e.g. of a replaced upload.
+
+        Task params:
+            target_dir: Dir containing the files
+            files: List of filenames to remove
+
+        :param obj params: Task params
+        :param Session session: DB session
+        """
+        for filename in params['files']:
+            path = os.path.join(
+                params['target_dir'], os.path.basename(filename)
+            )
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                self.logger.warning("Failed to remove: %s\n%s" % (path, e))
+
+
+def insert_queued_tasks(session):
+    """Insert any queued tasks of a session before commit.
+
+    :param Session session: DB session
+    """
+    tasks = session.info.pop(TaskQueue.SESSION_INFO_KEY, None)
+    if not tasks:
+        return
+
+    # NOTE: flush to update gdi_oids of new resources
+    session.flush()
+
+    sql = sql_text("""
+        INSERT INTO public.agdi_tasks (task_type, gdi_oid_resource, params)
+        VALUES (:task_type, :gdi_oid, :params);
+    """)
+    for task_type, resource, params in tasks:
+        session.execute(sql, {
+            'task_type': task_type,
+            'gdi_oid': resource.gdi_oid,
+            'params': json.dumps(params)
+        })
+
+
+def discard_queued_tasks(session, previous_transaction):
+    """Discard any queued tasks of a session on rollback.
+
+    :param Session session: DB session
+    :param SessionTransaction previous_transaction: Rolled back transaction
+    """
+    if previous_transaction.parent is None:
+        # NOTE: keep tasks on rollback of savepoints or subtransactions
+        session.info.pop(TaskQueue.SESSION_INFO_KEY, None)
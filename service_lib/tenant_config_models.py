@@ -0,0 +1,290 @@
+from collections import OrderedDict
+import os
+import threading
+import time
+
+from flask import g, has_app_context
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql import text as sql_text
+
+from .config_models import ConfigModels
+
+
+class TenantConfigModels():
+    """TenantConfigModels class
+
+    Registry for ConfigModels per tenant, providing the ConfigModels
+    interface for the ConfigDB of the current tenant.
+
+    ConfigModels and DB engines are created lazily on first use of a tenant,
+    and least recently used or idle tenants are evicted, except for tenants
+    still in use.
+
+    Reflected models are shared between tenants with identical ConfigDB
+    schema revision. Tenants with ConfigDBs at different revisions get their
+    own models, so models must always be resolved for the current tenant
+    (see TenantModel).
+    """
+
+    # default ConfigDB URL
+    DEFAULT_DB_URL = 'postgresql:///?service=soconfig_services'
+
+    def __init__(self, tenant_context, service_config, db_engine, logger):
+        """Constructor
+
+        :param TenantContext tenant_context: Tenant of current request
+        :param func service_config: Helper method for reading service config
+        :param DatabaseEngine db_engine: Database engine with DB connections
+        :param Logger logger: Application logger
+        """
+        self.tenant_context = tenant_context
+        self.service_config = service_config
+        self.db_engine = db_engine
+        self.logger = logger
+
+        # max number of cached tenants
+        self.max_tenants = int(os.environ.get('TENANT_CACHE_SIZE', 20))
+        # seconds after which an unused tenant is evicted (0 to disable)
+        self.idle_timeout = int(os.environ.get('TENANT_IDLE_TIMEOUT', 3600))
+
+        # cached tenants as
+        # {<tenant>: {'config_models': ..., 'db_url': ..., 'last_used': ...}}
+        # ordered from least to most recently used
+        self.tenants = OrderedDict()
+        # lookup for ConfigModels with reflected models by schema revision
+        self.schemas = {}
+        # locks for loading tenants as {<tenant>: <lock>}
+        self.load_locks = {}
+
+        self.lock = threading.Lock()
+
+    @property
+    def engine(self):
+        """Return database engine for ConfigDB of current tenant."""
+        return self.tenant_config_models().engine
+
+    @property
+    def base(self):
+        """Return automap base for ConfigDB of current tenant."""
+        return self.tenant_config_models().base
+
+    def session(self):
+        """Create a new session for ConfigDB of current tenant."""
+        return self.tenant_config_models().session()
+
+    def model(self, name):
+        """Get SQLAlchemy model.
+
+        :param str name: Table name of model
+        """
+        return self.tenant_config_models().model(name)
+
+    def tenant_config_models(self):
+        """Return ConfigModels for current tenant."""
+        tenant = self.tenant_context.tenant()
+
+        if has_app_context():
+            # NOTE: look up ConfigModels only once per request
+            cached = g.get('tenant_config_models')
+            if cached is not None and cached[0] == tenant:
+                return cached[1]
+
+        entry = self.cached_tenant(tenant)
+        if entry is None:
+            with self.lock:
+                load_lock = self.load_locks.setdefault(
+                    tenant, threading.Lock()
+                )
+
+            # NOTE: reflect models outside of registry lock, so that other
+            #       tenants are not blocked, and only once per tenant
+            with load_lock:
+                entry = self.cached_tenant(tenant)
+                if entry is None:
+                    try:
+                        entry = self.load_tenant(tenant)
+                    except Exception:
+                        # NOTE: do not keep locks of unknown tenants
+                        self.remove_load_lock(tenant, load_lock)
+                        raise
+                    with self.lock:
+                        entry['last_used'] = time.time()
+                        self.tenants[tenant] = entry
+                        self.evict_tenants(entry['last_used'])
+
+        if has_app_context():
+            g.tenant_config_models = (tenant, entry['config_models'])
+
+        return entry['config_models']
+
+    def cached_tenant(self, tenant):
+        """Return cached entry for a tenant and mark it as used, or None if
+        not loaded.
+
+        :param str tenant: Tenant name
+        """
+        now = time.time()
+        with self.lock:
+            entry = self.tenants.get(tenant)
+            if entry is not None:
+                # mark as most recently used
+                self.tenants.move_to_end(tenant)
+                entry['last_used'] = now
+
+            self.evict_tenants(now)
+
+        return entry
+
+    def load_tenant(self, tenant):
+        """Create ConfigModels for ConfigDB of a tenant.
+
+        :param str tenant: Tenant name
+        """
+        db_url = self.service_config().get('db_url', self.DEFAULT_DB_URL)
+        try:
+            engine = self.db_engine.db_engine(db_url, pinned=True)
+
+            revision = self.schema_revision_for(engine)
+            shared_models = None
+            if revision is not None:
+                with self.lock:
+                    shared_models = self.schemas.get(revision)
+
+            config_models = ConfigModels(engine, shared_models)
+        except Exception as e:
+            msg = (
+                "Could not load ConfigModels of tenant '%s' for ConfigDB at "
+                "'%s':\n%s" % (tenant, db_url, e)
+            )
+            self.logger.error(msg)
+            raise Exception(msg)
+
+        if shared_models is None:
+            if revision is not None:
+                with self.lock:
+                    self.schemas.setdefault(revision, config_models)
+            self.logger.info(
+                "Loaded ConfigModels for tenant '%s' (schema revision %s)" %
+                (tenant, revision)
+            )
+        else:
+            self.logger.info(
+                "Loaded shared ConfigModels for tenant '%s' "
+                "(schema revision %s)" % (tenant, revision)
+            )
+
+        return {
+            'config_models': config_models,
+            'db_url': db_url
+        }
+
+    def config_models_for_url(self, db_url):
+        """Return ConfigModels for any ConfigDB, e.g. of another environment.
+
+        NOTE: reflected models are reused for known schema revisions
+
+        :param str db_url: ConfigDB connection URL
+        """
+        engine = self.db_engine.db_engine(db_url)
+        revision = self.schema_revision_for(engine)
+        with self.lock:
+            shared_models = self.schemas.get(revision)
+
+        return ConfigModels(engine, shared_models)
+
+    def schema_revision_for(self, engine):
+        """Return Alembic schema revision of a ConfigDB, or None if unknown.
+
+        :param Engine engine: Database engine for ConfigDB
+        """
+        try:
+            conn = engine.connect()
+            try:
+                sql = sql_text("SELECT version_num FROM alembic_version;")
+                return conn.execute(sql).scalar()
+            finally:
+                conn.close()
+        except SQLAlchemyError as e:
+            self.logger.warning("Could not get ConfigDB revision: %s" % e)
+            return None
+
+    def remove_load_lock(self, tenant, load_lock):
+        """Remove lock for loading a tenant, unless already replaced.
+
+        :param str tenant: Tenant name
+        :param Lock load_lock: Lock for loading tenant
+        """
+        with self.lock:
+            if self.load_locks.get(tenant) is load_lock:
+                del self.load_locks[tenant]
+
+    def evict_tenants(self, now):
+        """Evict least recently used and idle tenants, skipping tenants
+        still in use.
+
+        NOTE: requires lock
+        NOTE: reflected models are kept for reuse
+
+        :param float now: Current timestamp
+        """
+        excess = len(self.tenants) - self.max_tenants
+        # NOTE: tenants in use are skipped in favor of the next least
+        #       recently used tenant, and evicted on a later call once no
+        #       longer in use
+        for tenant, entry in list(self.tenants.items()):
+            idle = (
+                self.idle_timeout > 0 and
+                now - entry['last_used'] > self.idle_timeout
+            )
+            if excess <= 0 and not idle:
+                # remaining tenants have been used more recently
+                break
+            if self.in_use(entry, now):
+                continue
+
+            del self.tenants[tenant]
+            self.load_locks.pop(tenant, None)
+            excess -= 1
+            if not any(
+                e['db_url'] == entry['db_url'] for e in self.tenants.values()
+            ):
+                # close connections if ConfigDB is not used by other tenants
+                self.db_engine.dispose(entry['db_url'])
+            self.logger.info("Evicted ConfigModels for tenant '%s'" % tenant)
+
+    def in_use(self, entry, now):
+        """Return whether a tenant has been used within the grace period of
+        DB engines, or its ConfigDB engine has checked out connections.
+
+        NOTE: requests keep using the ConfigModels of their tenant after
+              looking them up
+
+        :param obj entry: Cached tenant entry
+        :param float now: Current timestamp
+        """
+        if now - entry['last_used'] < self.db_engine.grace_period:
+            return True
+        return self.db_engine.checked_out(entry['db_url']) > 0
+
+
+class TenantModel():
+    """Descriptor for a ConfigDB model of the current tenant
+
+    Resolve the model from the config_models of the owning object on each
+    access, e.g.
+
+        class MapsController(Controller):
+            Map = TenantModel('map')
+    """
+
+    def __init__(self, name):
+        """Constructor
+
+        :param str name: Table name of model
+        """
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return obj.config_models.model(self.name)
@@ -0,0 +1,44 @@
+from flask import g, has_app_context, has_request_context
+
+
+class TenantContext():
+    """TenantContext class
+
+    Resolve the tenant of the current request lazily on first use per
+    request, so that nothing depends on the tenant outside of requests
+    (e.g. on import of the application).
+
+    Outside of requests (e.g. in CLI commands and upload workers), the
+    tenant is selected explicitly with use_tenant() for the current app
+    context, and defaults to QWC_TENANT or 'default'.
+    """
+
+    DEFAULT_TENANT = 'default'
+
+    def __init__(self, tenant_handler):
+        """Constructor
+
+        :param TenantHandler tenant_handler: Tenant handler
+        """
+        self.tenant_handler = tenant_handler
+
+    def tenant(self):
+        """Return tenant of current request or app context."""
+        if has_request_context():
+            if 'tenant' not in g:
+                # NOTE: TenantHandler may read tenant from request headers
+                #       or URL
+                g.tenant = self.tenant_handler.tenant()
+            return g.tenant
+
+        if has_app_context() and 'tenant' in g:
+            return g.tenant
+
+        return self.tenant_handler.tenant_name or self.DEFAULT_TENANT
+
+    def use_tenant(self, tenant):
+        """Select tenant for current app context outside of requests.
+
+        :param str tenant: Tenant name
+        """
+        g.tenant = tenant
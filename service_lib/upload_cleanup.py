@@ -0,0 +1,382 @@
+import os
+import re
+import shutil
+import time
+from xml.etree import ElementTree
+
+
+class UploadCleanup():
+    """Garbage collector for orphaned uploaded files
+
+    Collect all file paths referenced in the ConfigDB in one pass, then scan
+    the upload dirs and report or remove any entries that are not referenced.
+
+    NOTE: only entries with generated names (UUIDs or MD5 hashes) are
+          considered, so that any other files in these dirs are never touched
+    """
+
+    # names of generated upload dirs and files
+    UUID_DIR_PATTERN = re.compile(
+        r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
+    )
+    UUID_FILE_PATTERN = re.compile(
+        r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
+        r'\.[^.\/\\]+$'
+    )
+    MD5_FILE_PATTERN = re.compile(r'^[0-9a-f]{32}\.[^.\/\\]+$')
+    # processed thumbnail variants
+    # NOTE: keep in sync with ThumbnailHelper
+    THUMBNAIL_VARIANT_PATTERN = re.compile(r'^([0-9a-f]{32})\.(png|webp)$')
+    THUMBNAIL_VARIANT_EXTS = ['png', 'webp']
+
+    # symbol layer props with symbol paths in QML
+    QML_SYMBOL_PROPS = [
+        ('SvgMarker', 'name'), ('SVGFill', 'svgFile'),
+        ('RasterFill', 'imageFile')
+    ]
+
+    # subdirs relative to PROJECT_OUTPUT_DIR resp. JASPER_REPORTS_DIR
+    # NOTE: keep in sync with DataSetGUIController and TemplatesController
+    SYMBOLS_SUB_DIR = 'symbols'
+    PRINT_RESOURCES_SUB_DIR = 'print'
+    UPLOADS_SUB_DIR = 'uploads'
+    # subdir relative to QWC_ASSETS_DIR
+    # NOTE: keep in sync with ThumbnailHelper
+    THUMBNAILS_SUB_DIR = 'thumbnails'
+
+    def __init__(self, config_models, service_config, logger):
+        """Constructor
+
+        :param ConfigModels config_models: Helper for ORM models
+        :param func service_config: Helper method for reading service config
+        :param Logger logger: Application logger
+        """
+        self.config_models = config_models
+        self.service_config = service_config
+        self.logger = logger
+
+    def run(self, dry_run=True, min_age=24):
+        """Find and remove orphaned uploads and return stats.
+
+        Upload dirs that are not set in the service config are skipped.
+        Raise ValueError if any configured upload dir is missing and not
+        dry_run, e.g. if a volume is not mounted.
+
+        :param bool dry_run: Only report orphaned uploads if set
+        :param float min_age: Skip entries modified within this many hours
+        """
+        start = time.time()
+
+        # NOTE: no default dirs, so that entries in e.g. /tmp are never
+        #       removed on an unconfigured deployment
+        config = self.service_config()
+        qgs_dir = config.get('project_output_dir')
+        jasper_reports_dir = config.get('jasper_reports_dir')
+        qwc_assets_dir = config.get('qwc_assets_dir')
+
+        # dirs to scan as
+        # (<base dir>, <sub dir>, <upload type>, <name pattern>)
+        targets = [
+            (
+                qgs_dir, self.UPLOADS_SUB_DIR,
+                'uploads', self.UUID_DIR_PATTERN
+            ),
+            (
+                qgs_dir, self.SYMBOLS_SUB_DIR,
+                'symbols', self.MD5_FILE_PATTERN
+            ),
+            (
+                qgs_dir, self.PRINT_RESOURCES_SUB_DIR,
+                'print', self.MD5_FILE_PATTERN
+            ),
+            (
+                jasper_reports_dir, None,
+                'jasper_reports', self.UUID_DIR_PATTERN
+            ),
+            (
+                jasper_reports_dir, self.UPLOADS_SUB_DIR,
+                'jasper_uploads', self.UUID_DIR_PATTERN
+            ),
+            # NOTE: thumbnails at the top level of the shared QWC assets dir
+            #       (e.g. of earlier versions) are never touched
+            (
+                qwc_assets_dir, self.THUMBNAILS_SUB_DIR,
+                'thumbnails', self.UUID_FILE_PATTERN
+            ),
+            (
+                qwc_assets_dir, self.THUMBNAILS_SUB_DIR,
+                'thumbnails', self.THUMBNAIL_VARIANT_PATTERN
+            )
+        ]
+
+        unconfigured = []
+        missing_dirs = []
+        for key in ['project_output_dir', 'jasper_reports_dir',
+                    'qwc_assets_dir']:
+            if not config.get(key):
+                self.logger.info("Skipping upload dirs of unset %s" % key)
+                unconfigured.append(key)
+            elif not os.path.isdir(config.get(key)):
+                # NOTE: missing sub dirs are skipped, as they are only
+                #       created on first upload
+                missing_dirs.append(config.get(key))
+        if missing_dirs and not dry_run:
+            raise ValueError(
+                "Refusing to remove orphaned uploads, missing upload dirs: %s"
+                % ", ".join(missing_dirs)
+            )
+
+        # merge targets of dirs shared by multiple upload types
+        scan_dirs = {}
+        for base_dir, sub_dir, upload_type, pattern in targets:
+            if not base_dir:
+                continue
+            path = base_dir
+            if sub_dir is not None:
+                path = os.path.join(base_dir, sub_dir)
+            abspath = os.path.abspath(path)
+            if abspath not in scan_dirs:
+                scan_dirs[abspath] = (set(), [], [])
+            scan_dirs[abspath][1].append(pattern)
+            scan_dirs[abspath][2].append(upload_type)
+
+        refs = self.referenced_paths()
+        refs_duration = time.time() - start
+        for referenced, patterns, upload_types in scan_dirs.values():
+            for upload_type in upload_types:
+                referenced.update(refs[upload_type])
+
+        stats = {
+            'referenced': sum([len(names) for names in refs.values()]),
+            'scanned': 0,
+            'orphaned': 0,
+            'removed': 0,
+            'skipped_recent': 0,
+            'errors': 0,
+            'orphaned_bytes': 0,
+            'orphans': [],
+            'unconfigured': unconfigured,
+            'missing_dirs': missing_dirs
+        }
+
+        min_mtime = time.time() - min_age * 3600
+        for path, (referenced, patterns, upload_types) in scan_dirs.items():
+            self.scan_dir(
+                path, referenced, patterns, min_mtime, dry_run, stats
+            )
+
+        duration = time.time() - start
+        stats['refs_duration'] = round(refs_duration, 3)
+        stats['duration'] = round(duration, 3)
+        if duration > 0:
+            stats['entries_per_second'] = int(stats['scanned'] / duration)
+        else:
+            stats['entries_per_second'] = stats['scanned']
+
+        self.logger.info(
+            "Upload cleanup: %d scanned, %d orphaned (%d bytes), %d removed, "
+            "%d errors in %.3fs (%d entries/s)" % (
+                stats['scanned'], stats['orphaned'], stats['orphaned_bytes'],
+                stats['removed'], stats['errors'], stats['duration'],
+                stats['entries_per_second']
+            )
+        )
+
+        return stats
+
+    def referenced_paths(self):
+        """Collect names of all upload entries referenced in the ConfigDB,
+        grouped by upload type.
+        """
+        refs = {
+            'uploads': set(),
+            'symbols': set(),
+            'print': set(),
+            'jasper_reports': set(),
+            'jasper_uploads': set(),
+            'thumbnails': set()
+        }
+
+        OWSLayerData = self.config_models.model('ows_layer_data')
+        TemplateJasper = self.config_models.model('template_jasper')
+        TemplateQGIS = self.config_models.model('template_qgis')
+        Map = self.config_models.model('map')
+        BackgroundLayer = self.config_models.model('background_layer')
+
+        session = self.config_models.session()
+
+        # uploaded QMLs and symbols
+        query = session.query(
+            OWSLayerData.uploaded_qml, OWSLayerData.uploaded_client_qml,
+            OWSLayerData.qgs_style, OWSLayerData.client_qgs_style
+        ).yield_per(500)
+        for uploaded_qml, uploaded_client_qml, qgs_style, client_qgs_style \
+                in query:
+            self.add_upload_dir(refs['uploads'], uploaded_qml)
+            self.add_upload_dir(refs['uploads'], uploaded_client_qml)
+            self.add_qml_symbols(refs['symbols'], qgs_style)
+            self.add_qml_symbols(refs['symbols'], client_qgs_style)
+
+        # JasperReports reports and uploads
+        query = session.query(
+            TemplateJasper.report_filename, TemplateJasper.uploaded_report
+        ).yield_per(500)
+        for report_filename, uploaded_report in query:
+            self.add_upload_dir(refs['jasper_reports'], report_filename)
+            self.add_upload_dir(refs['jasper_uploads'], uploaded_report)
+
+        # uploaded QPTs and print resources
+        query = session.query(
+            TemplateQGIS.uploaded_qpt, TemplateQGIS.qgs_print_layout
+        ).yield_per(500)
+        for uploaded_qpt, qgs_print_layout in query:
+            self.add_upload_dir(refs['uploads'], uploaded_qpt)
+            self.add_qpt_resources(refs['print'], qgs_print_layout)
+
+        # thumbnails
+        for model in [Map, BackgroundLayer]:
+            query = session.query(model.thumbnail_image) \
+                .filter(model.thumbnail_image.isnot(None))
+            for thumbnail_image, in query:
+                self.add_thumbnail(refs['thumbnails'], thumbnail_image)
+
+        session.close()
+
+        return refs
+
+    def add_upload_dir(self, names, upload_path):
+        """Add top-level dir of an upload path.
+
+        :param set names: Referenced names
+        :param str upload_path: Path relative to uploads dir
+        """
+        if upload_path:
+            names.add(upload_path.replace('\\', '/').split('/')[0])
+
+    def add_thumbnail(self, names, thumbnail_image):
+        """Add filename of thumbnail, including all variants of a processed
+        thumbnail.
+
+        :param set names: Referenced names
+        :param str thumbnail_image: Thumbnail path relative to QWC assets dir
+        """
+        filename = os.path.basename(thumbnail_image)
+        names.add(filename)
+
+        match = self.THUMBNAIL_VARIANT_PATTERN.match(filename)
+        if match:
+            for ext in self.THUMBNAIL_VARIANT_EXTS:
+                names.add("%s.%s" % (match.group(1), ext))
+
+    def add_qml_symbols(self, names, qml_data):
+        """Add filenames of symbols referenced in QML.
+
+        :param set names: Referenced names
+        :param str qml_data: QML style
+        """
+        if not qml_data:
+            return
+
+        try:
+            root = ElementTree.fromstring(qml_data)
+        except ElementTree.ParseError as e:
+            self.logger.warning("Could not parse QML: %s" % e)
+            return
+
+        for layer_class, prop_key in self.QML_SYMBOL_PROPS:
+            for svgprop in root.findall(
+                ".//layer[@class='%s']/prop[@k='%s']" % (layer_class, prop_key)
+            ):
+                symbol_path = svgprop.get('v')
+                if symbol_path:
+                    names.add(os.path.basename(symbol_path))
+
+    def add_qpt_resources(self, names, qpt_data):
+        """Add filenames of resources referenced in QPT.
+
+        :param set names: Referenced names
+        :param str qpt_data: QGIS print layout
+        """
+        if not qpt_data:
+            return
+
+        try:
+            root = ElementTree.fromstring(qpt_data)
+        except ElementTree.ParseError as e:
+            self.logger.warning("Could not parse QPT: %s" % e)
+            return
+
+        for picture in root.findall(".//ComposerPicture"):
+            resource_path = picture.get('file')
+            if resource_path:
+                names.add(os.path.basename(resource_path))
+
+    def scan_dir(self, path, referenced, patterns, min_mtime, dry_run, stats):
+        """Report or remove orphaned entries in an upload dir.
+
+        :param str path: Upload dir
+        :param set referenced: Referenced names in this dir
+        :param list(re.Pattern) patterns: Patterns for names of generated
+                                          entries
+        :param float min_mtime: Skip entries modified after this timestamp
+        :param bool dry_run: Only report orphaned entries if set
+        :param obj stats: Stats to update
+        """
+        if not os.path.isdir(path):
+            self.logger.info("Skipping missing upload dir %s" % path)
+            return
+
+        with os.scandir(path) as entries:
+            for entry in entries:
+                stats['scanned'] += 1
+                if entry.name in referenced:
+                    continue
+                for pattern in patterns:
+                    if pattern.match(entry.name):
+                        break
+                else:
+                    # skip entries without generated names
+                    continue
+
+                try:
+                    entry_stat = entry.stat(follow_symlinks=False)
+                    if entry_stat.st_mtime > min_mtime:
+                        # skip recent entries of uploads in progress
+                        stats['skipped_recent'] += 1
+                        continue
+
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    if is_dir:
+                        size = self.dir_size(entry.path)
+                    else:
+                        size = entry_stat.st_size
+
+                    stats['orphaned'] += 1
+                    stats['orphaned_bytes'] += size
+                    stats['orphans'].append(entry.path)
+
+                    if not dry_run:
+                        if is_dir:
+                            shutil.rmtree(entry.path)
+                        else:
+                            os.remove(entry.path)
+                        stats['removed'] += 1
+                except OSError as e:
+                    self.logger.warning(
+                        "Could not clean up %s: %s" % (entry.path, e)
+                    )
+                    stats['errors'] += 1
+
+    def dir_size(self, path):
+        """Return total size of files in a dir.
+
+        :param str path: Dir path
+        """
+        size = 0
+        for root, dirs, files in os.walk(path):
+            for filename in files:
+                try:
+                    size += os.lstat(os.path.join(root, filename)).st_size
+                except OSError:
+                    pass
+        return size
@@ -0,0 +1,90 @@
+// Typeahead for select fields with lazy loaded options
+//
+// Select fields with a 'data-lookup-url' attribute only contain the empty and
+// the selected option when rendered. A search input is added in front of the
+// select, and matching options are loaded from the lookup endpoint
+// (see LookupController) on focus and while typing.
+//
+// Optional 'data-lookup-exclude' is a CSS selector for inputs with IDs of
+// options to skip, e.g. entries already added to a subform.
+$(function() {
+  // delay in ms after last key stroke before loading options
+  var DEBOUNCE_DELAY = 250;
+
+  $('select[data-lookup-url]').each(function() {
+    var select = $(this);
+    var url = select.data('lookup-url');
+    var excludeSelector = select.data('lookup-exclude');
+
+    var input = $('<input type="text" class="form-control lookup-search" autocomplete="off">');
+    input.attr('placeholder', 'Suchen...');
+    select.before(input);
+
+    var timer = null;
+    var request = null;
+    var loadedQuery = null;
+
+    var loadOptions = function() {
+      var query = $.trim(input.val());
+      if (query === loadedQuery) {
+        return;
+      }
+
+      var params = {q: query};
+      if (excludeSelector) {
+        var excludeIds = $(excludeSelector).map(function() {
+          return $(this).val();
+        }).get();
+        if (excludeIds.length > 0) {
+          params.exclude = excludeIds.join(',');
+        }
+      }
+
+      if (request !== null) {
+        // cancel pending request
+        request.abort();
+      }
+      request = $.getJSON(url, params).done(function(data) {
+        loadedQuery = query;
+        updateOptions(data.results, data.more);
+      }).always(function() {
+        request = null;
+      });
+    };
+
+    var updateOptions = function(results, more) {
+      var selected = select.find('option:selected');
+      var selectedId = selected.val();
+
+      // replace options, but keep empty and selected option
+      select.find('option').filter(function() {
+        return this.value !== '0' && this.value !== selectedId;
+      }).remove();
+      $.each(results, function(i, result) {
+        if (String(result.id) !== selectedId) {
+          select.append($('<option>').val(result.id).text(result.label));
+        }
+      });
+      if (more) {
+        select.append(
+          $('<option disabled>').text('... weitere Treffer, Suche verfeinern')
+        );
+      }
+    };
+
+    input.on('input', function() {
+      clearTimeout(timer);
+      timer = setTimeout(loadOptions, DEBOUNCE_DELAY);
+    });
+    input.on('focus', loadOptions);
+    select.on('focus mousedown', function() {
+      if (loadedQuery === null) {
+        loadOptions();
+      }
+    });
+    select.closest('table').on('click', 'button', function() {
+      // reload options after adding or removing subform entries
+      loadedQuery = null;
+    });
+  });
+});
@@ -0,0 +1,53 @@
+// Availability checks for resource names while typing
+//
+// Inputs with a 'data-name-check-url' attribute are checked against the
+// name registry (see NameCheckController) after each change, and marked as
+// error with the validation message if the name is already used.
+$(function() {
+  // delay in ms after last key stroke before checking name
+  var DEBOUNCE_DELAY = 300;
+
+  $('input[data-name-check-url]').each(function() {
+    var input = $(this);
+    var url = input.data('name-check-url');
+    var formGroup = input.closest('.form-group');
+    var help = $('<span class="help-block name-check"></span>').hide();
+    input.after(help);
+
+    var timer = null;
+    var request = null;
+    var checkedName = $.trim(input.val());
+
+    var showResult = function(message) {
+      formGroup.toggleClass('has-error', message !== null);
+      help.text(message || '').toggle(message !== null);
+    };
+
+    var checkName = function() {
+      var name = $.trim(input.val());
+      if (name === checkedName) {
+        return;
+      }
+      checkedName = name;
+
+      if (request !== null) {
+        // cancel pending request
+        request.abort();
+      }
+      if (name === '') {
+        showResult(null);
+        return;
+      }
+      request = $.getJSON(url, {name: name}).done(function(data) {
+        showResult(data.available ? null : data.message);
+      }).always(function() {
+        request = null;
+      });
+    };
+
+    input.on('input', function() {
+      clearTimeout(timer);
+      timer = setTimeout(checkName, DEBOUNCE_DELAY);
+    });
+  });
+});
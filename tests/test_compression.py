@@ -0,0 +1,49 @@
+import gzip
+import unittest
+
+from flask import Flask
+from flask_wtf.csrf import CSRFProtect, generate_csrf
+
+from service_lib.compression import ResponseCompression
+
+
+class ResponseCompressionTest(unittest.TestCase):
+    """Tests for compression of responses"""
+
+    def setUp(self):
+        app = Flask(__name__)
+        app.secret_key = 'test'
+        CSRFProtect(app)
+        ResponseCompression(app, min_size=100)
+
+        @app.route('/list')
+        def index():
+            return "<p>%s</p>" % ("x" * 1000)
+
+        @app.route('/form')
+        def form():
+            return '<input name="csrf_token" value="%s">%s' % (
+                generate_csrf(), "x" * 1000
+            )
+
+        self.client = app.test_client()
+
+    def get(self, path):
+        return self.client.get(path, headers={'Accept-Encoding': 'gzip'})
+
+    def test_compress_response(self):
+        response = self.get('/list')
+        self.assertEqual(response.headers.get('Content-Encoding'), 'gzip')
+        self.assertEqual(
+            gzip.decompress(response.get_data()).decode(),
+            "<p>%s</p>" % ("x" * 1000)
+        )
+
+    def test_skip_response_with_csrf_token(self):
+        response = self.get('/form')
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertIn('name="csrf_token"', response.get_data(as_text=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,197 @@
+import logging
+import os
+import unittest
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine
+from sqlalchemy.sql import text as sql_text
+
+from service_lib.data_versions import DataVersions
+
+
+# connection URL of an empty PostgreSQL test DB
+# NOTE: tables public.agdi_data_version, public.agdi_data_version_pending
+#       and schema agdi_test_versions are created and reset by these tests
+TEST_DB_URL = os.environ.get('TEST_CONFIGDB_URL')
+
+
+@unittest.skipUnless(TEST_DB_URL, "TEST_CONFIGDB_URL not set")
+class DataVersionsTest(unittest.TestCase):
+    """Tests for change counters of ConfigDB tables on a PostgreSQL test DB
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_engine(TEST_DB_URL)
+        # NOTE: same as in migrations a9d3c51e7f24 and b8e4f0c2d915
+        with cls.engine.begin() as conn:
+            conn.execute(sql_text("""
+                DROP SCHEMA IF EXISTS agdi_test_versions CASCADE;
+                DROP TABLE IF EXISTS public.agdi_data_version_pending;
+                DROP TABLE IF EXISTS public.agdi_data_version;
+
+                CREATE TABLE public.agdi_data_version (
+                    table_name character varying PRIMARY KEY,
+                    version bigint NOT NULL DEFAULT 0,
+                    updated_at timestamp without time zone NOT NULL
+                        DEFAULT now()
+                );
+
+                CREATE TABLE public.agdi_data_version_pending (
+                    txid bigint NOT NULL,
+                    table_name character varying NOT NULL,
+                    PRIMARY KEY (txid, table_name)
+                );
+
+                CREATE OR REPLACE FUNCTION public.agdi_bump_data_version()
+                RETURNS trigger AS $$
+                BEGIN
+                    INSERT INTO public.agdi_data_version_pending
+                        (txid, table_name)
+                    VALUES (
+                        txid_current(), TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME
+                    )
+                    ON CONFLICT DO NOTHING;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                CREATE OR REPLACE FUNCTION public.agdi_apply_data_version()
+                RETURNS trigger AS $$
+                BEGIN
+                    WITH pending AS (
+                        DELETE FROM public.agdi_data_version_pending
+                        WHERE txid = txid_current()
+                        RETURNING table_name
+                    )
+                    INSERT INTO public.agdi_data_version AS v
+                        (table_name, version, updated_at)
+                    SELECT table_name, 1, now() FROM pending
+                    ORDER BY table_name
+                    ON CONFLICT (table_name) DO UPDATE
+                        SET version = v.version + 1, updated_at = now();
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                CREATE CONSTRAINT TRIGGER agdi_data_version
+                AFTER INSERT ON public.agdi_data_version_pending
+                DEFERRABLE INITIALLY DEFERRED
+                FOR EACH ROW
+                EXECUTE PROCEDURE public.agdi_apply_data_version();
+
+                CREATE SCHEMA agdi_test_versions;
+                CREATE TABLE agdi_test_versions.a (id serial PRIMARY KEY);
+                CREATE TABLE agdi_test_versions.b (id serial PRIMARY KEY);
+                CREATE TRIGGER agdi_data_version
+                AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+                ON agdi_test_versions.a
+                FOR EACH STATEMENT
+                EXECUTE PROCEDURE public.agdi_bump_data_version();
+                CREATE TRIGGER agdi_data_version
+                AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+                ON agdi_test_versions.b
+                FOR EACH STATEMENT
+                EXECUTE PROCEDURE public.agdi_bump_data_version();
+            """))
+
+    @classmethod
+    def tearDownClass(cls):
+        with cls.engine.begin() as conn:
+            conn.execute(sql_text("""
+                DROP SCHEMA agdi_test_versions CASCADE;
+            """))
+        cls.engine.dispose()
+
+    def setUp(self):
+        with self.engine.begin() as conn:
+            conn.execute(sql_text("""
+                TRUNCATE public.agdi_data_version;
+                TRUNCATE public.agdi_data_version_pending;
+            """))
+
+        self.data_versions = DataVersions(
+            SimpleNamespace(engine=self.engine), logging.getLogger(__name__)
+        )
+
+    def transaction(self):
+        """Return connection and transaction, which fails instead of waiting
+        for locks of other transactions.
+        """
+        conn = self.engine.connect()
+        transaction = conn.begin()
+        conn.execute(sql_text("SET LOCAL lock_timeout = '2s';"))
+        return conn, transaction
+
+    def insert(self, conn, table, rows=1):
+        conn.execute(sql_text(
+            "INSERT INTO agdi_test_versions.%s (id) "
+            "SELECT nextval('agdi_test_versions.%s_id_seq') "
+            "FROM generate_series(1, :rows);" % (table, table)
+        ), rows=rows)
+
+    def test_bump_on_commit(self):
+        conn, transaction = self.transaction()
+        self.insert(conn, 'a', rows=3)
+        self.insert(conn, 'a')
+        self.insert(conn, 'b')
+
+        # not visible before commit
+        self.assertEqual(self.data_versions.versions(), {})
+
+        transaction.commit()
+        conn.close()
+
+        # bumped once per table and transaction
+        self.assertEqual(self.data_versions.versions(), {
+            'agdi_test_versions.a': 1,
+            'agdi_test_versions.b': 1
+        })
+        self.assertEqual(
+            self.data_versions.tables_key([
+                'agdi_test_versions.b', 'agdi_test_versions.c'
+            ]),
+            (1, 0)
+        )
+
+    def test_no_bump_on_rollback(self):
+        conn, transaction = self.transaction()
+        self.insert(conn, 'a')
+        transaction.rollback()
+        conn.close()
+
+        self.assertEqual(self.data_versions.versions(), {})
+
+    def test_concurrent_transactions(self):
+        # create counters, so that both transactions update existing rows
+        conn, transaction = self.transaction()
+        self.insert(conn, 'a')
+        self.insert(conn, 'b')
+        transaction.commit()
+        conn.close()
+
+        # write tables in opposite order in two open transactions
+        # NOTE: would wait for the counter rows locked by the other
+        #       transaction, if bumped immediately
+        conn1, transaction1 = self.transaction()
+        conn2, transaction2 = self.transaction()
+        try:
+            self.insert(conn1, 'a')
+            self.insert(conn2, 'b')
+            self.insert(conn1, 'b')
+            self.insert(conn2, 'a')
+
+            transaction2.commit()
+            transaction1.commit()
+        finally:
+            conn1.close()
+            conn2.close()
+
+        self.assertEqual(self.data_versions.versions(), {
+            'agdi_test_versions.a': 3,
+            'agdi_test_versions.b': 3
+        })
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import time
+import unittest
+
+from service_lib.database import DatabaseEngine
+
+
+# connection URL of an empty PostgreSQL test DB
+TEST_DB_URL = os.environ.get('TEST_CONFIGDB_URL')
+
+
+class DatabaseEngineTest(unittest.TestCase):
+    """Tests for eviction of engines of DatabaseEngine"""
+
+    def setUp(self):
+        self.db_engine = DatabaseEngine(
+            max_engines=1, idle_timeout=0, grace_period=60
+        )
+
+    def tearDown(self):
+        for conn_str in list(self.db_engine.engines):
+            self.db_engine.dispose(conn_str)
+
+    def evict(self, delay):
+        """Evict engines as if called delay seconds from now.
+
+        :param float delay: Seconds
+        """
+        with self.db_engine.lock:
+            return self.db_engine.evict_engines(time.time() + delay)
+
+    def test_keep_handed_out_engines(self):
+        # NOTE: engines are not connected by these tests
+        engine1 = self.db_engine.db_engine('sqlite:///agdi_test_1.db')
+        self.db_engine.db_engine('sqlite:///agdi_test_2.db')
+
+        # engine returned within grace period is kept beyond limit
+        self.assertIs(
+            self.db_engine.engines.get('sqlite:///agdi_test_1.db'), engine1
+        )
+        self.assertEqual(self.evict(30), 0)
+
+        # and evicted after grace period
+        self.assertEqual(self.evict(90), 1)
+        self.assertEqual(
+            list(self.db_engine.engines), ['sqlite:///agdi_test_2.db']
+        )
+
+    def test_evict_idle_engines(self):
+        self.db_engine.idle_timeout = 600
+        self.db_engine.db_engine('sqlite:///agdi_test_1.db')
+        self.db_engine.db_engine('sqlite:///agdi_test_2.db', pinned=True)
+
+        self.assertEqual(self.evict(300), 0)
+        # pinned engines are never evicted
+        self.assertEqual(self.evict(900), 1)
+        self.assertEqual(
+            list(self.db_engine.engines), ['sqlite:///agdi_test_2.db']
+        )
+
+    @unittest.skipUnless(TEST_DB_URL, "TEST_CONFIGDB_URL not set")
+    def test_keep_engines_with_checked_out_connections(self):
+        engine1 = self.db_engine.db_engine(TEST_DB_URL)
+        conn = engine1.connect()
+        try:
+            self.db_engine.db_engine('sqlite:///agdi_test_2.db')
+
+            # engine with checked out connection is kept after grace period
+            self.assertEqual(self.evict(90), 0)
+            self.assertIn(TEST_DB_URL, self.db_engine.engines)
+        finally:
+            conn.close()
+
+        self.assertEqual(self.evict(90), 1)
+        self.assertNotIn(TEST_DB_URL, self.db_engine.engines)
+
+
+if __name__ == '__main__':
+    unittest.main()
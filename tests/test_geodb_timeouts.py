@@ -0,0 +1,147 @@
+import os
+import unittest
+from types import SimpleNamespace
+
+from flask import Flask, json
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql import text as sql_text
+
+from controllers.data_set_gui_controller import DataSetGUIController
+from controllers.geodb_helper import GeoDBHelper
+from service_lib.database import DatabaseEngine
+
+
+# connection URL of an empty PostgreSQL test DB, used as data_source DB
+# NOTE: schema agdi_test_timeouts is created and dropped by these tests
+TEST_DB_URL = os.environ.get('TEST_CONFIGDB_URL')
+
+
+@unittest.skipUnless(TEST_DB_URL, "TEST_CONFIGDB_URL not set")
+class GeoDBTimeoutsTest(unittest.TestCase):
+    """Tests for statement and lock timeouts of data_source DBs"""
+
+    def setUp(self):
+        self.db_engine = DatabaseEngine()
+        self.service_config = {
+            'geodb_options': {
+                'statement_timeout': 500,
+                'lock_timeout': 200
+            }
+        }
+        self.geodb_helper = GeoDBHelper(
+            self.db_engine, lambda: self.service_config
+        )
+        self.data_source = SimpleNamespace(
+            connection=TEST_DB_URL, name='test'
+        )
+        # NOTE: engine without timeouts for setup and holding locks
+        self.admin_engine = create_engine(TEST_DB_URL)
+        with self.admin_engine.begin() as conn:
+            conn.execute(sql_text("""
+                DROP SCHEMA IF EXISTS agdi_test_timeouts CASCADE;
+                CREATE SCHEMA agdi_test_timeouts;
+                CREATE TABLE agdi_test_timeouts.attrs (
+                    id serial PRIMARY KEY,
+                    attrs text
+                );
+                INSERT INTO agdi_test_timeouts.attrs (attrs)
+                VALUES ('[{"name": "a"}]');
+                CREATE VIEW agdi_test_timeouts.slow_attrs AS
+                    SELECT id, attrs FROM agdi_test_timeouts.attrs
+                    WHERE pg_sleep(2) IS NOT NULL;
+            """))
+
+    def tearDown(self):
+        with self.admin_engine.begin() as conn:
+            conn.execute(sql_text(
+                "DROP SCHEMA agdi_test_timeouts CASCADE;"
+            ))
+        self.admin_engine.dispose()
+        for conn_str in list(self.db_engine.engines):
+            self.db_engine.dispose(conn_str)
+
+    def query_error(self, table_name):
+        """Query table with timeouts of data_source and return error.
+
+        :param str table_name: Table name as "<schema>.<table>"
+        """
+        engine = self.geodb_helper.engine(self.data_source)
+        with self.assertRaises(OperationalError) as cm:
+            with engine.connect() as conn:
+                conn.execute(sql_text(
+                    "SELECT * FROM %s;" % table_name
+                )).fetchall()
+        return cm.exception
+
+    def test_statement_timeout(self):
+        e = self.query_error('agdi_test_timeouts.slow_attrs')
+        self.assertEqual(
+            self.geodb_helper.error_message(e),
+            "Zeitüberschreitung: Abfrage wurde nach Ablauf von "
+            "statement_timeout abgebrochen"
+        )
+
+    def test_lock_timeout(self):
+        with self.admin_engine.begin() as conn:
+            conn.execute(sql_text(
+                "LOCK TABLE agdi_test_timeouts.attrs IN ACCESS EXCLUSIVE MODE;"
+            ))
+            e = self.query_error('agdi_test_timeouts.attrs')
+
+        self.assertEqual(
+            self.geodb_helper.error_message(e),
+            "Zeitüberschreitung: Tabelle ist gesperrt "
+            "(lock_timeout abgelaufen)"
+        )
+
+    def json_attributes(self, table_name):
+        """Return response and status of JSON attributes lookup.
+
+        :param str table_name: Table name as "<schema>.<table>"
+        """
+        app = Flask(__name__)
+        controller = DataSetGUIController(
+            app, SimpleNamespace(), None, None, self.db_engine,
+            lambda: self.service_config, None, None
+        )
+        # NOTE: skip lookup of data_source in ConfigDB
+        controller.engine_for_data_source = \
+            lambda data_source_id: self.geodb_helper.engine(self.data_source)
+
+        with app.test_request_context(
+            '/data_sets/json_attrs', query_string={
+                'data_source_id': 1,
+                'table_name': table_name,
+                'attr_name': 'attrs'
+            }
+        ):
+            response, status = controller.json_attributes()
+            return json.loads(response.get_data(as_text=True)), status
+
+    def test_json_attributes_timeout(self):
+        result, status = self.json_attributes('agdi_test_timeouts.slow_attrs')
+        self.assertEqual(status, 504)
+        self.assertEqual(
+            result['error'],
+            "Zeitüberschreitung: Abfrage wurde nach Ablauf von "
+            "statement_timeout abgebrochen"
+        )
+
+    def test_json_attributes_lock_timeout(self):
+        with self.admin_engine.begin() as conn:
+            conn.execute(sql_text(
+                "LOCK TABLE agdi_test_timeouts.attrs IN ACCESS EXCLUSIVE MODE;"
+            ))
+            result, status = self.json_attributes('agdi_test_timeouts.attrs')
+
+        self.assertEqual(status, 504)
+        self.assertEqual(
+            result['error'],
+            "Zeitüberschreitung: Tabelle ist gesperrt "
+            "(lock_timeout abgelaufen)"
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
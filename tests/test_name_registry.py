@@ -0,0 +1,100 @@
+import logging
+import threading
+import unittest
+from types import SimpleNamespace
+
+from service_lib.name_registry import NameRegistry
+
+
+class StaticNameRegistry(NameRegistry):
+    """NameRegistry with indexes built from static names"""
+
+    def __init__(self, config_models):
+        super().__init__(
+            config_models, SimpleNamespace(tables_key=lambda tables: None),
+            logging.getLogger(__name__)
+        )
+        # names per ConfigDB URL as {<URL>: {<type>: {<name>: set(<ID>)}}}
+        self.names = {}
+        # events blocking builds per ConfigDB URL
+        self.blocking = {}
+        self.started = threading.Event()
+
+    def build_index(self, version_key):
+        db_url = str(self.config_models.engine.url)
+        if db_url in self.blocking:
+            self.started.set()
+            self.blocking[db_url].wait(10)
+
+        return {
+            'names': self.names[db_url],
+            'root_layers': set(),
+            'version_key': version_key,
+            'built_at': 0
+        }
+
+
+class ThreadConfigModels():
+    """ConfigModels with a ConfigDB URL per thread"""
+
+    def __init__(self):
+        self.local = threading.local()
+
+    @property
+    def engine(self):
+        return SimpleNamespace(url=self.local.db_url)
+
+
+class NameRegistryTest(unittest.TestCase):
+    """Tests for name indexes of multiple ConfigDBs"""
+
+    def setUp(self):
+        self.config_models = ThreadConfigModels()
+        self.name_registry = StaticNameRegistry(self.config_models)
+        self.name_registry.FALLBACK_TTL = float('inf')
+        for db_url, name in [('db_a', 'a'), ('db_b', 'b')]:
+            names = {resource_type: {} for resource_type in NameRegistry.TYPES}
+            names['map'][name] = set([1])
+            self.name_registry.names[db_url] = names
+
+    def test_indexes_per_config_db(self):
+        self.config_models.local.db_url = 'db_a'
+        self.assertIsNotNone(self.name_registry.check('map', 'a'))
+        self.assertIsNone(self.name_registry.check('map', 'b'))
+
+        self.config_models.local.db_url = 'db_b'
+        self.assertIsNone(self.name_registry.check('map', 'a'))
+        self.assertIsNotNone(self.name_registry.check('map', 'b'))
+
+    def test_build_does_not_block_other_config_dbs(self):
+        release = threading.Event()
+        self.name_registry.blocking['db_a'] = release
+
+        def check():
+            self.config_models.local.db_url = 'db_a'
+            self.name_registry.check('map', 'a')
+
+        worker = threading.Thread(target=check)
+        worker.start()
+        try:
+            self.assertTrue(self.name_registry.started.wait(10))
+
+            # index of other ConfigDB is built while db_a is building
+            result = []
+
+            def resources():
+                self.config_models.local.db_url = 'db_b'
+                result.append(self.name_registry.resources('b'))
+
+            other = threading.Thread(target=resources)
+            other.start()
+            other.join(2)
+            self.assertFalse(other.is_alive())
+            self.assertEqual(result, [[('map', 1)]])
+        finally:
+            release.set()
+            worker.join(10)
+
+
+if __name__ == '__main__':
+    unittest.main()
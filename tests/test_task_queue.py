@@ -0,0 +1,338 @@
+import logging
+import os
+import tempfile
+import threading
+import unittest
+import zipfile
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import text as sql_text
+
+from service_lib.config_models import ConfigDBSession
+from service_lib.task_queue import TaskQueue
+
+
+# connection URL of an empty PostgreSQL test DB
+# NOTE: table public.agdi_tasks is created and truncated by these tests
+TEST_DB_URL = os.environ.get('TEST_CONFIGDB_URL')
+
+
+class TaskQueueConfigModels():
+    """ConfigModels for a test DB with only the tasks table"""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def session(self):
+        return ConfigDBSession(self.engine)
+
+
+@unittest.skipUnless(TEST_DB_URL, "TEST_CONFIGDB_URL not set")
+class TaskQueueTest(unittest.TestCase):
+    """Tests for TaskQueue with local workers on a PostgreSQL test DB"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_engine(TEST_DB_URL)
+        # NOTE: same as in migrations 4c2b7e9d1a30 and c3a9d7e51f02
+        with cls.engine.begin() as conn:
+            conn.execute(sql_text("""
+                DROP TABLE IF EXISTS public.agdi_tasks;
+                CREATE TABLE public.agdi_tasks (
+                    id bigserial PRIMARY KEY,
+                    task_type character varying NOT NULL,
+                    gdi_oid_resource bigint,
+                    params text NOT NULL,
+                    status character varying NOT NULL DEFAULT 'pending',
+                    error text,
+                    created_at timestamp without time zone NOT NULL
+                        DEFAULT now(),
+                    finished_at timestamp without time zone,
+                    attempts integer NOT NULL DEFAULT 0,
+                    started_at timestamp without time zone
+                );
+            """))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.engine.dispose()
+
+    def setUp(self):
+        with self.engine.begin() as conn:
+            conn.execute(sql_text(
+                "TRUNCATE public.agdi_tasks RESTART IDENTITY;"
+            ))
+
+        self.config_models = TaskQueueConfigModels(self.engine)
+        self.task_queue = TaskQueue(
+            self.config_models, logging.getLogger(__name__)
+        )
+        # processed tasks as [(<worker>, <params>)]
+        self.processed = []
+        self.task_queue.register_handler('record', self.record)
+
+    def record(self, params, session):
+        self.processed.append((threading.current_thread().name, params))
+
+    def enqueue(self, *params_list, task_type='record', gdi_oid=1):
+        session = self.config_models.session()
+        for params in params_list:
+            self.task_queue.enqueue(
+                task_type, SimpleNamespace(gdi_oid=gdi_oid), params, session
+            )
+        session.commit()
+        session.close()
+
+    def tasks(self):
+        with self.engine.connect() as conn:
+            return [
+                dict(row) for row in conn.execute(sql_text("""
+                    SELECT id, task_type, gdi_oid_resource, status, error,
+                        attempts
+                    FROM public.agdi_tasks
+                    ORDER BY id;
+                """))
+            ]
+
+    def test_enqueue_on_commit(self):
+        resource = SimpleNamespace(gdi_oid=42)
+
+        session = self.config_models.session()
+        self.task_queue.enqueue('record', resource, {'n': 1}, session)
+        self.assertEqual(self.tasks(), [])
+        session.rollback()
+        session.commit()
+        session.close()
+        # queued tasks are discarded on rollback
+        self.assertEqual(self.tasks(), [])
+
+        session = self.config_models.session()
+        self.task_queue.enqueue('record', resource, {'n': 2}, session)
+        session.commit()
+        session.close()
+
+        tasks = self.tasks()
+        self.assertEqual(len(tasks), 1)
+        self.assertEqual(tasks[0]['gdi_oid_resource'], 42)
+        self.assertEqual(tasks[0]['status'], TaskQueue.STATUS_PENDING)
+        self.assertEqual(
+            self.task_queue.status_message(42), "Upload wird verarbeitet..."
+        )
+
+    def test_enqueue_only_for_config_db_sessions(self):
+        session = Session(self.engine)
+        session.info[TaskQueue.SESSION_INFO_KEY] = [
+            ('record', SimpleNamespace(gdi_oid=1), {})
+        ]
+        session.commit()
+        session.close()
+
+        self.assertEqual(self.tasks(), [])
+
+    def test_process_in_order(self):
+        self.enqueue({'n': 1}, {'n': 2})
+
+        self.assertTrue(self.task_queue.process_next())
+        self.assertTrue(self.task_queue.process_next())
+        self.assertFalse(self.task_queue.process_next())
+
+        self.assertEqual(
+            [params for worker, params in self.processed],
+            [{'n': 1}, {'n': 2}]
+        )
+        self.assertEqual(
+            [task['status'] for task in self.tasks()],
+            [TaskQueue.STATUS_DONE, TaskQueue.STATUS_DONE]
+        )
+        self.assertIsNone(self.task_queue.status_message(1))
+
+    def test_skip_locked_by_other_worker(self):
+        self.enqueue({'n': 1}, {'n': 2})
+
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking(params, session):
+            self.record(params, session)
+            started.set()
+            # keep task locked until released
+            release.wait(10)
+
+        self.task_queue.register_handler('record', blocking)
+        worker = threading.Thread(
+            target=self.task_queue.process_next, name='worker-1'
+        )
+        worker.start()
+        try:
+            self.assertTrue(started.wait(10))
+
+            # second worker skips the task locked by the first worker
+            self.task_queue.register_handler('record', self.record)
+            threading.current_thread().name = 'worker-2'
+            self.assertTrue(self.task_queue.process_next())
+            self.assertFalse(self.task_queue.process_next())
+        finally:
+            release.set()
+            worker.join(10)
+
+        self.assertEqual(
+            sorted(self.processed, key=lambda p: p[1]['n']),
+            [('worker-1', {'n': 1}), ('worker-2', {'n': 2})]
+        )
+        self.assertEqual(
+            [task['status'] for task in self.tasks()],
+            [TaskQueue.STATUS_DONE, TaskQueue.STATUS_DONE]
+        )
+
+    def crash(self, expired=False):
+        """Claim and lock next task as in process_next, and return connection
+        and transaction of a worker crashing while processing it.
+
+        :param bool expired: Set to claim task before CLAIM_TIMEOUT
+        """
+        with self.engine.begin() as conn:
+            row = conn.execute(sql_text("""
+                UPDATE public.agdi_tasks
+                SET status = 'running', attempts = attempts + 1,
+                    started_at = now()
+                WHERE id = (
+                    SELECT id FROM public.agdi_tasks
+                    WHERE status IN ('pending', 'running')
+                    ORDER BY id
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id;
+            """)).first()
+        self.assertIsNotNone(row)
+        if expired:
+            self.expire_claims()
+
+        crashed = self.engine.connect()
+        transaction = crashed.begin()
+        crashed.execute(sql_text("""
+            SELECT id FROM public.agdi_tasks WHERE id = :id FOR UPDATE;
+        """), id=row['id'])
+
+        return crashed, transaction
+
+    def expire_claims(self):
+        """Move start of claimed tasks before CLAIM_TIMEOUT."""
+        with self.engine.begin() as conn:
+            conn.execute(sql_text("""
+                UPDATE public.agdi_tasks
+                SET started_at = started_at - make_interval(secs => :timeout)
+                WHERE status = 'running';
+            """), timeout=TaskQueue.CLAIM_TIMEOUT + 1)
+
+    def test_retry_after_crashed_worker(self):
+        self.enqueue({'n': 1})
+
+        crashed, transaction = self.crash(expired=True)
+
+        # task is locked while the crashed worker holds its connection
+        self.assertFalse(self.task_queue.process_next())
+
+        transaction.rollback()
+        crashed.close()
+
+        # claimed task is not processed again before CLAIM_TIMEOUT
+        with self.engine.begin() as conn:
+            conn.execute(sql_text(
+                "UPDATE public.agdi_tasks SET started_at = now();"
+            ))
+        self.assertFalse(self.task_queue.process_next())
+        self.assertEqual(
+            self.task_queue.status_message(1), "Upload wird verarbeitet..."
+        )
+
+        # task is processed again by the remaining worker
+        self.expire_claims()
+        self.assertTrue(self.task_queue.process_next())
+        self.assertEqual(len(self.processed), 1)
+        task = self.tasks()[0]
+        self.assertEqual(task['status'], TaskQueue.STATUS_DONE)
+        self.assertEqual(task['attempts'], 2)
+
+    def test_abort_after_max_attempts(self):
+        self.enqueue({'n': 1}, gdi_oid=3)
+
+        for i in range(TaskQueue.MAX_ATTEMPTS):
+            crashed, transaction = self.crash(expired=True)
+            transaction.rollback()
+            crashed.close()
+
+        self.assertTrue(self.task_queue.process_next())
+        self.assertFalse(self.task_queue.process_next())
+
+        self.assertEqual(self.processed, [])
+        task = self.tasks()[0]
+        self.assertEqual(task['status'], TaskQueue.STATUS_FAILED)
+        self.assertEqual(task['attempts'], TaskQueue.MAX_ATTEMPTS + 1)
+        self.assertEqual(
+            task['error'],
+            "Abgebrochen nach %d Versuchen" % TaskQueue.MAX_ATTEMPTS
+        )
+
+    def test_failed_task(self):
+        def failing(params, session):
+            # DB changes of a failed task are discarded
+            session.execute(sql_text("""
+                INSERT INTO public.agdi_tasks (task_type, params)
+                VALUES ('record', '{}');
+            """))
+            raise Exception("Extraction failed")
+
+        self.task_queue.register_handler('failing', failing)
+        self.enqueue({'n': 1}, task_type='failing', gdi_oid=7)
+
+        self.assertTrue(self.task_queue.process_next())
+        self.assertFalse(self.task_queue.process_next())
+
+        tasks = self.tasks()
+        self.assertEqual(len(tasks), 1)
+        self.assertEqual(tasks[0]['status'], TaskQueue.STATUS_FAILED)
+        self.assertEqual(tasks[0]['error'], "Extraction failed")
+        self.assertEqual(
+            self.task_queue.status_message(7),
+            "Verarbeitung des Uploads fehlgeschlagen: Extraction failed"
+        )
+
+    def test_unknown_task_type(self):
+        self.enqueue({}, task_type='unknown')
+
+        self.assertTrue(self.task_queue.process_next())
+
+        task = self.tasks()[0]
+        self.assertEqual(task['status'], TaskQueue.STATUS_FAILED)
+        self.assertEqual(task['error'], "Unknown task type 'unknown'")
+
+    def test_extract_zip_and_remove_files(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            zip_path = os.path.join(tmp_dir, 'upload.zip')
+            with zipfile.ZipFile(zip_path, 'w') as zip_file:
+                zip_file.writestr('new.svg', '<svg/>')
+            target_dir = os.path.join(tmp_dir, 'symbols')
+            os.makedirs(target_dir)
+            for filename in ['old.svg', 'other.svg']:
+                with open(os.path.join(target_dir, filename), 'w') as f:
+                    f.write('<svg/>')
+
+            self.enqueue({
+                'zip_path': zip_path,
+                'target_dir': target_dir,
+                'members': {'new.svg': 'abc.svg'},
+                'remove_files': ['old.svg', 'missing.svg']
+            }, task_type='extract_zip')
+            self.assertTrue(self.task_queue.process_next())
+
+            self.assertEqual(self.tasks()[0]['status'], TaskQueue.STATUS_DONE)
+            self.assertEqual(
+                sorted(os.listdir(target_dir)), ['abc.svg', 'other.svg']
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import logging
+import os
+import time
+import unittest
+
+from service_lib.database import DatabaseEngine
+from service_lib.tenant_config_models import TenantConfigModels
+
+
+# connection URL of an empty PostgreSQL test DB
+TEST_DB_URL = os.environ.get('TEST_CONFIGDB_URL')
+
+
+class TenantConfigModelsTest(unittest.TestCase):
+    """Tests for eviction of tenants of TenantConfigModels"""
+
+    def setUp(self):
+        self.db_engine = DatabaseEngine(grace_period=60)
+        self.config_models = TenantConfigModels(
+            None, lambda: {}, self.db_engine, logging.getLogger(__name__)
+        )
+        self.config_models.max_tenants = 1
+        self.config_models.idle_timeout = 0
+        self.now = time.time()
+
+    def tearDown(self):
+        for conn_str in list(self.db_engine.engines):
+            self.db_engine.dispose(conn_str)
+
+    def add_tenant(self, tenant, db_url):
+        """Add cached tenant as if loaded now.
+
+        NOTE: ConfigModels are not loaded by these tests
+
+        :param str tenant: Tenant name
+        :param str db_url: ConfigDB connection URL
+        """
+        self.db_engine.db_engine(db_url, pinned=True)
+        self.config_models.load_locks[tenant] = None
+        self.config_models.tenants[tenant] = {
+            'config_models': None,
+            'db_url': db_url,
+            'last_used': self.now
+        }
+
+    def evict(self, delay):
+        """Evict tenants as if called delay seconds from now.
+
+        :param float delay: Seconds
+        """
+        with self.config_models.lock:
+            self.config_models.evict_tenants(self.now + delay)
+        return list(self.config_models.tenants)
+
+    def test_keep_tenants_in_use(self):
+        self.add_tenant('a', 'sqlite:///agdi_test_a.db')
+        self.add_tenant('b', 'sqlite:///agdi_test_b.db')
+
+        # tenants used within grace period are kept beyond limit
+        self.assertEqual(self.evict(30), ['a', 'b'])
+        self.assertIn('sqlite:///agdi_test_a.db', self.db_engine.engines)
+
+        # and evicted with their engines and load locks afterwards
+        self.assertEqual(self.evict(90), ['b'])
+        self.assertNotIn('sqlite:///agdi_test_a.db', self.db_engine.engines)
+        self.assertEqual(list(self.config_models.load_locks), ['b'])
+
+    def test_keep_shared_engine(self):
+        self.add_tenant('a', 'sqlite:///agdi_test_a.db')
+        self.add_tenant('b', 'sqlite:///agdi_test_a.db')
+
+        self.assertEqual(self.evict(90), ['b'])
+        # engine is still used by other tenant
+        self.assertIn('sqlite:///agdi_test_a.db', self.db_engine.engines)
+
+    @unittest.skipUnless(TEST_DB_URL, "TEST_CONFIGDB_URL not set")
+    def test_keep_tenants_with_checked_out_connections(self):
+        self.add_tenant('a', TEST_DB_URL)
+        self.add_tenant('b', 'sqlite:///agdi_test_b.db')
+
+        conn = self.db_engine.engines[TEST_DB_URL].connect()
+        try:
+            # tenant with running request is kept after grace period,
+            # in favor of next least recently used tenant
+            self.assertEqual(self.evict(90), ['a'])
+            self.assertIn(TEST_DB_URL, self.db_engine.engines)
+        finally:
+            conn.close()
+
+        self.add_tenant('c', 'sqlite:///agdi_test_c.db')
+        self.assertEqual(self.evict(90), ['c'])
+        self.assertNotIn(TEST_DB_URL, self.db_engine.engines)
+
+
+if __name__ == '__main__':
+    unittest.main()